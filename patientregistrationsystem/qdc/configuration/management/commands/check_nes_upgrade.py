@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from qdc.check_upgrade import check_upgrade
+
+
+class Command(BaseCommand):
+    help = 'Check the latest NES version in the NES repository and store it for the contact page'
+
+    def handle(self, *args, **options):
+        upgrade_check = check_upgrade()
+
+        if upgrade_check is None:
+            self.stdout.write('The NES repository could not be reached.')
+        elif not upgrade_check['git']:
+            self.stdout.write('NES is not a git installation.')
+        elif upgrade_check['new_version']:
+            self.stdout.write('New version: %s (current: %s).' % (
+                upgrade_check['latest_tag'], upgrade_check['current_tag']))
+        else:
+            self.stdout.write('NES is up to date (%s).' % upgrade_check['current_tag'])
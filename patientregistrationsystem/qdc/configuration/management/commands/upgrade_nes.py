@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+from os import path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+from git import Repo
+
+from qdc.check_upgrade import UPGRADE_JOB_CACHE_KEY, check_upgrade, get_nes_directory_path, latest_version_tag
+
+
+def get_pending_migrations():
+    connection = connections[DEFAULT_DB_ALIAS]
+    connection.prepare_database()
+    executor = MigrationExecutor(connection)
+    targets = executor.loader.graph.leaf_nodes()
+    return executor.migration_plan(targets)
+
+
+class Command(BaseCommand):
+    help = 'Upgrade NES to the latest version of its git repository. Started by the upgrade page, ' \
+           'which shows its output'
+
+    def run(self, *args):
+        # The commands of the new version run in new processes, with their
+        # output after the output of this command
+        self.stdout.flush()
+        subprocess.check_call(args, cwd=settings.BASE_DIR or None)
+
+    def upgrade(self):
+        path_git_repo_local = get_nes_directory_path()
+
+        if '.git' not in os.listdir(path_git_repo_local):
+            raise CommandError('NES is not a git installation.')
+
+        repo = Repo(path_git_repo_local)
+        git = repo.git
+
+        repo.remotes.origin.fetch()
+        new_version_tag = latest_version_tag(git)
+
+        self.stdout.write('Checking out ' + new_version_tag)
+        git.checkout(new_version_tag)
+
+        self.run(sys.executable, '-m', 'pip', 'install', '-r', path.join(settings.BASE_DIR, 'requirements.txt'))
+
+        manage = path.join(settings.BASE_DIR, 'manage.py')
+        self.run(sys.executable, manage, 'collectstatic', '--noinput', '--verbosity', '0')
+
+        if get_pending_migrations():
+            self.run(sys.executable, manage, 'migrate')
+        else:
+            self.stdout.write("There are not migrations")
+
+        # the new version may use new database cache tables
+        self.run(sys.executable, manage, 'createcachetable')
+
+        os.utime(path.join(path_git_repo_local, 'patientregistrationsystem', 'qdc', 'qdc', 'wsgi.py'))
+
+        # check if the current TAG is the latest tag
+        if git.describe() != new_version_tag:
+            raise CommandError('NES was not updated ' + new_version_tag)
+
+        self.stdout.write("NES updated to " + new_version_tag)
+        return new_version_tag
+
+    def handle(self, *args, **options):
+        job = cache.get(UPGRADE_JOB_CACHE_KEY) or {'log': None, 'started_at': timezone.now()}
+        # the upgrade page takes the job as failed if this process dies
+        job.update(status='running', pid=os.getpid(), finished_at=None, tag=None)
+        cache.set(UPGRADE_JOB_CACHE_KEY, job, None)
+
+        try:
+            job['tag'] = self.upgrade()
+            job['status'] = 'finished'
+        except Exception:
+            job['status'] = 'failed'
+            raise
+        finally:
+            job['finished_at'] = timezone.now()
+            cache.set(UPGRADE_JOB_CACHE_KEY, job, None)
+
+        # the contact page stops offering the upgrade
+        check_upgrade()
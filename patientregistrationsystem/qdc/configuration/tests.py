@@ -1,3 +1,116 @@
-from django.test import TestCase
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from qdc.check_upgrade import UPGRADE_CHECK_CACHE_KEY, UPGRADE_CHECK_LOCK_CACHE_KEY, UPGRADE_JOB_CACHE_KEY, \
+    UPGRADE_START_TIMEOUT, UPGRADE_TIMEOUT, get_upgrade_check, get_upgrade_job
+from qdc.views import start_upgrade_job, stream_upgrade_log
+
+
+@override_settings(UPGRADE_CHECK_INTERVAL=60)
+@patch('qdc.check_upgrade.threading.Thread')
+class UpgradeCheckTest(TestCase):
+
+    def setUp(self):
+        cache.delete(UPGRADE_CHECK_CACHE_KEY)
+        cache.delete(UPGRADE_CHECK_LOCK_CACHE_KEY)
+
+    def set_upgrade_check(self, seconds_ago):
+        upgrade_check = {
+            'git': True, 'current_tag': 'TAG-1.72.7', 'latest_tag': 'TAG-1.73.0', 'new_version': True,
+            'checked_at': timezone.now() - timedelta(seconds=seconds_ago)
+        }
+        cache.set(UPGRADE_CHECK_CACHE_KEY, upgrade_check, None)
+        return upgrade_check
+
+    def test_recent_check_is_returned_without_checking_again(self, mock_thread):
+        upgrade_check = self.set_upgrade_check(10)
+
+        self.assertEqual(get_upgrade_check(), upgrade_check)
+        mock_thread.assert_not_called()
+
+    def test_old_check_is_returned_and_checked_again_in_background(self, mock_thread):
+        upgrade_check = self.set_upgrade_check(120)
+
+        self.assertEqual(get_upgrade_check(), upgrade_check)
+        mock_thread.return_value.start.assert_called_once_with()
+
+    def test_missing_check_is_checked_in_background(self, mock_thread):
+        self.assertIsNone(get_upgrade_check())
+        mock_thread.return_value.start.assert_called_once_with()
+
+    def test_check_is_not_started_while_another_runs(self, mock_thread):
+        get_upgrade_check()
+        get_upgrade_check()
+
+        self.assertEqual(mock_thread.return_value.start.call_count, 1)
+
+
+class UpgradeJobTest(TestCase):
+
+    def setUp(self):
+        cache.delete(UPGRADE_JOB_CACHE_KEY)
+
+    def set_upgrade_job(self, pid, seconds_ago, log=None):
+        cache.set(UPGRADE_JOB_CACHE_KEY, {
+            'status': 'running', 'log': log, 'pid': pid, 'finished_at': None, 'tag': None,
+            'started_at': timezone.now() - timedelta(seconds=seconds_ago)
+        }, None)
+
+    def dead_process_pid(self):
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        return process.pid
+
+    def test_job_of_a_running_process_is_running(self):
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        self.set_upgrade_job(process.pid, 10)
+
+        self.assertEqual(get_upgrade_job()['status'], 'running')
+
+    def test_job_of_a_dead_process_failed(self):
+        self.set_upgrade_job(self.dead_process_pid(), 10)
+
+        self.assertEqual(get_upgrade_job()['status'], 'failed')
+
+    def test_job_that_did_not_start_failed(self):
+        self.set_upgrade_job(None, UPGRADE_START_TIMEOUT + 1)
+
+        self.assertEqual(get_upgrade_job()['status'], 'failed')
+
+    def test_job_running_too_long_failed(self):
+        with patch('qdc.check_upgrade.process_is_running', return_value=True):
+            self.set_upgrade_job(1, UPGRADE_TIMEOUT + 1)
+
+            self.assertEqual(get_upgrade_job()['status'], 'failed')
+
+    @patch('qdc.views.subprocess.Popen', side_effect=OSError)
+    def test_job_that_can_not_be_started_failed(self, mock_popen):
+        with override_settings(BASE_DIR=self.tmp_directory()):
+            start_upgrade_job()
+
+        job = cache.get(UPGRADE_JOB_CACHE_KEY)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIsNotNone(job['finished_at'])
+
+    def test_log_stream_ends_when_the_process_of_the_job_died(self):
+        log_file = self.tmp_directory() + '/upgrade.log'
+        with open(log_file, 'w') as log:
+            log.write('Checking out TAG-1.73.0\n')
+        self.set_upgrade_job(self.dead_process_pid(), 10, log_file)
+
+        self.assertEqual(''.join(stream_upgrade_log(log_file)), 'Checking out TAG-1.73.0\n')
+
+    def tmp_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return directory
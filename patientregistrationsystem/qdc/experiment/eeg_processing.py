@@ -0,0 +1,376 @@
+"""Signal processing of the EEG data collections: reading of the EEG files,
+sensors position images and NWB files. MNE, NWB, NumPy and matplotlib are
+only loaded when this module is imported, so views and commands import it
+where it is needed rather than at module level.
+"""
+from datetime import date, timedelta
+from os import path
+
+import mne
+import nwb
+import numpy as np
+from django.conf import settings
+from django.utils.translation import ugettext as _
+from nwb.nwbco import *
+
+from experiment.models import EEGFile
+from export.directory_utils import create_directory
+from patient.models import SocialDemographicData
+
+
+class EEGReading:
+    file_format = None
+    reading = None
+
+
+def eeg_channel_count(reading):
+    """Number of EEG channels of a reading of MNE"""
+    return len(mne.pick_types(reading.info, eeg=True))
+
+
+# v1.5
+def get_sensors_position(eeg_data):
+    # Electrode localization image generation. Validate if EGI
+    reading = None
+    file_path = None
+
+    # Getting the eeg_file, if exists
+    eeg_files = eeg_data.eeg_files.all()
+
+    if len(eeg_files) == 1:
+        for eeg_file in eeg_files:
+            nes_code = eeg_file.eeg_data.file_format.nes_code
+            if nes_code == 'MNE-RawFromEGI':
+                reading = eeg_data_reading(eeg_file, preload=False)
+    elif len(eeg_files) == 3:
+        for eeg_file in eeg_files:
+            nes_code = eeg_file.eeg_data.file_format.nes_code
+            file_extension = eeg_file.file.path.split('.')[-1]
+            if nes_code == 'MNE-RawFromBrainVision' and file_extension == 'vhdr':
+                reading = eeg_data_reading(eeg_file, preload=False)
+
+    if reading:
+        raw = reading.reading
+
+        if raw is not None:
+            picks = mne.pick_types(raw.info, eeg=True)
+            ch_names = raw.info['ch_names']
+            channels = len(picks)
+            montage = ""
+
+            # If EGI 129 channels
+            if nes_code == 'MNE-RawFromEGI':
+                if channels == 129:
+                    montage = mne.channels.read_montage('GSN-HydroCel-129')
+
+                if channels == 128:
+                    montage = mne.channels.read_montage('GSN-HydroCel-128')
+
+                if montage != "":
+                    i = 0
+                    list1 = []
+                    list2 = []
+
+                    for ch_name in ch_names:
+                        i = i + 1
+                        if i < 10:
+                            label = 'EEG' + ' 00' + str(i)
+                        if 9 < i < 100:
+                            label = 'EEG' + ' 0' + str(i)
+                        if 99 < i < channels:
+                            label = 'EEG' + ' ' + str(i)
+
+                        if ch_name == label:
+                            list1.insert(i, 'E' + str(i))
+                            list2.insert(i, ch_name)
+
+                    list1.insert(i + 1, 'Cz')
+                    list2.insert(i + 1, 'E' + str(channels))
+                    mapping = dict(zip(list2, list1))
+
+                    raw.rename_channels(mapping)
+            if nes_code == 'MNE-RawFromBrainVision':
+                montage = mne.channels.read_montage('standard_1020')
+
+            if montage != '':
+
+                raw.set_montage(montage)
+
+                file_name = 'sensors_position_' + str(eeg_data.id) + ".png"
+                errors, path_complete = create_directory(settings.MEDIA_ROOT, "temp")
+
+                # The operation below ensures that the properly backend is set
+                import matplotlib as mpl
+                mpl.use('agg')
+
+                fig = raw.plot_sensors(
+                    ch_type='eeg', show_names=True, show=False, title="Sensor positions", ch_groups='position')
+                fig.savefig(path.join(path_complete, file_name))
+
+                file_path = path.join(settings.MEDIA_ROOT, 'temp', file_name)
+
+    return file_path
+
+
+def eeg_data_reading(eeg_file: EEGFile, preload=False):
+
+    eeg_reading = EEGReading()
+
+    # For known formats, try to access data in order to validate the format
+
+    # v1.5
+    if eeg_file.eeg_data.file_format.nes_code == "MNE-RawFromEGI":
+        eeg_reading.file_format = eeg_file.eeg_data.file_format
+
+        try:
+            # Trying to read the segments
+            reading = mne.io.read_raw_egi(eeg_file.file.path, preload=preload)
+        except:
+            reading = None
+
+        eeg_reading.reading = reading
+
+    if eeg_file.eeg_data.file_format.nes_code == "MNE-RawFromBrainVision":
+
+        eeg_reading.file_format = eeg_file.eeg_data.file_format
+
+        try:
+            # Trying to read the segments
+            reading = mne.io.read_raw_brainvision(eeg_file.file.path, preload=preload, stim_channel=False)
+        except:
+            reading = None
+
+        eeg_reading.reading = reading
+
+    return eeg_reading
+
+
+def update_process_requisition(request, process_requisition, status, message):
+    request.session['process_requisition_status' + str(process_requisition)] = status
+    request.session['process_requisition_message' + str(process_requisition)] = message
+    request.session.save()
+
+
+def clean(input_string):
+    return input_string.encode('ascii', 'replace').decode()
+
+
+def create_nwb_file(eeg_data, eeg_reading, process_requisition, request, filename):
+
+    subject_of_group = eeg_data.subject_of_group
+    social_demographic_data = None
+    social_demographic_query = SocialDemographicData.objects.filter(patient=subject_of_group.subject.patient)
+    if social_demographic_query:
+        social_demographic_data = social_demographic_query.first()
+
+    ########################################################################
+    # create a new NWB file
+    # several settings are specified when doing so. these can be supplied within
+    #   the NWB constructor or defined in a dict, as in in this example
+
+    nwb_file_settings = dict()
+    nwb_file_settings["filename"] = filename
+    # each file should have a descriptive globally unique identifier
+    #   that specifies the lab and this experiment session
+    # the function nwb.create_identifier() is recommended to use as it takes
+    #   the string and appends the present date and time
+    nwb_file_settings["identifier"] = nwb.create_identifier(
+        "Participant: " + subject_of_group.subject.patient.code +
+        "; NES experiment: " + clean(eeg_data.subject_of_group.group.experiment.title))
+    # indicate that it's OK to overwrite exting file
+    nwb_file_settings["overwrite"] = True
+    # specify the start time of the experiment. all times in the NWB file
+    #   are relative to experiment start time
+    # if the start time is not specified the present time will be used
+    # settings["start_time"] = "Sat Jul 04 2015 3:14:16"
+    nwb_file_settings["start_time"] = \
+        eeg_data.date.strftime("%Y-%m-%d") + (' ' + eeg_data.time.strftime('%H:%M:%S') if eeg_data.time else '')
+    # provide one or two sentences that describe the experiment and what
+    #   data is in the file
+    nwb_file_settings["description"] = clean(subject_of_group.group.experiment.description)
+    # create the NWB object. this manages the file
+    # print("Creating " + nwb_file_settings["filename"])
+    neurodata = nwb.NWB(**nwb_file_settings)
+    ########################################################################
+    # general metadata section
+    #
+    if request:
+        update_process_requisition(request, process_requisition, 'reading_metadata', _('Reading metadata'))
+
+    neurodata.set_metadata(EXPERIMENT_DESCRIPTION, clean(subject_of_group.group.experiment.description))
+    history_data = eeg_data.history.all().order_by('history_date')
+    if history_data:
+        experimenter = history_data.last().history_user
+        if experimenter.last_name or experimenter.first_name:
+            experimenter_description = experimenter.last_name + ', ' + experimenter.first_name
+        else:
+            experimenter_description = experimenter.username
+
+        if experimenter.email:
+            experimenter_description += ' - ' + experimenter.email
+
+        neurodata.set_metadata(EXPERIMENTER, clean(experimenter_description))
+    neurodata.set_metadata(SUBJECT_ID, subject_of_group.subject.patient.code)
+    neurodata.set_metadata(SEX, clean(subject_of_group.subject.patient.gender.name))
+    neurodata.set_metadata(SPECIES, "human")
+    neurodata.set_metadata(
+        AGE, str((date.today() - subject_of_group.subject.patient.date_birth) // timedelta(days=365.2425)))
+    if social_demographic_data:
+        if social_demographic_data.flesh_tone:
+            neurodata.set_metadata(GENOTYPE, clean(social_demographic_data.flesh_tone.name))
+        if social_demographic_data.natural_of:
+            neurodata.set_metadata(SUBJECT, clean(social_demographic_data.natural_of))
+
+    ########################################################################
+    # general devices section
+    #
+    if request:
+        update_process_requisition(request, process_requisition, 'reading_device_data', _('Reading device data'))
+    # Amplifier device setting
+    if hasattr(eeg_data.eeg_setting, 'eeg_amplifier_setting'):
+        device_identification = clean(eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.identification)
+        device_information = _("Device type: Amplifier; ")
+
+        if eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.description:
+            device_information += _("Description: ") + \
+                                  eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.description + "; "
+
+        device_information += \
+            _("Manufacturer: ") + eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.manufacturer.name + "; "
+
+        device_information += _('Gain: ') + str(eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.gain) + "; "
+
+        if eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.input_impedance:
+            device_information += \
+                _('Impedance: ') + \
+                get_nwb_eeg_amplifier_impedance_description(eeg_data.eeg_setting.eeg_amplifier_setting) + "; "
+
+        if eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.common_mode_rejection_ratio:
+            device_information += \
+                _('Common mode rejection ratio: ') + \
+                str(eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.common_mode_rejection_ratio) + "; "
+
+        neurodata.set_metadata(DEVICE(device_identification), clean(device_information))
+
+    # EEG machine
+    if hasattr(eeg_data.eeg_setting, 'eeg_amplifier_setting'):
+
+        device_identification = clean(eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.identification)
+        device_information = _("Device type: EEG Amplifier; ")
+
+        if eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.description:
+            device_information += \
+                _("Description: ") + eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.description + "; "
+
+        device_information += \
+            _("Manufacturer: ") + eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.manufacturer.name + "; "
+
+        device_information += \
+            _("Number of used channels: ") + \
+            str(eeg_data.eeg_setting.eeg_amplifier_setting.number_of_channels_used) + "; "
+
+        neurodata.set_metadata(DEVICE(device_identification), clean(device_information))
+
+    # Ephys: Filter device setting
+    if hasattr(eeg_data.eeg_setting, 'eeg_filter_setting'):
+        neurodata.set_metadata(EXTRA_FILTERING,
+                               clean(get_nwb_eeg_filter_description(eeg_data.eeg_setting.eeg_filter_setting)))
+
+    # EEG Electrode NET
+    if hasattr(eeg_data.eeg_setting, 'eeg_electrode_layout_setting'):
+
+        eeg_electrode_net_system = eeg_data.eeg_setting.eeg_electrode_layout_setting.eeg_electrode_net_system
+
+        device_identification = clean(eeg_electrode_net_system.eeg_electrode_net.identification)
+        device_information = _("Device type: EEG Electrode Net; ")
+
+        if eeg_electrode_net_system.eeg_electrode_net.description:
+            device_information += _("Description: ") + eeg_electrode_net_system.eeg_electrode_net.description + "; "
+
+        device_information += _("Manufacturer: ") + eeg_electrode_net_system.eeg_electrode_net.manufacturer.name + "; "
+
+        neurodata.set_metadata(DEVICE(device_identification), clean(device_information))
+
+        # Electrode map and group
+        electrode_map = []
+        electrode_group = []
+
+        for position in eeg_electrode_net_system.eeg_electrode_localization_system.electrode_positions.all():
+            position_name = clean(position.name)
+            electrode_group.append(position_name)
+            electrode_map.append([position.coordinate_x, position.coordinate_y, 0])
+            neurodata.set_metadata(EXTRA_SHANK_LOCATION(position_name),
+                                   clean(_("Position: ") + position_name + "; " +
+                                         _("Coordinates: (") +
+                                         str(position.coordinate_x) + ", " +
+                                         str(position.coordinate_y) + "); " +
+                                         _("EEG electrode localization system: " +
+                                           eeg_electrode_net_system.eeg_electrode_localization_system.name)))
+            neurodata.set_metadata(EXTRA_SHANK_DEVICE(position_name), device_identification)
+
+        neurodata.set_metadata(EXTRA_ELECTRODE_MAP, electrode_map)
+        neurodata.set_metadata(EXTRA_ELECTRODE_GROUP, electrode_group)
+
+    ########################################################################
+    # acquisition section
+    #
+    ########################################################################
+    if request:
+        update_process_requisition(request, process_requisition, 'reading_acquisition_data',
+                                   _('Reading acquisition data'))
+    if eeg_reading:
+
+        if eeg_reading.file_format.nes_code == "MNE-RawFromEGI":
+
+            # v1.5
+            number_of_channels = len(mne.pick_types(eeg_reading.reading.info, eeg=True))
+
+            number_of_samples = len(eeg_reading.reading._data[0])
+
+            sampling_rate = 0
+            if hasattr(eeg_data.eeg_setting, 'eeg_amplifier_setting') and \
+                    eeg_data.eeg_setting.eeg_amplifier_setting.sampling_rate:
+                sampling_rate = eeg_data.eeg_setting.eeg_amplifier_setting.sampling_rate
+
+            timestamps = np.arange(number_of_samples) * ((1 / sampling_rate) if sampling_rate else 0)
+
+            # v1.5
+            array_data = np.zeros((number_of_samples, number_of_channels))
+            for index_channel in range(number_of_channels):
+                channel_reading = \
+                    eeg_reading.reading._data[mne.pick_types(eeg_reading.reading.info, eeg=True)[index_channel]]
+                for index, value in enumerate(channel_reading):
+                    array_data[index][index_channel] = value
+
+            acquisition = neurodata.create_timeseries("ElectricalSeries", "data_collection", "acquisition")
+            acquisition.set_data(array_data, resolution=1.2345e-6)
+            acquisition.set_time(timestamps)
+            acquisition.set_value("num_samples", number_of_samples)
+            acquisition.set_value("electrode_idx", list(range(number_of_channels)))
+            acquisition.finalize()
+
+    # when all data is entered, close the file
+    neurodata.close()
+
+    return neurodata.file_name
+
+
+def get_nwb_eeg_filter_description(eeg_filter_setting):
+    response = _("Filter type:") + eeg_filter_setting.eeg_filter_type.name
+    if eeg_filter_setting.eeg_filter_type.description:
+        response += "(" + eeg_filter_setting.eeg_filter_type.description + ")"
+    response += "; "
+    if eeg_filter_setting.high_pass:
+        response += _("High pass: ") + str(eeg_filter_setting.high_pass) + " Hz; "
+    if eeg_filter_setting.low_pass:
+        response += _("Low pass: ") + str(eeg_filter_setting.high_pass) + " Hz; "
+    if eeg_filter_setting.order:
+        response += _("Order: ") + str(eeg_filter_setting.high_pass) + "; "
+    return response
+
+
+def get_nwb_eeg_amplifier_impedance_description(eeg_amplifier_setting):
+    response = str(eeg_amplifier_setting.eeg_amplifier.input_impedance)
+    if eeg_amplifier_setting.eeg_amplifier.input_impedance_unit:
+        response += " " + eeg_amplifier_setting.eeg_amplifier.input_impedance_unit
+    return response
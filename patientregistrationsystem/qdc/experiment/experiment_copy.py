@@ -0,0 +1,343 @@
+import time
+from collections import defaultdict
+from os import path
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import ugettext as _
+
+from experiment.models import Component, ComponentConfiguration, ContextTree, Group, SubjectOfGroup, \
+    DataConfigurationTree, EEGSetting, EEGAmplifierSetting, EEGSolutionSetting, EEGFilterSetting, \
+    EEGElectrodeLayoutSetting, EEGElectrodePositionSetting, EMGSetting, EMGDigitalFilterSetting, \
+    EMGADConverterSetting, EMGElectrodeSetting, EMGPreamplifierSetting, EMGPreamplifierFilterSetting, \
+    EMGAmplifierSetting, EMGAnalogFilterSetting, EMGElectrodePlacementSetting, TMSSetting, TMSDeviceSetting, \
+    Block, EEG, EMG, TMS, Instruction, Pause, Questionnaire, Stimulus, Task, TaskForTheExperimenter, \
+    DigitalGamePhase, GenericDataCollection, EEGData, EEGFile, EEGElectrodePositionCollectionStatus, EMGData, \
+    EMGFile, AdditionalData, AdditionalDataFile, DigitalGamePhaseData, DigitalGamePhaseFile, \
+    GenericDataCollectionData, GenericDataCollectionFile, ComponentAdditionalFile, TMSData, HotSpot, \
+    QuestionnaireResponse
+from qdc.query_count import count_queries
+
+# Component subclasses (multi-table inheritance) and the foreign keys of
+# each one that point to objects of the copied experiment
+COMPONENT_MODELS = (
+    (Block, {}),
+    (EEG, {'eeg_setting_id': 'eeg_setting'}),
+    (EMG, {'emg_setting_id': 'emg_setting'}),
+    (TMS, {'tms_setting_id': 'tms_setting'}),
+    (Instruction, {}),
+    (Pause, {}),
+    (Questionnaire, {}),
+    (Stimulus, {}),
+    (Task, {}),
+    (TaskForTheExperimenter, {}),
+    (DigitalGamePhase, {'context_tree_id': 'context_tree'}),
+    (GenericDataCollection, {}),
+)
+
+
+def bulk_create_with_history(model, objects):
+    """bulk_create does not call save(), so the simple history records of
+    audited models are created here, also in bulk.
+    """
+    objects = model.objects.bulk_create(objects)
+
+    if objects and hasattr(model, 'history'):
+        history_model = model.history.model
+        history_date = timezone.now()
+        fields = model._meta.concrete_fields
+        history_model.objects.bulk_create([
+            history_model(
+                history_date=history_date, history_type='+',
+                **{field.attname: getattr(obj, field.attname) for field in fields}
+            )
+            for obj in objects
+        ])
+
+    return objects
+
+
+class ExperimentCopy(object):
+    """Copies an experiment, and optionally its data collections, with one
+    bulk insert per model, in dependency order and inside one transaction.
+
+    Foreign keys of the copied objects are remapped in memory through
+    orig_and_clone, a dict of {old id: new id} dicts keyed by model name.
+    Files of data collections are shared with the original experiment (see
+    experiment.storage), other files are copied.
+
+    After copy(), report holds the number of queries and the time spent.
+    """
+
+    def __init__(self, experiment, copy_data_collection=False):
+        self.experiment = experiment
+        self.copy_data_collection = copy_data_collection
+        self.orig_and_clone = defaultdict(dict)
+        self.report = {}
+
+    def copy(self):
+        start = time.time()
+        counter = {'queries': 0}
+
+        with count_queries(counter), transaction.atomic():
+            old_experiment_id = self.experiment.id
+            new_experiment = self._copy_experiment()
+            self._copy_settings(old_experiment_id, new_experiment)
+            self._copy_components(old_experiment_id, new_experiment)
+            self._copy_groups(old_experiment_id, new_experiment)
+            if self.copy_data_collection:
+                self._copy_data_collections(old_experiment_id)
+            # bulk inserts do not cascade to Experiment.save()
+            new_experiment.save()
+
+        self.report = {
+            'queries': counter['queries'],
+            'seconds': round(time.time() - start, 3),
+        }
+
+        return new_experiment
+
+    def _bulk_clone(self, key, objects, remap=None, model=None, **values):
+        """Clones objects (a queryset, or a list of objects of model),
+        replacing the foreign keys listed in remap ({attname: orig_and_clone
+        key}) by the id of their clone, and setting values. The ids of the
+        clones are stored in orig_and_clone[key].
+        """
+        model = model or objects.model
+        objects = list(objects)
+        old_ids = [obj.pk for obj in objects]
+
+        for obj in objects:
+            # read before clearing the primary key, which may be one of them
+            new_ids = {
+                attname: self.orig_and_clone[mapping][getattr(obj, attname)]
+                if getattr(obj, attname) is not None else None
+                for attname, mapping in (remap or {}).items()
+            }
+            obj.pk = None
+            for attname, new_id in new_ids.items():
+                setattr(obj, attname, new_id)
+            for attname, value in values.items():
+                setattr(obj, attname, value)
+
+        bulk_create_with_history(model, objects)
+
+        if key:
+            self.orig_and_clone[key].update(zip(old_ids, [obj.pk for obj in objects]))
+
+        return objects
+
+    @staticmethod
+    def _copy_file(obj, field_name):
+        field_file = getattr(obj, field_name)
+        if field_file:
+            with field_file.storage.open(field_file.name, 'rb') as f:
+                field_file.save(path.basename(field_file.name), File(f), save=False)
+            type(obj).objects.filter(pk=obj.pk).update(**{field_name: field_file.name})
+
+    def _bulk_clone_files(self, queryset, remap):
+        """Clones rows of data collection file models. The files themselves
+        are not copied, only referenced again.
+        """
+        objects = list(queryset)
+        if objects:
+            references = objects[0].file.storage.add_references([obj.file.name for obj in objects])
+            for obj in objects:
+                obj.file.name = references[obj.file.name]
+
+        return self._bulk_clone(None, objects, remap, model=queryset.model)
+
+    def _copy_experiment(self):
+        new_experiment = self.experiment
+        new_experiment.pk = None
+        new_experiment.title = _('Copy of') + ' ' + new_experiment.title
+        new_experiment.last_sending = None
+        new_experiment.save()
+        if new_experiment.ethics_committee_project_file:
+            self._copy_file(new_experiment, 'ethics_committee_project_file')
+
+        return new_experiment
+
+    def _copy_settings(self, old_experiment_id, new_experiment):
+        for context_tree in self._bulk_clone(
+                'context_tree', ContextTree.objects.filter(experiment_id=old_experiment_id),
+                experiment_id=new_experiment.id):
+            self._copy_file(context_tree, 'setting_file')
+
+        # eeg setting
+        self._bulk_clone(
+            'eeg_setting', EEGSetting.objects.filter(experiment_id=old_experiment_id),
+            experiment_id=new_experiment.id)
+        for model in (EEGAmplifierSetting, EEGSolutionSetting, EEGFilterSetting, EEGElectrodeLayoutSetting):
+            self._bulk_clone(
+                None, model.objects.filter(eeg_setting__experiment_id=old_experiment_id),
+                {'eeg_setting_id': 'eeg_setting'})
+        # the electrode layout setting primary key is its eeg setting
+        self._bulk_clone(
+            'eeg_electrode_position_setting',
+            EEGElectrodePositionSetting.objects.filter(
+                eeg_electrode_layout_setting__eeg_setting__experiment_id=old_experiment_id),
+            {'eeg_electrode_layout_setting_id': 'eeg_setting'})
+
+        # emg setting
+        self._bulk_clone(
+            'emg_setting', EMGSetting.objects.filter(experiment_id=old_experiment_id),
+            experiment_id=new_experiment.id)
+        for model in (EMGDigitalFilterSetting, EMGADConverterSetting):
+            self._bulk_clone(
+                None, model.objects.filter(emg_setting__experiment_id=old_experiment_id),
+                {'emg_setting_id': 'emg_setting'})
+        self._bulk_clone(
+            'emg_electrode_setting',
+            EMGElectrodeSetting.objects.filter(emg_setting__experiment_id=old_experiment_id),
+            {'emg_setting_id': 'emg_setting'})
+        # the primary keys of the models below are their emg electrode setting
+        for model in (EMGPreamplifierSetting, EMGAmplifierSetting, EMGElectrodePlacementSetting):
+            self._bulk_clone(
+                None, model.objects.filter(emg_electrode_setting__emg_setting__experiment_id=old_experiment_id),
+                {'emg_electrode_setting_id': 'emg_electrode_setting'})
+        self._bulk_clone(
+            None, EMGPreamplifierFilterSetting.objects.filter(
+                emg_preamplifier_filter_setting__emg_electrode_setting__emg_setting__experiment_id=old_experiment_id),
+            {'emg_preamplifier_filter_setting_id': 'emg_electrode_setting'})
+        self._bulk_clone(
+            None, EMGAnalogFilterSetting.objects.filter(
+                emg_electrode_setting__emg_electrode_setting__emg_setting__experiment_id=old_experiment_id),
+            {'emg_electrode_setting_id': 'emg_electrode_setting'})
+
+        # tms setting
+        self._bulk_clone(
+            'tms_setting', TMSSetting.objects.filter(experiment_id=old_experiment_id),
+            experiment_id=new_experiment.id)
+        self._bulk_clone(
+            None, TMSDeviceSetting.objects.filter(tms_setting__experiment_id=old_experiment_id),
+            {'tms_setting_id': 'tms_setting'})
+
+    def _copy_components(self, old_experiment_id, new_experiment):
+        # bulk_create does not support multi-table inheritance, so the rows
+        # of Component are bulk created and the rows of its subclasses are
+        # inserted pointing to them.
+        self._bulk_clone(
+            'component', Component.objects.filter(experiment_id=old_experiment_id).order_by('id'),
+            experiment_id=new_experiment.id)
+
+        for model, remap in COMPONENT_MODELS:
+            for component in model.objects.filter(experiment_id=old_experiment_id):
+                new_component_id = self.orig_and_clone['component'][component.pk]
+                component.id = component.component_ptr_id = new_component_id
+                for attname, mapping in remap.items():
+                    setattr(component, attname, self.orig_and_clone[mapping][getattr(component, attname)])
+                component.save_base(raw=True, force_insert=True)
+                if model is Stimulus:
+                    self._copy_file(component, 'media_file')
+
+        self._bulk_clone(
+            'component_configuration',
+            ComponentConfiguration.objects.filter(
+                component__experiment_id=old_experiment_id).order_by('parent_id', 'order'),
+            {'component_id': 'component', 'parent_id': 'component'})
+
+    def _copy_groups(self, old_experiment_id, new_experiment):
+        groups = list(Group.objects.filter(experiment_id=old_experiment_id))
+        for group in groups:
+            # group code is unique and not needed to be set at start (goal
+            # keeper game integration)
+            group.code = None
+            group.experimental_protocol_id = self.orig_and_clone['component'].get(
+                group.experimental_protocol_id, group.experimental_protocol_id)
+        self._bulk_clone('group', groups, model=Group, experiment_id=new_experiment.id)
+
+        for subject_of_group in self._bulk_clone(
+                'subject_of_group', SubjectOfGroup.objects.filter(group__experiment_id=old_experiment_id),
+                {'group_id': 'group'}):
+            self._copy_file(subject_of_group, 'consent_form')
+
+    def _copy_data_configuration_trees(self, old_experiment_id):
+        # parents are cloned before their children, one tree level at a time
+        children = defaultdict(list)
+        data_configuration_trees = list(DataConfigurationTree.objects.filter(
+            component_configuration__component__experiment_id=old_experiment_id))
+        ids = set(dct.id for dct in data_configuration_trees)
+        level = []
+        for dct in data_configuration_trees:
+            if dct.parent_id in ids:
+                children[dct.parent_id].append(dct)
+            else:
+                level.append(dct)
+
+        while level:
+            next_level = [child for dct in level for child in children[dct.id]]
+            self._bulk_clone(
+                'dct', level, {'component_configuration_id': 'component_configuration', 'parent_id': 'dct'},
+                model=DataConfigurationTree)
+            level = next_level
+
+    def _copy_data_collections(self, old_experiment_id):
+        self._copy_data_configuration_trees(old_experiment_id)
+
+        data_collection_remap = {'subject_of_group_id': 'subject_of_group', 'data_configuration_tree_id': 'dct'}
+        in_experiment = {'subject_of_group__group__experiment_id': old_experiment_id}
+
+        # eeg
+        self._bulk_clone(
+            'eeg_data', EEGData.objects.filter(**in_experiment),
+            dict(data_collection_remap, eeg_setting_id='eeg_setting'))
+        self._bulk_clone(
+            None, EEGElectrodePositionCollectionStatus.objects.filter(
+                eeg_data__subject_of_group__group__experiment_id=old_experiment_id),
+            {'eeg_data_id': 'eeg_data', 'eeg_electrode_position_setting_id': 'eeg_electrode_position_setting'})
+        self._bulk_clone_files(
+            EEGFile.objects.filter(eeg_data__subject_of_group__group__experiment_id=old_experiment_id),
+            {'eeg_data_id': 'eeg_data'})
+
+        # emg
+        self._bulk_clone(
+            'emg_data', EMGData.objects.filter(**in_experiment),
+            dict(data_collection_remap, emg_setting_id='emg_setting'))
+        self._bulk_clone_files(
+            EMGFile.objects.filter(emg_data__subject_of_group__group__experiment_id=old_experiment_id),
+            {'emg_data_id': 'emg_data'})
+
+        # additional data
+        self._bulk_clone('additional_data', AdditionalData.objects.filter(**in_experiment), data_collection_remap)
+        self._bulk_clone_files(
+            AdditionalDataFile.objects.filter(
+                additional_data__subject_of_group__group__experiment_id=old_experiment_id),
+            {'additional_data_id': 'additional_data'})
+
+        # digital game phase
+        self._bulk_clone(
+            'digital_game_phase_data', DigitalGamePhaseData.objects.filter(**in_experiment), data_collection_remap)
+        self._bulk_clone_files(
+            DigitalGamePhaseFile.objects.filter(
+                digital_game_phase_data__subject_of_group__group__experiment_id=old_experiment_id),
+            {'digital_game_phase_data_id': 'digital_game_phase_data'})
+
+        # generic data collection
+        self._bulk_clone(
+            'generic_data_collection_data', GenericDataCollectionData.objects.filter(**in_experiment),
+            data_collection_remap)
+        self._bulk_clone_files(
+            GenericDataCollectionFile.objects.filter(
+                generic_data_collection_data__subject_of_group__group__experiment_id=old_experiment_id),
+            {'generic_data_collection_data_id': 'generic_data_collection_data'})
+
+        # component additional file
+        for component_additional_file in self._bulk_clone(
+                None, ComponentAdditionalFile.objects.filter(component__experiment_id=old_experiment_id),
+                {'component_id': 'component'}):
+            self._copy_file(component_additional_file, 'file')
+
+        # tms
+        self._bulk_clone(
+            'tms_data', TMSData.objects.filter(**in_experiment),
+            dict(data_collection_remap, tms_setting_id='tms_setting'))
+        for hotspot in self._bulk_clone(
+                None, HotSpot.objects.filter(tms_data__subject_of_group__group__experiment_id=old_experiment_id),
+                {'tms_data_id': 'tms_data'}):
+            self._copy_file(hotspot, 'hot_spot_map')
+
+        # questionnaire response
+        self._bulk_clone(None, QuestionnaireResponse.objects.filter(**in_experiment), data_collection_remap)
+
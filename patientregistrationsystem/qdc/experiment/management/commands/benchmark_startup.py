@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Run in a new interpreter: boots Django and imports the URLs, as a worker
+# does before serving its first request
+BOOT = '''
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+importlib.import_module(sys.argv[1])
+for module in sys.argv[2:]:
+    importlib.import_module(module)
+print(json.dumps({
+    'seconds': time.perf_counter() - start,
+    'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(name for name in ('mne', 'nwb', 'numpy', 'matplotlib', 'scipy') if name in sys.modules)
+}))
+'''
+
+# Modules a worker imported at boot before the signal processing was moved
+# to experiment.eeg_processing
+EAGER_MODULES = ['experiment.eeg_processing']
+
+
+class Command(BaseCommand):
+    help = 'Measure the boot time and resident memory of a worker, with the signal processing modules ' \
+           'imported lazily (as the workers do) and eagerly (as they did before)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, dest='runs', help='boots measured by mode (default: 5)')
+
+    def boot(self, modules):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'qdc.settings'))
+        output = subprocess.check_output(
+            [sys.executable, '-c', BOOT, settings.ROOT_URLCONF] + modules, env=env, cwd=settings.BASE_DIR or None)
+        return json.loads(output.decode().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        for mode, modules in (('lazy', []), ('eager', EAGER_MODULES)):
+            boots = [self.boot(modules) for _ in range(options['runs'])]
+            # ru_maxrss is in kilobytes on Linux
+            self.stdout.write('%s: %.2f s, %.0f MB resident; scientific modules loaded: %s' % (
+                mode, median(boot['seconds'] for boot in boots), median(boot['rss'] for boot in boots) / 1024,
+                ', '.join(boots[0]['modules']) or 'none'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from experiment.experiment_copy import ExperimentCopy
+from experiment.models import Experiment
+
+
+class Command(BaseCommand):
+    help = 'Copy an experiment and report the number of queries and time spent'
+
+    def add_arguments(self, parser):
+        parser.add_argument('experiment_id', type=int)
+        parser.add_argument(
+            '--with-data', action='store_true', dest='with_data', help='copy data collections as well'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            experiment = Experiment.objects.get(pk=options['experiment_id'])
+        except Experiment.DoesNotExist:
+            raise CommandError('Experiment "%s" does not exist.' % options['experiment_id'])
+
+        experiment_copy = ExperimentCopy(experiment, options['with_data'])
+        new_experiment = experiment_copy.copy()
+
+        self.stdout.write(
+            'Experiment copied to id %d in %.3f seconds, %d queries.' % (
+                new_experiment.id, experiment_copy.report['seconds'], experiment_copy.report['queries'])
+        )
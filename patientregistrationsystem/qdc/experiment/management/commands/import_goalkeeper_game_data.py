@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from experiment.models import Group
+from experiment.views import import_group_goalkeeper_game_data
+
+
+class Command(BaseCommand):
+    help = 'Import new goalkeeper game plays of groups with a group code'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--group', nargs='*', type=int, dest='group_ids', help='ids of the groups (default: all groups with code)'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true', dest='rebuild',
+            help='scan all game configurations, not only the ones newer than the last imported'
+        )
+
+    def handle(self, *args, **options):
+        if 'goalkeeper' not in settings.DATABASES:
+            raise CommandError('Goalkeeper database is not configured.')
+
+        groups = Group.objects.filter(code__isnull=False, experimental_protocol__isnull=False).exclude(code='')
+        if options['group_ids']:
+            groups = groups.filter(id__in=options['group_ids'])
+
+        for group in groups.order_by('id'):
+            summary = import_group_goalkeeper_game_data(group, options['rebuild'])
+            self.stdout.write('Group %s (%s): %d game configurations scanned, %d new plays imported.' % (
+                group.id, group.code, summary['scanned'], summary['imported']))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-19 16:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import experiment.models
+import experiment.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiment', '0006_auto_20190329_1627'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataFileBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=1000, unique=True)),
+                ('checksum', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField(default=0)),
+                ('reference_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='additionaldatafile',
+            name='file',
+            field=models.FileField(max_length=1000, storage=experiment.storage.ContentAddressedStorage(), upload_to=experiment.models.get_data_file_dir),
+        ),
+        migrations.AlterField(
+            model_name='digitalgamephasefile',
+            name='file',
+            field=models.FileField(max_length=1000, storage=experiment.storage.ContentAddressedStorage(), upload_to=experiment.models.get_data_file_dir),
+        ),
+        migrations.AlterField(
+            model_name='eegfile',
+            name='file',
+            field=models.FileField(max_length=1000, storage=experiment.storage.ContentAddressedStorage(), upload_to=experiment.models.get_data_file_dir),
+        ),
+        migrations.AlterField(
+            model_name='emgfile',
+            name='file',
+            field=models.FileField(max_length=1000, storage=experiment.storage.ContentAddressedStorage(), upload_to=experiment.models.get_data_file_dir),
+        ),
+        migrations.AlterField(
+            model_name='genericdatacollectionfile',
+            name='file',
+            field=models.FileField(max_length=1000, storage=experiment.storage.ContentAddressedStorage(), upload_to=experiment.models.get_data_file_dir),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-19 16:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiment', '0007_datafileblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalkeeperGameSync',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='goalkeeper_game_sync', serialize=False, to='experiment.Group')),
+                ('group_code', models.CharField(max_length=150)),
+                ('last_idconfig', models.IntegerField(default=0)),
+                ('last_sync', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-19 19:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiment', '0008_goalkeepergamesync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalquestionnaireresponse',
+            name='completion_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='questionnaireresponse',
+            name='completion_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
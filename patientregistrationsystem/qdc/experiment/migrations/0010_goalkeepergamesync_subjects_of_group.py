@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-20 09:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiment', '0009_questionnaireresponse_completion_synced_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goalkeepergamesync',
+            name='subjects_of_group',
+            field=models.ManyToManyField(blank=True, related_name='_goalkeepergamesync_subjects_of_group_+', to='experiment.SubjectOfGroup'),
+        ),
+    ]
@@ -4,6 +4,7 @@ import datetime
 from os import path
 
 from django.db import models
+from django.db.models import signals
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
@@ -11,6 +12,8 @@ from django.utils.translation import ugettext_lazy as _
 from simple_history.models import HistoricalRecords
 from django.conf import settings
 
+from experiment.protocol_images import schedule_experimental_protocol_images
+from experiment.storage import data_file_storage
 from patient.models import Patient, ClassificationOfDiseases
 from survey.models import Survey
 
@@ -1215,6 +1218,8 @@ class QuestionnaireResponse(DataCollection):
         User, null=False, related_name='+')
     history = HistoricalRecords()
     is_completed = models.CharField(max_length=50, default='')
+    # when is_completed was last read from LimeSurvey (see survey.completion)
+    completion_synced_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         permissions = (
@@ -1384,30 +1389,43 @@ class GenericDataCollectionData(DataFile, DataCollection):
         self.changed_by = value
 
 
+class DataFileBlob(models.Model):
+    # File of EEGFile, EMGFile, AdditionalDataFile, DigitalGamePhaseFile and
+    # GenericDataCollectionFile rows, a hard link to its content stored once
+    # by checksum (see experiment.storage)
+    name = models.CharField(max_length=1000, unique=True)
+    checksum = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    reference_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
 class EEGFile(models.Model):
     eeg_data = models.ForeignKey(EEGData, related_name='eeg_files')
-    file = models.FileField(upload_to=get_data_file_dir)
+    file = models.FileField(upload_to=get_data_file_dir, storage=data_file_storage, max_length=1000)
 
 
 class EMGFile(models.Model):
     emg_data = models.ForeignKey(EMGData, related_name='emg_files')
-    file = models.FileField(upload_to=get_data_file_dir)
+    file = models.FileField(upload_to=get_data_file_dir, storage=data_file_storage, max_length=1000)
 
 
 class AdditionalDataFile(models.Model):
     additional_data = models.ForeignKey(AdditionalData, related_name='additional_data_files')
-    file = models.FileField(upload_to=get_data_file_dir)
+    file = models.FileField(upload_to=get_data_file_dir, storage=data_file_storage, max_length=1000)
 
 
 class DigitalGamePhaseFile(models.Model):
     digital_game_phase_data = models.ForeignKey(DigitalGamePhaseData, related_name='digital_game_phase_files')
-    file = models.FileField(upload_to=get_data_file_dir)
+    file = models.FileField(upload_to=get_data_file_dir, storage=data_file_storage, max_length=1000)
 
 
 class GenericDataCollectionFile(models.Model):
     generic_data_collection_data = models.ForeignKey(
         GenericDataCollectionData, related_name='generic_data_collection_files')
-    file = models.FileField(upload_to=get_data_file_dir)
+    file = models.FileField(upload_to=get_data_file_dir, storage=data_file_storage, max_length=1000)
 
 
 class EEGElectrodePositionCollectionStatus(models.Model):
@@ -1510,6 +1528,18 @@ class GoalkeeperGameResults(models.Model):
         db_table = '"public"."gameresults"'
 
 
+class GoalkeeperGameSync(models.Model):
+    # Cursor of the goalkeeper game import of a group: only game
+    # configurations with idconfig greater than last_idconfig are read in the
+    # next import, except for the participants added to the group after the
+    # last import (not in subjects_of_group), whose plays are all read
+    group = models.OneToOneField(Group, primary_key=True, related_name='goalkeeper_game_sync')
+    group_code = models.CharField(max_length=150)
+    last_idconfig = models.IntegerField(default=0)
+    last_sync = models.DateTimeField(auto_now=True)
+    subjects_of_group = models.ManyToManyField(SubjectOfGroup, blank=True, related_name='+')
+
+
 class ScheduleOfSending(models.Model):
     SCHEDULE_STATUS_OPTIONS = (
         ("scheduled", _("scheduled")),
@@ -1535,3 +1565,44 @@ class PortalSelectedQuestion(models.Model):
 
     class Meta:
         unique_together = ('experiment', 'survey', 'question_code')
+
+
+def schedule_experimental_protocol_images_signal(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+
+    if isinstance(instance, ComponentConfiguration):
+        component_id = instance.parent_id
+    elif isinstance(instance, Component):
+        component_id = instance.id
+    elif isinstance(instance, Group):
+        component_id = instance.experimental_protocol_id
+    else:
+        return
+
+    if component_id is not None:
+        schedule_experimental_protocol_images(component_id)
+
+
+# Models whose changes change the diagrams of an experimental protocol. Saving
+# a step sends post_save with its own class (Block, EEG...) as sender.
+PROTOCOL_IMAGES_SENDERS = [Component, ComponentConfiguration, Group] + Component.__subclasses__()
+
+for sender in PROTOCOL_IMAGES_SENDERS:
+    signals.post_save.connect(
+        schedule_experimental_protocol_images_signal, sender=sender, dispatch_uid='experiment.protocol_images')
+signals.post_delete.connect(
+    schedule_experimental_protocol_images_signal, sender=ComponentConfiguration,
+    dispatch_uid='experiment.protocol_images')
+
+
+def delete_data_collection_file_signal(sender, instance, **kwargs):
+    # releases the reference of the row to its file (see
+    # experiment.storage), also when the row is deleted by a cascade
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+for sender in [EEGFile, EMGFile, AdditionalDataFile, DigitalGamePhaseFile, GenericDataCollectionFile]:
+    signals.post_delete.connect(
+        delete_data_collection_file_signal, sender=sender, dispatch_uid='experiment.data_collection_file')
@@ -1,5 +1,9 @@
 import coreapi
+import logging
 import os
+import requests
+import threading
+import time
 
 from csv import reader
 from datetime import date, timedelta
@@ -8,7 +12,9 @@ from io import StringIO
 from os import path
 
 from django.conf import settings
-from django.utils import translation
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone, translation
 
 from .models import Experiment, Group, Subject, User, EEGSetting, \
     EMGSetting, TMSSetting, ContextTree, \
@@ -32,18 +38,46 @@ from survey.abc_search_engine import Questionnaires
 from survey.survey_utils import QuestionnaireUtils
 from survey.views import questionnaire_evaluation_fields_excluded
 
+logger = logging.getLogger(__name__)
+
+
+# Availability of the Portal, as stored by check_portal_status: a dict with
+# 'active', 'latency' (seconds to get the API schema), 'last_error',
+# 'failures' (consecutive failed checks), 'checked_at' and 'next_check_at'
+PORTAL_STATUS_CACHE_KEY = 'portal_status'
+
+# Set while a process checks the Portal availability
+PORTAL_STATUS_LOCK_CACHE_KEY = 'portal_status_lock'
+
+# Seconds the Portal may take to send the API schema
+PORTAL_SCHEMA_TIMEOUT = 30
+
+
+class TimeoutSession(requests.Session):
+    """Session sending the requests with timeout, in seconds, when it is not
+    None (coreapi sends them without timeout)
+    """
+    timeout = None
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super(TimeoutSession, self).send(request, **kwargs)
+
 
 class RestApiClient(object):
     client = None
     schema = None
     active = False
+    error = None
 
     def __init__(self):
         auth = coreapi.auth.BasicAuthentication(
             username=settings.PORTAL_API['USER'],
             password=settings.PORTAL_API['PASSWORD']
         )
-        self.client = coreapi.Client(auth=auth)
+        session = TimeoutSession()
+        self.client = coreapi.Client(auth=auth, session=session)
 
         try:
             url = settings.PORTAL_API['URL'] + \
@@ -52,14 +86,72 @@ class RestApiClient(object):
                       settings.PORTAL_API['PORT'] else ''
                   ) + '/api/schema/'
 
+            # only the schema has a timeout: the experiment data sent
+            # afterwards may take longer
+            session.timeout = PORTAL_SCHEMA_TIMEOUT
             self.schema = self.client.get(url)
             self.active = True
-        except:
+        except Exception as e:
             self.active = False
+            self.error = str(e)
+        finally:
+            session.timeout = None
+
+
+def check_portal_status():
+    """Check the Portal availability and store it in the cache. After a
+    failed check the next one is delayed exponentially (see
+    settings.PORTAL_STATUS_MAX_BACKOFF).
+    :return: the Portal availability, see PORTAL_STATUS_CACHE_KEY
+    """
+    previous_status = cache.get(PORTAL_STATUS_CACHE_KEY)
+
+    start = time.perf_counter()
+    rest = RestApiClient()
+    now = timezone.now()
+
+    portal_status = {
+        'active': rest.active,
+        'latency': time.perf_counter() - start,
+        'last_error': previous_status['last_error'] if previous_status else None,
+        'failures': 0,
+        'checked_at': now
+    }
+    if not rest.active:
+        portal_status['last_error'] = rest.error
+        portal_status['failures'] = (previous_status['failures'] if previous_status else 0) + 1
+    delay = settings.PORTAL_STATUS_TTL * 2 ** portal_status['failures']
+    portal_status['next_check_at'] = now + timedelta(seconds=min(delay, settings.PORTAL_STATUS_MAX_BACKOFF))
+
+    cache.set(PORTAL_STATUS_CACHE_KEY, portal_status, None)
+
+    return portal_status
+
+
+def _check_portal_status_in_background():
+    try:
+        check_portal_status()
+    except Exception:
+        logger.exception('Checking Portal status')
+    finally:
+        cache.delete(PORTAL_STATUS_LOCK_CACHE_KEY)
+        connection.close()
+
+
+def get_portal_health():
+    """Portal availability last checked, without waiting for the Portal. When
+    the next check is due a thread checks it again, for the next requests.
+    :return: the Portal availability, see PORTAL_STATUS_CACHE_KEY | None if
+    it was never checked
+    """
+    portal_status = cache.get(PORTAL_STATUS_CACHE_KEY)
 
+    if portal_status is None or timezone.now() >= portal_status['next_check_at']:
+        # only one process checks at a time; the lock expires if it dies
+        if cache.add(PORTAL_STATUS_LOCK_CACHE_KEY, True, PORTAL_SCHEMA_TIMEOUT * 2):
+            threading.Thread(target=_check_portal_status_in_background, daemon=True).start()
 
-def get_portal_status():
-    return RestApiClient().active
+    return portal_status
 
 
 def send_experiment_to_portal(experiment: Experiment):
@@ -0,0 +1,63 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+# Directory of MEDIA_ROOT with the diagrams of the experimental protocols
+EXPERIMENTAL_PROTOCOL_IMAGE_DIR = 'experimental_protocol'
+
+# Seconds the renderer waits for further changes of the protocols, so that
+# a protocol changed by several saves (copy, import) is rendered once
+RENDER_DELAY = 2
+
+_lock = threading.Lock()
+_changed_components = {}
+_renderer = None
+
+
+def protocol_image_language():
+    return translation.get_language() or settings.LANGUAGE_CODE
+
+
+def schedule_experimental_protocol_images(component_id):
+    """Render, in a background thread, the diagrams of the experimental
+    protocols including the component once the current transaction commits
+    """
+    language_code = protocol_image_language()
+    transaction.on_commit(lambda: _queue(component_id, language_code))
+
+
+def _queue(component_id, language_code):
+    global _renderer
+    with _lock:
+        _changed_components.setdefault(language_code, set()).add(component_id)
+        if _renderer is None:
+            _renderer = threading.Thread(target=_render, daemon=True)
+            _renderer.start()
+
+
+def _render():
+    global _renderer
+    from experiment.views import render_experimental_protocol_images
+
+    while True:
+        time.sleep(RENDER_DELAY)
+        with _lock:
+            if not _changed_components:
+                _renderer = None
+                return
+            changed_components = dict(_changed_components)
+            _changed_components.clear()
+
+        try:
+            for language_code, component_ids in changed_components.items():
+                render_experimental_protocol_images(component_ids, language_code)
+        except Exception:
+            logger.exception('Rendering diagrams of experimental protocols')
+        finally:
+            connection.close()
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import shutil
+from collections import Counter, defaultdict
+from os import path
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIRECTORY = path.join('data_collection_files', 'blobs')
+
+
+def file_checksum(content):
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks():
+        sha256.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    content.seek(0)
+    return sha256.hexdigest()
+
+
+def blob_content_name(checksum):
+    return path.join(BLOB_DIRECTORY, checksum[:2], checksum[2:])
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Storage for data collection files (EEG, EMG, additional data,
+    digital game phase and generic data collection files).
+
+    The content of the files is stored once per content hash, in the blob
+    area, and each file is a hard link to it in the directory given by
+    get_data_file_dir. So files uploaded together (the .vhdr, .vmrk and .eeg
+    of a BrainVision recording, that refer to each other by name) stay in
+    the same directory. Every model row pointing to a file holds a reference
+    to it: cloning a row only adds a reference (see add_reference), the file
+    is removed when its last reference is deleted, and the content when its
+    last file is removed.
+    """
+
+    def save(self, name, content, max_length=None):
+        from experiment.models import DataFileBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        checksum = file_checksum(content)
+        content_name = blob_content_name(checksum)
+        if not self.exists(content_name):
+            stored_name = self._save(content_name, content)
+            if stored_name != content_name:
+                # stored at the same time by another upload
+                super(ContentAddressedStorage, self).delete(stored_name)
+
+        name = self._link(content_name, self.get_available_name(name, max_length=max_length), max_length)
+        DataFileBlob.objects.create(name=name, checksum=checksum, size=content.size, reference_count=1)
+
+        return name
+
+    def _link(self, content_name, name, max_length=None):
+        """Creates the file name as a hard link to the content stored under
+        content_name, or as a copy of it where the file system has no hard
+        links. Returns the name of the file created.
+        """
+        directory = path.dirname(self.path(name))
+        if not path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        while True:
+            try:
+                os.link(self.path(content_name), self.path(name))
+            except FileExistsError:
+                # created at the same time by another upload
+                name = self.get_available_name(name, max_length=max_length)
+            except OSError:
+                shutil.copyfile(self.path(content_name), self.path(name))
+                return name
+            else:
+                return name
+
+    def _delete_unused_content(self, checksum):
+        from experiment.models import DataFileBlob
+
+        content_name = blob_content_name(checksum)
+        if self.exists(content_name) and os.stat(self.path(content_name)).st_nlink == 1 \
+                and not DataFileBlob.objects.filter(checksum=checksum).exists():
+            super(ContentAddressedStorage, self).delete(content_name)
+
+    def add_reference(self, name):
+        """Returns the name a cloned row must use to share the file stored
+        under name: the same name, so the clone keeps the files uploaded with
+        it in its directory. Files uploaded before this storage was in use
+        are moved to the blob area first.
+        """
+        return self.add_references([name])[name]
+
+    def add_references(self, names):
+        """Bulk version of add_reference, used when cloning many rows at
+        once. Returns a dict mapping each name to the name of the clone.
+        """
+        from experiment.models import DataFileBlob
+
+        counts = Counter(names)
+        stored = set(DataFileBlob.objects.filter(name__in=list(counts)).values_list('name', flat=True))
+
+        names_by_count = defaultdict(list)
+        for name in stored:
+            names_by_count[counts[name]].append(name)
+        for count, blob_names in names_by_count.items():
+            DataFileBlob.objects.filter(name__in=blob_names).update(reference_count=F('reference_count') + count)
+
+        for name in set(counts) - stored:
+            # the row of the file uploaded before content addressed storage
+            # holds a reference too
+            self._import(name, counts[name] + 1)
+
+        return {name: name for name in counts}
+
+    def _import(self, name, reference_count):
+        from experiment.models import DataFileBlob
+
+        with self.open(name, 'rb') as f:
+            checksum = file_checksum(File(f))
+        content_name = blob_content_name(checksum)
+        if not self.exists(content_name):
+            self._link(name, content_name)
+
+        DataFileBlob.objects.create(
+            name=name, checksum=checksum, size=self.size(name), reference_count=reference_count
+        )
+
+    def delete(self, name):
+        from experiment.models import DataFileBlob
+
+        with transaction.atomic():
+            blob = DataFileBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                # file uploaded before content addressed storage
+                super(ContentAddressedStorage, self).delete(name)
+                return
+
+            if blob.reference_count > 1:
+                DataFileBlob.objects.filter(pk=blob.pk).update(reference_count=F('reference_count') - 1)
+                return
+
+            blob.delete()
+            super(ContentAddressedStorage, self).delete(name)
+            self._delete_unused_content(blob.checksum)
+
+
+data_file_storage = ContentAddressedStorage()
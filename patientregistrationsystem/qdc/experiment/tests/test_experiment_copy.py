@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from experiment.experiment_copy import ExperimentCopy
+from experiment.models import Experiment, Component, ComponentConfiguration, Group, SubjectOfGroup, \
+    DataConfigurationTree, EEGData, EEGFile, DataFileBlob
+from experiment.tests.tests_helper import ExperimentTestCase, ObjectsFactory
+from patient.tests.tests_orig import UtilTests
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExperimentCopyTest(ExperimentTestCase):
+
+    def setUp(self):
+        super(ExperimentCopyTest, self).setUp()
+
+        self.eeg_setting = ObjectsFactory.create_eeg_setting(self.experiment)
+        eeg_step = ObjectsFactory.create_component(
+            self.experiment, Component.EEG, kwargs={'eeg_set': self.eeg_setting})
+        component_configuration = ObjectsFactory.create_component_configuration(self.root_component, eeg_step)
+        self.dct = ObjectsFactory.create_data_configuration_tree(component_configuration)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def _add_eeg_data(self):
+        patient = UtilTests().create_patient(changed_by=self.user)
+        subject_of_group = ObjectsFactory.create_subject_of_group(
+            self.group, ObjectsFactory.create_subject(patient))
+        eeg_data = ObjectsFactory.create_eeg_data(self.dct, subject_of_group, self.eeg_setting)
+        ObjectsFactory.create_eeg_file(eeg_data)
+
+    def test_copy_experiment_without_data_collection(self):
+        self._add_eeg_data()
+
+        new_experiment = ExperimentCopy(Experiment.objects.get(pk=self.experiment.pk)).copy()
+
+        self.assertNotEqual(new_experiment.pk, self.experiment.pk)
+        self.assertEqual(Component.objects.filter(experiment=new_experiment).count(), 2)
+        self.assertEqual(ComponentConfiguration.objects.filter(component__experiment=new_experiment).count(), 1)
+        self.assertEqual(Group.objects.filter(experiment=new_experiment).count(), 1)
+        self.assertEqual(SubjectOfGroup.objects.filter(group__experiment=new_experiment).count(), 2)
+        self.assertFalse(EEGData.objects.filter(subject_of_group__group__experiment=new_experiment).exists())
+
+    def test_copy_experiment_with_data_collection_remaps_foreign_keys(self):
+        self._add_eeg_data()
+
+        new_experiment = ExperimentCopy(Experiment.objects.get(pk=self.experiment.pk), True).copy()
+
+        new_eeg_data = EEGData.objects.get(subject_of_group__group__experiment=new_experiment)
+        self.assertEqual(new_eeg_data.eeg_setting.experiment, new_experiment)
+        self.assertEqual(
+            new_eeg_data.data_configuration_tree.component_configuration.component.experiment, new_experiment)
+        self.assertEqual(
+            DataConfigurationTree.objects.filter(
+                component_configuration__component__experiment=new_experiment).count(), 1)
+        self.assertEqual(new_eeg_data.history.count(), 1)
+
+    def test_copy_experiment_with_data_collection_shares_files(self):
+        self._add_eeg_data()
+
+        new_experiment = ExperimentCopy(Experiment.objects.get(pk=self.experiment.pk), True).copy()
+
+        old_file = EEGFile.objects.get(eeg_data__subject_of_group__group__experiment=self.experiment)
+        new_file = EEGFile.objects.get(eeg_data__subject_of_group__group__experiment=new_experiment)
+        self.assertEqual(old_file.file.name, new_file.file.name)
+        self.assertEqual(DataFileBlob.objects.get(name=new_file.file.name).reference_count, 2)
+
+    def test_number_of_queries_does_not_depend_on_number_of_data_collections(self):
+        self._add_eeg_data()
+        experiment_copy = ExperimentCopy(Experiment.objects.get(pk=self.experiment.pk), True)
+        experiment_copy.copy()
+        queries_with_one_data_collection = experiment_copy.report['queries']
+
+        self._add_eeg_data()
+        self._add_eeg_data()
+        experiment_copy = ExperimentCopy(Experiment.objects.get(pk=self.experiment.pk), True)
+        experiment_copy.copy()
+
+        self.assertEqual(experiment_copy.report['queries'], queries_with_one_data_collection)
+
+    def test_report_counts_the_queries_of_the_copy(self):
+        experiment_copy = ExperimentCopy(Experiment.objects.get(pk=self.experiment.pk))
+        with CaptureQueriesContext(connection) as queries:
+            experiment_copy.copy()
+
+        self.assertGreater(experiment_copy.report['queries'], 0)
+        self.assertEqual(experiment_copy.report['queries'], len(queries))
@@ -3,13 +3,16 @@ from io import StringIO
 from unittest.mock import patch
 
 from django.contrib.auth.models import Group
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from custom_user.tests_helper import create_user
 from experiment.models import ScheduleOfSending, Component
 from experiment.portal import send_experiment_to_portal, \
     send_experiment_researcher_to_portal, \
-    send_researcher_to_portal, send_steps_to_portal
+    send_researcher_to_portal, send_steps_to_portal, check_portal_status, get_portal_health, \
+    PORTAL_SCHEMA_TIMEOUT, PORTAL_STATUS_CACHE_KEY, PORTAL_STATUS_LOCK_CACHE_KEY, TimeoutSession
 from experiment.tests.tests_helper import ObjectsFactory
 from experiment.views import get_block_tree
 from survey.abc_search_engine import ABCSearchEngine
@@ -158,3 +161,89 @@ class PortalAPITest(TestCase):
         survey_metadata = csv.reader(StringIO(kwargs['params']['survey_metadata']))
         for row in survey_metadata:
             self.assertEqual(len(row), len(HEADER_EXPLANATION_FIELDS))
+
+
+@override_settings(PORTAL_STATUS_TTL=60, PORTAL_STATUS_MAX_BACKOFF=300)
+@patch('experiment.portal.RestApiClient')
+class PortalStatusTest(TestCase):
+
+    def setUp(self):
+        cache.delete(PORTAL_STATUS_CACHE_KEY)
+        cache.delete(PORTAL_STATUS_LOCK_CACHE_KEY)
+
+    def test_available_portal_is_checked_again_after_ttl(self, mockRestApiClientClass):
+        mockRestApiClientClass.return_value.active = True
+
+        portal_status = check_portal_status()
+
+        self.assertTrue(portal_status['active'])
+        self.assertEqual(portal_status['failures'], 0)
+        self.assertEqual((portal_status['next_check_at'] - portal_status['checked_at']).total_seconds(), 60)
+
+    def test_failed_checks_back_off_exponentially(self, mockRestApiClientClass):
+        mockRestApiClientClass.return_value.active = False
+        mockRestApiClientClass.return_value.error = 'Connection refused'
+
+        delays = []
+        for _ in range(4):
+            portal_status = check_portal_status()
+            delays.append((portal_status['next_check_at'] - portal_status['checked_at']).total_seconds())
+
+        self.assertEqual(delays, [120, 240, 300, 300])
+        self.assertEqual(portal_status['failures'], 4)
+        self.assertEqual(portal_status['last_error'], 'Connection refused')
+
+    def test_success_resets_failures(self, mockRestApiClientClass):
+        mockRestApiClientClass.return_value.active = False
+        check_portal_status()
+        mockRestApiClientClass.return_value.active = True
+
+        self.assertEqual(check_portal_status()['failures'], 0)
+
+    @patch('experiment.portal.threading.Thread')
+    def test_health_is_read_from_cache_until_next_check(self, mockThread, mockRestApiClientClass):
+        mockRestApiClientClass.return_value.active = True
+        portal_status = check_portal_status()
+        mockRestApiClientClass.reset_mock()
+
+        self.assertEqual(get_portal_health(), portal_status)
+        mockRestApiClientClass.assert_not_called()
+        mockThread.assert_not_called()
+
+    @patch('experiment.portal.threading.Thread')
+    def test_health_due_is_checked_in_background(self, mockThread, mockRestApiClientClass):
+        mockRestApiClientClass.return_value.active = True
+        portal_status = check_portal_status()
+        portal_status['next_check_at'] = timezone.now()
+        cache.set(PORTAL_STATUS_CACHE_KEY, portal_status, None)
+
+        self.assertTrue(get_portal_health()['active'])
+        mockThread.return_value.start.assert_called_once_with()
+
+    @patch('experiment.portal.threading.Thread')
+    def test_lock_of_check_expires_soon_after_the_check_times_out(self, mockThread, mockRestApiClientClass):
+        with patch('experiment.portal.cache.add', return_value=True) as mock_add:
+            get_portal_health()
+
+        mock_add.assert_called_once_with(PORTAL_STATUS_LOCK_CACHE_KEY, True, PORTAL_SCHEMA_TIMEOUT * 2)
+
+
+class TimeoutSessionTest(TestCase):
+
+    @patch('requests.Session.send')
+    def test_requests_are_sent_with_timeout(self, mock_send):
+        session = TimeoutSession()
+        session.timeout = PORTAL_SCHEMA_TIMEOUT
+
+        session.send('request')
+
+        mock_send.assert_called_once_with('request', timeout=PORTAL_SCHEMA_TIMEOUT)
+
+    @patch('requests.Session.send')
+    def test_timeout_of_request_is_kept(self, mock_send):
+        session = TimeoutSession()
+        session.timeout = PORTAL_SCHEMA_TIMEOUT
+
+        session.send('request', timeout=5)
+
+        mock_send.assert_called_once_with('request', timeout=5)
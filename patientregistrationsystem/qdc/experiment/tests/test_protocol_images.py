@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from experiment.models import Component
+from experiment.protocol_images import EXPERIMENTAL_PROTOCOL_IMAGE_DIR
+from experiment.tests.tests_helper import ObjectsFactory
+from experiment.views import get_block_tree, get_experimental_protocol_image, render_experimental_protocol_images
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def write_png(graph, file_name, format):
+    with open(file_name, 'wb') as f:
+        f.write(b'png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@patch('experiment.views.pydot.Dot.write', autospec=True, side_effect=write_png)
+class ExperimentalProtocolImageTest(TestCase):
+
+    def setUp(self):
+        research_project = ObjectsFactory.create_research_project()
+        experiment = ObjectsFactory.create_experiment(research_project)
+        self.root = ObjectsFactory.create_block(experiment)
+        self.instruction = ObjectsFactory.create_component(experiment, Component.INSTRUCTION)
+        ObjectsFactory.create_component_configuration(self.root, self.instruction)
+        self.group = ObjectsFactory.create_group(experiment, self.root)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def protocol_image_files(self):
+        return os.listdir(os.path.join(TEMP_MEDIA_ROOT, EXPERIMENTAL_PROTOCOL_IMAGE_DIR, str(self.root.id)))
+
+    def test_image_of_unchanged_protocol_is_rendered_once(self, mock_write):
+        image1 = get_experimental_protocol_image(self.root, get_block_tree(self.root))
+        image2 = get_experimental_protocol_image(self.root, get_block_tree(self.root))
+
+        self.assertEqual(image1, image2)
+        self.assertTrue(os.path.exists(image1))
+        self.assertEqual(mock_write.call_count, 1)
+
+    def test_image_is_rendered_again_when_protocol_changes(self, mock_write):
+        image1 = get_experimental_protocol_image(self.root, get_block_tree(self.root))
+
+        self.instruction.identification = 'Other identification'
+        self.instruction.save()
+        image2 = get_experimental_protocol_image(self.root, get_block_tree(self.root))
+
+        self.assertNotEqual(image1, image2)
+        self.assertEqual(mock_write.call_count, 2)
+        self.assertEqual(self.protocol_image_files(), [os.path.basename(image2)])
+
+    def test_image_url_is_in_media_url(self, mock_write):
+        image = get_experimental_protocol_image(self.root, get_block_tree(self.root), True)
+
+        self.assertTrue(image.startswith('/media/' + EXPERIMENTAL_PROTOCOL_IMAGE_DIR))
+
+    def test_render_images_renders_protocols_including_the_component(self, mock_write):
+        render_experimental_protocol_images([self.instruction.id], 'en')
+
+        self.assertEqual(mock_write.call_count, 1)
+        self.assertTrue(self.protocol_image_files()[0].startswith('en_'))
+
+
+class ProtocolImagesSignalTest(TestCase):
+
+    def setUp(self):
+        research_project = ObjectsFactory.create_research_project()
+        experiment = ObjectsFactory.create_experiment(research_project)
+        self.instruction = ObjectsFactory.create_component(experiment, Component.INSTRUCTION)
+
+    @patch('experiment.models.schedule_experimental_protocol_images')
+    def test_saving_a_step_schedules_the_images(self, mock_schedule):
+        self.instruction.save()
+
+        mock_schedule.assert_called_once_with(self.instruction.id)
@@ -0,0 +1,181 @@
+import os
+import shutil
+import struct
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, override_settings
+
+from experiment.models import Component, DataFileBlob, EEGFile, FileFormat
+from experiment.storage import ContentAddressedStorage, blob_content_name, data_file_storage
+from experiment.tests.tests_helper import ExperimentTestCase, ObjectsFactory
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_content_is_stored_once(self):
+        name1 = self.storage.save('data_files/1/file.raw', ContentFile(b'eeg content'))
+        name2 = self.storage.save('data_files/2/file.raw', ContentFile(b'eeg content'))
+
+        self.assertEqual(name1, 'data_files/1/file.raw')
+        self.assertEqual(name2, 'data_files/2/file.raw')
+        self.assertTrue(os.path.samefile(self.storage.path(name1), self.storage.path(name2)))
+        self.assertEqual(DataFileBlob.objects.filter(checksum=DataFileBlob.objects.get(name=name1).checksum).count(), 2)
+
+    def test_different_content_is_stored_in_different_blobs(self):
+        name1 = self.storage.save('file.raw', ContentFile(b'eeg content'))
+        name2 = self.storage.save('file.raw', ContentFile(b'other eeg content'))
+
+        self.assertNotEqual(name1, name2)
+        self.assertFalse(os.path.samefile(self.storage.path(name1), self.storage.path(name2)))
+        self.assertEqual(DataFileBlob.objects.count(), 2)
+
+    def test_files_uploaded_together_stay_in_same_directory(self):
+        name1 = self.storage.save('data_files/1/recording.vhdr', ContentFile(b'header'))
+        name2 = self.storage.save('data_files/1/recording.eeg', ContentFile(b'eeg content'))
+
+        self.assertEqual(os.path.dirname(name1), os.path.dirname(name2))
+        self.assertEqual(os.path.basename(name2), 'recording.eeg')
+
+    def test_add_reference_does_not_copy_file(self):
+        name = self.storage.save('file.raw', ContentFile(b'eeg content'))
+
+        cloned_name = self.storage.add_reference(name)
+
+        self.assertEqual(name, cloned_name)
+        self.assertEqual(DataFileBlob.objects.get(name=name).reference_count, 2)
+
+    def test_add_reference_to_file_stored_before_blobs_imports_it(self):
+        legacy_name = FileSystemStorage().save('data_collection_files/1/eeg/file.raw', ContentFile(b'eeg content'))
+
+        cloned_name = self.storage.add_reference(legacy_name)
+
+        self.assertEqual(legacy_name, cloned_name)
+        self.assertTrue(self.storage.exists(legacy_name))
+        self.assertEqual(DataFileBlob.objects.get(name=legacy_name).reference_count, 2)
+
+    def test_delete_keeps_file_while_referenced(self):
+        name = self.storage.save('file.raw', ContentFile(b'eeg content'))
+        self.storage.add_reference(name)
+
+        self.storage.delete(name)
+
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(DataFileBlob.objects.get(name=name).reference_count, 1)
+
+    def test_delete_last_reference_removes_file(self):
+        name = self.storage.save('file.raw', ContentFile(b'eeg content'))
+        self.storage.add_reference(name)
+
+        self.storage.delete(name)
+        self.storage.delete(name)
+
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(DataFileBlob.objects.filter(name=name).exists())
+
+    def test_delete_last_file_of_content_removes_content(self):
+        name1 = self.storage.save('data_files/1/file.raw', ContentFile(b'eeg content'))
+        name2 = self.storage.save('data_files/2/file.raw', ContentFile(b'eeg content'))
+        content_name = blob_content_name(DataFileBlob.objects.get(name=name1).checksum)
+
+        self.storage.delete(name1)
+        self.assertTrue(self.storage.exists(content_name))
+
+        self.storage.delete(name2)
+        self.assertFalse(self.storage.exists(content_name))
+
+
+BRAINVISION_HEADER = """Brain Vision Data Exchange Header File Version 1.0
+
+[Common Infos]
+Codepage=UTF-8
+DataFile=recording.eeg
+MarkerFile=recording.vmrk
+DataFormat=BINARY
+DataOrientation=MULTIPLEXED
+NumberOfChannels=2
+SamplingInterval=1000
+
+[Binary Infos]
+BinaryFormat=IEEE_FLOAT_32
+
+[Channel Infos]
+Ch1=Fp1,,1,\u00b5V
+Ch2=Fp2,,1,\u00b5V
+"""
+
+BRAINVISION_MARKERS = """Brain Vision Data Exchange Marker File, Version 1.0
+
+[Common Infos]
+Codepage=UTF-8
+DataFile=recording.eeg
+
+[Marker Infos]
+Mk1=New Segment,,1,1,0
+"""
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BrainVisionFilesTest(ExperimentTestCase):
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_brainvision_files_uploaded_together_can_be_read(self):
+        from experiment.eeg_processing import eeg_data_reading
+
+        eeg_setting = ObjectsFactory.create_eeg_setting(self.experiment)
+        eeg_step = ObjectsFactory.create_component(self.experiment, Component.EEG, kwargs={'eeg_set': eeg_setting})
+        dct = ObjectsFactory.create_data_configuration_tree(
+            ObjectsFactory.create_component_configuration(self.root_component, eeg_step))
+        eeg_data = ObjectsFactory.create_eeg_data(dct, self.subject_of_group, eeg_setting)
+        eeg_data.file_format = FileFormat.objects.get_or_create(
+            nes_code='MNE-RawFromBrainVision', defaults={'name': 'BrainVision'})[0]
+        eeg_data.save()
+
+        samples = struct.pack('<200f', *range(200))
+        files = {}
+        for file_name, content in (('recording.vhdr', BRAINVISION_HEADER.encode('utf-8')),
+                                   ('recording.vmrk', BRAINVISION_MARKERS.encode('utf-8')),
+                                   ('recording.eeg', samples)):
+            files[file_name] = EEGFile.objects.create(eeg_data=eeg_data)
+            files[file_name].file.save(file_name, ContentFile(content))
+
+        reading = eeg_data_reading(files['recording.vhdr']).reading
+
+        self.assertIsNotNone(reading)
+        self.assertEqual(reading.info['ch_names'], ['Fp1', 'Fp2'])
+        self.assertEqual(reading.n_times, 100)
+
+    def test_deleting_the_rows_of_a_file_and_its_clone_removes_the_file(self):
+        eeg_setting = ObjectsFactory.create_eeg_setting(self.experiment)
+        eeg_step = ObjectsFactory.create_component(self.experiment, Component.EEG, kwargs={'eeg_set': eeg_setting})
+        dct = ObjectsFactory.create_data_configuration_tree(
+            ObjectsFactory.create_component_configuration(self.root_component, eeg_step))
+        eeg_data = ObjectsFactory.create_eeg_data(dct, self.subject_of_group, eeg_setting)
+        eeg_file = EEGFile.objects.create(eeg_data=eeg_data)
+        eeg_file.file.save('recording.eeg', ContentFile(b'eeg content'))
+        name = eeg_file.file.name
+        clone = EEGFile.objects.create(eeg_data=eeg_data, file=data_file_storage.add_reference(name))
+        content_name = blob_content_name(DataFileBlob.objects.get(name=name).checksum)
+
+        eeg_file.delete()
+        self.assertTrue(data_file_storage.exists(name))
+
+        # rows deleted by a cascade release their files too
+        eeg_data.delete()
+
+        self.assertFalse(EEGFile.objects.filter(pk=clone.pk).exists())
+        self.assertFalse(data_file_storage.exists(name))
+        self.assertFalse(data_file_storage.exists(content_name))
+        self.assertFalse(DataFileBlob.objects.filter(name=name).exists())
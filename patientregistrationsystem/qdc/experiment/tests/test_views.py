@@ -40,12 +40,14 @@ from experiment.models import Keyword, Component, \
     StimulusType, ContextTree, EMGElectrodePlacement, Equipment, DataConfigurationTree, EEGData, \
     HotSpot, ComponentAdditionalFile, TMSLocalizationSystem, EEGFile, EEGCapSize, \
     EEGElectrodeCap, EEGElectrodePositionCollectionStatus, EMGFile, \
-    DigitalGamePhaseFile, GenericDataCollectionFile, AdditionalDataFile, Stimulus, QuestionnaireResponse, EMGData
+    DigitalGamePhaseFile, GenericDataCollectionFile, AdditionalDataFile, Stimulus, QuestionnaireResponse, EMGData, \
+    GoalkeeperGameSync
     # TODO: Include these imports when the integration with the GoalKeeper Game is reimplemented    
     #GoalkeeperGame, GoalkeeperPhase, GoalkeeperGameResults, GoalkeeperGameConfig, \
 
 from experiment.models import Group as ExperimentGroup
 from experiment.tests.tests_helper import ObjectsFactory, ExperimentTestCase
+from experiment.views import goalkeeper_players_not_synced, goalkeeper_sync_cursor
 from patient.models import Patient, Telephone, SocialDemographicData, AmountCigarettes, AlcoholFrequency, \
     AlcoholPeriod, SocialHistoryData, MedicalRecordData, Diagnosis, ClassificationOfDiseases, FleshTone, Payment, \
     Religion, Schooling, ExamFile
@@ -70,7 +72,8 @@ class ScheduleOfSendingListViewTest(TestCase):
             self)
         self.assertEqual(logged, True)
 
-    def test_Schedule_of_Sending_List_is_valid(self):
+    @patch('experiment.portal.threading.Thread')
+    def test_Schedule_of_Sending_List_is_valid(self, mockThread):
         # Check if list of research projects is empty before inserting any.
         response = self.client.get(reverse('research_project_list'))
         self.assertEqual(response.status_code, 200)
@@ -5653,6 +5656,44 @@ class ExperimentQuestionnaireTest(ExperimentTestCase):
 
         self.assertFalse(QuestionnaireResponse.objects.exists())
 
+    @patch('survey.abc_search_engine.Server')
+    def test_group_view_refreshes_completion_of_responses_with_one_call_per_survey(self, mockServer):
+        mockServer.return_value.get_session_key.return_value = 'ldhfslhdf'
+        mockServer.return_value.list_participants.return_value = [
+            {'tid': '1', 'completed': '2018-05-15 15:51'}, {'tid': '2', 'completed': '2018-05-15 16:02'},
+            {'tid': '3', 'completed': '2018-05-16 09:30'}, {'tid': '4', 'completed': 'N'}
+        ]
+        questionnaire_dct = self.dct
+
+        # the same survey in a block of the experimental protocol
+        block = ObjectsFactory.create_block(self.experiment)
+        block_config = ObjectsFactory.create_component_configuration(self.root_component, block)
+        block_component_config = self._create_nes_questionnaire(block, self.survey)
+        block_questionnaire_dct = ObjectsFactory.create_data_configuration_tree(
+            block_component_config, parent=ObjectsFactory.create_data_configuration_tree(block_config))
+
+        for token_id, data_configuration_tree in [
+                (1, questionnaire_dct), (2, questionnaire_dct), (3, block_questionnaire_dct),
+                (4, block_questionnaire_dct)]:
+            questionnaire_response = ObjectsFactory.create_questionnaire_response(
+                data_configuration_tree, self.user, token_id, self.subject_of_group)
+            questionnaire_response.is_completed = 'N'
+            questionnaire_response.save()
+
+        response = self.client.get(reverse('group_view', args=(self.group.id,)))
+
+        # one call for the responses of both configurations of the survey
+        self.assertEqual(mockServer.return_value.list_participants.call_count, 1)
+        mockServer.return_value.get_participant_properties.assert_not_called()
+        self.assertEqual(
+            [(item['id'], item['total_fills_done']) for item in response.context['questionnaires_configuration_list']],
+            [(self.component_config.id, 2), (block_component_config.id, 1)])
+        self.assertEqual(
+            dict(QuestionnaireResponse.objects.filter(
+                data_configuration_tree__in=[questionnaire_dct, block_questionnaire_dct]
+            ).values_list('token_id', 'is_completed')),
+            {1: '2018-05-15 15:51', 2: '2018-05-15 16:02', 3: '2018-05-16 09:30', 4: 'N'})
+
     def _create_nes_questionnaire(self, root_component, survey):
         """Create questionnaire component in experimental protocol and return
         data configuration tree associated to that questionnaire component
@@ -5679,3 +5720,34 @@ class ExperimentQuestionnaireTest(ExperimentTestCase):
             'token': token_mock, 'completed': 'N'}
 
         return token_mock
+
+
+class GoalkeeperGameSyncTest(ExperimentTestCase):
+
+    def test_participant_added_after_import_has_all_plays_read(self):
+        sync = GoalkeeperGameSync.objects.create(group=self.group, group_code='group code', last_idconfig=10)
+        sync.subjects_of_group.add(self.subject_of_group)
+
+        patient = UtilTests().create_patient(changed_by=self.user)
+        ObjectsFactory.create_subject_of_group(self.group, ObjectsFactory.create_subject(patient))
+        subjects_of_group = {
+            subject_of_group.subject.patient.code: subject_of_group
+            for subject_of_group in self.group.subjectofgroup_set.all()
+        }
+
+        self.assertEqual(goalkeeper_players_not_synced(sync, subjects_of_group), [patient.code])
+
+    def test_cursor_stops_before_game_without_results(self):
+        self.assertEqual(goalkeeper_sync_cursor(10, [11, 12, 13], {11, 13}), 11)
+
+    def test_game_whose_results_arrive_after_a_later_game_was_imported_is_read_again(self):
+        # game 12 has no results yet when game 13 is imported
+        last_idconfig = goalkeeper_sync_cursor(10, [11, 12, 13], {11, 13})
+
+        # the next sync reads the games after the cursor, with the results of game 12 recorded
+        idconfigs = [idconfig for idconfig in [11, 12, 13, 14] if idconfig > last_idconfig]
+        self.assertEqual(idconfigs, [12, 13, 14])
+        self.assertEqual(goalkeeper_sync_cursor(last_idconfig, idconfigs, {12, 13, 14}), 14)
+
+    def test_cursor_ignores_games_of_participants_added_after_the_last_import(self):
+        self.assertEqual(goalkeeper_sync_cursor(10, [3, 5, 11], {3, 11}), 11)
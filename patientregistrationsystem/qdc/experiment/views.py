@@ -1,24 +1,18 @@
 # coding=utf-8
 import csv
+import hashlib
 import re
 import json
 import random
 import tempfile
 
-import numpy as np
-
-import nwb
-
 import pydot
 from django.core.mail import send_mail
 
-from nwb.nwbco import *
-
-import mne
 import base64
 import os
 
-from datetime import date, timedelta, datetime
+from datetime import timedelta, datetime
 from dateutil.relativedelta import relativedelta
 from functools import partial
 from io import StringIO
@@ -34,18 +28,19 @@ from django.core import serializers
 from django.core.files import File
 from django.core.files.base import ContentFile
 from django.core.urlresolvers import reverse
-from django.db.models import Q, Min
+from django.db.models import F, Q, Min
 from django.apps import apps
 from django.db.models.deletion import ProtectedError
 from django.http import HttpResponseRedirect, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render, render_to_response
+from django.utils import translation
 from django.utils.encoding import smart_str
 from django.utils.translation import ugettext as _
-from django.core.cache import cache
 
+from experiment.experiment_copy import ExperimentCopy
 from experiment.import_export import ExportExperiment, ImportExperiment
+from experiment.protocol_images import EXPERIMENTAL_PROTOCOL_IMAGE_DIR, protocol_image_language
 from patient.views import update_completed_status, update_acquisition_date
-from qdc.settings import MEDIA_ROOT
 from survey.survey_utils import QuestionnaireUtils, find_questionnaire_name
 from .models import Experiment, ExperimentResearcher, Subject, QuestionnaireResponse, SubjectOfGroup, Group, \
     Component, ComponentConfiguration, Questionnaire, Task, Stimulus, Pause, Instruction, Block, \
@@ -60,11 +55,11 @@ from .models import Experiment, ExperimentResearcher, Subject, QuestionnaireResp
     ADConverter, StandardizationSystem, Muscle, MuscleSubdivision, MuscleSide, \
     EMGElectrodePlacement, EMGSurfacePlacement, TMS, TMSSetting, TMSDeviceSetting, TMSDevice, Software, \
     EMGIntramuscularPlacement, EMGNeedlePlacement, SubjectStepData, EMGPreamplifierFilterSetting, \
-    EMGElectrodePlacementSetting, TMSData, TMSLocalizationSystem, \
+    TMSData, TMSLocalizationSystem, \
     DigitalGamePhase, ContextTree, DigitalGamePhaseData, Publication, \
     GenericDataCollection, GenericDataCollectionData, GoalkeeperGameLog, ScheduleOfSending, \
     GoalkeeperGameConfig, GoalkeeperGameResults, EEGFile, EMGFile, AdditionalDataFile, GenericDataCollectionFile, \
-    DigitalGamePhaseFile, PortalSelectedQuestion, ComponentAdditionalFile, GoalkeeperPhase
+    DigitalGamePhaseFile, PortalSelectedQuestion, ComponentAdditionalFile, GoalkeeperPhase, GoalkeeperGameSync
 
 from .forms import ExperimentForm, QuestionnaireResponseForm, FileForm, GroupForm, InstructionForm, \
     ComponentForm, StimulusForm, BlockForm, ComponentConfigurationForm, ResearchProjectForm, NumberOfUsesToInsertForm, \
@@ -87,7 +82,7 @@ from .forms import ExperimentForm, QuestionnaireResponseForm, FileForm, GroupFor
     GenericDataCollectionForm, GenericDataCollectionDataForm, ResendExperimentForm, ResearchProjectOwnerForm
 
 from .portal import get_experiment_status_portal, \
-    send_experiment_to_portal, get_portal_status, \
+    send_experiment_to_portal, get_portal_health, \
     send_group_to_portal, send_research_project_to_portal, \
     send_experiment_end_message_to_portal, \
     send_experimental_protocol_to_portal, send_participant_to_portal, \
@@ -111,12 +106,13 @@ from export.directory_utils import create_directory
 from export.forms import ParticipantsSelectionForm, AgeIntervalForm
 
 from patient.models import Patient, \
-    QuestionnaireResponse as PatientQuestionnaireResponse, \
-    SocialDemographicData
+    QuestionnaireResponse as PatientQuestionnaireResponse
 
 from survey.abc_search_engine import Questionnaires
+from survey.completion import experiment_responses_by_survey, is_response_completed, refresh_stale_completion
+from survey.limesurvey_cache import invalidate_question_groups
 from survey.models import Survey, SensitiveQuestion
-from survey.views import get_questionnaire_responses, check_limesurvey_access, create_list_of_trees, \
+from survey.views import get_cached_questionnaire_responses, check_limesurvey_access, create_list_of_trees, \
     get_questionnaire_language, get_survey_header, questionnaire_evaluation_fields_excluded
 
 
@@ -155,11 +151,6 @@ delimiter = "-"
 # pylint: disable=E1103
 
 
-class EEGReading:
-    file_format = None
-    reading = None
-
-
 @login_required
 @permission_required('experiment.view_researchproject')
 def research_project_list(request, template_name="experiment/research_project_list.html"):
@@ -1039,8 +1030,12 @@ def schedule_of_sending_list(request, template_name="experiment/schedule_of_send
 
     list_of_schedule_of_sending = ScheduleOfSending.objects.filter(status="scheduled").order_by("schedule_datetime")
 
-    portal_status = get_portal_status()
-    if not portal_status:
+    # the Portal is checked in the background (see experiment.portal)
+    portal_health = get_portal_health()
+    portal_status = portal_health is not None and portal_health['active']
+    if portal_health is None:
+        messages.info(request, _("Checking if the Portal is available. Reload the page in a few seconds."))
+    elif not portal_status:
         messages.warning(request, _("Portal is not available to send experiments"))
 
     context = {
@@ -1072,6 +1067,25 @@ def date_of_first_data_collection(subject_of_group):
     return result
 
 
+def dates_of_first_data_collection(subjects_of_group):
+    """Same as date_of_first_data_collection for many subjects of group, with one query per data collection model
+    :param subjects_of_group: list of subject of group ids
+    :return: dict subject of group id -> date of its first data collection. Subjects of group without data
+    collections are not included
+    """
+    result = {}
+
+    for model in [QuestionnaireResponse, EEGData, EMGData, AdditionalData, TMSData, DigitalGamePhaseData,
+                  GenericDataCollectionData]:
+        dates = model.objects.filter(subject_of_group__in=subjects_of_group).order_by().values_list(
+            'subject_of_group').annotate(Min('date'))
+        for subject_of_group_id, date_to_compare in dates:
+            if date_to_compare:
+                result[subject_of_group_id] = min(result.get(subject_of_group_id, date_to_compare), date_to_compare)
+
+    return result
+
+
 def send_all_experiments_to_portal():
     language_code = 'en'
     for schedule_of_sending in ScheduleOfSending.objects.filter(
@@ -1413,9 +1427,57 @@ def group_create(request, experiment_id,
 
 def recursively_create_list_of_questionnaires_and_statistics(
         block_id, list_of_questionnaires_configuration, num_participants, language_code):
-
-    for questionnaire_configuration in ComponentConfiguration.objects.filter(
-            parent_id=block_id, component__component_type="questionnaire"):
+    """Statistics of the questionnaires of the experimental protocol, the
+    questionnaires of a block before the ones of its sub-blocks. The protocol
+    tree is read with one query per level, and the completion of the responses
+    is refreshed with one LimeSurvey call per survey (see survey.completion).
+    """
+    root_id = block_id.id if isinstance(block_id, Component) else block_id
+
+    # configurations of questionnaires and blocks by block, level by level
+    configurations_by_block = {}
+    level = [root_id]
+    while level:
+        configurations = ComponentConfiguration.objects.filter(
+            parent_id__in=level, component__component_type__in=["questionnaire", "block"]
+        ).select_related('component')
+        level = []
+        for configuration in configurations:
+            configurations_by_block.setdefault(configuration.parent_id, []).append(configuration)
+            if configuration.component.component_type == "block":
+                level.append(configuration.component_id)
+
+    questionnaire_configurations = []
+    blocks = [root_id]
+    while blocks:
+        configurations = configurations_by_block.get(blocks.pop(), [])
+        questionnaire_configurations.extend(
+            configuration for configuration in configurations
+            if configuration.component.component_type == "questionnaire")
+        blocks.extend(reversed([
+            configuration.component_id for configuration in configurations
+            if configuration.component.component_type == "block"]))
+
+    questionnaires = Questionnaire.objects.select_related('survey').in_bulk(
+        [configuration.component_id for configuration in questionnaire_configurations])
+
+    responses_by_configuration = {}
+    for subject_response in QuestionnaireResponse.objects.filter(
+            data_configuration_tree__component_configuration__in=questionnaire_configurations
+    ).annotate(component_configuration_id=F('data_configuration_tree__component_configuration')):
+        responses_by_configuration.setdefault(subject_response.component_configuration_id, []).append(
+            subject_response)
+
+    responses_by_survey = {}
+    for configuration in questionnaire_configurations:
+        responses_by_survey.setdefault(
+            questionnaires[configuration.component_id].survey.lime_survey_id, []
+        ).extend(responses_by_configuration.get(configuration.id, []))
+
+    # one LimeSurvey session, only if some response is stale
+    refresh_stale_completion(responses_by_survey)
+
+    for questionnaire_configuration in questionnaire_configurations:
         if questionnaire_configuration.number_of_repetitions is not None:
             fills_per_participant = questionnaire_configuration.number_of_repetitions
             total_fills_needed = num_participants * fills_per_participant
@@ -1423,26 +1485,11 @@ def recursively_create_list_of_questionnaires_and_statistics(
             fills_per_participant = "Ilimitado"
             total_fills_needed = "Ilimitado"
 
-        amount_of_completed_questionnaires = 0
-
-        questionnaire = Questionnaire.objects.get(id=questionnaire_configuration.component.id)
-
-        for subject_response in QuestionnaireResponse.objects.filter(
-                data_configuration_tree__component_configuration=questionnaire_configuration):
-            if subject_response.is_completed == "N" or subject_response.is_completed == "":
-                surveys = Questionnaires()
-
-                is_completed = surveys.get_participant_properties(
-                    questionnaire.survey.lime_survey_id,
-                    subject_response.token_id,
-                    "completed") or ""
-                subject_response.is_completed = is_completed
+        questionnaire = questionnaires[questionnaire_configuration.component_id]
 
-                surveys.release_session_key()
-                subject_response.save()
-
-            if subject_response.is_completed != "N" and subject_response.is_completed != "":
-                amount_of_completed_questionnaires += 1
+        amount_of_completed_questionnaires = len([
+            subject_response for subject_response in responses_by_configuration.get(questionnaire_configuration.id, [])
+            if is_response_completed(subject_response)])
 
         list_of_questionnaires_configuration.append(
             {
@@ -1454,17 +1501,6 @@ def recursively_create_list_of_questionnaires_and_statistics(
             }
         )
 
-    for block_configuration in ComponentConfiguration.objects.filter(
-            parent_id=block_id, component__component_type="block"
-    ):
-
-        list_of_questionnaires_configuration = recursively_create_list_of_questionnaires_and_statistics(
-            Block.objects.get(id=block_configuration.component.id),
-            list_of_questionnaires_configuration,
-            num_participants,
-            language_code
-        )
-
     return list_of_questionnaires_configuration
 
 
@@ -4806,6 +4842,11 @@ def subjects(request, group_id, template_name="experiment/subjects.html"):
             if 'goalkeeper' in settings.DATABASES and GoalkeeperGameLog.objects.using('goalkeeper').first():
                 goalkeeper = True
 
+        # Completion of the responses not completed yet is read from LimeSurvey once per survey
+        refresh_stale_completion(
+            experiment_responses_by_survey(QuestionnaireResponse.objects.filter(subject_of_group__in=subject_list)),
+            surveys)
+
         # For each subject of the group...
         for subject_of_group in subject_list:
 
@@ -4831,17 +4872,7 @@ def subjects(request, group_id, template_name="experiment/subjects.html"):
 
                     for subject_response in subject_responses:
                         # Check if completed
-                        if subject_response.is_completed == "N" or subject_response.is_completed == "":
-                            is_completed = surveys.get_participant_properties(
-                                Questionnaire.objects.get(
-                                    id=questionnaire_configuration.component.id).survey.lime_survey_id,
-                                subject_response.token_id,
-                                "completed") or ""
-
-                            subject_response.is_completed = is_completed
-                            subject_response.save()
-
-                        if subject_response.is_completed == "N" or subject_response.is_completed == "":
+                        if not is_response_completed(subject_response):
                             # If there is an incomplete response for a questionnaire, this questionnaire is counted
                             # as not completed.
                             amount_of_completed_responses = 0
@@ -5373,6 +5404,9 @@ def get_limesurvey_response_url(questionnaire_response):
         .component_configuration.component
     questionnaire = Questionnaire.objects.get(id=survey_component.id)
 
+    # the responses shown by questionnaire_response_view change once filled
+    invalidate_question_groups(questionnaire.survey.lime_survey_id, questionnaire_response.token_id)
+
     questionnaire_lime_survey = Questionnaires()
     token = questionnaire_lime_survey.get_participant_properties(
         questionnaire.survey.lime_survey_id,
@@ -5721,30 +5755,9 @@ def questionnaire_response_view(
     token_id = questionnaire_response.token_id
     language_code = request.LANGUAGE_CODE
 
-    survey_title_key = \
-        request.LANGUAGE_CODE + "-" + str(limesurvey_id) + "-" + str(token_id)\
-        + "_survey_title"
-    groups_of_questions_key = \
-        request.LANGUAGE_CODE + "-" + str(limesurvey_id) + "-" + str(token_id)\
-        + "_group_of_questions"
-
-    # TODO (NES-991): BROKEN! Made a test and fix this before close this issue.
-    #  Before that we are putting a generic exception
-    try:
-        survey_title = cache.get(survey_title_key)
-        groups_of_questions = cache.get(groups_of_questions_key)
-    except:
-        survey_title = None
-        groups_of_questions = None
-
-    if not survey_title and not groups_of_questions:
-        # Get the responses for each question of the questionnaire.
-        survey_title, groups_of_questions = get_questionnaire_responses(
-            language_code, limesurvey_id, token_id, request)
-
-        # TODO (NES-991): see BROKEN! above
-        # cache.set(survey_title_key, survey_title)
-        # cache.set(groups_of_questions_key, groups_of_questions)
+    # Get the responses for each question of the questionnaire.
+    survey_title, groups_of_questions = get_cached_questionnaire_responses(
+        language_code, limesurvey_id, token_id, request)
 
     origin = get_origin(request)
 
@@ -6087,6 +6100,7 @@ def reuse_questionnaire_response(data_configuration_tree_id, patient_questionnai
 @permission_required('experiment.view_researchproject')
 def subject_eeg_view(request, group_id, subject_id,
                      template_name="experiment/subject_eeg_collection_list.html"):
+    from experiment.eeg_processing import eeg_channel_count, eeg_data_reading
 
     group = get_object_or_404(Group, id=group_id)
     subject = get_object_or_404(Subject, id=subject_id)
@@ -6119,7 +6133,7 @@ def subject_eeg_view(request, group_id, subject_id,
                             hasattr(eeg_data.eeg_setting, 'eeg_amplifier_setting') and \
                             eeg_data.eeg_setting.eeg_amplifier_setting.number_of_channels_used and \
                             eeg_data.eeg_setting.eeg_amplifier_setting.number_of_channels_used == \
-                            len(mne.pick_types(eeg_file.eeg_reading.reading.info, eeg=True)):
+                            eeg_channel_count(eeg_file.eeg_reading.reading):
 
                         eeg_file.can_export_to_nwb = True
 
@@ -6281,126 +6295,11 @@ def subject_eeg_data_create(request, group_id, subject_id, eeg_configuration_id,
     return render(request, template_name, context)
 
 
-# v1.5
-def get_sensors_position(eeg_data):
-    # Electrode localization image generation. Validate if EGI
-    reading = None
-    file_path = None
-
-    # Getting the eeg_file, if exists
-    eeg_files = eeg_data.eeg_files.all()
-
-    if len(eeg_files) == 1:
-        for eeg_file in eeg_files:
-            nes_code = eeg_file.eeg_data.file_format.nes_code
-            if nes_code == 'MNE-RawFromEGI':
-                reading = eeg_data_reading(eeg_file, preload=False)
-    elif len(eeg_files) == 3:
-        for eeg_file in eeg_files:
-            nes_code = eeg_file.eeg_data.file_format.nes_code
-            file_extension = eeg_file.file.path.split('.')[-1]
-            if nes_code == 'MNE-RawFromBrainVision' and file_extension == 'vhdr':
-                reading = eeg_data_reading(eeg_file, preload=False)
-
-    if reading:
-        raw = reading.reading
-
-        if raw is not None:
-            picks = mne.pick_types(raw.info, eeg=True)
-            ch_names = raw.info['ch_names']
-            channels = len(picks)
-            montage = ""
-
-            # If EGI 129 channels
-            if nes_code == 'MNE-RawFromEGI':
-                if channels == 129:
-                    montage = mne.channels.read_montage('GSN-HydroCel-129')
-
-                if channels == 128:
-                    montage = mne.channels.read_montage('GSN-HydroCel-128')
-
-                if montage != "":
-                    i = 0
-                    list1 = []
-                    list2 = []
-
-                    for ch_name in ch_names:
-                        i = i + 1
-                        if i < 10:
-                            label = 'EEG' + ' 00' + str(i)
-                        if 9 < i < 100:
-                            label = 'EEG' + ' 0' + str(i)
-                        if 99 < i < channels:
-                            label = 'EEG' + ' ' + str(i)
-
-                        if ch_name == label:
-                            list1.insert(i, 'E' + str(i))
-                            list2.insert(i, ch_name)
-
-                    list1.insert(i + 1, 'Cz')
-                    list2.insert(i + 1, 'E' + str(channels))
-                    mapping = dict(zip(list2, list1))
-
-                    raw.rename_channels(mapping)
-            if nes_code == 'MNE-RawFromBrainVision':
-                montage = mne.channels.read_montage('standard_1020')
-
-            if montage != '':
-
-                raw.set_montage(montage)
-
-                file_name = 'sensors_position_' + str(eeg_data.id) + ".png"
-                errors, path_complete = create_directory(settings.MEDIA_ROOT, "temp")
-
-                # The operation below ensures that the properly backend is set
-                import matplotlib as mpl
-                mpl.use('agg')
-
-                fig = raw.plot_sensors(
-                    ch_type='eeg', show_names=True, show=False, title="Sensor positions", ch_groups='position')
-                fig.savefig(path.join(path_complete, file_name))
-
-                file_path = path.join(settings.MEDIA_ROOT, 'temp', file_name)
-
-    return file_path
-
-
-def eeg_data_reading(eeg_file: EEGFile, preload=False):
-
-    eeg_reading = EEGReading()
-
-    # For known formats, try to access data in order to validate the format
-
-    # v1.5
-    if eeg_file.eeg_data.file_format.nes_code == "MNE-RawFromEGI":
-        eeg_reading.file_format = eeg_file.eeg_data.file_format
-
-        try:
-            # Trying to read the segments
-            reading = mne.io.read_raw_egi(eeg_file.file.path, preload=preload)
-        except:
-            reading = None
-
-        eeg_reading.reading = reading
-
-    if eeg_file.eeg_data.file_format.nes_code == "MNE-RawFromBrainVision":
-
-        eeg_reading.file_format = eeg_file.eeg_data.file_format
-
-        try:
-            # Trying to read the segments
-            reading = mne.io.read_raw_brainvision(eeg_file.file.path, preload=preload, stim_channel=False)
-        except:
-            reading = None
-
-        eeg_reading.reading = reading
-
-    return eeg_reading
-
-
 @login_required
 @permission_required('experiment.change_experiment')
 def eeg_data_view(request, eeg_data_id, tab, template_name="experiment/subject_eeg_data_form.html"):
+    from experiment.eeg_processing import get_sensors_position
+
     eeg_data = get_object_or_404(EEGData, pk=eeg_data_id)
     eeg_data_form = EEGDataForm(request.POST or None, instance=eeg_data)
     eeg_step = get_object_or_404(EEG, id=eeg_data.data_configuration_tree.component_configuration.component.id)
@@ -6670,19 +6569,11 @@ def eeg_data_get_process_requisition_status(request, process_requisition):
     return HttpResponse(json.dumps(response_data), content_type='application/json')
 
 
-def update_process_requisition(request, process_requisition, status, message):
-    request.session['process_requisition_status' + str(process_requisition)] = status
-    request.session['process_requisition_message' + str(process_requisition)] = message
-    request.session.save()
-
-
-def clean(input_string):
-    return input_string.encode('ascii', 'replace').decode()
-
-
 @login_required
 @permission_required('experiment.change_experiment')
 def eeg_file_export_nwb(request, eeg_file_id, some_number, process_requisition):
+    from experiment.eeg_processing import create_nwb_file, eeg_data_reading, update_process_requisition
+
     update_process_requisition(request, process_requisition, 'reading_source_file', _('Reading source file'))
     eeg_file = get_object_or_404(EEGFile, pk=eeg_file_id)
 
@@ -6724,228 +6615,6 @@ def eeg_file_export_nwb(request, eeg_file_id, some_number, process_requisition):
     return response
 
 
-def create_nwb_file(eeg_data, eeg_reading, process_requisition, request, filename):
-
-    subject_of_group = eeg_data.subject_of_group
-    social_demographic_data = None
-    social_demographic_query = SocialDemographicData.objects.filter(patient=subject_of_group.subject.patient)
-    if social_demographic_query:
-        social_demographic_data = social_demographic_query.first()
-
-    ########################################################################
-    # create a new NWB file
-    # several settings are specified when doing so. these can be supplied within
-    #   the NWB constructor or defined in a dict, as in in this example
-
-    nwb_file_settings = dict()
-    nwb_file_settings["filename"] = filename
-    # each file should have a descriptive globally unique identifier
-    #   that specifies the lab and this experiment session
-    # the function nwb.create_identifier() is recommended to use as it takes
-    #   the string and appends the present date and time
-    nwb_file_settings["identifier"] = nwb.create_identifier(
-        "Participant: " + subject_of_group.subject.patient.code +
-        "; NES experiment: " + clean(eeg_data.subject_of_group.group.experiment.title))
-    # indicate that it's OK to overwrite exting file
-    nwb_file_settings["overwrite"] = True
-    # specify the start time of the experiment. all times in the NWB file
-    #   are relative to experiment start time
-    # if the start time is not specified the present time will be used
-    # settings["start_time"] = "Sat Jul 04 2015 3:14:16"
-    nwb_file_settings["start_time"] = \
-        eeg_data.date.strftime("%Y-%m-%d") + (' ' + eeg_data.time.strftime('%H:%M:%S') if eeg_data.time else '')
-    # provide one or two sentences that describe the experiment and what
-    #   data is in the file
-    nwb_file_settings["description"] = clean(subject_of_group.group.experiment.description)
-    # create the NWB object. this manages the file
-    # print("Creating " + nwb_file_settings["filename"])
-    neurodata = nwb.NWB(**nwb_file_settings)
-    ########################################################################
-    # general metadata section
-    #
-    if request:
-        update_process_requisition(request, process_requisition, 'reading_metadata', _('Reading metadata'))
-
-    neurodata.set_metadata(EXPERIMENT_DESCRIPTION, clean(subject_of_group.group.experiment.description))
-    history_data = eeg_data.history.all().order_by('history_date')
-    if history_data:
-        experimenter = history_data.last().history_user
-        if experimenter.last_name or experimenter.first_name:
-            experimenter_description = experimenter.last_name + ', ' + experimenter.first_name
-        else:
-            experimenter_description = experimenter.username
-
-        if experimenter.email:
-            experimenter_description += ' - ' + experimenter.email
-
-        neurodata.set_metadata(EXPERIMENTER, clean(experimenter_description))
-    neurodata.set_metadata(SUBJECT_ID, subject_of_group.subject.patient.code)
-    neurodata.set_metadata(SEX, clean(subject_of_group.subject.patient.gender.name))
-    neurodata.set_metadata(SPECIES, "human")
-    neurodata.set_metadata(
-        AGE, str((date.today() - subject_of_group.subject.patient.date_birth) // timedelta(days=365.2425)))
-    if social_demographic_data:
-        if social_demographic_data.flesh_tone:
-            neurodata.set_metadata(GENOTYPE, clean(social_demographic_data.flesh_tone.name))
-        if social_demographic_data.natural_of:
-            neurodata.set_metadata(SUBJECT, clean(social_demographic_data.natural_of))
-
-    ########################################################################
-    # general devices section
-    #
-    if request:
-        update_process_requisition(request, process_requisition, 'reading_device_data', _('Reading device data'))
-    # Amplifier device setting
-    if hasattr(eeg_data.eeg_setting, 'eeg_amplifier_setting'):
-        device_identification = clean(eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.identification)
-        device_information = _("Device type: Amplifier; ")
-
-        if eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.description:
-            device_information += _("Description: ") + \
-                                  eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.description + "; "
-
-        device_information += \
-            _("Manufacturer: ") + eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.manufacturer.name + "; "
-
-        device_information += _('Gain: ') + str(eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.gain) + "; "
-
-        if eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.input_impedance:
-            device_information += \
-                _('Impedance: ') + \
-                get_nwb_eeg_amplifier_impedance_description(eeg_data.eeg_setting.eeg_amplifier_setting) + "; "
-
-        if eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.common_mode_rejection_ratio:
-            device_information += \
-                _('Common mode rejection ratio: ') + \
-                str(eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.common_mode_rejection_ratio) + "; "
-
-        neurodata.set_metadata(DEVICE(device_identification), clean(device_information))
-
-    # EEG machine
-    if hasattr(eeg_data.eeg_setting, 'eeg_amplifier_setting'):
-
-        device_identification = clean(eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.identification)
-        device_information = _("Device type: EEG Amplifier; ")
-
-        if eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.description:
-            device_information += \
-                _("Description: ") + eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.description + "; "
-
-        device_information += \
-            _("Manufacturer: ") + eeg_data.eeg_setting.eeg_amplifier_setting.eeg_amplifier.manufacturer.name + "; "
-
-        device_information += \
-            _("Number of used channels: ") + \
-            str(eeg_data.eeg_setting.eeg_amplifier_setting.number_of_channels_used) + "; "
-
-        neurodata.set_metadata(DEVICE(device_identification), clean(device_information))
-
-    # Ephys: Filter device setting
-    if hasattr(eeg_data.eeg_setting, 'eeg_filter_setting'):
-        neurodata.set_metadata(EXTRA_FILTERING,
-                               clean(get_nwb_eeg_filter_description(eeg_data.eeg_setting.eeg_filter_setting)))
-
-    # EEG Electrode NET
-    if hasattr(eeg_data.eeg_setting, 'eeg_electrode_layout_setting'):
-
-        eeg_electrode_net_system = eeg_data.eeg_setting.eeg_electrode_layout_setting.eeg_electrode_net_system
-
-        device_identification = clean(eeg_electrode_net_system.eeg_electrode_net.identification)
-        device_information = _("Device type: EEG Electrode Net; ")
-
-        if eeg_electrode_net_system.eeg_electrode_net.description:
-            device_information += _("Description: ") + eeg_electrode_net_system.eeg_electrode_net.description + "; "
-
-        device_information += _("Manufacturer: ") + eeg_electrode_net_system.eeg_electrode_net.manufacturer.name + "; "
-
-        neurodata.set_metadata(DEVICE(device_identification), clean(device_information))
-
-        # Electrode map and group
-        electrode_map = []
-        electrode_group = []
-
-        for position in eeg_electrode_net_system.eeg_electrode_localization_system.electrode_positions.all():
-            position_name = clean(position.name)
-            electrode_group.append(position_name)
-            electrode_map.append([position.coordinate_x, position.coordinate_y, 0])
-            neurodata.set_metadata(EXTRA_SHANK_LOCATION(position_name),
-                                   clean(_("Position: ") + position_name + "; " +
-                                         _("Coordinates: (") +
-                                         str(position.coordinate_x) + ", " +
-                                         str(position.coordinate_y) + "); " +
-                                         _("EEG electrode localization system: " +
-                                           eeg_electrode_net_system.eeg_electrode_localization_system.name)))
-            neurodata.set_metadata(EXTRA_SHANK_DEVICE(position_name), device_identification)
-
-        neurodata.set_metadata(EXTRA_ELECTRODE_MAP, electrode_map)
-        neurodata.set_metadata(EXTRA_ELECTRODE_GROUP, electrode_group)
-
-    ########################################################################
-    # acquisition section
-    #
-    ########################################################################
-    if request:
-        update_process_requisition(request, process_requisition, 'reading_acquisition_data',
-                                   _('Reading acquisition data'))
-    if eeg_reading:
-
-        if eeg_reading.file_format.nes_code == "MNE-RawFromEGI":
-
-            # v1.5
-            number_of_channels = len(mne.pick_types(eeg_reading.reading.info, eeg=True))
-
-            number_of_samples = len(eeg_reading.reading._data[0])
-
-            sampling_rate = 0
-            if hasattr(eeg_data.eeg_setting, 'eeg_amplifier_setting') and \
-                    eeg_data.eeg_setting.eeg_amplifier_setting.sampling_rate:
-                sampling_rate = eeg_data.eeg_setting.eeg_amplifier_setting.sampling_rate
-
-            timestamps = np.arange(number_of_samples) * ((1 / sampling_rate) if sampling_rate else 0)
-
-            # v1.5
-            array_data = np.zeros((number_of_samples, number_of_channels))
-            for index_channel in range(number_of_channels):
-                channel_reading = \
-                    eeg_reading.reading._data[mne.pick_types(eeg_reading.reading.info, eeg=True)[index_channel]]
-                for index, value in enumerate(channel_reading):
-                    array_data[index][index_channel] = value
-
-            acquisition = neurodata.create_timeseries("ElectricalSeries", "data_collection", "acquisition")
-            acquisition.set_data(array_data, resolution=1.2345e-6)
-            acquisition.set_time(timestamps)
-            acquisition.set_value("num_samples", number_of_samples)
-            acquisition.set_value("electrode_idx", list(range(number_of_channels)))
-            acquisition.finalize()
-
-    # when all data is entered, close the file
-    neurodata.close()
-
-    return neurodata.file_name
-
-
-def get_nwb_eeg_filter_description(eeg_filter_setting):
-    response = _("Filter type:") + eeg_filter_setting.eeg_filter_type.name
-    if eeg_filter_setting.eeg_filter_type.description:
-        response += "(" + eeg_filter_setting.eeg_filter_type.description + ")"
-    response += "; "
-    if eeg_filter_setting.high_pass:
-        response += _("High pass: ") + str(eeg_filter_setting.high_pass) + " Hz; "
-    if eeg_filter_setting.low_pass:
-        response += _("Low pass: ") + str(eeg_filter_setting.high_pass) + " Hz; "
-    if eeg_filter_setting.order:
-        response += _("Order: ") + str(eeg_filter_setting.high_pass) + "; "
-    return response
-
-
-def get_nwb_eeg_amplifier_impedance_description(eeg_amplifier_setting):
-    response = str(eeg_amplifier_setting.eeg_amplifier.input_impedance)
-    if eeg_amplifier_setting.eeg_amplifier.input_impedance_unit:
-        response += " " + eeg_amplifier_setting.eeg_amplifier.input_impedance_unit
-    return response
-
-
-
 @login_required
 @permission_required('experiment.change_experiment')
 def eeg_electrode_position_collection_status_change_the_order(request,
@@ -7469,6 +7138,7 @@ def group_goalkeeper_game_data(request, group_id, template_name="experiment/grou
             else:
                 group.code = group_code
                 group.save()
+                GoalkeeperGameSync.objects.filter(group=group).delete()
                 messages.success(request, _('Group code changed successfully.'))
 
         elif request.POST['action'][0:7] == "detail-":
@@ -7487,6 +7157,8 @@ def group_goalkeeper_game_data(request, group_id, template_name="experiment/grou
             else:
                 data_configuration_tree.code = phase_code
             data_configuration_tree.save()
+            # plays of the new phase may be older than the last imported one
+            GoalkeeperGameSync.objects.filter(group=group).delete()
 
     enable_upload = False
     digital_game_phase_collections = []
@@ -7532,7 +7204,8 @@ def group_goalkeeper_game_data(request, group_id, template_name="experiment/grou
     return render(request, template_name, context)
 
 
-def create_csv_for_goalkeeper(complete_filename, config, results):
+def create_csv_for_goalkeeper(config, results):
+    """Returns the content of the csv file stored as data collection of a goalkeeper game play"""
     header = ['player alias', 'group code', 'institution', 'id',
               'soccer team', 'game', 'phase', 'session time(s)',
               'relax time(s)', 'game data', 'game time', 'game random',
@@ -7543,155 +7216,192 @@ def create_csv_for_goalkeeper(complete_filename, config, results):
               'move', 'time until any key(s)', 'time until show again(s)', 'waited result',
               'eh random?', 'option chosen', 'movement time(s)', 'decision time(s)',
               'sequence executed']
-    rows_to_be_saved = list()
-    rows_to_be_saved.append(header)
+    csv_file = StringIO()
+    export_writer = csv.writer(csv_file, quotechar='"', quoting=csv.QUOTE_NONNUMERIC, delimiter=',')
+    export_writer.writerow(header)
     for result in results:
-        rows_to_be_saved.append([config.playeralias, config.groupcode, config.institution, config.idresult,
-                                 config.soccerteam, config.game, config.phase, config.sessiontime,
-                                 config.relaxtime, config.gamedata, config.gametime, config.gamerandom,
-                                 config.limitplays, config.totalcorrect, config.successrate,
-                                 config.gamemode, config.status, config.playstorelax,
-                                 config.scoreboard, config.finalscoreboard, config.animationtype,
-                                 config.minhits, config.playermachine,
-                                 result.move, result.timeuntilanykey, result.timeuntilshowagain,result.waitedresult,
-                                 result.ehrandom, result.optionchoosen, result.movementtime, result.decisiontime,
-                                 config.sequexecuted])
-
-    with open(complete_filename.encode('utf-8'), 'w', newline='', encoding='UTF-8') as csv_file:
-        export_writer = csv.writer(csv_file, quotechar='"', quoting=csv.QUOTE_NONNUMERIC, delimiter=',')
-        for row in rows_to_be_saved:
-            export_writer.writerow(row)
-
-
-@login_required
-@permission_required('experiment.view_researchproject')
-def load_group_goalkeeper_game_data(request, group_id):
-
-    group = get_object_or_404(Group, id=group_id)
-
-    if not group.code:
-        messages.info(request, _("No group code configured."))
-    else:
-        institution = (LocalInstitution.get_solo().code if LocalInstitution.get_solo().code else '')
-
-        number_of_imported_data = 0
-        list_of_paths = create_list_of_trees(group.experimental_protocol, "digital_game_phase")
-
-        # for each phase
-        for path in list_of_paths:
-
-            digital_game_phase_configuration = ComponentConfiguration.objects.get(pk=path[-1][0])
-
-            data_configuration_tree_id = \
-                list_data_configuration_tree(digital_game_phase_configuration.id, [item[0] for item in path])
-
-            if data_configuration_tree_id:
-                data_configuration_tree = get_object_or_404(DataConfigurationTree,
-                                                            pk=data_configuration_tree_id)
-                if data_configuration_tree.code is not None:
+        export_writer.writerow([config.playeralias, config.groupcode, config.institution, config.idresult,
+                                config.soccerteam, config.game, config.phase, config.sessiontime,
+                                config.relaxtime, config.gamedata, config.gametime, config.gamerandom,
+                                config.limitplays, config.totalcorrect, config.successrate,
+                                config.gamemode, config.status, config.playstorelax,
+                                config.scoreboard, config.finalscoreboard, config.animationtype,
+                                config.minhits, config.playermachine,
+                                result.move, result.timeuntilanykey, result.timeuntilshowagain, result.waitedresult,
+                                result.ehrandom, result.optionchoosen, result.movementtime, result.decisiontime,
+                                config.sequexecuted])
+
+    return csv_file.getvalue()
+
+
+def get_goalkeeper_game_phases(group):
+    """Returns a dict {(game code, phase): [data configuration trees]} of the digital game phase steps of the group
+    experimental protocol that have a game and phase configured.
+    """
+    game_phases = {}
 
-                    try:
-                        game_and_phase = GoalkeeperPhase.objects.get(pk=data_configuration_tree.code)
-                    except:
-                        game_and_phase = None
+    for path in create_list_of_trees(group.experimental_protocol, "digital_game_phase"):
+        data_configuration_tree_id = list_data_configuration_tree(path[-1][0], [item[0] for item in path])
 
-                    game = None
-                    phase = None
+        if data_configuration_tree_id:
+            data_configuration_tree = DataConfigurationTree.objects.get(pk=data_configuration_tree_id)
+            if data_configuration_tree.code is not None:
+                game_and_phase = GoalkeeperPhase.objects.select_related('game').filter(
+                    pk=data_configuration_tree.code).first()
+                if game_and_phase:
+                    phase = game_and_phase.phase if game_and_phase.phase is not None else 0
+                    game_phases.setdefault((game_and_phase.game.code, phase), []).append(data_configuration_tree)
 
-                    if game_and_phase:
-                        game = game_and_phase.game.code
-                        phase = game_and_phase.phase
+    return game_phases
 
-                        if phase == None:
-                            phase = 0
 
-                    # Create the folder to temporarily store the csv files to be saved as participant data collection
-                    errors, path_to_goalkeeper_files = create_directory(settings.MEDIA_ROOT, "temp_goalkeepergames")
+def goalkeeper_players_not_synced(sync, subjects_of_group):
+    """Returns the codes of the participants of subjects_of_group ({code: subject of group}) whose plays up to the
+    cursor of sync were not imported yet, because they were added to the group after the last import.
+    """
+    synced = set(sync.subjects_of_group.values_list('pk', flat=True))
 
-                    # for each subject
-                    for subject_of_group in group.subjectofgroup_set.all():
+    return [code for code, subject_of_group in subjects_of_group.items() if subject_of_group.pk not in synced]
 
-                        goalkeeper_games = GoalkeeperGameConfig.objects.using('goalkeeper').filter(
-                            groupcode=group.code,
-                            institution=institution,
-                            game=game,
-                            phase=phase,
-                            playeralias=subject_of_group.subject.patient.code).order_by('idconfig')
 
-                        if goalkeeper_games:
+def goalkeeper_sync_cursor(last_idconfig, idconfigs, idconfigs_with_results):
+    """Returns the cursor of a sync after reading the game configurations idconfigs (in ascending order): the last one
+    before the first configuration newer than last_idconfig without results yet, so that the next sync reads again
+    that configuration, whose results may be recorded later, and the ones after it.
+    """
+    for idconfig in idconfigs:
+        if idconfig <= last_idconfig:
+            # configuration of a participant added after the last import
+            continue
+        if idconfig not in idconfigs_with_results:
+            break
+        last_idconfig = idconfig
 
-                            for goalkeeper_game_configuration in goalkeeper_games:
+    return last_idconfig
 
-                                results = GoalkeeperGameResults.objects.using('goalkeeper').filter(
-                                    idconfig=goalkeeper_game_configuration.idconfig).all()
 
-                                if results:
+def import_group_goalkeeper_game_data(group, rebuild=False):
+    """Imports the goalkeeper game plays of the participants of the group that were not imported yet.
+    Game configurations and results are read with one query each, and already imported plays are
+    checked against a set built with one query.
+    Only game configurations newer than the last one imported for the group code are read, unless rebuild is True,
+    except for participants added to the group after the last import, whose game configurations are all read.
+    :return: dict with the number of game configurations scanned and of plays imported
+    """
+    summary = {'scanned': 0, 'imported': 0}
 
-                                    game_date = datetime.strptime(goalkeeper_game_configuration.gamedata, '%y%m%d')
-                                    game_time = datetime.strptime(goalkeeper_game_configuration.gametime, '%H%M%S')
+    game_phases = get_goalkeeper_game_phases(group)
+    if not game_phases:
+        return summary
 
-                                    if not DigitalGamePhaseData.objects.filter(
-                                            subject_of_group=subject_of_group,
-                                            data_configuration_tree=data_configuration_tree,
-                                            date=game_date, time=game_time):
+    sync, created = GoalkeeperGameSync.objects.get_or_create(group=group, defaults={'group_code': group.code})
+    if rebuild or sync.group_code != group.code:
+        sync.group_code = group.code
+        sync.last_idconfig = 0
 
-                                        # saving data
-                                        digital_game_phase_data = DigitalGamePhaseData()
-                                        digital_game_phase_data.subject_of_group = subject_of_group
-                                        digital_game_phase_data.data_configuration_tree = data_configuration_tree
+    institution = (LocalInstitution.get_solo().code if LocalInstitution.get_solo().code else '')
+    subjects_of_group = {
+        subject_of_group.subject.patient.code: subject_of_group
+        for subject_of_group in group.subjectofgroup_set.select_related('subject__patient')
+    }
 
-                                        digital_game_phase_data.date = game_date
-                                        digital_game_phase_data.time = game_time
+    goalkeeper_games = GoalkeeperGameConfig.objects.using('goalkeeper').filter(
+        groupcode=group.code,
+        institution=institution,
+        game__in=set(game for game, phase in game_phases),
+        playeralias__in=list(subjects_of_group)).filter(
+        Q(idconfig__gt=sync.last_idconfig) |
+        Q(playeralias__in=goalkeeper_players_not_synced(sync, subjects_of_group))).order_by('idconfig')
+
+    results_per_game = {}
+    for result in GoalkeeperGameResults.objects.using('goalkeeper').filter(
+            idconfig__in=goalkeeper_games.values('idconfig')).order_by('idgameresult'):
+        results_per_game.setdefault(result.idconfig, []).append(result)
+
+    imported_plays = set(DigitalGamePhaseData.objects.filter(subject_of_group__group=group).values_list(
+        'subject_of_group_id', 'data_configuration_tree_id', 'date', 'time'))
+
+    file_format = FileFormat.objects.get(nes_code='other')
+
+    sync.last_idconfig = goalkeeper_sync_cursor(
+        sync.last_idconfig, [configuration.idconfig for configuration in goalkeeper_games], results_per_game)
+
+    for goalkeeper_game_configuration in goalkeeper_games:
+        summary['scanned'] += 1
+        results = results_per_game.get(goalkeeper_game_configuration.idconfig)
+        if not results:
+            # game without results yet: the cursor stops before it
+            continue
+
+        game = goalkeeper_game_configuration.game
+        phase = goalkeeper_game_configuration.phase
+        subject_of_group = subjects_of_group[goalkeeper_game_configuration.playeralias]
+        game_date = datetime.strptime(goalkeeper_game_configuration.gamedata, '%y%m%d').date()
+        game_time = datetime.strptime(goalkeeper_game_configuration.gametime, '%H%M%S').time()
+
+        for data_configuration_tree in game_phases.get((game, phase), []):
+
+            play = (subject_of_group.id, data_configuration_tree.id, game_date, game_time)
+            if play in imported_plays:
+                continue
+            imported_plays.add(play)
+
+            # saving data
+            digital_game_phase_data = DigitalGamePhaseData()
+            digital_game_phase_data.subject_of_group = subject_of_group
+            digital_game_phase_data.data_configuration_tree = data_configuration_tree
+
+            digital_game_phase_data.date = game_date
+            digital_game_phase_data.time = game_time
+
+            if game == 'AQ':
+                digital_game_phase_data.description = \
+                    _("Team or structure: %s \nGame code: %s \nParticipant: %s") % \
+                    (goalkeeper_game_configuration.soccerteam,
+                     game,
+                     subject_of_group.subject.patient.code)
+            else:
+                digital_game_phase_data.description = \
+                    _("Team or structure: %s\nGame code: %s\nPhase: %s\nParticipant: %s") \
+                    % (goalkeeper_game_configuration.soccerteam,
+                       game,
+                       phase,
+                       subject_of_group.subject.patient.code)
 
-                                        if game == 'AQ':
-                                            digital_game_phase_data.description = \
-                                                _("Team or structure: %s \nGame code: %s \nParticipant: %s") % \
-                                                (goalkeeper_game_configuration.soccerteam,
-                                                 game,
-                                                 subject_of_group.subject.patient.code)
-                                        else:
-                                            digital_game_phase_data.description = \
-                                                _("Team or structure: %s\nGame code: %s\nPhase: %s\nParticipant: %s") \
-                                                % (goalkeeper_game_configuration.soccerteam,
-                                                   game,
-                                                   phase,
-                                                   subject_of_group.subject.patient.code)
+            digital_game_phase_data.file_format = file_format
 
-                                        digital_game_phase_data.file_format = \
-                                            get_object_or_404(FileFormat, nes_code='other')
+            digital_game_phase_data.sequence_used_in_context_tree = \
+                goalkeeper_game_configuration.sequexecuted
 
-                                        digital_game_phase_data.sequence_used_in_context_tree = \
-                                            goalkeeper_game_configuration.sequexecuted
+            digital_game_phase_data.save()
 
-                                        digital_game_phase_data.save()
+            # Digital Game Phase File: csv to be stored as data collection of the participant
+            file_name = "%s_%s.csv" % (group.code, subject_of_group.subject.patient.code)
 
-                                        # Digital Game Phase File
-                                        file_name = "%s_%s.csv" % (
-                                            group.code, subject_of_group.subject.patient.code)
+            digital_game_phase_file = DigitalGamePhaseFile(digital_game_phase_data=digital_game_phase_data)
+            digital_game_phase_file.file.save(
+                file_name,
+                ContentFile(create_csv_for_goalkeeper(goalkeeper_game_configuration, results).encode('utf-8')))
 
-                                        complete_file_name = os.path.join(path_to_goalkeeper_files, file_name)
+            summary['imported'] += 1
 
-                                        # CSV to be stored as data collection of the participant
-                                        create_csv_for_goalkeeper(
-                                            complete_file_name, goalkeeper_game_configuration, results)
+    sync.save()
+    sync.subjects_of_group.set(subjects_of_group.values())
 
-                                        with open(complete_file_name, "r") as file:
-                                            file_content = file.read()
+    return summary
 
-                                        digital_game_phase_file = DigitalGamePhaseFile(
-                                            digital_game_phase_data=digital_game_phase_data)
-                                        digital_game_phase_file.file.save(
-                                            file_name,
-                                            ContentFile(file_content))
-                                        digital_game_phase_file.save()
 
-                                        number_of_imported_data += 1
+@login_required
+@permission_required('experiment.view_researchproject')
+def load_group_goalkeeper_game_data(request, group_id):
 
-                                        # Delete the temporary file created
-                                        os.remove(complete_file_name)
+    group = get_object_or_404(Group, id=group_id)
 
-                    # Remove directory where the files of each subject were temporarily stored
-                    os.rmdir(path_to_goalkeeper_files)
+    if not group.code:
+        messages.info(request, _("No group code configured."))
+    else:
+        number_of_imported_data = import_group_goalkeeper_game_data(
+            group, rebuild='rebuild' in request.GET)['imported']
 
         if number_of_imported_data:
             if number_of_imported_data == 1:
@@ -8514,9 +8224,11 @@ def subject_additional_data_view(request, group_id, subject_id,
     return render(request, template_name, context)
 
 
-def get_subgraph(tree, node_identifier=""):
+def get_subgraph(tree, node_identifier="", blocks=None):
 
-    block = get_object_or_404(Block, id=tree['component'].id)
+    if blocks is None:
+        blocks = get_blocks_of_tree(tree)
+    block = blocks[tree['component'].id]
 
     first_node = None
     last_node = None
@@ -8553,7 +8265,7 @@ def get_subgraph(tree, node_identifier=""):
 
             new_subgraph, new_first_node, new_last_node = \
                 get_subgraph(component_configuration_item['component'],
-                             node_identifier + '_' + str(component_configuration_item['id']))
+                             node_identifier + '_' + str(component_configuration_item['id']), blocks)
             subgraph.add_subgraph(new_subgraph)
 
             if block.type == Block.PARALLEL_BLOCK:
@@ -8637,46 +8349,111 @@ def split_node_identification_for_graph(identification):
     return '\n'.join(result)
 
 
-def get_experimental_protocol_image(experimental_protocol, tree, url=False):
+def get_blocks_of_tree(tree):
+    """Blocks of the experimental protocol tree by id, with one query"""
+    block_ids = []
+    trees = [tree]
+    while trees:
+        item = trees.pop()
+        if item['component_type'] == Component.BLOCK:
+            block_ids.append(item['component'].id)
+            trees.extend(configuration['component'] for configuration in item['list_of_component_configuration'])
 
-    graph = pydot.Dot(graph_type='digraph')
+    return Block.objects.in_bulk(block_ids)
 
-    subgraph, first_node, last_node = get_subgraph(tree)
-    graph.add_subgraph(subgraph)
 
-    initial_node = pydot.Node(
-        'initial_node', label='', style="filled", shape='circle',
-        fillcolor='green'
-    )
-    ending_node = pydot.Node(
-        'ending_node', label='', style="filled", shape='circle',
-        fillcolor='red'
-    )
-    subgraph.add_node(initial_node)
-    subgraph.add_node(ending_node)
-    if first_node:
-        subgraph.add_edge(pydot.Edge(initial_node, first_node))
-    if last_node:
-        subgraph.add_edge(pydot.Edge(last_node, ending_node))
+def get_experimental_protocol_fingerprint(tree, blocks):
+    """Version of the diagram of the experimental protocol tree: a digest of
+    what is drawn from its component configurations, in the active language
+    """
+    def drawn_items(item, configuration_id=None):
+        component = item['component']
+        yield [configuration_id, component.id, item['component_type'], item['numeration'],
+               component.identification, blocks[component.id].type if component.id in blocks else None]
+        for configuration in item['list_of_component_configuration']:
+            yield from drawn_items(configuration['component'], configuration['id'])
 
-    # graph file name
-    file_name = \
-        "experimental_protocol_" + str(experimental_protocol.id) + ".svg"
+    content = json.dumps([protocol_image_language()] + list(drawn_items(tree)))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
 
-    # writing
-    errors, path_complete = create_directory(settings.MEDIA_ROOT, "temp")
 
-    try:
-        graph.write(path.join(path_complete, file_name), format='png')
-    except:
-        return None
+def get_experimental_protocol_image(experimental_protocol, tree, url=False):
+    """Diagram of the experimental protocol. Diagrams are stored by protocol
+    with the fingerprint of its version, so they are only rendered when the
+    protocol changes
+    :return: path, or url, of the diagram | None if it can't be rendered
+    """
+    blocks = get_blocks_of_tree(tree)
+    directory = path.join(EXPERIMENTAL_PROTOCOL_IMAGE_DIR, str(experimental_protocol.id))
+    language_code = protocol_image_language()
+    file_name = language_code + '_' + get_experimental_protocol_fingerprint(tree, blocks) + '.png'
+
+    errors, path_complete = create_directory(settings.MEDIA_ROOT, directory)
+    image_file = path.join(path_complete, file_name)
+
+    if not path.exists(image_file):
+        graph = pydot.Dot(graph_type='digraph')
+
+        subgraph, first_node, last_node = get_subgraph(tree, blocks=blocks)
+        graph.add_subgraph(subgraph)
+
+        initial_node = pydot.Node(
+            'initial_node', label='', style="filled", shape='circle',
+            fillcolor='green'
+        )
+        ending_node = pydot.Node(
+            'ending_node', label='', style="filled", shape='circle',
+            fillcolor='red'
+        )
+        subgraph.add_node(initial_node)
+        subgraph.add_node(ending_node)
+        if first_node:
+            subgraph.add_edge(pydot.Edge(initial_node, first_node))
+        if last_node:
+            subgraph.add_edge(pydot.Edge(last_node, ending_node))
+
+        # The diagram is written aside and then moved, so a diagram being
+        # written is never read
+        rendering_file = tempfile.NamedTemporaryFile(suffix='.png', dir=path_complete, delete=False)
+        rendering_file.close()
+        try:
+            graph.write(rendering_file.name, format='png')
+        except:
+            os.remove(rendering_file.name)
+            return None
+        os.replace(rendering_file.name, image_file)
+
+        # Diagrams of former versions in this language
+        for old_file_name in os.listdir(path_complete):
+            if old_file_name != file_name and old_file_name.startswith(language_code + '_'):
+                os.remove(path.join(path_complete, old_file_name))
 
     return path.join(
         settings.MEDIA_URL if url else settings.MEDIA_ROOT,
-        'temp', file_name
+        directory, file_name
     )
 
 
+def render_experimental_protocol_images(component_ids, language_code):
+    """Render the diagrams of the experimental protocols including the
+    components, so that views, exports and sendings to the Portal find them
+    rendered. Run by a thread after the protocols change.
+    """
+    roots = set()
+    components = set(component_ids)
+    visited = set(components)
+    while components:
+        roots.update(Group.objects.filter(
+            experimental_protocol__in=components).values_list('experimental_protocol', flat=True))
+        components = set(ComponentConfiguration.objects.filter(
+            component__in=components).values_list('parent', flat=True)) - visited
+        visited.update(components)
+
+    with translation.override(language_code):
+        for root in Component.objects.filter(id__in=roots):
+            get_experimental_protocol_image(root, get_block_tree(root, language_code))
+
+
 def get_description_from_experimental_protocol_tree(component, component_configuration_attributes=[]):
     description = _('Step') + ' ' + component['numeration'] if component['numeration'] else _('Main step')
 
@@ -9921,735 +9698,14 @@ def get_uses_of_step_with_data(experiment):
            steps_generic_data_collection
 
 
-def clone_data_configuration_tree(dct, orig_and_clone):
-    old_component_configuration_id = dct.component_configuration.id
-    old_dct_id = dct.id
-    dct.pk = None
-    new_component_configuration = ComponentConfiguration.objects.get(
-        pk=orig_and_clone[old_component_configuration_id]
-    )
-    dct.component_configuration = new_component_configuration
-    dct.save()
-    orig_and_clone['dct'][old_dct_id] = dct.id
-
-    return dct
-
-
-def clone_electrode_positions(old_eeg_data, orig_and_clone):
-    for eepcs in EEGElectrodePositionCollectionStatus.objects.filter(
-            eeg_data=old_eeg_data
-    ):
-        eepcs.pk = None
-        new_eeg_data = EEGData.objects.get(
-            pk=orig_and_clone['eeg_data'][old_eeg_data.id]
-        )
-        new_eeg_electrode_position_setting = \
-            EEGElectrodePositionSetting.objects.get(
-                pk=orig_and_clone['eeg_electrode_position_setting'][eepcs.eeg_electrode_position_setting.id]
-            )
-        eepcs.eeg_data = new_eeg_data
-        eepcs.eeg_electrode_position_setting = \
-            new_eeg_electrode_position_setting
-
-        eepcs.save()
-
-
-def clone_eeg_data(eeg_data, orig_and_clone):
-    old_eeg_data_id = eeg_data.id
-    eeg_data.pk = None
-    new_eeg_setting = EEGSetting.objects.get(
-        pk=orig_and_clone['eeg_setting'][eeg_data.eeg_setting.id]
-    )
-    new_subject_of_group = SubjectOfGroup.objects.get(
-        pk=orig_and_clone['subject_of_group'][eeg_data.subject_of_group.id]
-    )
-    new_data_configuration_tree = DataConfigurationTree.objects.get(
-        pk=orig_and_clone['dct'][eeg_data.data_configuration_tree.id]
-    )
-    eeg_data.eeg_setting = new_eeg_setting
-    eeg_data.subject_of_group = new_subject_of_group
-    eeg_data.data_configuration_tree = new_data_configuration_tree
-    eeg_data.save()
-    orig_and_clone['eeg_data'][old_eeg_data_id] = eeg_data.id
-
-    old_eeg_data = EEGData.objects.get(pk=old_eeg_data_id)
-    clone_electrode_positions(old_eeg_data, orig_and_clone)
-
-    return eeg_data
-
-
-def clone_eeg_file(eeg_file, orig_and_clone):
-    eeg_file.pk = None
-    new_eeg_data = EEGData.objects.get(
-        pk=orig_and_clone['eeg_data'][eeg_file.eeg_data.id]
-    )
-    eeg_file.eeg_data = new_eeg_data
-    f = open(os.path.join(MEDIA_ROOT, eeg_file.file.name), 'rb')
-    eeg_file.file.save(os.path.basename(f.name), File(f))
-    eeg_file.save()
-
-    return eeg_file
-
-
-def clone_emg_data(emg_data, orig_and_clone):
-    old_emg_data_id = emg_data.id
-    emg_data.pk = None
-    new_emg_setting = EMGSetting.objects.get(
-        pk=orig_and_clone['emg_setting'][emg_data.emg_setting.id]
-    )
-    new_subject_of_group = SubjectOfGroup.objects.get(
-        pk=orig_and_clone['subject_of_group'][emg_data.subject_of_group.id]
-    )
-    new_data_configuration_tree = DataConfigurationTree.objects.get(
-        pk=orig_and_clone['dct'][emg_data.data_configuration_tree.id]
-    )
-    emg_data.emg_setting = new_emg_setting
-    emg_data.subject_of_group = new_subject_of_group
-    emg_data.data_configuration_tree = new_data_configuration_tree
-    emg_data.save()
-    orig_and_clone['emg_data'][old_emg_data_id] = emg_data.id
-
-
-def clone_emg_file(emg_file, orig_and_clone):
-    emg_file.pk = None
-    new_emg_data = EMGData.objects.get(
-        pk=orig_and_clone['emg_data'][emg_file.emg_data.id]
-    )
-    emg_file.emg_data = new_emg_data
-    f = open(os.path.join(MEDIA_ROOT, emg_file.file.name), 'rb')
-    emg_file.file.save(os.path.basename(f.name), File(f))
-
-    emg_file.save()
-
-    return emg_file
-
-
-def clone_additional_data(additional_data, orig_and_clone):
-    old_additional_data_id = additional_data.id
-    additional_data.pk = None
-    new_subject_of_group = SubjectOfGroup.objects.get(
-        pk=orig_and_clone['subject_of_group'][
-            additional_data.subject_of_group.id
-        ]
-    )
-    if additional_data.data_configuration_tree:
-        new_data_configuration_tree = DataConfigurationTree.objects.get(
-            pk=orig_and_clone['dct'][additional_data.data_configuration_tree.id]
-        )
-    else:
-        new_data_configuration_tree = None
-    additional_data.subject_of_group = new_subject_of_group
-    additional_data.data_configuration_tree = new_data_configuration_tree
-    additional_data.save()
-    orig_and_clone['additional_data'][old_additional_data_id] = \
-        additional_data.id
-
-
-def clone_additional_data_file(additional_data_file, orig_and_clone):
-    additional_data_file.pk = None
-    new_additional_data = AdditionalData.objects.get(
-        pk=orig_and_clone['additional_data'][
-            additional_data_file.additional_data.id
-        ]
-    )
-    additional_data_file.additional_data = new_additional_data
-    f = open(os.path.join(MEDIA_ROOT, additional_data_file.file.name), 'rb')
-    additional_data_file.file.save(os.path.basename(f.name), File(f))
-    additional_data_file.save()
-
-    return additional_data_file
-
-
-def clone_digital_game_phase_data(dgp_data, orig_and_clone):
-    old_dgp_data_id = dgp_data.id
-    dgp_data.pk = None
-    new_subject_of_group = SubjectOfGroup.objects.get(
-        pk=orig_and_clone['subject_of_group'][dgp_data.subject_of_group.id]
-    )
-    new_data_configuration_tree = DataConfigurationTree.objects.get(
-        pk=orig_and_clone['dct'][dgp_data.data_configuration_tree.id]
-    )
-    dgp_data.subject_of_group = new_subject_of_group
-    dgp_data.data_configuration_tree = new_data_configuration_tree
-    dgp_data.save()
-    orig_and_clone['digital_game_phase_data'][old_dgp_data_id] = dgp_data.id
-
-
-def clone_digital_game_phase_file(dgp_file, orig_and_clone):
-    dgp_file.pk = None
-    new_dgp_data = DigitalGamePhaseData.objects.get(
-        pk=orig_and_clone['digital_game_phase_data'][
-            dgp_file.digital_game_phase_data.id
-        ]
-    )
-    dgp_file.digital_game_phase_data = new_dgp_data
-    f = open(os.path.join(MEDIA_ROOT, dgp_file.file.name), 'rb')
-    dgp_file.file.save(os.path.basename(f.name), File(f))
-    dgp_file.save()
-
-    return dgp_file
-
-
-def clone_generic_data_collection_data(gdc_data, orig_and_clone):
-    old_gdc_data_id = gdc_data.id
-    gdc_data.pk = None
-    new_subject_of_group = SubjectOfGroup.objects.get(
-        pk=orig_and_clone['subject_of_group'][gdc_data.subject_of_group.id]
-    )
-    new_data_configuration_tree = DataConfigurationTree.objects.get(
-        pk=orig_and_clone['dct'][gdc_data.data_configuration_tree.id]
-    )
-    gdc_data.subject_of_group = new_subject_of_group
-    gdc_data.data_configuration_tree = new_data_configuration_tree
-    gdc_data.save()
-    orig_and_clone['generic_data_collection_data'][old_gdc_data_id] = \
-        gdc_data.id
-
-
-def clone_generic_data_collection_file(gdc_file, orig_and_clone):
-    gdc_file.pk = None
-    new_gdc_data = GenericDataCollectionData.objects.get(
-        pk=orig_and_clone['generic_data_collection_data'][
-            gdc_file.generic_data_collection_data.id
-        ]
-    )
-    gdc_file.generic_data_collection_data = new_gdc_data
-    f = open(os.path.join(MEDIA_ROOT, gdc_file.file.name), 'rb')
-    gdc_file.file.save(os.path.basename(f.name), File(f))
-    gdc_file.save()
-
-    return gdc_file
-
-
-def clone_component_additional_file(component_additional_file, orig_and_clone):
-    component_additional_file.pk = None
-    new_component = Component.objects.get(
-        pk=orig_and_clone['component'][component_additional_file.component.id]
-    )
-    component_additional_file.component = new_component
-    f = open(
-        os.path.join(MEDIA_ROOT, component_additional_file.file.name), 'rb'
-    )
-    component_additional_file.file.save(os.path.basename(f.name), File(f))
-    component_additional_file.save()
-
-    return component_additional_file
-
-
-def clone_context_tree(context_tree, new_experiment, orig_and_clone):
-    old_context_tree_id = context_tree.id
-    context_tree.pk = None
-    context_tree.experiment = new_experiment
-    context_tree.save()
-    old_context_tree = ContextTree.objects.get(pk=old_context_tree_id)
-    if old_context_tree.setting_file:
-        f = open(os.path.join(
-            MEDIA_ROOT, old_context_tree.setting_file.name), 'rb'
-        )
-        context_tree.setting_file.save(os.path.basename(f.name), File(f))
-    orig_and_clone['context_tree'][old_context_tree_id] = context_tree.id
-
-
-def clone_hotspot(hotspot, new_tms_data):
-    old_hotspot = hotspot
-    hotspot.pk = None
-    hotspot.tms_data = new_tms_data
-    hotspot.save()
-    if old_hotspot.hot_spot_map:
-        f = open(os.path.join(MEDIA_ROOT, old_hotspot.hot_spot_map.name), 'rb')
-        hotspot.hot_spot_map.save(os.path.basename(f.name), File(f))
-
-
-def clone_tms_data(tms_data, orig_and_clone):
-    old_tms_data_id = tms_data.id
-    tms_data.pk = None
-    new_tms_setting = TMSSetting.objects.get(
-        pk=orig_and_clone['tms_setting'][tms_data.tms_setting.id]
-    )
-    new_subject_of_group = SubjectOfGroup.objects.get(
-        pk=orig_and_clone['subject_of_group'][tms_data.subject_of_group.id]
-    )
-    new_data_configuration_tree = DataConfigurationTree.objects.get(
-        pk=orig_and_clone['dct'][tms_data.data_configuration_tree.id]
-    )
-    tms_data.tms_setting = new_tms_setting
-    tms_data.subject_of_group = new_subject_of_group
-    tms_data.data_configuration_tree = new_data_configuration_tree
-    tms_data.save()
-
-    old_tms_data = TMSData.objects.get(pk=old_tms_data_id)
-    if hasattr(old_tms_data, 'hotspot'):
-        clone_hotspot(old_tms_data.hotspot, tms_data)
-
-    return tms_data
-
-
-def clone_questionnaire_response_data(q_response, orig_and_clone):
-    q_response.pk = None
-    new_subject_of_group = SubjectOfGroup.objects.get(
-        pk=orig_and_clone['subject_of_group'][q_response.subject_of_group.id]
-    )
-    new_data_configuration_tree = DataConfigurationTree.objects.get(
-        pk=orig_and_clone['dct'][q_response.data_configuration_tree.id]
-    )
-    q_response.subject_of_group = new_subject_of_group
-    q_response.data_configuration_tree = new_data_configuration_tree
-    q_response.save()
-
-
 def copy_experiment(experiment, copy_data_collection=False):
-    orig_and_clone = dict()
-    orig_and_clone['component'] = {}
-    orig_and_clone['context_tree'] = {}
-    orig_and_clone['dct'] = {}
-    orig_and_clone['subject_of_group'] = {}
-    orig_and_clone['eeg_setting'] = {}
-    orig_and_clone['emg_setting'] = {}
-    orig_and_clone['tms_setting'] = {}
-    orig_and_clone['eeg_data'] = {}
-    orig_and_clone['emg_data'] = {}
-    orig_and_clone['additional_data'] = {}
-    orig_and_clone['digital_game_phase_data'] = {}
-    orig_and_clone['generic_data_collection_data'] = {}
-    orig_and_clone['eeg_electrode_position_setting'] = {}
-
-    experiment_id = experiment.id
-    new_experiment = experiment
-    new_experiment.pk = None
-    new_experiment.title = _('Copy of') + ' ' + new_experiment.title
-    new_experiment.last_sending = None
-    new_experiment.save()
-    if experiment.ethics_committee_project_file:
-        f = open(os.path.join(
-            MEDIA_ROOT, experiment.ethics_committee_project_file.name), 'rb'
-        )
-        new_experiment.ethics_committee_project_file.save(
-            os.path.basename(f.name), File(f)
-        )
-
-    # context tree
-    for context_tree in ContextTree.objects.filter(
-            experiment_id=experiment_id
-    ):
-        clone_context_tree(context_tree, new_experiment, orig_and_clone)
-
-    # eeg setting
-    for eeg_setting in EEGSetting.objects.filter(
-            experiment_id=experiment_id):
-        old_eeg_setting_id = eeg_setting.id
-        new_eeg_setting = copy_eeg_setting(
-            eeg_setting, new_experiment, orig_and_clone
-        )
-        orig_and_clone['eeg_setting'][old_eeg_setting_id] = new_eeg_setting.id
-
-    # emg setting
-    for emg_setting in EMGSetting.objects.filter(
-            experiment_id=experiment_id):
-        old_emg_setting_id = emg_setting.id
-        new_emg_setting = copy_emg_setting(emg_setting, new_experiment)
-        orig_and_clone['emg_setting'][old_emg_setting_id] = \
-            new_emg_setting.id
-
-    # tms setting
-    for tms_setting in TMSSetting.objects.filter(
-            experiment_id=experiment_id):
-        old_tms_setting_id = tms_setting.id
-        new_tms_setting = copy_tms_setting(tms_setting, new_experiment)
-        orig_and_clone['tms_setting'][old_tms_setting_id] = new_tms_setting.id
-
-    # component
-    for component in Component.objects.filter(experiment_id=experiment_id):
-        clone_component = create_component(
-            component, new_experiment, orig_and_clone
-        )
-        orig_and_clone['component'][component.id] = clone_component.id
-
-    # component configuration
-    for component_configuration in ComponentConfiguration.objects.filter(
-            component_id__experiment_id=experiment_id
-    ).order_by('parent_id', 'order'):
-
-        old_component_id = component_configuration.component_id
-        parent_id = component_configuration.parent_id
-
-        old_component_configuration_id = component_configuration.id
-        component_configuration.pk = None
-        if component_configuration.name:
-            component_configuration.name = component_configuration.name
-
-        component_configuration.component_id = \
-            orig_and_clone['component'][old_component_id]
-        component_configuration.parent_id = \
-            orig_and_clone['component'][parent_id]
-        component_configuration.save()
-        orig_and_clone[old_component_configuration_id] = \
-            component_configuration.id
-
-    # groups
-    groups = Group.objects.filter(experiment_id=experiment_id)
-    for group in groups:
-        experimental_protocol_id = group.experimental_protocol_id
-        subject_list = [item.pk for item in SubjectOfGroup.objects.filter(group=group)]
-        new_group = group
-        new_group.pk = None
-        new_group.title = new_group.title
-        # group code is unique and not needed to be set at start (goal
-        # keeper game integration)
-        new_group.code = None
-        new_group.experiment_id = new_experiment.id
-        if experimental_protocol_id in orig_and_clone['component']:
-            new_group.experimental_protocol_id = \
-                orig_and_clone['component'][experimental_protocol_id]
-        new_group.save()
-
-        # subject of group
-        if subject_list:
-            new_subject_of_group = SubjectOfGroup.objects.filter(id__in=subject_list)
-            for subject_of_group in new_subject_of_group:
-                old_subject_of_group_id = subject_of_group.id
-                subject_of_group.pk = None
-                subject_of_group.group_id = group.id
-                subject_of_group.save()
-                old_subject_of_group = SubjectOfGroup.objects.get(
-                    pk=old_subject_of_group_id
-                )
-                if old_subject_of_group.consent_form:
-                    f = open(
-                        os.path.join(
-                            MEDIA_ROOT, old_subject_of_group.consent_form.name
-                        ), 'rb'
-                    )
-                    subject_of_group.consent_form.save(
-                        os.path.basename(f.name), File(f)
-                    )
-                orig_and_clone['subject_of_group'][old_subject_of_group_id] \
-                    = subject_of_group.id
-
-    if copy_data_collection:
-        # TODO: 1) check if groups has data collection before trying to copy or
-        #  check this in template so the option to copy with data
-        #  doesn't appear;
-        # TODO: 2) explain that orig_and_clone is modified in method
-        dct_new_list = []
-        for data_configuration_tree in DataConfigurationTree.objects.filter(
-                component_configuration_id__component_id__experiment_id
-                =experiment_id
-        ):
-            dct_new_list.append(
-                clone_data_configuration_tree(
-                    data_configuration_tree, orig_and_clone
-                )
-            )
-        for dct in dct_new_list:
-            if dct.parent:
-                new_dct_parent = DataConfigurationTree.objects.get(
-                    pk=orig_and_clone['dct'][dct.parent.id]
-                )
-                dct.parent = new_dct_parent
-                dct.save()
-        # eeg_data
-        for eeg_data in EEGData.objects.filter(
-            eeg_setting_id__experiment_id=experiment_id
-        ):
-            clone_eeg_data(eeg_data, orig_and_clone)
-        # eeg_file
-        for eeg_file in EEGFile.objects.filter(
-            eeg_data_id__eeg_setting_id__experiment_id=experiment_id
-        ):
-            clone_eeg_file(eeg_file, orig_and_clone)
-        # emg_data
-        for emg_data in EMGData.objects.filter(
-            emg_setting_id__experiment_id=experiment_id
-        ):
-            clone_emg_data(emg_data, orig_and_clone)
-        # emg_file
-        for emg_file in EMGFile.objects.filter(
-            emg_data_id__emg_setting_id__experiment_id=experiment_id
-        ):
-            clone_emg_file(emg_file, orig_and_clone)
-        # additional_data
-        for additional_data in AdditionalData.objects.filter(
-            subject_of_group_id__group_id__experiment_id=experiment_id
-        ):
-            clone_additional_data(additional_data, orig_and_clone)
-        # additional_data_file
-        for additional_data_file in AdditionalDataFile.objects.filter(
-            additional_data_id__subject_of_group_id__group_id__experiment_id
-            =experiment_id
-        ):
-            clone_additional_data_file(additional_data_file, orig_and_clone)
-        # digital_game_phase_data
-        for digital_game_phase_data in DigitalGamePhaseData.objects.filter(
-                data_configuration_tree_id__component_configuration_id__component_id__experiment_id=experiment_id
-        ):
-            clone_digital_game_phase_data(
-                digital_game_phase_data, orig_and_clone
-            )
-        # digital_game_phase_file
-        for digital_game_phase_file in DigitalGamePhaseFile.objects.filter(
-            digital_game_phase_data_id__data_configuration_tree_id__component_configuration_id__component_id__experiment_id=experiment_id
-        ):
-            clone_digital_game_phase_file(
-                digital_game_phase_file, orig_and_clone
-            )
-        # generic_data_collection_data
-        for generic_data_collection_data in \
-                GenericDataCollectionData.objects.filter(
-                    data_configuration_tree_id__component_configuration_id__component_id__experiment_id=experiment_id
-                ):
-            clone_generic_data_collection_data(
-                generic_data_collection_data, orig_and_clone
-            )
-        # generic_data_collection_file
-        for generic_data_collection_file in \
-                GenericDataCollectionFile.objects.filter(
-                    generic_data_collection_data_id__data_configuration_tree_id__component_configuration_id__component_id__experiment_id=experiment_id
-                ):
-            clone_generic_data_collection_file(
-                generic_data_collection_file, orig_and_clone
-            )
-        # component_additional_file
-        for component_additional_file in \
-                ComponentAdditionalFile.objects.filter(
-                    component_id__experiment_id=experiment_id
-                ):
-            clone_component_additional_file(
-                component_additional_file, orig_and_clone
-            )
-        # tms_data
-        for tms_data in TMSData.objects.filter(
-                tms_setting_id__experiment_id=experiment_id
-        ):
-            clone_tms_data(tms_data, orig_and_clone)
-
-        # questionnaire_response_data
-        for questionnaire_response_data in QuestionnaireResponse.objects.filter(
-            subject_of_group_id__group_id__experiment_id=experiment_id
-        ):
-            clone_questionnaire_response_data(questionnaire_response_data, orig_and_clone)
-
-
-def copy_eeg_setting(eeg_setting, new_experiment, orig_and_clone):
-    eeg_setting_id = eeg_setting.id
-    new_eeg_setting = eeg_setting
-    new_eeg_setting.pk = None
-    new_eeg_setting.experiment = new_experiment
-    new_eeg_setting.save()
-
-    # eeg_layout_setting
-    if EEGElectrodeLayoutSetting.objects.filter(eeg_setting_id=eeg_setting_id).exists():
-        new_eeg_electrode_layout_setting = get_object_or_404(EEGElectrodeLayoutSetting, pk=eeg_setting_id)
-        new_eeg_electrode_layout_setting.pk = None
-        new_eeg_electrode_layout_setting.eeg_setting = new_eeg_setting
-        new_eeg_electrode_layout_setting.save()
-
-        for position_setting in EEGElectrodePositionSetting.objects.filter(
-                eeg_electrode_layout_setting_id=eeg_setting_id):
-            old_position_setting_id = position_setting.id
-            new_position_setting = position_setting
-            new_position_setting.pk = None
-            new_position_setting.eeg_electrode_layout_setting = new_eeg_electrode_layout_setting
-            new_position_setting.save()
-
-            orig_and_clone['eeg_electrode_position_setting'][
-                old_position_setting_id
-            ] = new_position_setting.id
-
-    # eeg_amplifier_setting
-    if EEGAmplifierSetting.objects.filter(eeg_setting_id=eeg_setting_id).exists():
-        new_eeg_amplifier_setting = get_object_or_404(EEGAmplifierSetting, pk=eeg_setting_id)
-        new_eeg_amplifier_setting.pk = None
-        new_eeg_amplifier_setting.eeg_setting = new_eeg_setting
-        new_eeg_amplifier_setting.save()
-
-    # eeg_solution_setting
-    if EEGSolutionSetting.objects.filter(eeg_setting_id=eeg_setting_id).exists():
-        new_eeg_solution_setting = get_object_or_404(EEGSolutionSetting, pk=eeg_setting_id)
-        new_eeg_solution_setting.pk = None
-        new_eeg_solution_setting.eeg_setting = new_eeg_setting
-        new_eeg_solution_setting.save()
-
-    # eeg_filter_setting
-    if EEGFilterSetting.objects.filter(eeg_setting_id=eeg_setting_id).exists():
-        new_eeg_filter_setting = get_object_or_404(EEGFilterSetting, pk=eeg_setting_id)
-        new_eeg_filter_setting.pk = None
-        new_eeg_filter_setting.eeg_setting = new_eeg_setting
-        new_eeg_filter_setting.save()
-
-    return new_eeg_setting
-
-
-def copy_emg_setting(emg_setting, new_experiment):
-    emg_setting_id = emg_setting.id
-    new_emg_setting = emg_setting
-    new_emg_setting.pk = None
-    new_emg_setting.experiment = new_experiment
-    new_emg_setting.save()
-
-    # EMGDigitalFilterSetting
-    if EMGDigitalFilterSetting.objects.filter(emg_setting_id=emg_setting_id).exists():
-        new_emg_digital_filter_setting = get_object_or_404(EMGDigitalFilterSetting, pk=emg_setting_id)
-        new_emg_digital_filter_setting.pk = None
-        new_emg_digital_filter_setting.emg_setting = new_emg_setting
-        new_emg_digital_filter_setting.save()
-
-    # EMGADConverterSetting
-    if EMGADConverterSetting.objects.filter(emg_setting_id=emg_setting_id).exists():
-        new_emg_ad_converter_filter_setting = get_object_or_404(EMGADConverterSetting, pk=emg_setting_id)
-        new_emg_ad_converter_filter_setting.pk = None
-        new_emg_ad_converter_filter_setting.emg_setting = new_emg_setting
-        new_emg_ad_converter_filter_setting.save()
-
-    # EMGElectrodeSetting
-    for emg_electrode_setting in EMGElectrodeSetting.objects.filter(emg_setting_id=emg_setting_id):
-        emg_electrode_setting_id = emg_electrode_setting.id
-
-        new_emg_electrode_setting = emg_electrode_setting
-        new_emg_electrode_setting.pk = None
-        new_emg_electrode_setting.emg_setting = new_emg_setting
-        new_emg_electrode_setting.save()
-
-        # EMGPreamplifierSetting
-        if EMGPreamplifierSetting.objects.filter(emg_electrode_setting_id=emg_electrode_setting_id).exists():
-            new_emg_preamplifier_setting = get_object_or_404(EMGPreamplifierSetting, pk=emg_electrode_setting_id)
-            new_emg_preamplifier_setting.pk = None
-            new_emg_preamplifier_setting.emg_electrode_setting_id = new_emg_electrode_setting.id
-            new_emg_preamplifier_setting.save()
-
-            # EMGPreamplifierFilterSetting
-            if EMGPreamplifierFilterSetting.objects.filter(
-                    emg_preamplifier_filter_setting_id=emg_electrode_setting_id).exists():
-                new_emg_preamplifier_filter_setting = get_object_or_404(EMGPreamplifierFilterSetting,
-                                                                        pk=emg_electrode_setting_id)
-                new_emg_preamplifier_filter_setting.pk = None
-                new_emg_preamplifier_filter_setting.emg_preamplifier_filter_setting = new_emg_preamplifier_setting
-                new_emg_preamplifier_filter_setting.save()
-
-        # EMGAmplifierSetting
-        if EMGAmplifierSetting.objects.filter(emg_electrode_setting_id=emg_electrode_setting_id).exists():
-            new_emg_amplifier_setting = get_object_or_404(EMGAmplifierSetting, pk=emg_electrode_setting_id)
-            new_emg_amplifier_setting.pk = None
-            new_emg_amplifier_setting.emg_electrode_setting_id = new_emg_electrode_setting.id
-            new_emg_amplifier_setting.save()
-
-            # EMGAnalogFilterSetting
-            if EMGAnalogFilterSetting.objects.filter(
-                    emg_electrode_setting=emg_electrode_setting_id).exists():
-                new_emg_analog_filter_setting = get_object_or_404(EMGAnalogFilterSetting, pk=emg_electrode_setting_id)
-                new_emg_analog_filter_setting.pk = None
-                new_emg_analog_filter_setting.emg_electrode_setting = new_emg_amplifier_setting
-                new_emg_analog_filter_setting.save()
-
-        # EMGElectrodePlacementSetting
-        if EMGElectrodePlacementSetting.objects.filter(
-                emg_electrode_setting_id=emg_electrode_setting_id).exists():
-            new_emg_electrode_placement_setting = get_object_or_404(EMGElectrodePlacementSetting,
-                                                                    pk=emg_electrode_setting_id)
-            new_emg_electrode_placement_setting.pk = None
-            new_emg_electrode_placement_setting.emg_electrode_setting_id = new_emg_electrode_setting.id
-            new_emg_electrode_placement_setting.save()
-
-    return new_emg_setting
-
-
-def clone_tms_device_setting(tms_device_setting, new_tms_setting):
-    tms_device_setting.pk = None
-    tms_device_setting.tms_setting = new_tms_setting
-    tms_device_setting.save()
-
-
-def copy_tms_setting(tms_setting, new_experiment):
-    old_tms_setting_id = tms_setting.id
-    new_tms_setting = tms_setting
-    new_tms_setting.pk = None
-    new_tms_setting.experiment = new_experiment
-    new_tms_setting.save()
-
-    old_tms_setting = TMSSetting.objects.get(pk=old_tms_setting_id)
-
-    if hasattr(old_tms_setting, "tms_device_setting"):
-        clone_tms_device_setting(
-            old_tms_setting.tms_device_setting, new_tms_setting
-        )
-
-    return new_tms_setting
-
-
-def create_component(component, new_experiment, orig_and_clone):
-
-    component_type = component.component_type
-    file = None  # define variable that can be used in conditionals below
-
-    if component_type == 'block':
-        block = get_object_or_404(Block, pk=component.id)
-        clone = Block(number_of_mandatory_components=block.number_of_mandatory_components, type=block.type)
-
-    elif component_type == 'eeg':
-        eeg = get_object_or_404(EEG, pk=component.id)
-        clone = EEG(eeg_setting_id=orig_and_clone['eeg_setting'][eeg.eeg_setting_id])
-
-    elif component_type == 'emg':
-        emg = get_object_or_404(EMG, pk=component.id)
-        clone = EMG(emg_setting_id=orig_and_clone['emg_setting'][emg.emg_setting_id])
-
-    elif component_type == 'tms':
-        tms = get_object_or_404(TMS, pk=component.id)
-        clone = TMS(tms_setting_id=orig_and_clone['tms_setting'][tms.tms_setting_id])
-
-    elif component_type == 'instruction':
-        instruction = get_object_or_404(Instruction, pk=component.id)
-        clone = Instruction(text=instruction.text)
-
-    elif component_type == 'pause':
-        clone = Pause()
-
-    elif component_type == 'questionnaire':
-        questionnaire = get_object_or_404(Questionnaire, pk=component.id)
-        clone = Questionnaire(survey_id=questionnaire.survey_id)
-
-    elif component_type == 'stimulus':
-        stimulus = get_object_or_404(Stimulus, pk=component.id)
-        clone = Stimulus(stimulus_type_id=stimulus.stimulus_type_id)
-        if stimulus.media_file:
-            file = open(os.path.join(MEDIA_ROOT, stimulus.media_file.name), 'rb')
-
-    elif component_type == 'task':
-        clone = Task()
-
-    elif component_type == 'task_experiment':
-        clone = TaskForTheExperimenter()
-
-    elif component_type == 'digital_game_phase':
-        digital_game_phase = get_object_or_404(DigitalGamePhase, pk=component.id)
-        clone = DigitalGamePhase(
-            context_tree_id=orig_and_clone['context_tree'][
-                digital_game_phase.context_tree_id
-            ],
-            software_version_id=digital_game_phase.software_version_id
-        )
-
-    elif component_type == 'generic_data_collection':
-        generic_data_collection = get_object_or_404(GenericDataCollection, pk=component.id)
-        clone = GenericDataCollection(information_type_id=generic_data_collection.information_type_id)
-
-    else:
-        clone = Component()
-
-    clone.identification = component.identification
-
-    clone.experiment = new_experiment
-    clone.description = component.description
-    clone.duration_value = component.duration_value
-    clone.duration_unit = component.duration_unit
-    clone.component_type = component.component_type
-
-    clone.save()
-
-    # Stimulus component has FileField
-    if isinstance(clone, Stimulus) and file:
-        clone.media_file.save(os.path.basename(file.name), File(file))
+    """Copies experiment (which becomes the copy) and returns the report of
+    the copy: number of queries and seconds spent.
+    """
+    experiment_copy = ExperimentCopy(experiment, copy_data_collection)
+    experiment_copy.copy()
 
-    return clone
+    return experiment_copy.report
 
 
 @login_required
@@ -1,26 +1,33 @@
 # -*- coding: utf-8 -*-
 import csv
 import json
+import multiprocessing
 import random
 import re
+import shutil
 import string
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-from csv import writer
 from datetime import date, datetime, timedelta
+from itertools import repeat
 from sys import modules
-from os import path, makedirs
+from os import path, makedirs, stat
 
 from django.conf import settings
 from django.core.files import File
-from django.db.models import CharField, DateField, TextField, FloatField, BooleanField, NullBooleanField
+from django.db import connections
+from django.db.models import CharField, DateField, TextField, FloatField, BooleanField, NullBooleanField, Max
 from django.utils.encoding import smart_str
 from django.utils.translation import ugettext as _
 from django.apps import apps
 from django.shortcuts import get_object_or_404
 from django.template.defaultfilters import slugify
 
-from export.export_utils import create_list_of_trees, can_export_nwb
+from export.export_cache import ArtifactCache, artifact_key
+from export.export_utils import create_list_of_trees, can_export_nwb, nwb_conversion_memory
+from export.file_jobs import FileJobPool
+from export.response_table import ResponseTable, MULTIPLE_CHOICE_QUESTION_TYPES
 from plugin.models import RandomForests
 
 from survey.survey_utils import HEADER_EXPLANATION_FIELDS, QUESTION_TYPES
@@ -38,14 +45,15 @@ from experiment.models import \
     ContextTree, SubjectStepData, EEGElectrodePositionSetting, \
     SurfaceElectrode, IntramuscularElectrode, \
     NeedleElectrode, EMGElectrodeSetting, EMGIntramuscularPlacement, \
-    EMGSurfacePlacement, EMGNeedlePlacement, ComponentAdditionalFile, ResearchProject, Experiment
+    EMGSurfacePlacement, EMGNeedlePlacement, ComponentAdditionalFile, ResearchProject, Experiment, EEGFile, \
+    EMGFile, AdditionalDataFile, DigitalGamePhaseFile, GenericDataCollectionFile, DataFileBlob
 
 from experiment.views import get_block_tree, get_experimental_protocol_image, \
-    get_description_from_experimental_protocol_tree, get_sensors_position, \
-    create_nwb_file, \
-    list_data_configuration_tree, date_of_first_data_collection
+    get_description_from_experimental_protocol_tree, \
+    list_data_configuration_tree, dates_of_first_data_collection
 
 from survey.abc_search_engine import Questionnaires
+from survey.completion import is_response_completed, refresh_stale_completion
 from survey.views import limesurvey_available
 from survey.survey_utils import QuestionnaireUtils
 
@@ -99,6 +107,9 @@ EMG_DEFAULT_SETTING = 'emg_default_setting.json'
 TMS_DEFAULT_SETTING_FILENAME = 'tms_default_setting.json'
 CONTEXT_TREE_DEFAULT = 'context_tree_default.json'
 
+PARQUET_MEDIATYPE = 'application/vnd.apache.parquet'
+PARQUET_ROW_GROUP_SIZE = 10000
+
 
 def is_number(s):
     try:
@@ -112,7 +123,62 @@ def to_number(value):
     return int(float(value))
 
 
-def save_to_csv(complete_filename, rows_to_be_saved, filesformat_type, mode='w'):
+def get_mediatype(filesformat_type):
+    return PARQUET_MEDIATYPE if filesformat_type == 'parquet' else 'text/' + filesformat_type
+
+
+def to_parquet_column(values, field_type):
+    """Convert the values of a column to the Arrow type corresponding to
+    its datapackage table schema type. If some value can't be converted, the
+    column is kept as strings.
+    """
+    import pyarrow
+
+    values = [None if value is None or value == '' else value for value in values]
+    try:
+        if field_type == 'number':
+            return pyarrow.array([None if value is None else float(value) for value in values], pyarrow.float64())
+        if field_type == 'integer':
+            return pyarrow.array([None if value is None else int(value) for value in values], pyarrow.int64())
+        if field_type == 'date':
+            return pyarrow.array([
+                None if value is None else value if isinstance(value, date)
+                else datetime.strptime(value, '%Y-%m-%d').date()
+                for value in values
+            ], pyarrow.date32())
+        if field_type == 'boolean':
+            return pyarrow.array(values, pyarrow.bool_())
+    except (ValueError, TypeError, pyarrow.ArrowException):
+        pass
+
+    return pyarrow.array([None if value is None else smart_str(value) for value in values], pyarrow.string())
+
+
+def save_to_parquet(complete_filename, rows_to_be_saved, schema_fields=None):
+    """Save rows in a compressed Parquet file. The first row is the header.
+    Parquet files can't be appended to, so all their rows are saved at once.
+    :param schema_fields: datapackage table schema fields (see
+    ExportExecution._set_datapackage_table_schema) used to type the columns
+    with the same name. The other columns are saved as strings.
+    """
+    # pyarrow loads NumPy, so it is only imported when a Parquet file is saved
+    import pyarrow
+    import pyarrow.parquet
+
+    header, rows = rows_to_be_saved[0], rows_to_be_saved[1:]
+    field_types = {field['name']: field['type'] for field in schema_fields or []}
+
+    columns = [
+        to_parquet_column([row[index] if index < len(row) else None for row in rows], field_types.get(name))
+        for index, name in enumerate(header)
+    ]
+    table = pyarrow.Table.from_arrays(columns, [smart_str(name) for name in header])
+
+    pyarrow.parquet.write_table(
+        table, complete_filename, compression='snappy', row_group_size=PARQUET_ROW_GROUP_SIZE)
+
+
+def save_to_csv(complete_filename, rows_to_be_saved, filesformat_type, mode='w', schema_fields=None):
     """
     :param complete_filename: filename and directory structure where file is
     going to be saved
@@ -120,9 +186,17 @@ def save_to_csv(complete_filename, rows_to_be_saved, filesformat_type, mode='w')
     file
     :param filesformat_type: file extension
     :param mode: mode for openning file
+    :param schema_fields: datapackage table schema fields, used for the column
+    types of parquet files
     :return:
     """
 
+    if filesformat_type == 'parquet':
+        if mode != 'w':
+            raise ValueError('Parquet files are saved at once, rows can not be appended to them')
+        save_to_parquet(complete_filename, rows_to_be_saved, schema_fields)
+        return
+
     if filesformat_type == 'tsv':
         separator = '\t'
     else:
@@ -206,6 +280,78 @@ def is_patient_active(subject_id):
     return response
 
 
+# Export being processed by the pool of ExportExecution.process_per_participant_per_experiment. The pool
+# workers are forked from the process running the export, so they inherit it instead of unpickling a copy.
+_export_execution = None
+
+
+def get_fork_context():
+    """multiprocessing context whose processes are forked | None where processes can't be forked (Windows). With
+    other start methods the workers wouldn't inherit _export_execution.
+    """
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+
+
+def _process_group_per_experiment(group_id, heading_type, per_experiment_plugin):
+    questionnaire_lime_survey = Questionnaires()
+    try:
+        return _export_execution.export_group_per_experiment(
+            group_id, heading_type, per_experiment_plugin, questionnaire_lime_survey)
+    finally:
+        questionnaire_lime_survey.release_session_key()
+
+
+# Memory used to render the image of the sensors positions of an EEG data: the
+# recording is not read, only its header
+SENSORS_POSITION_IMAGE_MEMORY = 64 * 2 ** 20
+
+
+# Data collection files of a group and the lookup from each file model to the group
+DATA_FILE_GROUP_LOOKUPS = (
+    (EEGFile, 'eeg_data__subject_of_group__group_id'),
+    (EMGFile, 'emg_data__subject_of_group__group_id'),
+    (AdditionalDataFile, 'additional_data__subject_of_group__group_id'),
+    (DigitalGamePhaseFile, 'digital_game_phase_data__subject_of_group__group_id'),
+    (GenericDataCollectionFile, 'generic_data_collection_data__subject_of_group__group_id'),
+)
+
+
+def get_data_files_fingerprint(group_id):
+    """Returns a dict with the checksum of each data collection file of the group by its name. Files stored before
+    content addressed storage have no checksum: their size and modification time are used instead.
+    """
+    names = []
+    for model, group_lookup in DATA_FILE_GROUP_LOOKUPS:
+        names.extend(model.objects.filter(**{group_lookup: group_id}).values_list('file', flat=True))
+
+    fingerprint = dict(DataFileBlob.objects.filter(name__in=names).values_list('name', 'checksum'))
+    for name in set(names) - set(fingerprint):
+        try:
+            file_stat = stat(path.join(settings.MEDIA_ROOT, name))
+            fingerprint[name] = '%d:%s' % (file_stat.st_size, file_stat.st_mtime)
+        except OSError:
+            fingerprint[name] = None
+
+    return fingerprint
+
+
+def _create_nwb_file(eeg_file_id, filename):
+    from experiment.eeg_processing import create_nwb_file, eeg_data_reading
+
+    eeg_file = EEGFile.objects.get(pk=eeg_file_id)
+    eeg_reading = eeg_data_reading(eeg_file, preload=True)
+    return create_nwb_file(eeg_file.eeg_data, eeg_reading, int(random.random() * 10000), None, filename)
+
+
+def _get_sensors_position(eeg_data_id):
+    from experiment.eeg_processing import get_sensors_position
+
+    return get_sensors_position(EEGData.objects.get(pk=eeg_data_id))
+
+
 class LogMessages:
     def __init__(self, user, file_name=path.join(settings.MEDIA_ROOT, 'export_log')):
         self.user = user
@@ -241,7 +387,16 @@ class ExportExecution:
         self.root_directory = ''
         self.participants_filtered_data = []
         self.per_group_data = {}
+        self.participant_rows_per_code = None
         self.questionnaire_utils = QuestionnaireUtils()
+        # NWB files and images of the sensors positions are prepared while the
+        # export goes on, and collected before the data of the groups is exported
+        self.file_jobs = FileJobPool()
+        self.prepared_files = {}
+        # Jobs preparing the files of each group, listed by include_group_data
+        # and submitted by submit_group_file_jobs for the groups not cached
+        self.group_file_jobs = {}
+        self.group_artifact_keys = {}
 
     @staticmethod
     def _temp_method_to_remove_undesirable_line(fields):
@@ -451,6 +606,10 @@ class ExportExecution:
                                 questionnaire_code, str(questionnaire_id))
                             configuration_tree_list = DataConfigurationTree.objects.filter(
                                 component_configuration=questionnaire_configuration)
+                            refresh_stale_completion({questionnaire_id: list(
+                                ExperimentQuestionnaireResponse.objects.filter(
+                                    data_configuration_tree__in=configuration_tree_list,
+                                    subject_of_group__in=subjects_of_group))}, surveys)
 
                             for data_configuration_tree in configuration_tree_list:
                                 for subject_of_group in subjects_of_group:
@@ -460,10 +619,9 @@ class ExportExecution:
                                             subject_of_group=subject_of_group)
                                     for questionnaire_response in experiment_questionnaire_response_list:
                                         token_id = questionnaire_response.token_id
-                                        completed = surveys.get_participant_properties(
-                                            questionnaire_id, token_id, 'completed')
+                                        completed = questionnaire_response.is_completed
                                         # load complete questionnaires data
-                                        if completed is not None and completed != 'N' and completed != '':
+                                        if is_response_completed(questionnaire_response):
                                             subject_code = questionnaire_response.subject_of_group.subject.patient.code
                                             step_number = path_experiment[0][4]
                                             step_identification = questionnaire_configuration.component.identification
@@ -613,7 +771,15 @@ class ExportExecution:
 
                             for eeg_data in eeg_data_list:
                                 subject_code = eeg_data.subject_of_group.subject.patient.code
-                                sensors_positions_filename = get_sensors_position(eeg_data)
+                                group_file_jobs = self.group_file_jobs.setdefault(group_id, [])
+                                group_file_jobs.append((
+                                    ('sensors_position', eeg_data.id), SENSORS_POSITION_IMAGE_MEMORY,
+                                    _get_sensors_position, (eeg_data.id,)))
+                                for eeg_file in eeg_data.eeg_file_list:
+                                    if eeg_file.can_export_to_nwb:
+                                        group_file_jobs.append((
+                                            ('nwb', eeg_file.id), nwb_conversion_memory(eeg_file.eeg_reading),
+                                            _create_nwb_file, (eeg_file.id, self.get_nwb_file_in_preparation(eeg_file))))
 
                                 if subject_code not in self.per_group_data[group_id]['data_per_participant']:
                                     self.per_group_data[group_id]['data_per_participant'][subject_code] = {}
@@ -635,7 +801,7 @@ class ExportExecution:
                                     'step_number': step_number,
                                     'step_identification': step_identification,
                                     'setting_id': eeg_data.eeg_setting_id,
-                                    'sensor_filename': sensors_positions_filename,
+                                    'eeg_data_id': eeg_data.id,
                                     'eeg_data_directory_name': 'EEGData_' + index,
                                     'data_configuration_tree_id': data_configuration_tree_id,
                                     'directory_step_name': 'Step_' + str(step_number) + '_'
@@ -871,14 +1037,24 @@ class ExportExecution:
 
         return participant_list
 
+    def get_participant_rows_per_code(self):
+        """Index the participant rows built by process_participant_data by participant code (their first
+        column). It's built once, so questionnaire responses are joined with participant data without scanning
+        all participants for each response.
+        :return: dict participant code -> participant row
+        """
+        if self.participant_rows_per_code is None:
+            self.participant_rows_per_code = {}
+            for participant_row in self.get_input_data('participants')['data_list'][1:]:
+                self.participant_rows_per_code.setdefault(participant_row[0], participant_row)
+
+        return self.participant_rows_per_code
+
     def get_participant_row_data(self, subject_code):
         participant_rows = []
-        participant_data_list = self.get_input_data('participants')['data_list']
-        header = participant_data_list[0]
-        for sublist in participant_data_list[1:len(participant_data_list)]:
-            if subject_code in sublist:
-                participant_rows.append(sublist)
-                participant_rows.insert(0, header)
+        participant_row = self.get_participant_rows_per_code().get(subject_code)
+        if participant_row is not None:
+            participant_rows = [self.get_input_data('participants')['data_list'][0], participant_row]
 
         return participant_rows
 
@@ -1036,13 +1212,14 @@ class ExportExecution:
         export_fields_list.append(export_row_list)
 
         # Including the responses
-        for fields in fields_description[1:fields_description.__len__()]:
+        participant_fields_per_code = {
+            participant_fields[len(participant_fields) - 1]: participant_fields
+            for participant_fields in export_participant_row[1:len(export_participant_row)]
+        }
+        for fields in fields_description[1:len(fields_description)]:
             participation_code = fields[len(fields) - 1]
             export_row_list = fields[0:len(fields) - 1]
-            for participant_fields in export_participant_row[1:export_participant_row.__len__()]:
-                if participation_code == participant_fields[len(participant_fields) - 1]:
-                    for field in participant_fields:
-                        export_row_list.append(field)
+            export_row_list.extend(participant_fields_per_code.get(participation_code, []))
             export_fields_list.append(export_row_list)
 
         return export_fields_list
@@ -1151,7 +1328,6 @@ class ExportExecution:
                     # Path ex. data/Per_questionnaire/Q123_aaa/Responses_Q123.csv
                     complete_filename = path.join(
                         export_path, export_filename + '.' + filesformat_type)
-                    save_to_csv(complete_filename, result, filesformat_type)
 
                     # TODO (NES-911): extends conditional to the other parts
                     if not plugin:
@@ -1178,7 +1354,7 @@ class ExportExecution:
                                 export_directory, export_filename + '.'
                                                   + filesformat_type),
                             'format': filesformat_type,
-                            'mediatype': 'text/' + filesformat_type,
+                            'mediatype': get_mediatype(filesformat_type),
                             'description': 'Questionnaire response',
                             'profile': 'tabular-data-resource',
                             'schema': {
@@ -1190,6 +1366,9 @@ class ExportExecution:
                         }
                     else:
                         datapackage_json = ''
+                    save_to_csv(
+                        complete_filename, result, filesformat_type,
+                        schema_fields=datapackage_json['schema']['fields'] if datapackage_json else None)
                     self.files_to_zip_list.append([complete_filename, export_directory, datapackage_json])
 
             # Questionnaire metadata
@@ -1212,7 +1391,9 @@ class ExportExecution:
                 # At this point of the championship, fix it right here
                 self._temp_method_to_remove_undesirable_line(questionnaire_fields)
 
-                save_to_csv(complete_filename, questionnaire_fields, filesformat_type)
+                save_to_csv(
+                    complete_filename, questionnaire_fields, filesformat_type,
+                    schema_fields=self._set_questionnaire_metadata_fields())
 
                 self.files_to_zip_list.append([
                     complete_filename, export_questionnaire_metadata_directory,
@@ -1222,7 +1403,7 @@ class ExportExecution:
                         'title':
                             questionnaire['prefix_filename_fields'] + '_' + str(questionnaire_code) + '_' + language,
                         'path': path.join(export_questionnaire_metadata_directory, export_filename),
-                        'format': filesformat_type, 'mediatype': 'text/' + filesformat_type,
+                        'format': filesformat_type, 'mediatype': get_mediatype(filesformat_type),
                         'description': 'Questionnaire metadata',
                         'profile': 'tabular-data-resource',
                         'schema': {'fields': self._set_questionnaire_metadata_fields()}
@@ -1327,19 +1508,20 @@ class ExportExecution:
                         questionnaire['prefix_filename_responses'], str(questionnaire_code), language)
                     # /data/Participant_data/Per_questionnaire/Q123_aaa/Responses_Q123.csv
                     complete_filename = path.join(export_path, export_filename + '.' + filesformat_type)
-                    save_to_csv(complete_filename, fields_description, filesformat_type)
+                    schema_fields = self._set_questionnaire_response_fields(
+                        heading_type, rows_participant_data[0], answer_list, questions)
+                    save_to_csv(complete_filename, fields_description, filesformat_type, schema_fields=schema_fields)
 
                     self.files_to_zip_list.append([
                         complete_filename, export_directory,
                         {
                             'name': slugify(export_filename), 'title': export_filename,
                             'path': path.join(export_directory, export_filename + '.' + filesformat_type),
-                            'format': filesformat_type, 'mediatype': 'text/' + filesformat_type,
+                            'format': filesformat_type, 'mediatype': get_mediatype(filesformat_type),
                             'description': 'Questionnaire response',
                             'profile': 'tabular-data-resource',
                             'schema': {
-                                'fields': self._set_questionnaire_response_fields(
-                                    heading_type, rows_participant_data[0], answer_list, questions)
+                                'fields': schema_fields
                             }
                         }
                     ])
@@ -1361,7 +1543,9 @@ class ExportExecution:
                 # At this point of the championship, fix it right here
                 self._temp_method_to_remove_undesirable_line(questionnaire_fields)
 
-                save_to_csv(complete_filename, questionnaire_fields, filesformat_type)
+                save_to_csv(
+                    complete_filename, questionnaire_fields, filesformat_type,
+                    schema_fields=self._set_questionnaire_metadata_fields())
 
                 self.files_to_zip_list.append([
                     complete_filename, export_questionnaire_metadata_directory,
@@ -1369,7 +1553,7 @@ class ExportExecution:
                         'name': slugify(export_filename), 'title': export_filename,
                         'path': path.join(export_questionnaire_metadata_directory,
                                           export_filename + '.' + filesformat_type),
-                        'format': filesformat_type, 'mediatype': 'text/' + filesformat_type,
+                        'format': filesformat_type, 'mediatype': get_mediatype(filesformat_type),
                         'description': 'Questionnaire metadata',
                         'profile': 'tabular-data-resource',
                         'schema': {
@@ -1479,6 +1663,9 @@ class ExportExecution:
         error_msg = ''
 
         filesformat_type = self.get_input_data('filesformat_type')
+        # Rows of the questionnaire responses files, saved once all the
+        # participants are read: {complete filename: {'rows', 'schema_fields'}}
+        rows_per_file = OrderedDict()
 
         for group_id in self.per_group_data:
             if 'questionnaires_per_group' in self.per_group_data[group_id]:
@@ -1534,6 +1721,7 @@ class ExportExecution:
                     for token in questionnaires['token_list']:
                         dir_questionnaire_step[questionnaire_id].add(token['directory_step_name'])
 
+                    questionnaire_lime_survey = Questionnaires()
                     for token in questionnaires['token_list']:
                         path_group_per_questionnaire = self.per_group_data[
                             group_id
@@ -1587,36 +1775,28 @@ class ExportExecution:
                                 rows_participant_data[0], answer_list[0][field_type])
                             fields_description.insert(0, header)
 
-                            ###
-                            # Jury-rig detected!
-                            file_exists = False
-                            for item in self.files_to_zip_list:
-                                if complete_filename in item[0]:
-                                    # Append in complete_filename fields_description in the file
-                                    # that already exists
-                                    save_to_csv(complete_filename, fields_description[1:], filesformat_type, mode='a')
-                                    file_exists = True
-                                    break
-                            ###
-
-                            # Save array list into a file to expor
-                            questionnaire_lime_survey = Questionnaires()
-                            if not file_exists:
-                                save_to_csv(complete_filename, fields_description, filesformat_type)
+                            if complete_filename in rows_per_file:
+                                # rows of the other participants are saved with the first ones, at the end
+                                rows_per_file[complete_filename]['rows'].extend(fields_description[1:])
+                            else:
                                 # TODO (NES-991): treat possible error
                                 error, questions = QuestionnaireUtils.get_questions(
                                     questionnaire_lime_survey, questionnaire_id, language)
+                                schema_fields = self._set_questionnaire_response_fields(
+                                    heading_type, rows_participant_data[0], answer_list[0], questions)
+                                rows_per_file[complete_filename] = {
+                                    'rows': fields_description, 'schema_fields': schema_fields
+                                }
                                 self.files_to_zip_list.append([
                                     complete_filename, export_directory,
                                     {
                                         'name': slugify(export_filename), 'title': export_filename,
                                         'path': path.join(export_directory, export_filename + '.' + filesformat_type),
-                                        'format': filesformat_type, 'mediatype': 'text/' + filesformat_type,
+                                        'format': filesformat_type, 'mediatype': get_mediatype(filesformat_type),
                                         'description': 'Questionnaire response',
                                         'profile': 'tabular-data-resource',
                                         'schema': {
-                                            'fields': self._set_questionnaire_response_fields(
-                                                heading_type, rows_participant_data[0], answer_list[0], questions)
+                                            'fields': schema_fields
                                         }
                                     }
                                 ])
@@ -1643,7 +1823,9 @@ class ExportExecution:
                                     prefix_filename_fields, 'QS', language, filesformat_type)
 
                         complete_filename = path.join(complete_export_metadata_path, export_filename)
-                        save_to_csv(complete_filename, questionnaire_fields, filesformat_type)
+                        save_to_csv(
+                            complete_filename, questionnaire_fields, filesformat_type,
+                            schema_fields=self._set_questionnaire_metadata_fields())
 
                         self.files_to_zip_list.append([
                             complete_filename, export_metadata_directory,
@@ -1651,7 +1833,7 @@ class ExportExecution:
                                 'name': slugify(prefix_filename_fields + '_' + questionnaire_code),
                                 'title': prefix_filename_fields + '_' + questionnaire_code,
                                 'path': path.join(export_metadata_directory, export_filename),
-                                'format': filesformat_type, 'mediatype': 'text/' + filesformat_type,
+                                'format': filesformat_type, 'mediatype': get_mediatype(filesformat_type),
                                 'description': 'Questionnaire metadata',
                                 'profile': 'tabular-data-resource',
                                 'schema': {
@@ -1662,6 +1844,10 @@ class ExportExecution:
 
                     questionnaire_lime_survey.release_session_key()
 
+        for complete_filename, file_rows in rows_per_file.items():
+            save_to_csv(
+                complete_filename, file_rows['rows'], filesformat_type, schema_fields=file_rows['schema_fields'])
+
         return error_msg
 
     def process_per_participant(self, heading_type, participants_plugin):
@@ -1756,7 +1942,6 @@ class ExportExecution:
                         participant_rows = self.get_per_participant_data(
                             participant_code, questionnaire_code)[language][0]
                         per_participant_rows = [header, participant_rows]
-                        save_to_csv(complete_filename, per_participant_rows, filesformat_type)
 
                         answer_list = {'fields': [], 'header': [], 'header_questionnaire': []}
                         questionnaire = next(
@@ -1772,7 +1957,7 @@ class ExportExecution:
                         datapackage_json = {
                             'name': slugify(export_filename), 'title': export_filename,
                             'path': path.join(export_questionnaire_directory, export_filename + '.' + filesformat_type),
-                            'format': filesformat_type, 'mediatype': 'text/' + filesformat_type,
+                            'format': filesformat_type, 'mediatype': get_mediatype(filesformat_type),
                             'description': 'Questionnaire response',
                             'profile': 'tabular-data-resource',
                             'schema': {
@@ -1780,6 +1965,9 @@ class ExportExecution:
                                     heading_type, participant_data_header, answer_list, questions)
                             }
                         }
+                        save_to_csv(
+                            complete_filename, per_participant_rows, filesformat_type,
+                            schema_fields=datapackage_json['schema']['fields'])
 
                         self.files_to_zip_list.append([
                             complete_filename, export_questionnaire_directory, datapackage_json
@@ -1863,7 +2051,6 @@ class ExportExecution:
                                     per_participant_rows = \
                                         self.per_participant_data[participant_code][questionnaire_code][language]
                                     per_participant_rows.insert(0, header)
-                                    save_to_csv(complete_filename, per_participant_rows, filesformat_type)
 
                                     # Get data for datapackage resource questionnaire response table schema
                                     rows_participant_data = self.get_input_data('participants')['data_list']
@@ -1876,6 +2063,11 @@ class ExportExecution:
                                     # TODO (NES-991): QuestionnaireUtils already in self.questionnaire_utils
                                     error, questions = QuestionnaireUtils.get_questions(
                                         questionnaire_lime_survey, questionnaire_id, language)
+                                    schema_fields = self._set_questionnaire_response_fields(
+                                        heading_type, rows_participant_data[0], answer_list, questions)
+                                    save_to_csv(
+                                        complete_filename, per_participant_rows, filesformat_type,
+                                        schema_fields=schema_fields)
 
                                     self.files_to_zip_list.append([
                                         complete_filename, export_directory,
@@ -1883,656 +2075,774 @@ class ExportExecution:
                                             'name': slugify(export_filename), 'title': export_filename,
                                             'path': path.join(
                                                 export_directory, export_filename + '.' + filesformat_type),
-                                            'format': filesformat_type, 'mediatype': 'text/' + filesformat_type,
+                                            'format': filesformat_type, 'mediatype': get_mediatype(filesformat_type),
                                             'description': 'Questionnaire response',
                                             'profile': 'tabular-data-resource',
                                             'schema': {
-                                                'fields': self._set_questionnaire_response_fields(
-                                                    heading_type, rows_participant_data[0], answer_list, questions
-                                                )
+                                                'fields': schema_fields
                                             }
                                         }
                                     ])
 
         return error_msg
 
+    def submit_group_file_jobs(self, heading_type, per_experiment_plugin=False):
+        """Start the jobs preparing the files of the groups whose files are not in the export cache. Called once
+        the group data is included and its directories are created, as the key of a group depends on them.
+        """
+        artifact_cache = ArtifactCache()
+        for group_id in self.per_group_data:
+            if artifact_cache.enabled:
+                key = self.get_group_artifact_key(group_id, heading_type, per_experiment_plugin)
+                self.group_artifact_keys[group_id] = key
+                if artifact_cache.has(key):
+                    continue
+            for job_key, memory, function, args in self.group_file_jobs.get(group_id, []):
+                self.file_jobs.submit(job_key, memory, function, *args)
+
+    def get_nwb_file_in_preparation(self, eeg_file):
+        directory = path.join(self.get_directory_base(), 'NWB_in_preparation')
+        makedirs(directory, exist_ok=True)
+        return path.join(directory, '%d.nwb' % eeg_file.id)
+
     def process_per_participant_per_experiment(self, heading_type, per_experiment_plugin=False):
-        error_msg = ''
-        questionnaire_lime_survey = Questionnaires()
+        """Export the data of each participant of each group. The directory tree of a group doesn't depend on
+        the other groups, so with settings.EXPORT_WORKERS greater than one the groups are processed in a pool
+        of forked processes, or in this process where processes can't be forked. The files created for each group
+        are added to files_to_zip_list in the order of per_group_data, so the zip file and datapackage.json are
+        the same whatever the number of workers.
+        """
+        global _export_execution
+
+        self.prepared_files = self.file_jobs.collect()
+        if self.file_jobs.errors:
+            # a worker exited while preparing them, out of memory for instance
+            return _('Error preparing the NWB files and sensors position images of the export.')
+
+        group_ids = list(self.per_group_data)
+        workers = min(settings.EXPORT_WORKERS, len(group_ids))
+        fork_context = get_fork_context() if workers > 1 else None
+        if fork_context is not None:
+            # Workers must open their own database connections instead of sharing the connection of this process
+            connections.close_all()
+            _export_execution = self
+            try:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=fork_context) as executor:
+                    group_results = list(executor.map(
+                        _process_group_per_experiment, group_ids, repeat(heading_type), repeat(per_experiment_plugin)))
+            finally:
+                _export_execution = None
+        else:
+            questionnaire_lime_survey = Questionnaires()
+            group_results = (
+                self.export_group_per_experiment(
+                    group_id, heading_type, per_experiment_plugin, questionnaire_lime_survey)
+                for group_id in group_ids
+            )
 
-        for group_id in self.per_group_data:
-            header_saved = False
-            participant_list = self.per_group_data[group_id]['data_per_participant']
-            # Participant data
-            for participant_code in participant_list:
-                prefix_filename_participant = 'Participant_'
-                # Ex. Participant_P123
-                participant_name = prefix_filename_participant + str(participant_code)
-                participant_data_directory = self.per_group_data[group_id]['group']['participant_data_directory']
-                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                path_per_participant = path.join(participant_data_directory, participant_name)
+        try:
+            for error_msg, files_to_zip_list in group_results:
+                self.files_to_zip_list.extend(files_to_zip_list)
+                if error_msg != '':
+                    return error_msg
+        finally:
+            # NWB files prepared for groups that failed to export
+            shutil.rmtree(path.join(self.get_directory_base(), 'NWB_in_preparation'), ignore_errors=True)
 
-                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                participant_data_export_directory = self.per_group_data[group_id]['group'][
-                    'participant_data_export_directory']
-                participant_export_directory = path.join(participant_data_export_directory, participant_name)
-                if 'token_list' in participant_list[participant_code] and self.get_input_data('export_per_participant'):
-                    # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                    if not path.exists(path_per_participant):
-                        error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
-                        if error_msg != '':
-                            return error_msg
+        return ''
 
-                    for token_data in participant_list[participant_code]['token_list']:
-                        questionnaire_code = token_data['questionnaire_code']
-                        questionnaire_id = token_data['questionnaire_id']
-                        questionnaire_title = self.get_input_data(
-                            'questionnaires_from_experiments')[group_id][str(questionnaire_id)]['questionnaire_name']
-                        # ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_Questionnaire
-                        error_msg, directory_step_participant = create_directory(
-                            path_per_participant, token_data['directory_step_name'])
-                        if error_msg != '':
-                            return error_msg
+    def export_group_per_experiment(self, group_id, heading_type, per_experiment_plugin, questionnaire_lime_survey):
+        """process_group_per_experiment reusing the files exported before for the same group data and export
+        options, kept in the export cache while settings.EXPORT_CACHE_SIZE is greater than zero
+        """
+        artifact_cache = ArtifactCache()
+        if not artifact_cache.enabled:
+            return self.process_group_per_experiment(
+                group_id, heading_type, per_experiment_plugin, questionnaire_lime_survey)
+
+        key = self.group_artifact_keys.get(group_id) or self.get_group_artifact_key(
+            group_id, heading_type, per_experiment_plugin)
+        files_to_zip_list = artifact_cache.get(key, self.get_directory_base())
+        if files_to_zip_list is not None:
+            return '', files_to_zip_list
+
+        # the entry was evicted after submit_group_file_jobs found it, so the files of the group were not prepared
+        file_jobs = FileJobPool(workers=1)
+        for job_key, memory, function, args in self.group_file_jobs.get(group_id, []):
+            if job_key not in self.prepared_files:
+                file_jobs.submit(job_key, memory, function, *args)
+        self.prepared_files.update(file_jobs.collect())
+
+        error_msg, files_to_zip_list = self.process_group_per_experiment(
+            group_id, heading_type, per_experiment_plugin, questionnaire_lime_survey)
+        if error_msg == '':
+            artifact_cache.put(key, self.get_directory_base(), files_to_zip_list)
+
+        return error_msg, files_to_zip_list
+
+    def get_group_artifact_key(self, group_id, heading_type, per_experiment_plugin):
+        """Key of the files exported for the group: it changes when the group data, the questionnaire responses of
+        its participants or the export options change, when a data collection of the group is changed, and when
+        a setting or equipment described in the files, or the content of a data collection file, changes
+        """
+        last_changes = [
+            model.history.filter(subject_of_group__group_id=group_id).aggregate(Max('history_date'))[
+                'history_date__max']
+            for model in [ExperimentQuestionnaireResponse, EEGData, EMGData, AdditionalData, TMSData,
+                          DigitalGamePhaseData, GenericDataCollectionData]
+        ]
 
-                        # Ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_Questionnaire
-                        step_participant_export_directory = path.join(
-                            participant_export_directory, token_data['directory_step_name'])
-                        # Select questionnaire language
-                        questionnaire_language = self.get_input_data('questionnaire_language')[str(questionnaire_id)]
+        responses = []
+        eeg_setting_ids, emg_setting_ids, tms_data_ids = set(), set(), set()
+        for participant_data in self.per_group_data[group_id]['data_per_participant'].values():
+            for token_data in participant_data.get('token_list', []):
+                responses.append(self.questionnaires_responses.get(
+                    str(token_data['questionnaire_id']), {}).get(token_data['token_id']))
+            eeg_setting_ids.update(eeg_data['setting_id'] for eeg_data in participant_data.get('eeg_data_list', []))
+            emg_setting_ids.update(emg_data['setting_id'] for emg_data in participant_data.get('emg_data_list', []))
+            tms_data_ids.update(tms_data['tms_data_id'] for tms_data in participant_data.get('tms_data_list', []))
+
+        # settings and equipment have no history, so the descriptions saved with the data collections are used
+        descriptions = [
+            [get_eeg_setting_description(setting_id) for setting_id in sorted(eeg_setting_ids)],
+            [get_emg_setting_description(setting_id) for setting_id in sorted(emg_setting_ids)],
+            [get_tms_data_description(tms_data_id) for tms_data_id in sorted(tms_data_ids)],
+        ]
 
-                        filesformat_type = self.get_input_data('filesformat_type')
+        # directories of the export are the same for every export of the group
+        return artifact_key(
+            self.per_group_data[group_id], self.input_data, heading_type, per_experiment_plugin, last_changes,
+            responses, descriptions, get_data_files_fingerprint(group_id), relative_to=self.get_directory_base())
 
-                        if 'long' in self.get_input_data('response_type'):
-                            language_list = questionnaire_language['language_list']
-                        else:
-                            language_list = [questionnaire_language['output_language']]
-                        response_english_plugin_done = False
-                        for language in language_list:
-                            if response_english_plugin_done:
-                                break
-                            export_filename = '%s_%s_%s' % (str(
-                                questionnaire_code), slugify(questionnaire_title), language)
-                            if per_experiment_plugin:
-                                randomforests = RandomForests.objects.first()
-                                if questionnaire_id == randomforests.admission_assessment.lime_survey_id:
-                                    export_filename = 'QA_unified_admission_assessment_en'
-                                elif questionnaire_id == randomforests.surgical_evaluation.lime_survey_id:
-                                    export_filename = 'QS_surgical_evaluation_en'
-                                elif questionnaire_id == \
-                                        randomforests.followup_assessment.lime_survey_id:
-                                    export_filename = \
-                                        'QF_unified_followup_assessment_en'
-                                else:
-                                    # TODO: error
-                                    pass
-                                response_english_plugin_done = True
+    def process_group_per_experiment(self, group_id, heading_type, per_experiment_plugin, questionnaire_lime_survey):
+        """
+        :return: error message and list of the files created for the group, in files_to_zip_list format
+        """
+        error_msg = ''
+        files_to_zip_list = []
+        header_saved = False
+        participant_list = self.per_group_data[group_id]['data_per_participant']
+        # Participant data
+        for participant_code in participant_list:
+            prefix_filename_participant = 'Participant_'
+            # Ex. Participant_P123
+            participant_name = prefix_filename_participant + str(participant_code)
+            participant_data_directory = self.per_group_data[group_id]['group']['participant_data_directory']
+            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+            path_per_participant = path.join(participant_data_directory, participant_name)
+
+            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+            participant_data_export_directory = self.per_group_data[group_id]['group'][
+                'participant_data_export_directory']
+            participant_export_directory = path.join(participant_data_export_directory, participant_name)
+            if 'token_list' in participant_list[participant_code] and self.get_input_data('export_per_participant'):
+                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                if not path.exists(path_per_participant):
+                    error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
+
+                for token_data in participant_list[participant_code]['token_list']:
+                    questionnaire_code = token_data['questionnaire_code']
+                    questionnaire_id = token_data['questionnaire_id']
+                    questionnaire_title = self.get_input_data(
+                        'questionnaires_from_experiments')[group_id][str(questionnaire_id)]['questionnaire_name']
+                    # ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_Questionnaire
+                    error_msg, directory_step_participant = create_directory(
+                        path_per_participant, token_data['directory_step_name'])
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
 
-                            # Path ex. data/Experiment_data/Group_xxx/Per_participant/Participant_P123/Step_X_aaa
-                            complete_filename = path.join(
-                                directory_step_participant, export_filename + '.' + filesformat_type)
+                    # Ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_Questionnaire
+                    step_participant_export_directory = path.join(
+                        participant_export_directory, token_data['directory_step_name'])
+                    # Select questionnaire language
+                    questionnaire_language = self.get_input_data('questionnaire_language')[str(questionnaire_id)]
 
-                            export_rows_participants = self.get_participant_row_data(token_data['subject_code'])
+                    filesformat_type = self.get_input_data('filesformat_type')
 
-                            # Questionnaire response by participant
-                            token_id = token_data['token_id']
-                            answer_list = self.questionnaires_responses[str(questionnaire_id)][token_id][language]
+                    if 'long' in self.get_input_data('response_type'):
+                        language_list = questionnaire_language['language_list']
+                    else:
+                        language_list = [questionnaire_language['output_language']]
+                    response_english_plugin_done = False
+                    for language in language_list:
+                        if response_english_plugin_done:
+                            break
+                        export_filename = '%s_%s_%s' % (str(
+                            questionnaire_code), slugify(questionnaire_title), language)
+                        if per_experiment_plugin:
+                            randomforests = RandomForests.objects.first()
+                            if questionnaire_id == randomforests.admission_assessment.lime_survey_id:
+                                export_filename = 'QA_unified_admission_assessment_en'
+                            elif questionnaire_id == randomforests.surgical_evaluation.lime_survey_id:
+                                export_filename = 'QS_surgical_evaluation_en'
+                            elif questionnaire_id == \
+                                    randomforests.followup_assessment.lime_survey_id:
+                                export_filename = \
+                                    'QF_unified_followup_assessment_en'
+                            else:
+                                # TODO: error
+                                pass
+                            response_english_plugin_done = True
 
-                            per_participant_rows = self.merge_questionnaire_answer_list_per_participant(
-                                export_rows_participants[1], answer_list[1: len(answer_list)])
+                        # Path ex. data/Experiment_data/Group_xxx/Per_participant/Participant_P123/Step_X_aaa
+                        complete_filename = path.join(
+                            directory_step_participant, export_filename + '.' + filesformat_type)
 
-                            field_type = 'fields' if heading_type == 'code' else 'header_questionnaire'
-                            header = self.build_header_questionnaire_per_participant(
-                                export_rows_participants[0], answer_list[0][field_type])
-                            per_participant_rows.insert(0, header)
+                        export_rows_participants = self.get_participant_row_data(token_data['subject_code'])
 
-                            save_to_csv(complete_filename, per_participant_rows, filesformat_type)
+                        # Questionnaire response by participant
+                        token_id = token_data['token_id']
+                        answer_list = self.questionnaires_responses[str(questionnaire_id)][token_id][language]
 
-                            # TODO (NES-991): treat error!
-                            # TODO (NES-991): QuestionnaireUtils already in self.questionnaire_utils
-                            error, questions = QuestionnaireUtils.get_questions(
-                                questionnaire_lime_survey, questionnaire_id, language)
+                        per_participant_rows = self.merge_questionnaire_answer_list_per_participant(
+                            export_rows_participants[1], answer_list[1: len(answer_list)])
 
-                            self.files_to_zip_list.append([
-                                complete_filename, step_participant_export_directory,
-                                {
-                                    'name': slugify(export_filename) + '_per-participant', 'title': export_filename,
-                                    'path': path.join(
-                                        step_participant_export_directory, export_filename + '.' + filesformat_type),
-                                    'format': 'csv', 'mediatype': 'text/csv', 'description': 'Questionnaire response',
-                                    'profile': 'tabular-data-resource',
-                                    'schema': {
-                                        'fields': self._set_questionnaire_response_fields(
-                                            heading_type, export_rows_participants[0], answer_list[0], questions
-                                        )
-                                    }
-                                }
-                            ])
+                        field_type = 'fields' if heading_type == 'code' else 'header_questionnaire'
+                        header = self.build_header_questionnaire_per_participant(
+                            export_rows_participants[0], answer_list[0][field_type])
+                        per_participant_rows.insert(0, header)
 
-                # For component_list
-                if 'eeg_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
-                    # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                    if not path.exists(path_per_participant):
-                        error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
-                        if error_msg != '':
-                            return error_msg
+                        # TODO (NES-991): treat error!
+                        # TODO (NES-991): QuestionnaireUtils already in self.questionnaire_utils
+                        error, questions = QuestionnaireUtils.get_questions(
+                            questionnaire_lime_survey, questionnaire_id, language)
+                        schema_fields = self._set_questionnaire_response_fields(
+                            heading_type, export_rows_participants[0], answer_list[0], questions)
 
-                    eeg_data_list = \
-                        self.per_group_data[group_id]['data_per_participant'][participant_code]['eeg_data_list']
-                    for eeg_data in eeg_data_list:
-                        if eeg_data['eeg_file_list']:
-                            directory_step_name = eeg_data['directory_step_name']
-                            path_per_eeg_participant = path.join(path_per_participant, directory_step_name)
-                            if not path.exists(path_per_eeg_participant):
-                                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_a
-                                error_msg, path_per_eeg_participant = create_directory(
-                                    path_per_participant, directory_step_name)
-                                if error_msg != '':
-                                    return error_msg
+                        save_to_csv(
+                            complete_filename, per_participant_rows, filesformat_type, schema_fields=schema_fields)
 
-                            # data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_a
-                            export_eeg_step_directory = path.join(participant_export_directory, directory_step_name)
-
-                            # To create EEGData directory
-                            directory_data_name = eeg_data['eeg_data_directory_name']
-                            path_per_eeg_data = path.join(path_per_eeg_participant, directory_data_name)
-                            if not path.exists(path_per_eeg_data):
-                                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                                # /Step_X_aaa/EEGDATA_#
-                                error_msg, path_per_eeg_data = create_directory(
-                                    path_per_eeg_participant, directory_data_name)
-                                if error_msg != '':
-                                    return error_msg
+                        files_to_zip_list.append([
+                            complete_filename, step_participant_export_directory,
+                            {
+                                'name': slugify(export_filename) + '_per-participant', 'title': export_filename,
+                                'path': path.join(
+                                    step_participant_export_directory, export_filename + '.' + filesformat_type),
+                                'format': filesformat_type, 'mediatype': get_mediatype(filesformat_type),
+                                'description': 'Questionnaire response',
+                                'profile': 'tabular-data-resource',
+                                'schema': {
+                                    'fields': schema_fields
+                                }
+                            }
+                        ])
 
+            # For component_list
+            if 'eeg_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
+                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                if not path.exists(path_per_participant):
+                    error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
+
+                eeg_data_list = \
+                    self.per_group_data[group_id]['data_per_participant'][participant_code]['eeg_data_list']
+                for eeg_data in eeg_data_list:
+                    if eeg_data['eeg_file_list']:
+                        directory_step_name = eeg_data['directory_step_name']
+                        path_per_eeg_participant = path.join(path_per_participant, directory_step_name)
+                        if not path.exists(path_per_eeg_participant):
                             # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_a
-                            # /EEGData_#
-                            export_eeg_data_directory = path.join(export_eeg_step_directory, directory_data_name)
+                            error_msg, path_per_eeg_participant = create_directory(
+                                path_per_participant, directory_step_name)
+                            if error_msg != '':
+                                return error_msg, files_to_zip_list
 
-                            eeg_setting_description = get_eeg_setting_description(eeg_data['setting_id'])
+                        # data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_a
+                        export_eeg_step_directory = path.join(participant_export_directory, directory_step_name)
 
-                            if eeg_setting_description:
-                                filename, extension = EEG_SETTING_FILENAME.split('.')
-                                # Path ex. data/Experiment_data/Group_xxxx/eeg_setting_description.json
-                                complete_setting_filename = path.join(path_per_eeg_data, EEG_SETTING_FILENAME)
-                                self.files_to_zip_list.append([
-                                    complete_setting_filename, export_eeg_data_directory,
-                                    {
-                                        'name': filename, 'title': filename,
-                                        'path': path.join(export_eeg_data_directory, EEG_SETTING_FILENAME),
-                                        # TODO (NES-987): implement get_mediatype(extension) method and apply in the
-                                        #  other places
-                                        'format': extension, 'mediatype': 'application/%s' % extension
-                                    }
-                                ])
+                        # To create EEGData directory
+                        directory_data_name = eeg_data['eeg_data_directory_name']
+                        path_per_eeg_data = path.join(path_per_eeg_participant, directory_data_name)
+                        if not path.exists(path_per_eeg_data):
+                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                            # /Step_X_aaa/EEGDATA_#
+                            error_msg, path_per_eeg_data = create_directory(
+                                path_per_eeg_participant, directory_data_name)
+                            if error_msg != '':
+                                return error_msg, files_to_zip_list
 
-                                with open(complete_setting_filename.encode('utf-8'), 'w', newline='',
-                                          encoding='UTF-8') as outfile:
-                                    json.dump(eeg_setting_description, outfile, indent=4)
+                        # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_a
+                        # /EEGData_#
+                        export_eeg_data_directory = path.join(export_eeg_step_directory, directory_data_name)
 
-                            # If sensor position image exist
-                            sensors_positions_image = eeg_data['sensor_filename']
-                            if sensors_positions_image:
-                                sensor_position_filename = 'sensor_position.png'
-                                complete_sensor_position_filename = path.join(
-                                    path_per_eeg_data, sensor_position_filename)
+                        eeg_setting_description = get_eeg_setting_description(eeg_data['setting_id'])
 
-                                with open(sensors_positions_image, 'rb') as f:
-                                    data = f.read()
-                                with open(complete_sensor_position_filename, 'wb') as f:
-                                    f.write(data)
+                        if eeg_setting_description:
+                            filename, extension = EEG_SETTING_FILENAME.split('.')
+                            # Path ex. data/Experiment_data/Group_xxxx/eeg_setting_description.json
+                            complete_setting_filename = path.join(path_per_eeg_data, EEG_SETTING_FILENAME)
+                            files_to_zip_list.append([
+                                complete_setting_filename, export_eeg_data_directory,
+                                {
+                                    'name': filename, 'title': filename,
+                                    'path': path.join(export_eeg_data_directory, EEG_SETTING_FILENAME),
+                                    # TODO (NES-987): implement get_mediatype(extension) method and apply in the
+                                    #  other places
+                                    'format': extension, 'mediatype': 'application/%s' % extension
+                                }
+                            ])
 
-                                self.files_to_zip_list.append([
-                                    complete_sensor_position_filename, export_eeg_data_directory,
-                                    {
-                                        'name': slugify(sensor_position_filename), 'title': 'sensor_position',
-                                        'path': path.join(export_eeg_data_directory, sensor_position_filename),
-                                        'description': 'Data Collection (format: png)'
-                                    }
-                                ])
+                            with open(complete_setting_filename.encode('utf-8'), 'w', newline='',
+                                      encoding='UTF-8') as outfile:
+                                json.dump(eeg_setting_description, outfile, indent=4)
 
-                            for eeg_file in eeg_data['eeg_file_list']:
-                                path_eeg_data_file = str(eeg_file.file.file)
-                                eeg_data_filename = path.basename(path_eeg_data_file)
-                                complete_eeg_data_filename = path.join(path_per_eeg_data, eeg_data_filename)
-
-                                # For datapackage resources
-                                unique_name = slugify(eeg_data_filename)
-                                file_format_nes_code = eeg_file.eeg_data.file_format.nes_code
-                                datapackage_resource = {
-                                    'name': unique_name, 'title': unique_name,
-                                    'path': path.join(export_eeg_data_directory, eeg_data_filename),
-                                    'description': 'Data Collection (format: %s)' % file_format_nes_code
-                                }
+                        # If sensor position image exist
+                        sensors_positions_image = self.prepared_files.get(('sensors_position', eeg_data['eeg_data_id']))
+                        if sensors_positions_image:
+                            sensor_position_filename = 'sensor_position.png'
+                            complete_sensor_position_filename = path.join(
+                                path_per_eeg_data, sensor_position_filename)
 
-                                with open(path_eeg_data_file, 'rb') as f:
-                                    data = f.read()
-                                with open(complete_eeg_data_filename, 'wb') as f:
-                                    f.write(data)
+                            with open(sensors_positions_image, 'rb') as f:
+                                data = f.read()
+                            with open(complete_sensor_position_filename, 'wb') as f:
+                                f.write(data)
 
-                                self.files_to_zip_list.append([
-                                    complete_eeg_data_filename, export_eeg_data_directory, datapackage_resource
-                                ])
+                            files_to_zip_list.append([
+                                complete_sensor_position_filename, export_eeg_data_directory,
+                                {
+                                    'name': slugify(sensor_position_filename), 'title': 'sensor_position',
+                                    'path': path.join(export_eeg_data_directory, sensor_position_filename),
+                                    'description': 'Data Collection (format: png)'
+                                }
+                            ])
 
-                                # v1.5
-                                # can export to nwb?
-                                if eeg_file.can_export_to_nwb:
-                                    process_requisition = int(random.random() * 10000)
-                                    eeg_file_name = eeg_data_filename.split('.')[0]
-                                    nwb_file_name = eeg_file_name + '.nwb'
-                                    complete_nwb_file_name = path.join(path_per_eeg_data, nwb_file_name)
-                                    req = None
-
-                                    # Was it open properly?
-                                    ok_opening = False
-
-                                    if eeg_file.eeg_reading.file_format:
-                                        if eeg_file.eeg_reading.file_format.nes_code == 'MNE-RawFromEGI':
-                                            ok_opening = True
-
-                                    if ok_opening:
-                                        complete_nwb_file_name = create_nwb_file(
-                                            eeg_file.eeg_data, eeg_file.eeg_reading, process_requisition,
-                                            req, complete_nwb_file_name)
-                                        if complete_nwb_file_name:
-                                            self.files_to_zip_list.append([
-                                                complete_nwb_file_name, export_eeg_data_directory,
-                                                {
-                                                    'name': slugify(nwb_file_name), 'title': eeg_file_name,
-                                                    'path': path.join(export_eeg_data_directory, nwb_file_name),
-                                                    'description': 'Data Collection (format: nwb)'
-                                                }
-                                            ])
-                                        else:
-                                            return error_msg
-
-                if 'emg_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
-                    # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                    if not path.exists(path_per_participant):
-                        error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
-                        if error_msg != '':
-                            return error_msg
+                        for eeg_file in eeg_data['eeg_file_list']:
+                            path_eeg_data_file = str(eeg_file.file.file)
+                            eeg_data_filename = path.basename(path_eeg_data_file)
+                            complete_eeg_data_filename = path.join(path_per_eeg_data, eeg_data_filename)
 
-                    emg_data_list = \
-                        self.per_group_data[group_id]['data_per_participant'][participant_code]['emg_data_list']
-                    for emg_data in emg_data_list:
-                        if emg_data['emg_file_list']:
-                            directory_step_name = emg_data['directory_step_name']
-                            path_per_emg_participant = path.join(path_per_participant, directory_step_name)
-                            if not path.exists(path_per_emg_participant):
-                                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                                # /Step_X_aaa
-                                error_msg, path_per_emg_participant = create_directory(
-                                    path_per_participant, directory_step_name)
-                                if error_msg != '':
-                                    return error_msg
+                            # For datapackage resources
+                            unique_name = slugify(eeg_data_filename)
+                            file_format_nes_code = eeg_file.eeg_data.file_format.nes_code
+                            datapackage_resource = {
+                                'name': unique_name, 'title': unique_name,
+                                'path': path.join(export_eeg_data_directory, eeg_data_filename),
+                                'description': 'Data Collection (format: %s)' % file_format_nes_code
+                            }
 
-                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_aaa
-                            export_emg_step_directory = path.join(participant_export_directory, directory_step_name)
-
-                            # To create EMGData directory
-                            directory_data_name = emg_data['emg_data_directory_name']
-                            path_per_emg_data = path.join(path_per_emg_participant, directory_data_name)
-                            if not path.exists(path_per_emg_data):
-                                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                                # /Step_X_aaa/EMGDATA_#
-                                error_msg, path_per_emg_data = create_directory(
-                                    path_per_emg_participant, directory_data_name)
-                                if error_msg != '':
-                                    return error_msg
+                            with open(path_eeg_data_file, 'rb') as f:
+                                data = f.read()
+                            with open(complete_eeg_data_filename, 'wb') as f:
+                                f.write(data)
 
-                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_aaa
-                            # /EMGData_#
-                            export_emg_data_directory = path.join(export_emg_step_directory, directory_data_name)
+                            files_to_zip_list.append([
+                                complete_eeg_data_filename, export_eeg_data_directory, datapackage_resource
+                            ])
 
-                            url_segment1 = path_per_emg_data.rpartition('export')
-                            url1 = url_segment1[0]
+                            # v1.5
+                            # can export to nwb?
+                            if eeg_file.can_export_to_nwb:
+                                eeg_file_name = eeg_data_filename.split('.')[0]
+                                nwb_file_name = eeg_file_name + '.nwb'
+                                complete_nwb_file_name = path.join(path_per_eeg_data, nwb_file_name)
+
+                                # converted by the file jobs started in include_group_data
+                                if self.prepared_files.get(('nwb', eeg_file.id)):
+                                    shutil.move(self.prepared_files[('nwb', eeg_file.id)], complete_nwb_file_name)
+                                    files_to_zip_list.append([
+                                        complete_nwb_file_name, export_eeg_data_directory,
+                                        {
+                                            'name': slugify(nwb_file_name), 'title': eeg_file_name,
+                                            'path': path.join(export_eeg_data_directory, nwb_file_name),
+                                            'description': 'Data Collection (format: nwb)'
+                                        }
+                                    ])
+                                else:
+                                    return error_msg, files_to_zip_list
 
-                            url_partial = emg_data['emg_file_list'][0].file.name
-                            url_segment2 = url_partial.rpartition('media/')
-                            url2 = url_segment2[2]
+            if 'emg_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
+                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                if not path.exists(path_per_participant):
+                    error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
+
+                emg_data_list = \
+                    self.per_group_data[group_id]['data_per_participant'][participant_code]['emg_data_list']
+                for emg_data in emg_data_list:
+                    if emg_data['emg_file_list']:
+                        directory_step_name = emg_data['directory_step_name']
+                        path_per_emg_participant = path.join(path_per_participant, directory_step_name)
+                        if not path.exists(path_per_emg_participant):
+                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                            # /Step_X_aaa
+                            error_msg, path_per_emg_participant = create_directory(
+                                path_per_participant, directory_step_name)
+                            if error_msg != '':
+                                return error_msg, files_to_zip_list
 
-                            url = url1 + url2
+                        # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_aaa
+                        export_emg_step_directory = path.join(participant_export_directory, directory_step_name)
 
-                            for emg_file in emg_data['emg_file_list']:
-                                path_emg_data_file = emg_file.file.name
-                                emg_data_filename = path.basename(path_emg_data_file)
-                                complete_emg_data_filename = path.join(path_per_emg_data, emg_data_filename)
+                        # To create EMGData directory
+                        directory_data_name = emg_data['emg_data_directory_name']
+                        path_per_emg_data = path.join(path_per_emg_participant, directory_data_name)
+                        if not path.exists(path_per_emg_data):
+                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                            # /Step_X_aaa/EMGDATA_#
+                            error_msg, path_per_emg_data = create_directory(
+                                path_per_emg_participant, directory_data_name)
+                            if error_msg != '':
+                                return error_msg, files_to_zip_list
 
-                                # For datapackage resources
-                                unique_name = slugify(emg_data_filename)
-                                file_format_nes_code = emg_file.emg_data.file_format.nes_code
-                                datapackage_resource = {
-                                    'name': unique_name, 'title': unique_name,
-                                    'path': path.join(export_emg_data_directory, emg_data_filename),
-                                    'description': 'Data Collection (format: %s)' % file_format_nes_code
-                                }
+                        # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_aaa
+                        # /EMGData_#
+                        export_emg_data_directory = path.join(export_emg_step_directory, directory_data_name)
 
-                                with open(url, 'rb') as f:
-                                    data = f.read()
-                                with open(complete_emg_data_filename, 'wb') as f:
-                                    f.write(data)
+                        url_segment1 = path_per_emg_data.rpartition('export')
+                        url1 = url_segment1[0]
 
-                                self.files_to_zip_list.append([
-                                    complete_emg_data_filename, export_emg_data_directory, datapackage_resource
-                                ])
+                        url_partial = emg_data['emg_file_list'][0].file.name
+                        url_segment2 = url_partial.rpartition('media/')
+                        url2 = url_segment2[2]
 
-                            # Create documento json with emg settings
-                            emg_setting_description = get_emg_setting_description(emg_data['setting_id'])
+                        url = url1 + url2
 
-                            if emg_setting_description:
-                                filename, extension = EMG_SETTING_FILENAME.split('.')
-                                # Path ex. data/Experiment_data/Group_xxxx/emg_setting_description.txt 
-                                complete_setting_filename = path.join(path_per_emg_data, EMG_SETTING_FILENAME)
-                                self.files_to_zip_list.append([
-                                    complete_setting_filename, export_emg_data_directory,
-                                    {
-                                        'name': filename, 'title': filename,
-                                        'path': path.join(export_emg_data_directory, EMG_SETTING_FILENAME),
-                                        # TODO (NES-987): implement get_mediatype(extension) method
-                                        'format': extension, 'mediatype': 'application/%s' % extension
-                                    }
-                                ])
+                        for emg_file in emg_data['emg_file_list']:
+                            path_emg_data_file = emg_file.file.name
+                            emg_data_filename = path.basename(path_emg_data_file)
+                            complete_emg_data_filename = path.join(path_per_emg_data, emg_data_filename)
 
-                                with open(complete_setting_filename.encode('utf-8'), 'w', newline='',
-                                          encoding='UTF-8') as outfile:
-                                    json.dump(emg_setting_description, outfile, indent=4)
+                            # For datapackage resources
+                            unique_name = slugify(emg_data_filename)
+                            file_format_nes_code = emg_file.emg_data.file_format.nes_code
+                            datapackage_resource = {
+                                'name': unique_name, 'title': unique_name,
+                                'path': path.join(export_emg_data_directory, emg_data_filename),
+                                'description': 'Data Collection (format: %s)' % file_format_nes_code
+                            }
 
-                if 'tms_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
-                    # path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                    if not path.exists(path_per_participant):
-                        error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
-                        if error_msg != '':
-                            return error_msg
+                            with open(url, 'rb') as f:
+                                data = f.read()
+                            with open(complete_emg_data_filename, 'wb') as f:
+                                f.write(data)
 
-                    tms_data_list = self.per_group_data[group_id]['data_per_participant'][participant_code][
-                        'tms_data_list']
-                    for tms_data in tms_data_list:
-                        tms_data_description = get_tms_data_description(tms_data['tms_data_id'])
-                        if tms_data_description:
-                            directory_step_name = tms_data['directory_step_name']
-                            path_per_tms_participant = path.join(path_per_participant, directory_step_name)
-                            if not path.exists(path_per_tms_participant):
-                                # path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                                # /Step_X_aaa
-                                error_msg, path_per_tms_participant = create_directory(
-                                    path_per_participant, directory_step_name)
-                                if error_msg != '':
-                                    return error_msg
+                            files_to_zip_list.append([
+                                complete_emg_data_filename, export_emg_data_directory, datapackage_resource
+                            ])
 
-                            # path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_aaa
-                            export_tms_step_directory = path.join(participant_export_directory, directory_step_name)
+                        # Create documento json with emg settings
+                        emg_setting_description = get_emg_setting_description(emg_data['setting_id'])
 
-                            filename, extension = TMS_DATA_FILENAME.split('.')
-                            # Path ex. data/Experiment_data/Group_xxxx/tms_data_description.txt
-                            complete_data_filename = path.join(path_per_tms_participant, TMS_DATA_FILENAME)
-                            self.files_to_zip_list.append([
-                                complete_data_filename, export_tms_step_directory,
+                        if emg_setting_description:
+                            filename, extension = EMG_SETTING_FILENAME.split('.')
+                            # Path ex. data/Experiment_data/Group_xxxx/emg_setting_description.txt 
+                            complete_setting_filename = path.join(path_per_emg_data, EMG_SETTING_FILENAME)
+                            files_to_zip_list.append([
+                                complete_setting_filename, export_emg_data_directory,
                                 {
                                     'name': filename, 'title': filename,
-                                    'path': path.join(export_tms_step_directory, TMS_DATA_FILENAME),
+                                    'path': path.join(export_emg_data_directory, EMG_SETTING_FILENAME),
                                     # TODO (NES-987): implement get_mediatype(extension) method
                                     'format': extension, 'mediatype': 'application/%s' % extension
                                 }
                             ])
 
-                            with open(complete_data_filename.encode('utf-8'), 'w', newline='', encoding='UTF-8') as \
-                                    outfile:
-                                json.dump(tms_data_description, outfile, indent=4)
-
-                            # TMS hotspot position image file
-                            tms_data = get_object_or_404(TMSData, pk=tms_data['tms_data_id'])
-
-                            if hasattr(tms_data, 'hotspot'):
-                                hotspot_image = tms_data.hotspot.hot_spot_map.name
-                                if hotspot_image:
-                                    filename, extension = HOTSPOT_MAP.split('.')
-                                    complete_hotspot_filename = path.join(path_per_tms_participant, HOTSPOT_MAP)
-                                    path_hot_spot_image = path.join(
-                                        settings.MEDIA_ROOT,
-                                        hotspot_image)
-                                    with open(path_hot_spot_image, 'rb') as f:
-                                        data = f.read()
-                                    with open(complete_hotspot_filename, 'wb') as f:
-                                        f.write(data)
+                            with open(complete_setting_filename.encode('utf-8'), 'w', newline='',
+                                      encoding='UTF-8') as outfile:
+                                json.dump(emg_setting_description, outfile, indent=4)
 
-                                    self.files_to_zip_list.append([
-                                        complete_hotspot_filename, export_tms_step_directory,
-                                        {
-                                            'name': filename, 'title': filename,
-                                            'path': path.join(export_tms_step_directory, HOTSPOT_MAP),
-                                            # TODO (NES-987): implement get_mediatype(extension) method
-                                            'format': extension, 'mediatype': 'image/%s' % extension
-                                        }
-                                    ])
+            if 'tms_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
+                # path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                if not path.exists(path_per_participant):
+                    error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
+
+                tms_data_list = self.per_group_data[group_id]['data_per_participant'][participant_code][
+                    'tms_data_list']
+                for tms_data in tms_data_list:
+                    tms_data_description = get_tms_data_description(tms_data['tms_data_id'])
+                    if tms_data_description:
+                        directory_step_name = tms_data['directory_step_name']
+                        path_per_tms_participant = path.join(path_per_participant, directory_step_name)
+                        if not path.exists(path_per_tms_participant):
+                            # path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                            # /Step_X_aaa
+                            error_msg, path_per_tms_participant = create_directory(
+                                path_per_participant, directory_step_name)
+                            if error_msg != '':
+                                return error_msg, files_to_zip_list
 
-                if 'digital_game_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
-                    # path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                    if not path.exists(path_per_participant):
-                        error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
-                        if error_msg != '':
-                            return error_msg
+                        # path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/Step_X_aaa
+                        export_tms_step_directory = path.join(participant_export_directory, directory_step_name)
 
-                    goalkeeper_game_directory = self.per_group_data[group_id]['group']['goalkeeper_game_data_directory']
-                    if not path.exists(path_per_participant):
-                        error_msg, path_per_participant = create_directory(goalkeeper_game_directory, '')
-                        if error_msg != '':
-                            return error_msg
+                        filename, extension = TMS_DATA_FILENAME.split('.')
+                        # Path ex. data/Experiment_data/Group_xxxx/tms_data_description.txt
+                        complete_data_filename = path.join(path_per_tms_participant, TMS_DATA_FILENAME)
+                        files_to_zip_list.append([
+                            complete_data_filename, export_tms_step_directory,
+                            {
+                                'name': filename, 'title': filename,
+                                'path': path.join(export_tms_step_directory, TMS_DATA_FILENAME),
+                                # TODO (NES-987): implement get_mediatype(extension) method
+                                'format': extension, 'mediatype': 'application/%s' % extension
+                            }
+                        ])
 
-                    goalkeeper_game_data_list = self.per_group_data[
-                        group_id
-                    ]['data_per_participant'][participant_code]['digital_game_data_list']
-
-                    for goalkeeper_game_data in goalkeeper_game_data_list:
-                        if goalkeeper_game_data['digital_game_file_list']:
-                            directory_step_name = goalkeeper_game_data['directory_step_name']
-                            path_goalkeeper_game_data = path.join(path_per_participant, directory_step_name)
-                            if not path.exists(path_goalkeeper_game_data):
-                                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                                # /Step_X_COMPONENT_TYPE
-                                error_msg, path_goalkeeper_game_data = create_directory(path_per_participant,
-                                                                                        directory_step_name)
-                                if error_msg != '':
-                                    return error_msg
+                        with open(complete_data_filename.encode('utf-8'), 'w', newline='', encoding='UTF-8') as \
+                                outfile:
+                            json.dump(tms_data_description, outfile, indent=4)
+
+                        # TMS hotspot position image file
+                        tms_data = get_object_or_404(TMSData, pk=tms_data['tms_data_id'])
+
+                        if hasattr(tms_data, 'hotspot'):
+                            hotspot_image = tms_data.hotspot.hot_spot_map.name
+                            if hotspot_image:
+                                filename, extension = HOTSPOT_MAP.split('.')
+                                complete_hotspot_filename = path.join(path_per_tms_participant, HOTSPOT_MAP)
+                                path_hot_spot_image = path.join(
+                                    settings.MEDIA_ROOT,
+                                    hotspot_image)
+                                with open(path_hot_spot_image, 'rb') as f:
+                                    data = f.read()
+                                with open(complete_hotspot_filename, 'wb') as f:
+                                    f.write(data)
 
-                                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                                # /Step_X_COMPONENT_TYPE
-                                export_goalkeeper_game_directory = path.join(participant_export_directory,
-                                                                             directory_step_name)
+                                files_to_zip_list.append([
+                                    complete_hotspot_filename, export_tms_step_directory,
+                                    {
+                                        'name': filename, 'title': filename,
+                                        'path': path.join(export_tms_step_directory, HOTSPOT_MAP),
+                                        # TODO (NES-987): implement get_mediatype(extension) method
+                                        'format': extension, 'mediatype': 'image/%s' % extension
+                                    }
+                                ])
 
-                                # To create Game_digital_dataData directory 
-                                directory_data_name = goalkeeper_game_data['digital_game_data_directory']
+            if 'digital_game_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
+                # path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                if not path.exists(path_per_participant):
+                    error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
 
-                                path_per_goalkeeper_game_data = path.join(
-                                    path_goalkeeper_game_data, directory_data_name)
-                                if not path.exists(path_per_goalkeeper_game_data):
-                                    # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123 
-                                    #  /Step_X_aaa/GoalkeeperDATA_
-                                    error_msg, path_per_goalkeeper_game_data = create_directory(
-                                        path_goalkeeper_game_data, directory_data_name)
-                                    if error_msg != '':
-                                        return error_msg
-
-                                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                                # /Step_X_aaa/GoalkeeperDATA_
-                                export_goalkeeper_data_directory = path.join(
-                                    export_goalkeeper_game_directory, directory_data_name)
-
-                                for context_tree_file in goalkeeper_game_data['digital_game_file_list']:
-                                    digital_game_file = context_tree_file['digital_game_file']
-                                    path_context_tree_file = path.join(settings.MEDIA_ROOT, digital_game_file.file.name)
-                                    filename = path.basename(path_context_tree_file)
-                                    unique_name1 = slugify(filename)
-
-                                    # General csv file
-                                    file_name_digital = filename.split('_')[0]
-                                    unique_name2 = slugify(file_name_digital)
-
-                                    # Path ex. data/Experiment_data/Group_XXX/Per_participant
-                                    #  /Participant_123/Step_X_COMPONENT_TYPE/file_name.format_type
-                                    complete_goalkeeper_game_filename = path.join(
-                                        path_per_goalkeeper_game_data, filename)
-
-                                    with open(path_context_tree_file, 'rb') as f:
-                                        data = f.read()
-                                    with open(complete_goalkeeper_game_filename, 'wb') as f:
-                                        f.write(data)
+                goalkeeper_game_directory = self.per_group_data[group_id]['group']['goalkeeper_game_data_directory']
+                if not path.exists(path_per_participant):
+                    error_msg, path_per_participant = create_directory(goalkeeper_game_directory, '')
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
 
-                                    self.files_to_zip_list.append([
-                                        complete_goalkeeper_game_filename, export_goalkeeper_data_directory,
-                                        {
-                                            'name': unique_name1, 'title': unique_name1,
-                                            'path': path.join(export_goalkeeper_data_directory, filename),
-                                            'description': 'Data Collection (format: %s)'
-                                                           % digital_game_file.digital_game_phase_data.file_format.nes_code
-                                        }
-                                    ])
+                goalkeeper_game_data_list = self.per_group_data[
+                    group_id
+                ]['data_per_participant'][participant_code]['digital_game_data_list']
 
-                                    file_extension = 'tsv' if 'tsv' in self.get_input_data(
-                                        'filesformat_type') else 'csv'
-                                    export_filename = file_name_digital + '.' + file_extension
+                for goalkeeper_game_data in goalkeeper_game_data_list:
+                    if goalkeeper_game_data['digital_game_file_list']:
+                        directory_step_name = goalkeeper_game_data['directory_step_name']
+                        path_goalkeeper_game_data = path.join(path_per_participant, directory_step_name)
+                        if not path.exists(path_goalkeeper_game_data):
+                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                            # /Step_X_COMPONENT_TYPE
+                            error_msg, path_goalkeeper_game_data = create_directory(path_per_participant,
+                                                                                    directory_step_name)
+                            if error_msg != '':
+                                return error_msg, files_to_zip_list
 
-                                    complete_digital_filename = path.join(goalkeeper_game_directory, export_filename)
+                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                            # /Step_X_COMPONENT_TYPE
+                            export_goalkeeper_game_directory = path.join(participant_export_directory,
+                                                                         directory_step_name)
+
+                            # To create Game_digital_dataData directory 
+                            directory_data_name = goalkeeper_game_data['digital_game_data_directory']
+
+                            path_per_goalkeeper_game_data = path.join(
+                                path_goalkeeper_game_data, directory_data_name)
+                            if not path.exists(path_per_goalkeeper_game_data):
+                                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123 
+                                #  /Step_X_aaa/GoalkeeperDATA_
+                                error_msg, path_per_goalkeeper_game_data = create_directory(
+                                    path_goalkeeper_game_data, directory_data_name)
+                                if error_msg != '':
+                                    return error_msg, files_to_zip_list
 
-                                    with open(complete_goalkeeper_game_filename, 'r') as infile, \
-                                            open(complete_digital_filename, 'a') as outfile:
-                                        header = next(infile)
+                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                            # /Step_X_aaa/GoalkeeperDATA_
+                            export_goalkeeper_data_directory = path.join(
+                                export_goalkeeper_game_directory, directory_data_name)
+
+                            for context_tree_file in goalkeeper_game_data['digital_game_file_list']:
+                                digital_game_file = context_tree_file['digital_game_file']
+                                path_context_tree_file = path.join(settings.MEDIA_ROOT, digital_game_file.file.name)
+                                filename = path.basename(path_context_tree_file)
+                                unique_name1 = slugify(filename)
+
+                                # General csv file
+                                file_name_digital = filename.split('_')[0]
+                                unique_name2 = slugify(file_name_digital)
+
+                                # Path ex. data/Experiment_data/Group_XXX/Per_participant
+                                #  /Participant_123/Step_X_COMPONENT_TYPE/file_name.format_type
+                                complete_goalkeeper_game_filename = path.join(
+                                    path_per_goalkeeper_game_data, filename)
+
+                                with open(path_context_tree_file, 'rb') as f:
+                                    data = f.read()
+                                with open(complete_goalkeeper_game_filename, 'wb') as f:
+                                    f.write(data)
 
-                                        if not header_saved:
-                                            outfile.write(header)
-                                            header_saved = True
+                                files_to_zip_list.append([
+                                    complete_goalkeeper_game_filename, export_goalkeeper_data_directory,
+                                    {
+                                        'name': unique_name1, 'title': unique_name1,
+                                        'path': path.join(export_goalkeeper_data_directory, filename),
+                                        'description': 'Data Collection (format: %s)'
+                                                       % digital_game_file.digital_game_phase_data.file_format.nes_code
+                                    }
+                                ])
 
-                                        for line in infile:
-                                            outfile.write(line)
+                                file_extension = 'tsv' if 'tsv' in self.get_input_data(
+                                    'filesformat_type') else 'csv'
+                                export_filename = file_name_digital + '.' + file_extension
 
-                    goalkeeper_game_data_export_directory = self.per_group_data[
-                        group_id
-                    ]['group']['goalkeeper_game_data_export_directory']
-                    self.files_to_zip_list.append([
-                        complete_digital_filename, goalkeeper_game_data_export_directory,
-                        {
-                            'name': unique_name2, 'title': unique_name2,
-                            'path': path.join(
-                                goalkeeper_game_data_export_directory, export_filename),
-                            'encoding': 'UTF-8',
-                        }
-                    ])
+                                complete_digital_filename = path.join(goalkeeper_game_directory, export_filename)
 
-                if 'generic_data_collection_data_list' \
-                        in self.per_group_data[group_id]['data_per_participant'][participant_code]:
-                    if not path.exists(path_per_participant):
-                        error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
-                        if error_msg != '':
-                            return error_msg
-                    generic_data_collection_data_list = self.per_group_data[
-                        group_id
-                    ]['data_per_participant'][participant_code]['generic_data_collection_data_list']
-                    for generic_data_collection_data in generic_data_collection_data_list:
-                        directory_step_name = generic_data_collection_data['directory_step_name']
-                        path_generic_data_collection_data = path.join(path_per_participant, directory_step_name)
-                        if not path.exists(path_generic_data_collection_data):
-                            error_msg, path_generic_data_collection_data = create_directory(
-                                path_per_participant, directory_step_name)
-                            if error_msg:
-                                return error_msg
-                        export_generic_data_directory = path.join(participant_export_directory, directory_step_name)
-                        directory_data_name = generic_data_collection_data['generic_data_collection_directory']
-                        path_per_generic_data = path.join(path_generic_data_collection_data, directory_data_name)
-                        if not path.exists(path_per_generic_data):
-                            error_msg, path_per_generic_data = create_directory(
-                                path_generic_data_collection_data, directory_data_name)
-                            if error_msg:
-                                return error_msg
-                        export_generic_data_directory = path.join(export_generic_data_directory, directory_data_name)
-                        for generic_data_file in generic_data_collection_data['generic_data_collection_file_list']:
-                            path_generic_data_collection_file = path.join(
-                                settings.MEDIA_ROOT, generic_data_file.file.name)
-                            filename = path.basename(path_generic_data_collection_file)
-                            complete_generic_data_filename = path.join(path_per_generic_data, filename)
+                                with open(complete_goalkeeper_game_filename, 'r') as infile, \
+                                        open(complete_digital_filename, 'a') as outfile:
+                                    header = next(infile)
 
-                            # For datapackage resources
-                            unique_name = slugify(filename)
-                            file_format_nes_code = generic_data_file.generic_data_collection_data.file_format.nes_code
-                            information_type = generic_data_file.generic_data_collection_data.data_configuration_tree.\
-                                component_configuration.component.genericdatacollection.information_type.name
-                            datapackage_resource = {
-                                'name': unique_name, 'title': unique_name,
-                                'path': path.join(export_generic_data_directory, filename),
-                                'description': 'Data Collection (format: %s), information type: %s'
-                                               % (file_format_nes_code, information_type)
-                            }
+                                    if not header_saved:
+                                        outfile.write(header)
+                                        header_saved = True
 
-                            with open(path_generic_data_collection_file, 'rb') as f:
-                                data = f.read()
-                            with open(complete_generic_data_filename, 'wb') as f:
-                                f.write(data)
-                            self.files_to_zip_list.append([
-                                complete_generic_data_filename, export_generic_data_directory, datapackage_resource
-                            ])
+                                    for line in infile:
+                                        outfile.write(line)
 
-                if 'additional_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
-                    # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                    if not path.exists(path_per_participant):
-                        error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
-                        if error_msg != '':
-                            return error_msg
+                goalkeeper_game_data_export_directory = self.per_group_data[
+                    group_id
+                ]['group']['goalkeeper_game_data_export_directory']
+                files_to_zip_list.append([
+                    complete_digital_filename, goalkeeper_game_data_export_directory,
+                    {
+                        'name': unique_name2, 'title': unique_name2,
+                        'path': path.join(
+                            goalkeeper_game_data_export_directory, export_filename),
+                        'encoding': 'UTF-8',
+                    }
+                ])
 
-                    additional_data_list = self.per_group_data[
-                        group_id
-                    ]['data_per_participant'][participant_code]['additional_data_list']
+            if 'generic_data_collection_data_list' \
+                    in self.per_group_data[group_id]['data_per_participant'][participant_code]:
+                if not path.exists(path_per_participant):
+                    error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
+                generic_data_collection_data_list = self.per_group_data[
+                    group_id
+                ]['data_per_participant'][participant_code]['generic_data_collection_data_list']
+                for generic_data_collection_data in generic_data_collection_data_list:
+                    directory_step_name = generic_data_collection_data['directory_step_name']
+                    path_generic_data_collection_data = path.join(path_per_participant, directory_step_name)
+                    if not path.exists(path_generic_data_collection_data):
+                        error_msg, path_generic_data_collection_data = create_directory(
+                            path_per_participant, directory_step_name)
+                        if error_msg:
+                            return error_msg, files_to_zip_list
+                    export_generic_data_directory = path.join(participant_export_directory, directory_step_name)
+                    directory_data_name = generic_data_collection_data['generic_data_collection_directory']
+                    path_per_generic_data = path.join(path_generic_data_collection_data, directory_data_name)
+                    if not path.exists(path_per_generic_data):
+                        error_msg, path_per_generic_data = create_directory(
+                            path_generic_data_collection_data, directory_data_name)
+                        if error_msg:
+                            return error_msg, files_to_zip_list
+                    export_generic_data_directory = path.join(export_generic_data_directory, directory_data_name)
+                    for generic_data_file in generic_data_collection_data['generic_data_collection_file_list']:
+                        path_generic_data_collection_file = path.join(
+                            settings.MEDIA_ROOT, generic_data_file.file.name)
+                        filename = path.basename(path_generic_data_collection_file)
+                        complete_generic_data_filename = path.join(path_per_generic_data, filename)
+
+                        # For datapackage resources
+                        unique_name = slugify(filename)
+                        file_format_nes_code = generic_data_file.generic_data_collection_data.file_format.nes_code
+                        information_type = generic_data_file.generic_data_collection_data.data_configuration_tree.\
+                            component_configuration.component.genericdatacollection.information_type.name
+                        datapackage_resource = {
+                            'name': unique_name, 'title': unique_name,
+                            'path': path.join(export_generic_data_directory, filename),
+                            'description': 'Data Collection (format: %s), information type: %s'
+                                           % (file_format_nes_code, information_type)
+                        }
 
-                    for additional_data in additional_data_list:
-                        directory_step_name = additional_data['directory_step_name']
-                        path_additional_data = path.join(path_per_participant, directory_step_name)
-                        if not path.exists(path_additional_data):
-                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
-                            # /Step_X_COMPONENT_TYPE
-                            error_msg, path_additional_data = create_directory(
-                                path_per_participant, directory_step_name)
+                        with open(path_generic_data_collection_file, 'rb') as f:
+                            data = f.read()
+                        with open(complete_generic_data_filename, 'wb') as f:
+                            f.write(data)
+                        files_to_zip_list.append([
+                            complete_generic_data_filename, export_generic_data_directory, datapackage_resource
+                        ])
 
-                            if error_msg != '':
-                                return error_msg
+            if 'additional_data_list' in self.per_group_data[group_id]['data_per_participant'][participant_code]:
+                # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                if not path.exists(path_per_participant):
+                    error_msg, path_per_participant = create_directory(participant_data_directory, participant_name)
+                    if error_msg != '':
+                        return error_msg, files_to_zip_list
 
-                        # Path ex. data/Experiment_data/Group_XX/Per_participant/Participant_123/Step_X_COMP._TYPE
-                        export_step_additional_data_directory = path.join(
-                            participant_export_directory, directory_step_name)
+                additional_data_list = self.per_group_data[
+                    group_id
+                ]['data_per_participant'][participant_code]['additional_data_list']
 
-                        # To create AdditionalData directory
-                        directory_data_name = additional_data['additional_data_directory']
-                        path_per_additional_data = path.join(path_additional_data, directory_data_name)
-                        if not path.exists(path_per_additional_data):
-                            error_msg, path_per_additional_data = create_directory(
-                                path_additional_data, directory_data_name)
-                            if error_msg != '':
-                                return error_msg
+                for additional_data in additional_data_list:
+                    directory_step_name = additional_data['directory_step_name']
+                    path_additional_data = path.join(path_per_participant, directory_step_name)
+                    if not path.exists(path_additional_data):
+                        # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123
+                        # /Step_X_COMPONENT_TYPE
+                        error_msg, path_additional_data = create_directory(
+                            path_per_participant, directory_step_name)
+
+                        if error_msg != '':
+                            return error_msg, files_to_zip_list
+
+                    # Path ex. data/Experiment_data/Group_XX/Per_participant/Participant_123/Step_X_COMP._TYPE
+                    export_step_additional_data_directory = path.join(
+                        participant_export_directory, directory_step_name)
+
+                    # To create AdditionalData directory
+                    directory_data_name = additional_data['additional_data_directory']
+                    path_per_additional_data = path.join(path_additional_data, directory_data_name)
+                    if not path.exists(path_per_additional_data):
+                        error_msg, path_per_additional_data = create_directory(
+                            path_additional_data, directory_data_name)
+                        if error_msg != '':
+                            return error_msg, files_to_zip_list
 
-                        export_additional_data_directory = path.join(export_step_additional_data_directory,
-                                                                     directory_data_name)
+                    export_additional_data_directory = path.join(export_step_additional_data_directory,
+                                                                 directory_data_name)
 
-                        for additional_file in additional_data['additional_data_file_list']:
-                            additional_file_object =  additional_file['additional_data_filename']
-                            path_additional_data_file = path.join(settings.MEDIA_ROOT, additional_file_object.file.name)
-                            filename = path.basename(path_additional_data_file)
-                            unique_name = slugify(filename)
-                            file_format_nes_code = additional_file_object.additional_data.file_format.nes_code
+                    for additional_file in additional_data['additional_data_file_list']:
+                        additional_file_object =  additional_file['additional_data_filename']
+                        path_additional_data_file = path.join(settings.MEDIA_ROOT, additional_file_object.file.name)
+                        filename = path.basename(path_additional_data_file)
+                        unique_name = slugify(filename)
+                        file_format_nes_code = additional_file_object.additional_data.file_format.nes_code
 
-                            # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/
-                            # Step_X_COMPONENT_TYPE/file_name.format_type
-                            complete_additional_data_filename = path.join(path_per_additional_data, filename)
-                            with open(path_additional_data_file, 'rb') as f:
-                                data = f.read()
-                            with open(complete_additional_data_filename, 'wb') as f:
-                                f.write(data)
+                        # Path ex. data/Experiment_data/Group_XXX/Per_participant/Participant_123/
+                        # Step_X_COMPONENT_TYPE/file_name.format_type
+                        complete_additional_data_filename = path.join(path_per_additional_data, filename)
+                        with open(path_additional_data_file, 'rb') as f:
+                            data = f.read()
+                        with open(complete_additional_data_filename, 'wb') as f:
+                            f.write(data)
 
-                            self.files_to_zip_list.append([
-                                complete_additional_data_filename, export_additional_data_directory,
-                                {
-                                    'name': unique_name, 'title': unique_name,
-                                    'path': path.join(export_additional_data_directory, filename),
-                                    'description': 'Data Collection (additional file, format: %s)'
-                                                   % file_format_nes_code
-                                }
-                            ])
+                        files_to_zip_list.append([
+                            complete_additional_data_filename, export_additional_data_directory,
+                            {
+                                'name': unique_name, 'title': unique_name,
+                                'path': path.join(export_additional_data_directory, filename),
+                                'description': 'Data Collection (additional file, format: %s)'
+                                               % file_format_nes_code
+                            }
+                        ])
 
-        return error_msg
+        return error_msg, files_to_zip_list
 
     @staticmethod
     def handle_exported_field(field):
@@ -2588,33 +2898,23 @@ class ExportExecution:
 
     @staticmethod
     def calculate_age_by_participant(participants_list):
+        # (a, b, c,) -> patient is subject of a group: a: patient; b, c,
+        #  are subjects of group
+        # (a,) -> patient comes from exporting Per participant
+        first_data_collections = dates_of_first_data_collection(
+            [subject_of_group for participant in participants_list for subject_of_group in participant[1:]])
+        patients = Patient.objects.only('code', 'date_birth').in_bulk(
+            [participant[0] for participant in participants_list])
+
         age_value_dict = {}
         for participant in participants_list:
-            # (a, b, c,) -> patient is subject of a group: a: patient; b, c,
-            #  are subjects of group
-            # (a,) -> patient comes from exporting Per participant
-            length_tupple = len(participant)
-            if length_tupple > 1:
-                # put first data collection 1 day ahead for first iteration
-                first_data_collection = date.today() + timedelta(days=1)
-                for i in range(1, length_tupple):
-                    date_data_collection = \
-                        date_of_first_data_collection(participant[i])
-                    # subject of group has no data collection
-                    if date_data_collection:
-                        first_data_collection = min(
-                            first_data_collection,
-                            date_of_first_data_collection(participant[i])
-                        )
-                # if first_data_collection = date.today() + timedelta(days=1),
-                # there're no data collections for all subjects of groups
-                if first_data_collection > date.today():
-                    first_data_collection = None
-            else:
-                first_data_collection = None
-            subject = get_object_or_404(Patient, pk=participant[0])
-            date_ = \
-                first_data_collection if first_data_collection else date.today()
+            # age at the first data collection of all subjects of groups, or
+            # today if there're no data collections (or they are in the future)
+            date_ = min([date.today()] + [
+                first_data_collections[subject_of_group] for subject_of_group in participant[1:]
+                if subject_of_group in first_data_collections
+            ])
+            subject = patients[participant[0]]
             age_value = format(
                 (date_ - subject.date_birth) / timedelta(days=365.2425),
                 '.4'
@@ -2626,17 +2926,12 @@ class ExportExecution:
 
     @staticmethod
     def add_subject_of_group(participants, group_ids):
-        for group_id in group_ids:
-            group = Group.objects.get(id=group_id)
-            # Patient.objects.filter(subject__subjectofgroup__group=group).values('id')
-            subjects_of_group = group.subjectofgroup_set.all()
-            for sog in subjects_of_group:
-                patient_sog = sog.subject.patient
-                for i in range(len(participants)):
-                    if participants[i][0] == patient_sog.id:
-                        participants[i] = participants[i] + (sog.id,)
-
-        return participants
+        subjects_of_group = {}
+        for patient_id, subject_of_group_id in SubjectOfGroup.objects.filter(
+                group_id__in=group_ids).values_list('subject__patient_id', 'id'):
+            subjects_of_group[patient_id] = subjects_of_group.get(patient_id, ()) + (subject_of_group_id,)
+
+        return [participant + subjects_of_group.get(participant[0], ()) for participant in participants]
 
     def process_participant_data(self, participants_output_fields, participants, language, participants_plugin=False):
         # TODO: fix translation model functionality
@@ -2688,14 +2983,8 @@ class ExportExecution:
         return export_rows_participants
 
     def get_participant_data_per_code(self, subject_code, questionnaire_response_fields):
-        db_data = []
-        for record in self.get_input_data('participants')['data_list']:
-            if record[-1] == subject_code:
-                db_data = record
-
         # append participant data to questionnaire response
-        for field in db_data:
-            questionnaire_response_fields.append(field)
+        questionnaire_response_fields.extend(self.get_participant_rows_per_code().get(subject_code, []))
 
         return questionnaire_response_fields
 
@@ -2719,13 +3008,7 @@ class ExportExecution:
                 if error_msg != '':
                     return error_msg
 
-        if 'tsv' in self.get_input_data('filesformat_type'):
-            # TODO (NES-987): change this like in other places
-            file_extension = 'tsv'
-            separator = '\t'
-        else:
-            file_extension = 'csv'
-            separator = ','
+        file_extension = self.get_tabular_file_extension()
 
         export_filename = '%s.%s' % (self.get_input_data('participants')['output_filename'], file_extension)
 
@@ -2733,6 +3016,7 @@ class ExportExecution:
 
         export_rows_participants = self.get_input_data('participants')['data_list']
         participants_headers, participants_field_types = self._set_participants_fields()
+        participants_schema_fields = self._set_datapackage_table_schema(participants_headers, participants_field_types)
 
         self.files_to_zip_list.append([
             complete_filename, base_directory,
@@ -2740,18 +3024,16 @@ class ExportExecution:
                 # For datapackages.json resources
                 'name': 'participants', 'title': 'Participants',
                 'path': path.join(base_directory, export_filename),
-                'format': file_extension, 'mediatype': 'text/%s' % file_extension, 'encoding': 'UTF-8',
+                'format': file_extension, 'mediatype': get_mediatype(file_extension), 'encoding': 'UTF-8',
                 'profile': 'tabular-data-resource',
                 'schema': {
-                    'fields': self._set_datapackage_table_schema(participants_headers, participants_field_types)
+                    'fields': participants_schema_fields
                 }
             }
         ])
 
-        with open(complete_filename.encode('utf-8'), 'w', newline='', encoding='UTF-8') as csv_file:
-            export_writer = csv.writer(csv_file, quotechar='"', delimiter=separator, quoting=csv.QUOTE_NONNUMERIC)
-            for row in export_rows_participants:
-                export_writer.writerow(row)
+        save_to_csv(
+            complete_filename, export_rows_participants, file_extension, schema_fields=participants_schema_fields)
 
         # Process diagnosis file
         diagnosis_input_data = self.get_input_data('diagnosis')
@@ -2760,30 +3042,27 @@ class ExportExecution:
             export_rows_diagnosis = self.process_diagnosis_data(
                 diagnosis_input_data['output_list'], participants_filtered_list, heading_type)
 
-            # TODO (NES-987): refactor this as in other places
-            file_extension = 'tsv' if 'tsv' in self.get_input_data('filesformat_type') else 'csv'
             export_filename = ('%s.' + file_extension) % self.get_input_data('diagnosis')['output_filename']
             complete_filename = path.join(base_export_directory, export_filename)
 
             diagnosis_field_types = self._set_diagnosis_fields()
+            diagnosis_schema_fields = self._set_datapackage_table_schema(
+                export_rows_diagnosis[0], diagnosis_field_types)
 
             self.files_to_zip_list.append([
                 complete_filename, base_directory,
                 {
                     'name': 'diagnosis', 'title': 'Diagnosis',
                     'path': path.join(base_directory, export_filename),
-                    'format': file_extension, 'mediatype': 'text/%s' % file_extension, 'encoding': 'UTF-8',
+                    'format': file_extension, 'mediatype': get_mediatype(file_extension), 'encoding': 'UTF-8',
                     'profile': 'tabular-data-resource',
                     'schema': {
-                        'fields': self._set_datapackage_table_schema(export_rows_diagnosis[0], diagnosis_field_types)
+                        'fields': diagnosis_schema_fields
                     }
                 }
             ])
 
-            with open(complete_filename.encode('utf-8'), 'w', newline='', encoding='UTF-8') as csv_file:
-                export_writer = writer(csv_file, quotechar='"', delimiter=separator, quoting=csv.QUOTE_NONNUMERIC)
-                for row in export_rows_diagnosis:
-                    export_writer.writerow(row)
+            save_to_csv(complete_filename, export_rows_diagnosis, file_extension, schema_fields=diagnosis_schema_fields)
 
         return error_msg
 
@@ -3043,7 +3322,7 @@ class ExportExecution:
             Experiment._meta.get_field('description').__class__
         ]
 
-        file_extension = 'tsv' if 'tsv' in self.get_input_data('filesformat_type') else 'csv'
+        file_extension = self.get_tabular_file_extension()
         filename_experiment_resume = 'Experiment' + '.' + file_extension
 
         # path ex. data/Experiment_data
@@ -3057,10 +3336,14 @@ class ExportExecution:
         # User/.../qdc/media/.../data/Experiment_data/Experiment.csv
         complete_filename_experiment_resume = path.join(experiment_resume_directory, filename_experiment_resume)
 
+        experiment_schema_fields = self._set_datapackage_table_schema(
+            experiment_summary_header, experiment_summary_field_types)
         experiment_description_fields = []
         experiment_description_fields.insert(0, experiment_summary_header)
         experiment_description_fields.insert(1, experiment_summary)
-        save_to_csv(complete_filename_experiment_resume, experiment_description_fields, filesformat_type)
+        save_to_csv(
+            complete_filename_experiment_resume, experiment_description_fields, filesformat_type,
+            schema_fields=experiment_schema_fields)
 
         self.files_to_zip_list.append([
             complete_filename_experiment_resume, export_experiment_data,
@@ -3068,12 +3351,11 @@ class ExportExecution:
                 # For datapackages.json resources
                 'name': 'Experiment', 'title': 'Experiment',
                 'path': path.join(export_experiment_data, filename_experiment_resume),
-                'format': file_extension, 'mediatype': 'text/%s' % file_extension,
+                'format': file_extension, 'mediatype': get_mediatype(file_extension),
                 'encoding': 'UTF-8',
                 'profile': 'tabular-data-resource',
                 'schema': {
-                    'fields': self._set_datapackage_table_schema(
-                        experiment_summary_header, experiment_summary_field_types)
+                    'fields': experiment_schema_fields
                 }
             }
         ])
@@ -3356,24 +3638,6 @@ class ExportExecution:
             json.dump(datapackage_dict, file)
         self.files_to_zip_list.append([file_path, ''])
 
-    @staticmethod
-    def find_duplicates(fill_list1, fill_list2):
-
-        line1 = fill_list1[1]
-        line2 = fill_list2[1]
-
-        index = 0
-        total = len(line1)
-
-        duplicate_list = []
-
-        while index != total:
-            if line1[index] != line2[index]:
-                duplicate_list.append(index)
-            index += 1
-
-        return duplicate_list
-
     def get_response_type(self):
 
         response_type = self.get_input_data('response_type')
@@ -3389,6 +3653,10 @@ class ExportExecution:
             heading_type = ['code']
         return heading_type
 
+    def get_tabular_file_extension(self):
+        filesformat_type = self.get_input_data('filesformat_type')
+        return filesformat_type if filesformat_type in ['tsv', 'parquet'] else 'csv'
+
     def get_filesformat_type(self):
 
         filesformat_type = self.get_input_data('filesformat_type')
@@ -3413,62 +3681,27 @@ class ExportExecution:
                 # TODO: Put this as the first line of method.
                 if limesurvey_available(questionnaire_lime_survey):
                     data_from_lime_survey = {}
+                    header_filtered = set()
                     for language in language_list:
-                        responses_string1 = questionnaire_lime_survey.get_responses(
-                            questionnaire_id, language, response_type[0])
-                        fill_list1 = QuestionnaireUtils.responses_to_csv(responses_string1)
+                        short_responses = ResponseTable(questionnaire_lime_survey.get_responses(
+                            questionnaire_id, language, response_type[0]))
 
                         # Multiple choice answers need replacement
                         # TODO (NES-991): make a test for getting multiple choice questions
                         error, multiple_choice_questions = QuestionnaireUtils.get_questions(
-                            questionnaire_lime_survey, questionnaire_id,
-                            language, ['M', 'P'])
-                        replace_multiple_choice_question_answers(
-                            fill_list1, multiple_choice_questions)
+                            questionnaire_lime_survey, questionnaire_id, language, MULTIPLE_CHOICE_QUESTION_TYPES)
+                        short_responses.replace_multiple_choice_answers(multiple_choice_questions)
 
                         # Read 'long' information, if necessary
                         if len(response_type) > 1:
-                            responses_string2 = questionnaire_lime_survey.get_responses(
-                                questionnaire_id, language, response_type[1])
-                            fill_list2 = QuestionnaireUtils.responses_to_csv(
-                                responses_string2)
-                            # Multiple choice answers need replacement
-                            # TODO (NES-991): make a test for getting multiple choice questions
-                            error, multiple_choice_questions = QuestionnaireUtils.get_questions(
-                                questionnaire_lime_survey, questionnaire_id, language)
-                            replace_multiple_choice_question_answers(
-                                fill_list2, multiple_choice_questions)
+                            long_responses = ResponseTable(questionnaire_lime_survey.get_responses(
+                                questionnaire_id, language, response_type[1]))
+                            long_responses.replace_multiple_choice_answers(multiple_choice_questions)
                         else:
-                            fill_list2 = fill_list1
-
-                        # Filter fields
-                        subscripts = []
+                            long_responses = short_responses
 
-                        for field in fields:
-                            if field in fill_list1[0]:
-                                subscripts.append(fill_list1[0].index(field))
-
-                        data_from_lime_survey[language] = {}
-
-                        duplicate_indices = self.find_duplicates(fill_list1, fill_list2)
-
-                        line_index = 1
-                        line_total = len(fill_list1) - 1
-                        header_filtered = set()
-                        while line_index < line_total:
-                            data_fields_filtered = []
-                            line1 = fill_list1[line_index]
-                            line2 = fill_list2[line_index]
-
-                            for index in subscripts:
-                                data_fields_filtered.append(line1[index])
-                                if index in duplicate_indices:
-                                    data_fields_filtered.append(line2[index])
-                                    header_filtered.add(fill_list1[0][index])
-
-                            token = line1[fill_list1[0].index('token')]
-                            data_from_lime_survey[language][token] = list(data_fields_filtered)
-                            line_index += 1
+                        data_from_lime_survey[language], header_filtered = short_responses.responses_by_token(
+                            fields, long_responses)
                     self.questionnaire_utils.redefine_header_and_fields_experiment(
                         questionnaire_id, header_filtered, fields, headers)
 
@@ -3482,24 +3715,22 @@ class ExportExecution:
                         ]['questionnaires_per_group'][int(questionnaire_id)]['token_list']
                         for questionnaire_data in questionnaire_list:
                             token_id = questionnaire_data['token_id']
-                            completed = questionnaire_lime_survey.get_participant_properties(
-                                questionnaire_id, token_id, 'completed')
-                            if completed is not None and completed != 'N' and completed != '':
-                                token = questionnaire_lime_survey.get_participant_properties(
-                                    questionnaire_id, token_id, 'token')
-                                header = self.questionnaire_utils.questionnaires_experiment_data[
-                                    questionnaire_id
-                                ]
-
-                                if questionnaire_id not in self.questionnaires_responses:
-                                    self.questionnaires_responses[questionnaire_id] = {}
-                                if token not in self.questionnaires_responses[questionnaire_id]:
-                                    self.questionnaires_responses[questionnaire_id][token_id] = {}
-
-                                for language in data_from_lime_survey:
-                                    fields_filtered_list = [header, data_from_lime_survey[language][token]]
-                                    self.questionnaires_responses[questionnaire_id][token_id][language] = \
-                                        fields_filtered_list
+                            # tokens of token_list are of completed responses (see include_group_data)
+                            token = questionnaire_lime_survey.get_participant_properties(
+                                questionnaire_id, token_id, 'token')
+                            header = self.questionnaire_utils.questionnaires_experiment_data[
+                                questionnaire_id
+                            ]
+
+                            if questionnaire_id not in self.questionnaires_responses:
+                                self.questionnaires_responses[questionnaire_id] = {}
+                            if token not in self.questionnaires_responses[questionnaire_id]:
+                                self.questionnaires_responses[questionnaire_id][token_id] = {}
+
+                            for language in data_from_lime_survey:
+                                fields_filtered_list = [header, data_from_lime_survey[language][token]]
+                                self.questionnaires_responses[questionnaire_id][token_id][language] = \
+                                    fields_filtered_list
 
     def define_experiment_questionnaire(self, questionnaire, questionnaire_lime_survey):
         questionnaire_id = questionnaire['id']
@@ -3529,48 +3760,17 @@ class ExportExecution:
 
         if available:
             # read all data for questionnaire_id from LimeSurvey
-            responses_string1 = questionnaire_lime_survey.get_responses(
-                questionnaire_id, language, response_type[0]
-            )
-            # all the answer from the questionnaire_id in csv format
-            fill_list1 = QuestionnaireUtils.responses_to_csv(responses_string1)
+            short_responses = ResponseTable(
+                questionnaire_lime_survey.get_responses(questionnaire_id, language, response_type[0]))
 
             # read 'long' information, if necessary
             if len(response_type) > 1:
-                responses_string2 = questionnaire_lime_survey.get_responses(questionnaire_id, language,
-                                                                            response_type[1])
-                fill_list2 = QuestionnaireUtils.responses_to_csv(responses_string2)
+                long_responses = ResponseTable(
+                    questionnaire_lime_survey.get_responses(questionnaire_id, language, response_type[1]))
             else:
-                fill_list2 = fill_list1
-
-            # filter fields
-            subscripts = []
-            # identify the index of the fields selected on the fill_list1[0]
-            for field in fields:
-                if field in fill_list1[0]:
-                    subscripts.append(fill_list1[0].index(field))
-
-            data_from_lime_survey = {}
-
-            duplicate_indices = self.find_duplicates(fill_list1, fill_list2)
-
-            line_index = 1
-            line_total = len(fill_list1) - 1
-            header_filtered = set()
-            while line_index < line_total:
-                data_fields_filtered = []
-                line1 = fill_list1[line_index]
-                line2 = fill_list2[line_index]
-
-                for index in subscripts:
-                    data_fields_filtered.append(line1[index])
-                    if index in duplicate_indices:
-                        data_fields_filtered.append(line2[index])
-                        header_filtered.add(fill_list1[0][index])
-
-                token = line1[fill_list1[0].index('token')]
-                data_from_lime_survey[token] = list(data_fields_filtered)
-                line_index += 1
+                long_responses = short_responses
+
+            data_from_lime_survey, header_filtered = short_responses.responses_by_token(fields, long_responses)
             # self.update_questionnaire_experiment_rules(questionnaire_id)
 
             token = questionnaire_lime_survey.get_participant_properties(questionnaire_id, token_id, 'token')
@@ -3651,62 +3851,27 @@ class ExportExecution:
             if result is None:
                 return Questionnaires.ERROR_CODE
 
-            fill_list1 = QuestionnaireUtils.responses_to_csv(result)
+            short_responses = ResponseTable(result)
 
             # Multiple choice answers need replacement
             # TODO (NES-991): make a test for getting multiple choice questions
             error, multiple_choice_questions = QuestionnaireUtils.get_questions(
-                questionnaire_lime_survey, questionnaire_id, language, ['M', 'P'])
+                questionnaire_lime_survey, questionnaire_id, language, MULTIPLE_CHOICE_QUESTION_TYPES)
             if error:
                 return error
-            replace_multiple_choice_question_answers(
-                fill_list1, multiple_choice_questions)
+            short_responses.replace_multiple_choice_answers(multiple_choice_questions)
 
             # Read 'long' information, if necessary
             if len(response_type) > 1:
-                responses_string2 = questionnaire_lime_survey.get_responses(
-                    questionnaire_id, language, response_type[1])
-                fill_list2 = QuestionnaireUtils.responses_to_csv(
-                    responses_string2)
-                # Multiple choice answers need replacement
-                # TODO (NES-991): make a test for getting multiple choice questions
-                error, multiple_choice_questions = QuestionnaireUtils.get_questions(
-                    questionnaire_lime_survey, questionnaire_id, language)
-                replace_multiple_choice_question_answers(
-                    fill_list1, multiple_choice_questions)
+                long_responses = ResponseTable(
+                    questionnaire_lime_survey.get_responses(questionnaire_id, language, response_type[1]))
+                long_responses.replace_multiple_choice_answers(multiple_choice_questions)
             else:
-                fill_list2 = fill_list1
-
-            # filter fields
-            subscripts = []
-
-            for field in fields:
-                if field in fill_list1[0]:
-                    subscripts.append(fill_list1[0].index(field))
+                long_responses = short_responses
 
             # If responses exists
-            if subscripts:
-                data_from_lime_survey = {}
-
-                duplicate_indices = self.find_duplicates(fill_list1, fill_list2)
-
-                line_index = 1
-                line_total = len(fill_list1) - 1
-                header_filtered = set()
-                while line_index < line_total:
-                    data_fields_filtered = []
-                    line1 = fill_list1[line_index]
-                    line2 = fill_list2[line_index]
-
-                    for index in subscripts:
-                        data_fields_filtered.append(line1[index])
-                        if index in duplicate_indices:
-                            data_fields_filtered.append(line2[index])
-                            header_filtered.add(fill_list1[0][index])
-
-                    token = line1[fill_list1[0].index('token')]
-                    data_from_lime_survey[token] = list(data_fields_filtered)
-                    line_index += 1
+            if any(field in short_responses.columns for field in fields):
+                data_from_lime_survey, header_filtered = short_responses.responses_by_token(fields, long_responses)
 
                 self.update_questionnaire_rules(questionnaire_id)
 
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from os import path
+
+from django.conf import settings
+from django.db import models
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def _fingerprint(obj):
+    """JSON representation of the export inputs that json can't serialize"""
+    if isinstance(obj, models.Model):
+        return '%s:%s' % (obj._meta.label, obj.pk)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    return str(obj)
+
+
+def artifact_key(*inputs, relative_to=''):
+    """Content address of the files exported from inputs: equal inputs give
+    the same key, and any change in them gives another one.
+    :param relative_to: directory of the export, removed from the paths in
+    inputs
+    """
+    try:
+        serialized = json.dumps(inputs, sort_keys=True, default=_fingerprint)
+    except TypeError:
+        # dicts with keys of different types can't be sorted
+        serialized = json.dumps(inputs, default=_fingerprint)
+    if relative_to:
+        serialized = serialized.replace(relative_to, '')
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class ArtifactCache:
+    """Bounded on-disk cache of exported files. Each entry holds the files
+    exported for one key, with paths relative to the export directory, and
+    their files_to_zip_list entries. When the cache exceeds max_size the
+    least recently used entries are removed.
+    """
+
+    def __init__(self, directory=None, max_size=None):
+        self.directory = directory or path.join(settings.MEDIA_ROOT, 'export_cache')
+        self.max_size = settings.EXPORT_CACHE_SIZE if max_size is None else max_size
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def entry_directory(self, key):
+        return path.join(self.directory, key[:2], key)
+
+    def has(self, key):
+        return path.isfile(path.join(self.entry_directory(key), MANIFEST_FILENAME))
+
+    def get(self, key, export_directory):
+        """Copy the files of the entry key into export_directory
+        :return: files_to_zip_list of the copied files, or None if the entry
+        doesn't exist
+        """
+        entry_directory = self.entry_directory(key)
+        manifest_filename = path.join(entry_directory, MANIFEST_FILENAME)
+        try:
+            with open(manifest_filename, encoding='UTF-8') as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+        files_to_zip_list = []
+        for relative_filename, *zip_entry in manifest:
+            complete_filename = path.join(export_directory, relative_filename)
+            os.makedirs(path.dirname(complete_filename), exist_ok=True)
+            # copied instead of linked: the export may still write to its files
+            shutil.copyfile(path.join(entry_directory, relative_filename), complete_filename)
+            files_to_zip_list.append([complete_filename] + zip_entry)
+
+        # entries are evicted by last use
+        os.utime(manifest_filename)
+
+        return files_to_zip_list
+
+    def put(self, key, export_directory, files_to_zip_list):
+        """Store the files of files_to_zip_list, all of them inside
+        export_directory, in the entry key
+        """
+        entry_directory = self.entry_directory(key)
+        if path.exists(entry_directory):
+            return
+
+        manifest = []
+        for complete_filename, *zip_entry in files_to_zip_list:
+            relative_filename = path.relpath(complete_filename, export_directory)
+            if relative_filename.startswith(os.pardir) or not path.isfile(complete_filename):
+                return
+            manifest.append([relative_filename] + zip_entry)
+
+        os.makedirs(path.dirname(entry_directory), exist_ok=True)
+        temporary_directory = tempfile.mkdtemp(dir=path.dirname(entry_directory))
+        try:
+            for relative_filename, *zip_entry in manifest:
+                os.makedirs(path.dirname(path.join(temporary_directory, relative_filename)), exist_ok=True)
+                shutil.copyfile(
+                    path.join(export_directory, relative_filename), path.join(temporary_directory, relative_filename))
+            with open(path.join(temporary_directory, MANIFEST_FILENAME), 'w', encoding='UTF-8') as manifest_file:
+                json.dump(manifest, manifest_file)
+            os.rename(temporary_directory, entry_directory)
+        except (OSError, TypeError):
+            # other export stored the same entry meanwhile, the disk is full or
+            # the files_to_zip_list entries are not serializable
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        for prefix in os.listdir(self.directory):
+            for key in os.listdir(path.join(self.directory, prefix)):
+                entry_directory = path.join(self.directory, prefix, key)
+                manifest_filename = path.join(entry_directory, MANIFEST_FILENAME)
+                if not path.isfile(manifest_filename):
+                    # entry being stored
+                    continue
+                size = sum(
+                    path.getsize(path.join(directory, filename))
+                    for directory, _, filenames in os.walk(entry_directory) for filename in filenames
+                )
+                entries.append((path.getmtime(manifest_filename), size, entry_directory))
+                total_size += size
+
+        for last_use, size, entry_directory in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_directory, ignore_errors=True)
+            total_size -= size
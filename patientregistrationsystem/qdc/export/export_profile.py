@@ -0,0 +1,62 @@
+import json
+import time
+from contextlib import contextmanager
+from os import path
+
+from export.models import Export
+from qdc.query_count import count_queries
+from survey.abc_search_engine import limesurvey_calls
+
+
+class ExportProfile:
+    """Wall time, database queries, LimeSurvey calls and bytes written by each
+    stage of an export, stored as JSON in Export.profile at the end of every
+    stage. Stages processed by a pool of processes (see settings.EXPORT_WORKERS)
+    only count the queries and LimeSurvey calls of the process running the
+    export.
+    """
+
+    def __init__(self, export_id):
+        self.export_id = export_id
+        self.stages = []
+        self.counter = {'queries': 0}
+
+    @contextmanager
+    def stage(self, name, export=None):
+        """Profile the code run in the context as the stage name. The bytes
+        written are the size of the files the stage adds to
+        export.files_to_zip_list, unless the context sets
+        stage['bytes_written'] itself.
+        """
+        stage = {'stage': name}
+        files_count = len(export.files_to_zip_list) if export else 0
+        queries = self.counter['queries']
+        calls = limesurvey_calls()
+        start_time = time.perf_counter()
+
+        try:
+            with count_queries(self.counter):
+                yield stage
+        finally:
+            stage['time'] = round(time.perf_counter() - start_time, 3)
+            stage['queries'] = self.counter['queries'] - queries
+            stage['limesurvey_calls'] = limesurvey_calls() - calls
+            if 'bytes_written' not in stage:
+                stage['bytes_written'] = sum(
+                    path.getsize(file[0]) for file in (export.files_to_zip_list[files_count:] if export else [])
+                    if path.isfile(file[0])
+                )
+            self.stages.append(stage)
+            self.save()
+
+    def as_dict(self):
+        return {
+            'stages': self.stages,
+            'total': {
+                key: round(sum(stage[key] for stage in self.stages), 3)
+                for key in ['time', 'queries', 'limesurvey_calls', 'bytes_written']
+            }
+        }
+
+    def save(self):
+        Export.objects.filter(pk=self.export_id).update(profile=json.dumps(self.as_dict()))
@@ -1,6 +1,4 @@
-import mne
 from experiment.models import ComponentConfiguration
-from experiment.views import eeg_data_reading
 
 
 def create_list_of_trees(block_id, component_type, numeration=''):
@@ -43,10 +41,13 @@ def create_list_of_trees(block_id, component_type, numeration=''):
 
 
 def can_export_nwb(eeg_data_list):
+    from experiment.eeg_processing import eeg_channel_count, eeg_data_reading
+
     for eeg_data in eeg_data_list:
         eeg_data.eeg_file_list = []
         for eeg_file in eeg_data.eeg_files.all():
-            eeg_file.eeg_reading = eeg_data_reading(eeg_file, preload=True)
+            # only the header: the recording is read by the NWB conversion
+            eeg_file.eeg_reading = eeg_data_reading(eeg_file, preload=False)
             eeg_file.can_export_to_nwb = False
 
             # v1.5
@@ -55,9 +56,17 @@ def can_export_nwb(eeg_data_list):
                 if eeg_file.eeg_reading.file_format.nes_code == 'MNE-RawFromEGI' \
                         and hasattr(eeg_data.eeg_setting, 'eeg_amplifier_setting') \
                         and eeg_data.eeg_setting.eeg_amplifier_setting.number_of_channels_used \
-                        and eeg_data.eeg_setting.eeg_amplifier_setting.number_of_channels_used == len(
-                            mne.pick_types(eeg_file.eeg_reading.reading.info, eeg=True)):
+                        and eeg_data.eeg_setting.eeg_amplifier_setting.number_of_channels_used == \
+                        eeg_channel_count(eeg_file.eeg_reading.reading):
                     eeg_file.can_export_to_nwb = True
             eeg_data.eeg_file_list.append(eeg_file)
 
     return eeg_data_list
+
+
+def nwb_conversion_memory(eeg_reading):
+    """Bytes held by the conversion of eeg_reading to NWB: the recording read
+    and its copy in the NWB file data, both of floats
+    """
+    raw = eeg_reading.reading
+    return 2 * raw.info['nchan'] * raw.n_times * 8
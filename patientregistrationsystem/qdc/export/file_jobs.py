@@ -0,0 +1,119 @@
+import logging
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from queue import Empty, Queue
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def _run_job(key, function, args):
+    try:
+        return function(*args)
+    except Exception:
+        logger.exception('Preparing %s for the export', key)
+        return None
+
+
+class FileJobPool:
+    """Pool of processes preparing files of the data collections (NWB files,
+    images of the sensors positions) while the export goes on. Each job is
+    submitted with the memory it needs, and jobs are only started while the
+    memory of the jobs running stays within memory_budget; a job bigger than
+    the budget runs alone. With one worker the jobs run when submitted.
+
+    A job whose worker exits without reporting (killed by the system when
+    out of memory, for instance) breaks the pool: the jobs running in it are
+    recorded in errors, and the jobs not started yet run in a new pool.
+    """
+
+    def __init__(self, workers=None, memory_budget=None):
+        self.workers = settings.EXPORT_FILE_WORKERS if workers is None else workers
+        self.memory_budget = settings.EXPORT_FILE_MEMORY_BUDGET if memory_budget is None else memory_budget
+        self.pool = None
+        self.pending = deque()
+        self.running = {}
+        self.memory_in_use = 0
+        self.finished = Queue()
+        self.results = {}
+        self.errors = {}
+
+    def submit(self, key, memory, function, *args):
+        """Run function(*args) in the pool. Its result, or None if it raises an
+        exception or its worker exits, is returned by collect under key
+        """
+        if key in self.results or key in self.running or any(job[0] == key for job in self.pending):
+            return
+
+        if self.workers <= 1:
+            self.results[key] = _run_job(key, function, args)
+            return
+
+        self.pending.append((key, memory, function, args))
+        self._update()
+
+    def collect(self):
+        """Wait for the jobs submitted
+        :return: dict with the result of each job by its key
+        """
+        while self.pending or self.running:
+            self._finish(*self.finished.get())
+            self._update()
+
+        self._shutdown()
+
+        return self.results
+
+    def _start_pool(self):
+        # Workers are forked now, so they open their own database
+        # connections instead of sharing the connection of this process
+        connections.close_all()
+        self.pool = ProcessPoolExecutor(self.workers)
+        weakref.finalize(self, self.pool.shutdown, False)
+
+    def _shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _update(self):
+        while True:
+            try:
+                self._finish(*self.finished.get_nowait())
+            except Empty:
+                break
+
+        while self.pending and (not self.running or self.memory_in_use + self.pending[0][1] <= self.memory_budget):
+            if self.pool is None:
+                self._start_pool()
+            key, memory, function, args = self.pending.popleft()
+            self.running[key] = (memory, self.pool)
+            self.memory_in_use += memory
+            try:
+                future = self.pool.submit(_run_job, key, function, args)
+            except BrokenProcessPool as error:
+                # the pool broke since the last job finished
+                self._finish(key, None, error)
+                continue
+            future.add_done_callback(lambda future, key=key: self._put_finished(key, future))
+
+    def _put_finished(self, key, future):
+        # Called from the management thread of the pool
+        error = future.exception()
+        self.finished.put((key, None if error else future.result(), error))
+
+    def _finish(self, key, result, error=None):
+        memory, pool = self.running.pop(key)
+        self.memory_in_use -= memory
+        self.results[key] = result
+        if error is not None:
+            logger.error('Preparing %s for the export: %r', key, error)
+            self.errors[key] = error
+            if isinstance(error, BrokenProcessPool) and pool is self.pool:
+                # the jobs not started yet run in a new pool
+                self.pool.shutdown(wait=False)
+                self.pool = None
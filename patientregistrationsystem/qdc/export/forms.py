@@ -1,4 +1,6 @@
 # coding=utf-8
+from importlib.util import find_spec
+
 from django.forms import ModelForm, Form, TextInput, CharField, BooleanField, MultipleChoiceField, \
     CheckboxSelectMultiple, ChoiceField, SelectMultiple, IntegerField, NumberInput, RadioSelect
 
@@ -22,6 +24,10 @@ FORMATS_CHOICES = (
     ('tsv', _("Tab separated values")),
 )
 
+# Parquet export needs the optional pyarrow package
+if find_spec('pyarrow'):
+    FORMATS_CHOICES += (('parquet', _("Parquet (typed columns, compressed)")),)
+
 
 class ExportForm(Form):
     title = CharField(
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-19 18:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='export',
+            name='profile',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -15,7 +15,19 @@ class Export(models.Model):
     date = models.DateTimeField(null=False, auto_now_add=True)
     input_file = models.FileField(upload_to=get_export_dir, null=False, max_length=1000)
     output_export = models.FileField(upload_to=get_export_dir, null=False, max_length=1000)
+    # JSON with the time, queries, LimeSurvey calls and bytes written by each
+    # stage of the export (see export.export_profile)
+    profile = models.TextField(null=True, blank=True)
 
     def delete(self, *args, **kwargs):
         self.content.delete()
         super(Export, self).delete(*args, **kwargs)
+
+
+class ParticipantSelection(models.Model):
+    """Participants selected to be exported, referenced by id from the session
+    of the user
+    """
+    user = models.ForeignKey(User, null=False)
+    date = models.DateTimeField(null=False, auto_now_add=True)
+    patients = models.ManyToManyField('patient.Patient')
@@ -0,0 +1,82 @@
+from csv import reader
+from io import StringIO
+
+MULTIPLE_CHOICE_QUESTION_TYPES = ['M', 'P']
+
+
+class ResponseTable:
+    """Questionnaire responses exported by LimeSurvey, parsed once into a
+    numpy object array with one column per response field. Columns are
+    selected by field name, and the rows are only built when the selected
+    columns are read (see responses_by_token).
+    """
+
+    def __init__(self, responses_string):
+        # numpy is imported by the tables, not by the modules importing this one
+        import numpy as np
+
+        rows = list(reader(StringIO(responses_string or ''), delimiter=','))
+        # LimeSurvey exports end with an empty line
+        while rows and not rows[-1]:
+            rows.pop()
+
+        self.header = rows[0] if rows else []
+        # the first column of a field is the one used when it is repeated
+        self.columns = {field: index for index, field in reversed(list(enumerate(self.header)))}
+        self.values = np.empty((max(len(rows) - 1, 0), len(self.header)), dtype=object)
+        if len(rows) > 1:
+            self.values[:] = rows[1:]
+
+    def __len__(self):
+        return len(self.values)
+
+    def column(self, field):
+        return self.values[:, self.columns[field]]
+
+    def replace_multiple_choice_answers(self, multiple_choice_questions):
+        """Fills the options of multiple choice (or multiple choice with
+        comments) questions not selected by participants with 'N' (the
+        options selected have 'Y' - or 'S' in Portuguese - filled).
+        :param multiple_choice_questions: list of questions, as returned by
+        QuestionnaireUtils.get_questions, of the multiple choice types
+        """
+        titles = {question['title'] for question in multiple_choice_questions}
+        columns = [index for index, field in enumerate(self.header) if field.partition('[')[0] in titles]
+        if not columns or not len(self):
+            return
+
+        answers = self.values[:, columns]
+        answers[answers == ''] = 'N'
+        self.values[:, columns] = answers
+
+    def responses_by_token(self, fields, long_responses=None):
+        """Select the responses of fields for each token. When long_responses
+        differ from these responses for a field, the long response is
+        selected right after the short one.
+        :param fields: list of fields to select, fields not in the table are
+        ignored
+        :param long_responses: ResponseTable with the 'long' responses of the
+        same participants, in the same order
+        :return: tuple (dict mapping tokens to lists of responses, set of
+        fields with both short and long responses)
+        """
+        import numpy as np
+
+        subscripts = [self.columns[field] for field in fields if field in self.columns]
+        long_subscripts = set()
+        if long_responses is not None and long_responses is not self and len(self):
+            long_subscripts = set(np.flatnonzero(self.values[0] != long_responses.values[0]).tolist())
+
+        selected = []
+        for index in subscripts:
+            selected.append(self.values[:, index])
+            if index in long_subscripts:
+                selected.append(long_responses.values[:, index])
+
+        tokens = self.column('token').tolist() if len(self) else []
+        if selected:
+            rows = np.column_stack(selected).tolist()
+        else:
+            rows = [[] for _ in tokens]
+
+        return dict(zip(tokens, rows)), {self.header[index] for index in subscripts if index in long_subscripts}
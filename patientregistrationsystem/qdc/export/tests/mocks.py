@@ -8,13 +8,9 @@ LIMESURVEY_SURVEY_ID_2 = 505050
 
 def set_mocks1(mockServer):
     mockServer.return_value.get_survey_properties.return_value = {'additional_languages': '', 'language': 'en'}
-    mockServer.return_value.get_participant_properties.side_effect = 4 * [
-        {'completed': '2019-06-26'},
-    ] + [
+    mockServer.return_value.get_participant_properties.side_effect = [
         {'token': 'JLsKj3ZDO3Iof91'},
-        {'completed': '2019-06-26'},
         {'token': 'VLqIkSdSRzCanyW'},
-        {'completed': '2019-06-26'},
         {'token': 'IhbAZg38yDSt8jZ'}
     ]
     mockServer.return_value.export_responses.return_value = \
@@ -248,11 +244,8 @@ def set_mocks1(mockServer):
 
 def set_mocks2(mockServer):
     mockServer.return_value.get_survey_properties.return_value = {'additional_languages': '', 'language': 'en'}
-    mockServer.return_value.get_participant_properties.side_effect = 3 * [
-        {'completed': '2019-06-24'}
-    ] + [
+    mockServer.return_value.get_participant_properties.side_effect = [
         {'token': 'vnCfOsrabtuTfYs'},
-        {'completed': '2019-06-24'},
         {'token': 'G0lmOoIe6IElYKF'}
     ]
     mockServer.return_value.export_responses.return_value = \
@@ -471,11 +464,8 @@ def set_mocks2(mockServer):
 
 def set_mocks3(mockServer):
     mockServer.return_value.get_survey_properties.return_value = {'additional_languages': '', 'language': 'en'}
-    mockServer.return_value.get_participant_properties.side_effect = 3 * [
-        {'completed': '2019-06-26'}
-    ] + [
+    mockServer.return_value.get_participant_properties.side_effect = [
         {'token': 'pO9iPqlkQzD4zwG'},
-        {'completed': '2019-06-26'},
         {'token': 'g7GaPTLHc2rB6TV'}
     ]
     mockServer.return_value.export_responses.return_value = \
@@ -616,8 +606,6 @@ def set_mocks3(mockServer):
 def set_mocks4(mockServer):
     mockServer.return_value.get_survey_properties.return_value = {'additional_languages': '', 'language': 'en'}
     mockServer.return_value.get_participant_properties.side_effect = [
-        {'completed': '2019-06-26'},
-        {'completed': '2019-06-26'},
         {'token': 'obyBy4HizUhe3j0'}
 
     ]
@@ -798,8 +786,6 @@ def set_mocks4(mockServer):
 def update_mocks4_full_and_abbreviated(mock_server):
     mock_server.return_value.get_participant_properties.side_effect = [
         {'token': 'obyBy4HizUhe3j0'},
-        {'completed': '2019-06-26'},
-        {'completed': '2019-06-26'},
         {'token': 'obyBy4HizUhe3j0'}
     ]
     mock_server.return_value.list_questions.side_effect = [
@@ -1102,8 +1088,6 @@ def set_mocks5(mockServer):
 def set_mocks6(mock_server):
     mock_server.return_value.get_survey_properties.return_value = {'language': 'en', 'additional_languages': ''}
     mock_server.return_value.get_participant_properties.side_effect = [
-        {'completed': '2019-08-02 15:48'},
-        {'completed': '2019-08-02 15:48'},
         {'token': 'q3qEpwISYsxsOHf'}
     ]
     mock_server.return_value.export_responses.return_value = \
@@ -1250,8 +1234,6 @@ def update_mocks6_full(mock_server):
     """
     mock_server.return_value.get_participant_properties.side_effect = [
         {'token': 'q3qEpwISYsxsOHf'},
-        {'completed': '2019-08-02 15:48'},
-        {'completed': '2019-08-02 15:48'},
         {'token': 'q3qEpwISYsxsOHf'},
     ]
     mock_server.return_value.export_responses_by_token.return_value = \
@@ -1266,8 +1248,6 @@ def update_mocks6_abbreviated(mock_server):
     """
     mock_server.return_value.get_participant_properties.side_effect = [
         {'token': 'q3qEpwISYsxsOHf'},
-        {'completed': '2019-08-02 15:48'},
-        {'completed': '2019-08-02 15:48'},
         {'token': 'q3qEpwISYsxsOHf'},
     ]
     mock_server.return_value.export_responses_by_token.side_effect = [
@@ -1285,8 +1265,6 @@ def set_mocks7(mock_server):
     # TODO (NES-991): put docstrings here and in other functions
     mock_server.return_value.get_survey_properties.return_value = {'language': 'en', 'additional_languages': ''}
     mock_server.return_value.get_participant_properties.side_effect = [
-        {'completed': '2019-08-05 17:33'},
-        {'completed': '2019-08-05 17:33'},
         {'token': 'MHwQ04bv2DQYisN'}
     ]
     mock_server.return_value.export_responses.side_effect = [
@@ -2742,8 +2720,6 @@ def set_mocks7(mock_server):
 def update_mocks7_full(mock_server):
     mock_server.return_value.get_participant_properties.side_effect = [
         {'token': 'MHwQ04bv2DQYisN'},
-        {'completed': '2019-08-05 17:33'},
-        {'completed': '2019-08-05 17:33'},
         {'token': 'MHwQ04bv2DQYisN'}
     ]
     mock_server.return_value.export_responses_by_token.side_effect = [
@@ -2801,8 +2777,6 @@ def update_mocks7_full(mock_server):
 def update_mocks7_abbreviated(mock_server):
     mock_server.return_value.get_participant_properties.side_effect = [
         {'token': 'MHwQ04bv2DQYisN'},
-        {'completed': '2019-08-05 17:33'},
-        {'completed': '2019-08-05 17:33'},
         {'token': 'MHwQ04bv2DQYisN'}
     ]
     mock_server.return_value.export_responses_by_token.side_effect = [
@@ -0,0 +1,290 @@
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from experiment.models import Component
+from experiment.tests.tests_helper import ObjectsFactory
+from export.export import ExportExecution, save_to_csv, get_data_files_fingerprint
+from export.export_cache import ArtifactCache
+from export.file_jobs import FileJobPool
+from export.tests.test_file_jobs import exit_worker
+from export.tests.tests_helper import ExportTestCase
+from patient.models import Patient
+from patient.tests.tests_orig import UtilTests
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def process_group_per_experiment(export, group_id, heading_type, per_experiment_plugin, questionnaire_lime_survey):
+    """Replaces ExportExecution.process_group_per_experiment: each group creates one file, whose directory
+    is the id of the process that exported the group
+    """
+    error_msg = export.per_group_data[group_id].get('error', '')
+    return error_msg, [['Group_%d.csv' % group_id, str(os.getpid()), {'name': 'group_%d' % group_id}]]
+
+
+@patch('survey.abc_search_engine.Server')
+@patch.object(ExportExecution, 'process_group_per_experiment', process_group_per_experiment)
+class ProcessPerParticipantPerExperimentTest(SimpleTestCase):
+
+    def setUp(self):
+        self.export = ExportExecution(1, 1)
+        self.export.per_group_data = {3: {}, 1: {}, 2: {}}
+
+    def get_exported_files(self):
+        return [file[0] for file in self.export.files_to_zip_list]
+
+    def get_exporting_processes(self):
+        return {file[1] for file in self.export.files_to_zip_list}
+
+    @override_settings(EXPORT_WORKERS=1)
+    def test_groups_are_exported_in_the_same_process(self, mockServer):
+        error_msg = self.export.process_per_participant_per_experiment('code')
+
+        self.assertEqual(error_msg, '')
+        self.assertEqual(self.get_exported_files(), ['Group_3.csv', 'Group_1.csv', 'Group_2.csv'])
+        self.assertEqual(self.get_exporting_processes(), {str(os.getpid())})
+
+    @override_settings(EXPORT_WORKERS=2)
+    def test_groups_exported_in_pool_are_merged_in_groups_order(self, mockServer):
+        error_msg = self.export.process_per_participant_per_experiment('code')
+
+        self.assertEqual(error_msg, '')
+        self.assertEqual(self.get_exported_files(), ['Group_3.csv', 'Group_1.csv', 'Group_2.csv'])
+        self.assertNotIn(str(os.getpid()), self.get_exporting_processes())
+
+    @override_settings(EXPORT_WORKERS=2)
+    @patch('export.export.multiprocessing.get_context', side_effect=ValueError)
+    def test_groups_are_exported_in_the_same_process_where_processes_can_not_be_forked(
+            self, mock_get_context, mockServer):
+        error_msg = self.export.process_per_participant_per_experiment('code')
+
+        self.assertEqual(error_msg, '')
+        self.assertEqual(self.get_exported_files(), ['Group_3.csv', 'Group_1.csv', 'Group_2.csv'])
+        self.assertEqual(self.get_exporting_processes(), {str(os.getpid())})
+
+    @override_settings(EXPORT_WORKERS=1)
+    def test_file_job_whose_worker_exits_gives_export_error(self, mockServer):
+        self.export.file_jobs = FileJobPool(workers=2, memory_budget=100)
+        self.export.file_jobs.submit(('nwb', 1), 10, exit_worker)
+
+        error_msg = self.export.process_per_participant_per_experiment('code')
+
+        self.assertNotEqual(error_msg, '')
+        self.assertEqual(self.get_exported_files(), [])
+
+    @override_settings(EXPORT_WORKERS=2)
+    def test_error_in_group_exported_in_pool_stops_merging(self, mockServer):
+        self.export.per_group_data[1]['error'] = 'Error creating directory'
+
+        error_msg = self.export.process_per_participant_per_experiment('code')
+
+        self.assertEqual(error_msg, 'Error creating directory')
+        self.assertEqual(self.get_exported_files(), ['Group_3.csv', 'Group_1.csv'])
+
+
+@override_settings(EXPORT_CACHE_SIZE=1000)
+@patch.object(ExportExecution, 'get_group_artifact_key', lambda export, group_id, *args: 'key_%d' % group_id)
+@patch.object(ArtifactCache, 'has', lambda artifact_cache, key: key == 'key_1')
+class SubmitGroupFileJobsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.export = ExportExecution(1, 1)
+        self.export.per_group_data = {1: {}, 2: {}}
+        self.export.group_file_jobs = {1: [(('nwb', 1), 10, pow, (2, 3))], 2: [(('nwb', 2), 10, pow, (3, 2))]}
+        self.export.file_jobs = FileJobPool(workers=1)
+
+    def test_files_of_cached_groups_are_not_prepared(self):
+        self.export.submit_group_file_jobs('code')
+
+        self.assertEqual(self.export.file_jobs.collect(), {('nwb', 2): 9})
+        self.assertEqual(self.export.group_artifact_keys, {1: 'key_1', 2: 'key_2'})
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DataFilesFingerprintTest(ExportTestCase):
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_fingerprint_changes_when_data_collection_file_is_replaced(self):
+        eeg_setting = ObjectsFactory.create_eeg_setting(self.experiment)
+        eeg_step = ObjectsFactory.create_component(self.experiment, Component.EEG, kwargs={'eeg_set': eeg_setting})
+        dct = ObjectsFactory.create_data_configuration_tree(
+            ObjectsFactory.create_component_configuration(self.root_component, eeg_step))
+        eeg_file = ObjectsFactory.create_eeg_file(
+            ObjectsFactory.create_eeg_data(dct, self.subject_of_group, eeg_setting))
+        fingerprint = get_data_files_fingerprint(self.group.id)
+
+        eeg_file.file.delete(save=False)
+        eeg_file.file.save('file.bin', ContentFile(b'other content'))
+
+        self.assertEqual(len(fingerprint), 1)
+        self.assertNotEqual(get_data_files_fingerprint(self.group.id), fingerprint)
+
+
+class ParticipantAgeTest(ExportTestCase):
+
+    def setUp(self):
+        super(ParticipantAgeTest, self).setUp()
+
+        component = ObjectsFactory.create_component(
+            self.experiment, Component.GENERIC_DATA_COLLECTION,
+            kwargs={'it': ObjectsFactory.create_information_type()})
+        component_configuration = ObjectsFactory.create_component_configuration(self.root_component, component)
+        self.dct = ObjectsFactory.create_data_configuration_tree(component_configuration)
+
+        self.patient.date_birth = date(2000, 1, 1)
+        self.patient.save()
+
+    def add_data_collection(self, subject_of_group, date_):
+        data_collection = ObjectsFactory.create_generic_data_collection_data(self.dct, subject_of_group)
+        data_collection.date = date_
+        data_collection.save()
+
+    def add_participant(self, group):
+        patient = UtilTests().create_patient(changed_by=self.user)
+        return ObjectsFactory.create_subject_of_group(group, ObjectsFactory.create_subject(patient))
+
+    def calculate_age(self, group_ids):
+        participants = ExportExecution.add_subject_of_group(
+            list(Patient.objects.filter(subject__subjectofgroup__group=self.group).values_list('id')), group_ids)
+        return ExportExecution.calculate_age_by_participant(participants)
+
+    def test_add_subject_of_group(self):
+        other_group = ObjectsFactory.create_group(self.experiment)
+        other_subject_of_group = ObjectsFactory.create_subject_of_group(other_group, self.subject)
+
+        participants = ExportExecution.add_subject_of_group(
+            [(self.patient.id,)], [str(self.group.id), str(other_group.id)])
+
+        self.assertEqual(len(participants), 1)
+        self.assertEqual(
+            sorted(participants[0][1:]), sorted([self.subject_of_group.id, other_subject_of_group.id]))
+        self.assertEqual(participants[0][0], self.patient.id)
+
+    def test_age_is_calculated_at_first_data_collection_of_all_groups(self):
+        other_group = ObjectsFactory.create_group(self.experiment)
+        self.add_data_collection(self.subject_of_group, date(2010, 1, 1))
+        self.add_data_collection(
+            ObjectsFactory.create_subject_of_group(other_group, self.subject), date(2005, 1, 1))
+
+        age_value_dict = self.calculate_age([str(self.group.id), str(other_group.id)])
+
+        self.assertEqual(
+            age_value_dict[self.patient.code],
+            format((date(2005, 1, 1) - date(2000, 1, 1)) / timedelta(days=365.2425), '.4'))
+
+    def test_age_is_calculated_today_without_data_collection(self):
+        age_value_dict = self.calculate_age([str(self.group.id)])
+
+        self.assertEqual(
+            age_value_dict[self.patient.code],
+            format((date.today() - date(2000, 1, 1)) / timedelta(days=365.2425), '.4'))
+
+    def test_number_of_queries_does_not_depend_on_number_of_participants(self):
+        self.add_data_collection(self.subject_of_group, date(2010, 1, 1))
+        with CaptureQueriesContext(connection) as one_participant_context:
+            self.calculate_age([str(self.group.id)])
+
+        for i in range(3):
+            self.add_data_collection(self.add_participant(self.group), date(2010, 1, i + 1))
+        with CaptureQueriesContext(connection) as many_participants_context:
+            age_value_dict = self.calculate_age([str(self.group.id)])
+
+        self.assertEqual(len(age_value_dict), 4)
+        self.assertEqual(len(many_participants_context), len(one_participant_context))
+
+
+class ParticipantRowsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.export = ExportExecution(1, 1)
+        self.export.input_data = {
+            'participants': {
+                'data_list': [
+                    ['participant_code', 'age', 'gender'],
+                    ['P1', '30.1', 'female'],
+                    ['P2', '40.2', 'male'],
+                ]
+            }
+        }
+
+    def test_get_participant_row_data_returns_header_and_participant_row(self):
+        self.assertEqual(
+            self.export.get_participant_row_data('P2'), [['participant_code', 'age', 'gender'], ['P2', '40.2', 'male']])
+
+    def test_get_participant_row_data_of_unknown_participant_is_empty(self):
+        self.assertEqual(self.export.get_participant_row_data('P3'), [])
+
+    def test_get_participant_row_data_does_not_match_other_columns(self):
+        self.assertEqual(self.export.get_participant_row_data('male'), [])
+
+    def test_get_participant_data_per_code_appends_participant_row_to_response(self):
+        self.assertEqual(
+            self.export.get_participant_data_per_code('P1', ['response']), ['response', 'P1', '30.1', 'female'])
+
+
+@skipIf(pyarrow is None, 'pyarrow is not installed')
+class SaveToParquetTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'participants.parquet')
+        self.schema_fields = [
+            {'name': 'participant_code', 'title': 'participant_code', 'type': 'string', 'format': 'default'},
+            {'name': 'age', 'title': 'age', 'type': 'number', 'format': 'default'},
+            {'name': 'date_birth', 'title': 'date_birth', 'type': 'date', 'format': 'default'},
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_columns_are_typed_by_datapackage_schema(self):
+        rows = [['participant_code', 'age', 'date_birth'], ['P1', '30.5', date(1990, 1, 2)], ['P2', '', '1980-03-04']]
+
+        save_to_csv(self.filename, rows, 'parquet', schema_fields=self.schema_fields)
+
+        table = pyarrow.parquet.read_table(self.filename)
+        self.assertEqual(table.schema.field('age').type, pyarrow.float64())
+        self.assertEqual(table.schema.field('date_birth').type, pyarrow.date32())
+        self.assertEqual(table.column('age').to_pylist(), [30.5, None])
+        self.assertEqual(table.column('date_birth').to_pylist(), [date(1990, 1, 2), date(1980, 3, 4)])
+
+    def test_column_with_invalid_values_is_saved_as_strings(self):
+        rows = [['participant_code', 'age'], ['P1', 'thirty']]
+
+        save_to_csv(self.filename, rows, 'parquet', schema_fields=self.schema_fields)
+
+        table = pyarrow.parquet.read_table(self.filename)
+        self.assertEqual(table.column('age').to_pylist(), ['thirty'])
+
+    def test_column_with_invalid_value_after_valid_ones_is_saved_as_strings(self):
+        rows = [['participant_code', 'age']] + [['P%d' % i, str(i)] for i in range(100)] + [['P100', 'thirty']]
+
+        save_to_csv(self.filename, rows, 'parquet', schema_fields=self.schema_fields)
+
+        table = pyarrow.parquet.read_table(self.filename)
+        self.assertEqual(table.column('age').to_pylist()[-2:], ['99', 'thirty'])
+
+    def test_rows_can_not_be_appended(self):
+        save_to_csv(self.filename, [['participant_code', 'age'], ['P1', '30.5']], 'parquet',
+                    schema_fields=self.schema_fields)
+
+        with self.assertRaises(ValueError):
+            save_to_csv(self.filename, [['P2', '40']], 'parquet', mode='a')
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import time
+from os import path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from export.export import ExportExecution
+from export.export_cache import ArtifactCache, artifact_key
+
+
+class ArtifactKeyTest(SimpleTestCase):
+
+    def test_equal_inputs_give_equal_keys(self):
+        self.assertEqual(artifact_key({'a': 1, 'b': [1, 2]}, 'code'), artifact_key({'b': [1, 2], 'a': 1}, 'code'))
+
+    def test_changed_inputs_give_other_key(self):
+        self.assertNotEqual(artifact_key({'a': 1}, 'code'), artifact_key({'a': 2}, 'code'))
+        self.assertNotEqual(artifact_key({'a': 1}, 'code'), artifact_key({'a': 1}, 'full'))
+
+    def test_export_directory_is_not_part_of_the_key(self):
+        self.assertEqual(
+            artifact_key({'directory': '/media/export/1/10/data'}, relative_to='/media/export/1/10'),
+            artifact_key({'directory': '/media/export/1/11/data'}, relative_to='/media/export/1/11'))
+
+
+class ArtifactCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache_directory = tempfile.mkdtemp()
+        self.export_directory = tempfile.mkdtemp()
+        self.other_export_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for directory in [self.cache_directory, self.export_directory, self.other_export_directory]:
+            shutil.rmtree(directory)
+
+    def create_file(self, relative_filename, content='responses'):
+        complete_filename = path.join(self.export_directory, relative_filename)
+        os.makedirs(path.dirname(complete_filename), exist_ok=True)
+        with open(complete_filename, 'w') as f:
+            f.write(content)
+        return complete_filename
+
+    def test_get_copies_stored_files_into_export_directory(self):
+        artifact_cache = ArtifactCache(self.cache_directory, 1000)
+        filename = self.create_file(path.join('Group_1', 'Per_participant', 'P1.csv'))
+        artifact_cache.put('ab12', self.export_directory, [[filename, 'Group_1/Per_participant', {'name': 'p1'}]])
+
+        files_to_zip_list = artifact_cache.get('ab12', self.other_export_directory)
+
+        other_filename = path.join(self.other_export_directory, 'Group_1', 'Per_participant', 'P1.csv')
+        self.assertEqual(files_to_zip_list, [[other_filename, 'Group_1/Per_participant', {'name': 'p1'}]])
+        with open(other_filename) as f:
+            self.assertEqual(f.read(), 'responses')
+
+    def test_get_unknown_key_returns_none(self):
+        self.assertIsNone(ArtifactCache(self.cache_directory, 1000).get('cd34', self.export_directory))
+
+    def test_files_outside_export_directory_are_not_stored(self):
+        artifact_cache = ArtifactCache(self.cache_directory, 1000)
+        artifact_cache.put('ab12', self.export_directory, [[path.join(self.cache_directory, 'P1.csv'), '']])
+
+        self.assertIsNone(artifact_cache.get('ab12', self.other_export_directory))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        artifact_cache = ArtifactCache(self.cache_directory, 250)
+        artifact_cache.put('aa11', self.export_directory, [[self.create_file('P1.csv', 100 * 'a'), '']])
+        artifact_cache.put('bb22', self.export_directory, [[self.create_file('P2.csv', 100 * 'b'), '']])
+        # use the first entry after the second one
+        os.utime(path.join(artifact_cache.entry_directory('aa11'), 'manifest.json'), (time.time() + 10,) * 2)
+
+        artifact_cache.put('cc33', self.export_directory, [[self.create_file('P3.csv', 100 * 'c'), '']])
+
+        self.assertIsNotNone(artifact_cache.get('aa11', self.other_export_directory))
+        self.assertIsNone(artifact_cache.get('bb22', self.other_export_directory))
+
+
+def process_group_per_experiment(export, group_id, heading_type, per_experiment_plugin, questionnaire_lime_survey):
+    """Replaces ExportExecution.process_group_per_experiment: counts the groups processed"""
+    export.groups_processed.append(group_id)
+    complete_filename = path.join(export.get_directory_base(), 'Group_%d.csv' % group_id)
+    os.makedirs(export.get_directory_base(), exist_ok=True)
+    with open(complete_filename, 'w') as f:
+        f.write('group')
+    return '', [[complete_filename, 'Group_%d' % group_id]]
+
+
+@patch('survey.abc_search_engine.Server')
+@patch.object(ExportExecution, 'process_group_per_experiment', process_group_per_experiment)
+@patch.object(ExportExecution, 'get_group_artifact_key', lambda export, group_id, *args: 'key%d' % group_id)
+class ExportGroupCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root)
+
+    def export(self, export_id):
+        export = ExportExecution(1, export_id)
+        export.per_group_data = {1: {}, 2: {}}
+        export.groups_processed = []
+        export.process_per_participant_per_experiment('code')
+        return export
+
+    def test_groups_are_processed_in_every_export_without_cache(self, mockServer):
+        with override_settings(MEDIA_ROOT=self.media_root, EXPORT_CACHE_SIZE=0):
+            self.export(1)
+            export = self.export(2)
+
+        self.assertEqual(export.groups_processed, [1, 2])
+
+    def test_unchanged_groups_are_copied_from_cache(self, mockServer):
+        with override_settings(MEDIA_ROOT=self.media_root, EXPORT_CACHE_SIZE=1000):
+            self.export(1)
+            export = self.export(2)
+
+        self.assertEqual(export.groups_processed, [])
+        self.assertEqual(
+            export.files_to_zip_list,
+            [[path.join(export.get_directory_base(), 'Group_%d.csv' % group_id), 'Group_%d' % group_id]
+             for group_id in [1, 2]])
+        self.assertTrue(path.isfile(export.files_to_zip_list[0][0]))
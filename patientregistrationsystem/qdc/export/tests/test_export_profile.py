@@ -0,0 +1,88 @@
+import json
+from unittest.mock import patch
+
+from django.core.urlresolvers import reverse
+
+from custom_user.tests_helper import create_user
+from experiment.models import Group
+from export.export_profile import ExportProfile
+from export.models import Export
+from export.tests.tests_helper import ExportTestCase
+from survey.abc_search_engine import Questionnaires
+
+
+class ExportProfileTest(ExportTestCase):
+
+    def setUp(self):
+        super(ExportProfileTest, self).setUp()
+        self.export = Export.objects.create(user=self.user)
+
+    def test_stage_counts_queries(self):
+        profile = ExportProfile(self.export.id)
+
+        with profile.stage('include_group_data'):
+            list(Group.objects.all())
+            Group.objects.count()
+
+        self.assertEqual(profile.stages[0]['stage'], 'include_group_data')
+        self.assertEqual(profile.stages[0]['queries'], 2)
+
+    @patch('survey.abc_search_engine.Server')
+    def test_stage_counts_limesurvey_calls(self, mockServer):
+        profile = ExportProfile(self.export.id)
+
+        with profile.stage('get_questionnaires_responses'):
+            questionnaire_lime_survey = Questionnaires()
+            questionnaire_lime_survey.get_survey_title(1, 'en')
+            questionnaire_lime_survey.release_session_key()
+
+        # session key, title and release of session key
+        self.assertEqual(profile.stages[0]['limesurvey_calls'], 3)
+        self.assertEqual(profile.stages[0]['queries'], 0)
+
+    def test_stage_sets_bytes_written(self):
+        profile = ExportProfile(self.export.id)
+
+        with profile.stage('zip') as stage:
+            stage['bytes_written'] = 1024
+
+        self.assertEqual(profile.as_dict()['total']['bytes_written'], 1024)
+
+    def test_profile_is_saved_after_each_stage(self):
+        profile = ExportProfile(self.export.id)
+
+        with profile.stage('read_configuration_data'):
+            pass
+        with profile.stage('zip'):
+            pass
+
+        self.export.refresh_from_db()
+        self.assertEqual(
+            [stage['stage'] for stage in json.loads(self.export.profile)['stages']],
+            ['read_configuration_data', 'zip'])
+
+    def test_export_profile_view_returns_json(self):
+        profile = ExportProfile(self.export.id)
+        with profile.stage('zip'):
+            pass
+
+        response = self.client.get(reverse('export_profile', args=(self.export.id,)))
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content.decode())['stages'][0]['stage'], 'zip')
+        self.assertNotIn('Content-Disposition', response)
+
+    def test_export_profile_view_downloads_json(self):
+        response = self.client.get(reverse('export_profile', args=(self.export.id,)), {'download': ''})
+
+        self.assertEqual(
+            response['Content-Disposition'], 'attachment; filename="export_%d_profile.json"' % self.export.id)
+        self.assertEqual(json.loads(response.content.decode()), {'stages': []})
+
+    def test_export_profile_of_other_user_is_not_found(self):
+        other_user, other_user_passwd = create_user()
+        export = Export.objects.create(user=other_user)
+
+        response = self.client.get(reverse('export_profile', args=(export.id,)))
+
+        self.assertEqual(response.status_code, 404)
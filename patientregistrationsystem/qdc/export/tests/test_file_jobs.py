@@ -0,0 +1,68 @@
+import os
+import time
+
+from django.test import SimpleTestCase
+
+from export.file_jobs import FileJobPool
+
+
+def slow_square(number):
+    time.sleep(0.2)
+    return number * number
+
+
+def exit_worker():
+    # as the system does with a worker out of memory
+    os._exit(1)
+
+
+class FileJobPoolTest(SimpleTestCase):
+
+    def test_job_runs_when_submitted_with_one_worker(self):
+        file_jobs = FileJobPool(workers=1, memory_budget=100)
+
+        file_jobs.submit('a', 10, pow, 2, 3)
+
+        self.assertEqual(file_jobs.results, {'a': 8})
+        self.assertEqual(file_jobs.collect(), {'a': 8})
+
+    def test_jobs_are_collected_from_the_pool(self):
+        file_jobs = FileJobPool(workers=2, memory_budget=100)
+
+        file_jobs.submit('a', 10, slow_square, 2)
+        file_jobs.submit('b', 10, slow_square, 3)
+
+        self.assertEqual(file_jobs.collect(), {'a': 4, 'b': 9})
+
+    def test_jobs_beyond_memory_budget_wait_for_running_jobs(self):
+        file_jobs = FileJobPool(workers=2, memory_budget=100)
+
+        file_jobs.submit('a', 80, slow_square, 2)
+        file_jobs.submit('b', 80, slow_square, 3)
+
+        self.assertEqual(list(file_jobs.running), ['a'])
+        self.assertEqual(file_jobs.collect(), {'a': 4, 'b': 9})
+        self.assertEqual(file_jobs.memory_in_use, 0)
+
+    def test_job_bigger_than_memory_budget_runs_alone(self):
+        file_jobs = FileJobPool(workers=2, memory_budget=100)
+
+        file_jobs.submit('a', 500, slow_square, 2)
+
+        self.assertEqual(file_jobs.collect(), {'a': 4})
+
+    def test_failed_job_gives_none(self):
+        file_jobs = FileJobPool(workers=2, memory_budget=100)
+
+        file_jobs.submit('a', 10, int, 'not a number')
+
+        self.assertEqual(file_jobs.collect(), {'a': None})
+
+    def test_job_whose_worker_exits_gives_error(self):
+        file_jobs = FileJobPool(workers=2, memory_budget=100)
+
+        file_jobs.submit('a', 80, exit_worker)
+        file_jobs.submit('b', 80, slow_square, 3)
+
+        self.assertEqual(file_jobs.collect(), {'a': None, 'b': 9})
+        self.assertEqual(list(file_jobs.errors), ['a'])
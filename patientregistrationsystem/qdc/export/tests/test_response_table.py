@@ -0,0 +1,51 @@
+from django.test import SimpleTestCase
+
+from export.response_table import ResponseTable
+
+SHORT_RESPONSES = \
+    '"id","token","q1","mc[SQ001]","mc[SQ002]","q2"\n' \
+    '"1","tk1","A1","Y","","text"\n' \
+    '"2","tk2","A2","","Y",""\n\n'
+
+LONG_RESPONSES = \
+    '"id","token","q1","mc[SQ001]","mc[SQ002]","q2"\n' \
+    '"1","tk1","Answer 1","Yes","","text"\n' \
+    '"2","tk2","Answer 2","","Yes",""\n\n'
+
+
+class ResponseTableTest(SimpleTestCase):
+
+    def test_trailing_empty_line_is_not_a_response(self):
+        table = ResponseTable(SHORT_RESPONSES)
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.column('token').tolist(), ['tk1', 'tk2'])
+
+    def test_empty_responses(self):
+        table = ResponseTable('')
+
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.responses_by_token(['q1']), ({}, set()))
+
+    def test_replace_multiple_choice_answers_fills_only_multiple_choice_options(self):
+        table = ResponseTable(SHORT_RESPONSES)
+
+        table.replace_multiple_choice_answers([{'title': 'mc', 'type': 'M'}])
+
+        self.assertEqual(table.column('mc[SQ001]').tolist(), ['Y', 'N'])
+        self.assertEqual(table.column('mc[SQ002]').tolist(), ['N', 'Y'])
+        self.assertEqual(table.column('q2').tolist(), ['text', ''])
+
+    def test_responses_by_token_selects_fields_in_given_order(self):
+        responses, fields_with_long_responses = ResponseTable(SHORT_RESPONSES).responses_by_token(
+            ['q2', 'q1', 'unknown'])
+
+        self.assertEqual(responses, {'tk1': ['text', 'A1'], 'tk2': ['', 'A2']})
+        self.assertEqual(fields_with_long_responses, set())
+
+    def test_responses_by_token_appends_long_responses_that_differ(self):
+        responses, fields_with_long_responses = ResponseTable(SHORT_RESPONSES).responses_by_token(
+            ['q1', 'q2'], ResponseTable(LONG_RESPONSES))
+
+        self.assertEqual(responses, {'tk1': ['A1', 'Answer 1', 'text'], 'tk2': ['A2', 'Answer 2', '']})
+        self.assertEqual(fields_with_long_responses, {'q1'})
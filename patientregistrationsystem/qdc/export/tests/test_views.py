@@ -8,6 +8,7 @@ import zipfile
 from datetime import date, datetime
 
 import shutil
+from base64 import b64encode
 from unittest.mock import patch
 
 from django.core.files import File
@@ -26,7 +27,7 @@ from export.export import PROTOCOL_IMAGE_FILENAME, PROTOCOL_DESCRIPTION_FILENAME
     EEG_SETTING_FILENAME, TMS_DATA_FILENAME, HOTSPOT_MAP, EMG_SETTING_FILENAME, EMG_DEFAULT_SETTING, \
     TMS_DEFAULT_SETTING_FILENAME, CONTEXT_TREE_DEFAULT, ExportExecution
 from export.export_utils import create_list_of_trees
-from export.models import Export
+from export.models import Export, ParticipantSelection
 from export.tests.mocks import set_mocks1, LIMESURVEY_SURVEY_ID_1, set_mocks2, set_mocks3, set_mocks4, \
     set_mocks5, set_mocks6, set_mocks7, update_mocks4_full_and_abbreviated, update_mocks7_full, \
     update_mocks7_abbreviated, \
@@ -35,9 +36,11 @@ from export.tests.mocks import set_mocks1, LIMESURVEY_SURVEY_ID_1, set_mocks2, s
     update_mocks11_full, update_mocks11_abbreviated, update_mocks6_full, update_mocks6_abbreviated, update_mocks9_full, \
     update_mocks9_abbreviated
 from export.tests.tests_helper import ExportTestCase
-from export.views import EXPORT_DIRECTORY, abbreviated_data, PATIENT_FIELDS, DIAGNOSIS_FIELDS
+from export.views import EXPORT_DIRECTORY, abbreviated_data, PATIENT_FIELDS, DIAGNOSIS_FIELDS, \
+    get_questionnaire_fields, get_questionnaire_experiment_fields
 from patient.tests.tests_orig import UtilTests
 from survey.tests.tests_helper import create_survey
+from survey.limesurvey_cache import invalidate_survey_cache
 from survey.survey_utils import HEADER_EXPLANATION_FIELDS
 
 USER_USERNAME = 'myadmin'
@@ -1677,6 +1680,28 @@ class ExportSelectionTest(ExportTestCase):
         self.assertIn('license', self.client.session)
         self.assertEqual(self.client.session['license'], '0')
 
+    def test_experiment_selection_stores_participants_of_selected_groups_once(self):
+        other_group = ObjectsFactory.create_group(self.experiment)
+        ObjectsFactory.create_subject_of_group(other_group, self.subject)
+        UtilTests().create_patient(changed_by=self.user)
+
+        response = self.client.post(reverse('experiment_selection'), {
+            'group_selected': [self.group.id, other_group.id],
+            'action': 'next-step-participants'
+        })
+
+        selection = ParticipantSelection.objects.get(pk=response.wsgi_request.session['participant_selection'])
+        self.assertEqual(list(selection.patients.all()), [self.patient])
+        self.assertNotIn('filtered_participant_data', response.wsgi_request.session)
+
+    def test_new_selection_replaces_previous_selection_of_user(self):
+        data = {'group_selected': self.group.id, 'action': 'next-step-participants'}
+
+        self.client.post(reverse('experiment_selection'), data)
+        self.client.post(reverse('experiment_selection'), data)
+
+        self.assertEqual(ParticipantSelection.objects.filter(user=self.user).count(), 1)
+
 
 class ExportFrictionlessDataTest(ExportTestCase):
 
@@ -4387,3 +4412,74 @@ class ExportFrictionlessDataTest(ExportTestCase):
 
 def tearDownModule():
     shutil.rmtree(TEMP_MEDIA_ROOT)
+
+
+@patch('survey.abc_search_engine.Server')
+class QuestionnaireFieldsCacheTest(ExportTestCase):
+
+    def setUp(self):
+        super(QuestionnaireFieldsCacheTest, self).setUp()
+
+        self.survey = create_survey(LIMESURVEY_SURVEY_ID_1)
+        self.questionnaire = ObjectsFactory.create_component(
+            self.experiment, Component.QUESTIONNAIRE, kwargs={'survey': self.survey})
+        component_config = ObjectsFactory.create_component_configuration(self.root_component, self.questionnaire)
+        ObjectsFactory.create_questionnaire_response(
+            dct=ObjectsFactory.create_data_configuration_tree(component_config), responsible=self.user, token_id=1,
+            subject_of_group=self.subject_of_group)
+
+    @staticmethod
+    def set_mocks(mockServer):
+        mockServer.return_value.get_session_key.return_value = 'smq3awd8sqimf37qlqi5ypxucqrk7h5e'
+        mockServer.return_value.get_survey_properties.return_value = {'additional_languages': '', 'language': 'en'}
+        mockServer.return_value.get_participant_properties.return_value = {'token': 'sIbj3gwjvwpa2QY'}
+        mockServer.return_value.get_language_properties.return_value = {'surveyls_title': 'Questionnaire'}
+        mockServer.return_value.export_responses_by_token.return_value = b64encode(b'"id","q1"\n"1","Y"\n').decode()
+
+    def test_questionnaire_fields_are_read_from_limesurvey_once(self, mockServer):
+        self.set_mocks(mockServer)
+
+        error, fields = get_questionnaire_fields([LIMESURVEY_SURVEY_ID_1], 'en')
+        limesurvey_calls = len(mockServer.return_value.mock_calls)
+        error_cached, fields_cached = get_questionnaire_fields([LIMESURVEY_SURVEY_ID_1], 'en')
+
+        self.assertEqual(error_cached, 0)
+        self.assertEqual(fields_cached, fields)
+        self.assertEqual(fields[0]['output_list'], [{'field': 'q1', 'header': 'q1', 'description': 'q1'}])
+        self.assertEqual(len(mockServer.return_value.mock_calls), limesurvey_calls)
+
+    def test_questionnaire_fields_are_shared_with_experiment_fields(self, mockServer):
+        self.set_mocks(mockServer)
+
+        error, fields = get_questionnaire_fields([LIMESURVEY_SURVEY_ID_1], 'en')
+        limesurvey_calls = len(mockServer.return_value.mock_calls)
+        experiment_fields = get_questionnaire_experiment_fields([{
+            'questionnaire': self.questionnaire, 'token': '1', 'group_id': self.group.id,
+            'group_title': self.group.title
+        }], 'en')
+
+        self.assertEqual(experiment_fields[0]['output_list'], fields[0]['output_list'])
+        self.assertEqual(experiment_fields[0]['group_title'], self.group.title)
+        self.assertEqual(len(mockServer.return_value.mock_calls), limesurvey_calls)
+
+    def test_questionnaire_fields_are_read_again_when_survey_changes(self, mockServer):
+        self.set_mocks(mockServer)
+
+        get_questionnaire_fields([LIMESURVEY_SURVEY_ID_1], 'en')
+        mockServer.return_value.export_responses_by_token.return_value = b64encode(
+            b'"id","q1","q2"\n"1","Y","N"\n').decode()
+        invalidate_survey_cache(LIMESURVEY_SURVEY_ID_1)
+        error, fields = get_questionnaire_fields([LIMESURVEY_SURVEY_ID_1], 'en')
+
+        self.assertEqual([output['field'] for output in fields[0]['output_list']], ['q1', 'q2'])
+
+    def test_questionnaire_fields_are_read_again_when_an_export_starts(self, mockServer):
+        self.set_mocks(mockServer)
+
+        get_questionnaire_fields([LIMESURVEY_SURVEY_ID_1], 'en')
+        mockServer.return_value.export_responses_by_token.return_value = b64encode(
+            b'"id","q1","q2"\n"1","Y","N"\n').decode()
+        self.client.get(reverse('export_menu'))
+        error, fields = get_questionnaire_fields([LIMESURVEY_SURVEY_ID_1], 'en')
+
+        self.assertEqual([output['field'] for output in fields[0]['output_list']], ['q1', 'q2'])
@@ -16,6 +16,7 @@ from custom_user.models import User
 
 from export.export import is_patient_active
 from export.input_export import InputExport, build_complete_export_structure
+from export.models import ParticipantSelection
 from export.views import Survey, Questionnaires, QuestionnaireResponse, create_directory
 
 from patient.models import Gender, MaritalStatus, Patient
@@ -379,6 +380,11 @@ class AdvancedSearchTest(TestCase):
         self.assertEqual(logged, True)
         self.data = {}
 
+    @staticmethod
+    def selected_participants_count(response):
+        return ParticipantSelection.objects.get(
+            pk=response.wsgi_request.session['participant_selection']).patients.count()
+
     def create_initial_patients_data(self):
         female_list = [1, 2, 4]
 
@@ -423,7 +429,7 @@ class AdvancedSearchTest(TestCase):
         self.assertEqual(response.status_code, 302)
 
         self.assertEqual(
-            len(response.wsgi_request.session['filtered_participant_data']),
+            self.selected_participants_count(response),
             Patient.objects.count()
         )
 
@@ -441,7 +447,7 @@ class AdvancedSearchTest(TestCase):
         response = self.client.post(reverse('filter_participants'), self.data)
         self.assertEqual(response.status_code, 200)
 
-        self.assertEqual(len(response.wsgi_request.session['filtered_participant_data']),
+        self.assertEqual(self.selected_participants_count(response),
                          Patient.objects.filter(gender__name="Female").count())
 
     def test_filter_age_participants(self):
@@ -465,7 +471,7 @@ class AdvancedSearchTest(TestCase):
         date_birth_min = '%s-%s-%s' % (birthday_min.year, birthday_min.month, birthday_min.day)
         date_birth_max = '%s-%s-%s' % (birthday_max.year, birthday_max.month, birthday_max.day)
 
-        self.assertEqual(len(response.wsgi_request.session['filtered_participant_data']), 3)
+        self.assertEqual(self.selected_participants_count(response), 3)
 
     def test_filter_marital_status_participants(self):
 
@@ -483,7 +489,7 @@ class AdvancedSearchTest(TestCase):
         response = self.client.post(reverse('filter_participants'), self.data)
         self.assertEqual(response.status_code, 200)
 
-        self.assertEqual(len(response.wsgi_request.session['filtered_participant_data']),
+        self.assertEqual(self.selected_participants_count(response),
                          Patient.objects.filter(marital_status__name="Married").count())
 
     def test_second_page(self):
@@ -5,6 +5,7 @@ urlpatterns = [
     url(r'^$', views.export_menu, name='export_menu'),
     url(r'^create/$', views.export_create, name='export_create'),
     url(r'^view/$', views.export_view, name='export_view'),
+    url(r'^(?P<export_id>\d+)/profile/$', views.export_profile, name='export_profile'),
 
     url(r'^filter_participants/$', views.filter_participants, name='filter_participants'),
     url(r'^experiment_selection/$', views.experiment_selection, name='experiment_selection'),
@@ -19,11 +19,13 @@ from os import path
 from zipfile import ZipFile
 from shutil import rmtree
 
-from survey.survey_utils import QuestionnaireUtils
+from survey.limesurvey_cache import invalidate_questionnaire_headers, limesurvey_cache
+from survey.survey_utils import QuestionnaireUtils, questionnaire_header_cache_keys
 from .forms import ExportForm, ParticipantsSelectionForm, AgeIntervalForm
-from .models import Export
+from .models import Export, ParticipantSelection
 
 from export.export import ExportExecution, create_directory
+from export.export_profile import ExportProfile
 from export.input_export import build_complete_export_structure
 from export.export_utils import create_list_of_trees, can_export_nwb
 
@@ -35,7 +37,7 @@ from survey.abc_search_engine import Questionnaires
 from survey.views import get_questionnaire_language
 
 from experiment.models import ResearchProject, Experiment, Group, \
-    SubjectOfGroup, Component, ComponentConfiguration, \
+    Component, ComponentConfiguration, \
     Block, Instruction, Questionnaire, Stimulus, DataConfigurationTree, \
     QuestionnaireResponse as ExperimentQuestionnaireResponse, \
     ClassificationOfDiseases, EEGData, AdditionalData, EMGData, TMSData, \
@@ -187,7 +189,7 @@ HEADER_EXPLANATION_FIELDS = [
 def update_export_instance(input_file, output_export, export_instance):
     export_instance.input_file = input_file
     export_instance.output_export = output_export
-    export_instance.save()
+    export_instance.save(update_fields=['input_file', 'output_export'])
 
 
 def find_description(field_to_find, fields_inclusion):
@@ -227,14 +229,15 @@ def export_create(
     try:
         export_instance = Export.objects.get(user=request.user, id=export_id)
         export = ExportExecution(export_instance.user.id, export_instance.id)
+        profile = ExportProfile(export_instance.id)
         language_code = request.LANGUAGE_CODE
 
         if participants_plugin and not per_experiment_plugin:
             participants_filtered_list = participants_plugin
-        elif 'filtered_participant_data' in request.session:
-            participants_filtered_list = request.session['filtered_participant_data']
         else:
-            participants_filtered_list = Patient.objects.filter(removed=False)
+            participants_filtered_list = get_participant_selection(request)
+            if participants_filtered_list is None:
+                participants_filtered_list = Patient.objects.filter(removed=False)
         export.set_participants_filtered_data(participants_filtered_list)
 
         # Set path of the directory base
@@ -249,7 +252,8 @@ def export_create(
         input_export_file = path.join('export', str(request.user.id), str(export_instance.id), str(input_filename))
 
         # Prepare data to be processed
-        input_data = export.read_configuration_data(input_filename)
+        with profile.stage('read_configuration_data'):
+            input_data = export.read_configuration_data(input_filename)
 
         if not export.is_input_data_consistent() or not input_data:
             messages.error(request, _('Inconsistent data read from json file'))
@@ -272,30 +276,36 @@ def export_create(
                     # Required convertion from ValuesListQuerySet to list
                     list(participants_list),
                     request.session['group_selected_list'])
-            export_rows_participants = export.process_participant_data(
-                participants_input_data, participants_list, language_code, participants_plugin)
+            with profile.stage('process_participant_data'):
+                export_rows_participants = export.process_participant_data(
+                    participants_input_data, participants_list, language_code, participants_plugin)
             export.get_input_data('participants')['data_list'] = export_rows_participants
             # Create file participants.csv and diagnosis.csv
-            error_msg = export.build_participant_export_data(
-                'group_selected_list' in request.session, request.POST.get('headings'))
+            with profile.stage('build_participant_export_data', export):
+                error_msg = export.build_participant_export_data(
+                    'group_selected_list' in request.session, request.POST.get('headings'))
             if error_msg != '':
                 messages.error(request, error_msg)
                 return render(request, template_name)
 
         if 'group_selected_list' in request.session:
             # Export method: filter by experiments
-            export.include_group_data(request.session['group_selected_list'], participants_plugin)
+            with profile.stage('include_group_data'):
+                export.include_group_data(request.session['group_selected_list'], participants_plugin)
             # if fields from questionnaires were selected
             if export.get_input_data('questionnaire_list'):
-                export.get_questionnaires_responses(request.POST.get('headings'))
+                with profile.stage('get_questionnaires_responses'):
+                    export.get_questionnaires_responses(request.POST.get('headings'))
 
             error_msg = export.create_group_data_directory()
             if error_msg != '':
                 messages.error(request, error_msg)
                 return render(request, template_name)
+            export.submit_group_file_jobs(request.POST.get('headings'), per_experiment_plugin)
 
             # Create files of experimental protocol description file
-            error_msg = export.process_experiment_data(language_code)
+            with profile.stage('process_experiment_data', export):
+                error_msg = export.process_experiment_data(language_code)
 
             if error_msg != '':
                 messages.error(request, error_msg)
@@ -306,12 +316,15 @@ def export_create(
                 # Process per questionnaire data - entrance evaluation
                 # questionnaires (Particpant data directory)
                 if export.get_input_data('export_per_questionnaire'):
-                    error_msg = export.process_per_entrance_questionnaire(request.POST.get('headings'))
+                    with profile.stage('process_per_entrance_questionnaire', export):
+                        error_msg = export.process_per_entrance_questionnaire(request.POST.get('headings'))
                     if error_msg != '':
                         messages.error(request, error_msg)
                         return render(request, template_name)
                 if export.get_input_data('export_per_participant'):
-                    error_msg = export.process_per_participant_per_entrance_questionnaire(request.POST.get('headings'))
+                    with profile.stage('process_per_participant_per_entrance_questionnaire', export):
+                        error_msg = export.process_per_participant_per_entrance_questionnaire(
+                            request.POST.get('headings'))
                     if error_msg != '':
                         messages.error(request, error_msg)
                         return render(request, template_name)
@@ -321,35 +334,40 @@ def export_create(
             if export.get_input_data('questionnaires_from_experiments'):
                 if export.get_input_data('export_per_questionnaire'):
                     # 'headings' == ['code'], ['full'] or ['abbreviated'], so request.POST.get('headings')[0]
-                    error_msg = export.process_per_experiment_questionnaire(
-                        request.POST.get('headings'), per_experiment_plugin)
+                    with profile.stage('process_per_experiment_questionnaire', export):
+                        error_msg = export.process_per_experiment_questionnaire(
+                            request.POST.get('headings'), per_experiment_plugin)
                     if error_msg != '':
                         messages.error(request, error_msg)
                         return render(request, template_name)
             # Build export data for each component
-            error_msg = export.process_per_participant_per_experiment(
-                request.POST.get('headings'), per_experiment_plugin=per_experiment_plugin)
+            with profile.stage('process_per_participant_per_experiment', export):
+                error_msg = export.process_per_participant_per_experiment(
+                    request.POST.get('headings'), per_experiment_plugin=per_experiment_plugin)
             if error_msg != '':
                 messages.error(request, error_msg)
                 return render(request, template_name)
 
             # Build datapackage.json file (TODO (NES-991): error_msg stays?)
             # TODO (NES-991): only process datapackage json file if not sending to Plugin
-            export.process_datapackage_json_file(request)
+            with profile.stage('process_datapackage_json_file', export):
+                export.process_datapackage_json_file(request)
 
         else:
             # Export method: filter by entrance questionnaire
             if export.get_input_data('questionnaires'):
                 # Process per questionnaire data - entrance evaluation questionnaires
-                error_msg = export.process_per_questionnaire(request.POST.get('headings'), participants_plugin)
+                with profile.stage('process_per_questionnaire', export):
+                    error_msg = export.process_per_questionnaire(request.POST.get('headings'), participants_plugin)
                 if error_msg == Questionnaires.ERROR_CODE:  # TODO (NES-971): ??
                     return error_msg
                 if error_msg != '':
                     messages.error(request, error_msg)
                     return render(request, template_name)
 
-                error_msg = export.process_per_participant(
-                    request.POST.get('headings'), participants_plugin if participants_plugin else None)
+                with profile.stage('process_per_participant', export):
+                    error_msg = export.process_per_participant(
+                        request.POST.get('headings'), participants_plugin if participants_plugin else None)
                 if error_msg != '':
                     messages.error(request, error_msg)
                     return render(request, template_name)
@@ -358,7 +376,8 @@ def export_create(
                 #  Call once!
                 # Build datapackage.json file (TODO (NES-991): error_msg stays?)
                 if not participants_plugin:
-                    export.process_datapackage_json_file(request)
+                    with profile.stage('process_datapackage_json_file', export):
+                        export.process_datapackage_json_file(request)
 
         # Create zip file and include files
         export_complete_filename = ''
@@ -367,10 +386,12 @@ def export_create(
             export_filename = export.get_input_data('export_filename')
             export_complete_filename = path.join(base_directory_name, export_filename)
 
-            with ZipFile(export_complete_filename, 'w') as zip_file:
-                for filename, directory, *resource in export.files_to_zip_list:  # just by now
-                    fdir, fname = path.split(filename)
-                    zip_file.write(filename.encode('utf-8'), path.join(directory, fname))
+            with profile.stage('zip') as stage:
+                with ZipFile(export_complete_filename, 'w') as zip_file:
+                    for filename, directory, *resource in export.files_to_zip_list:  # just by now
+                        fdir, fname = path.split(filename)
+                        zip_file.write(filename.encode('utf-8'), path.join(directory, fname))
+                stage['bytes_written'] = path.getsize(export_complete_filename)
 
             output_export_file = path.join(
                 'export', path.join(str(export_instance.user.id), str(export_instance.id), str(export_filename)))
@@ -599,13 +620,14 @@ def export_view(request, template_name='export/export_data.html'):
         # If called from expired session return to fist export options.
         # This is to workaround in a code break arising from trying to
         # export after an expired session
-        if 'filtered_participant_data' not in request.session:
+        participants_filtered_list = get_participant_selection(request)
+        if participants_filtered_list is None:
             return HttpResponseRedirect(reverse('export_menu'))
 
         # Obter a lista dos participantes filtrados que têm questionários de
         # entrada preenchidos.
         patient_questionnaire_response_list = QuestionnaireResponse.objects.filter(
-                patient_id__in=request.session['filtered_participant_data'])
+                patient_id__in=participants_filtered_list)
 
         surveys_with_ev_list = []
         surveys_id_list = []
@@ -776,31 +798,20 @@ def get_experiment_questionnaire_response_list(group_id):
 def get_questionnaire_experiment_header(
         questionnaire_lime_survey, questionnaire_id, token_id, fields, heading_type='code', current_language='pt-BR'):
 
-    questionnaire_list = []
-    language_new = get_questionnaire_language(questionnaire_lime_survey, questionnaire_id, current_language)
-    token = questionnaire_lime_survey.get_participant_properties(questionnaire_id, token_id, 'token')
+    cache_key = questionnaire_header_cache_keys([questionnaire_id], current_language, 'header_' + heading_type)[
+        questionnaire_id]
+    questionnaire_header = limesurvey_cache().get(cache_key)
 
-    responses_string = questionnaire_lime_survey.get_header_response(questionnaire_id, language_new, token)
-
-    if not isinstance(responses_string, dict):
-        questionnaire_questions = QuestionnaireUtils.responses_to_csv(responses_string)
-        responses_heading_type = questionnaire_lime_survey.get_header_response(
-            questionnaire_id, language_new, token, heading_type=heading_type)
-        questionnaire_questions_heading_type = QuestionnaireUtils.responses_to_csv(responses_heading_type)
-        if heading_type == 'abbreviated':
-            # Remove trailling spaces that are brought by get_header_response
-            questionnaire_questions_heading_type[0] = [
-                str.rstrip(item) for item in questionnaire_questions_heading_type[0]
-            ]
-
-        questionnaire_header = list(zip(questionnaire_questions_heading_type[0], questionnaire_questions[0]))
-
-        # line 0 - header information
-        for question in questionnaire_header:
-            if question[1] in fields:
-                questionnaire_list.append(question)
+    if questionnaire_header is None:
+        language_new = get_questionnaire_language(questionnaire_lime_survey, questionnaire_id, current_language)
+        token = questionnaire_lime_survey.get_participant_properties(questionnaire_id, token_id, 'token')
+        questionnaire_header = read_questionnaire_header(
+            questionnaire_lime_survey, questionnaire_id, language_new, token, heading_type)
+        if questionnaire_header is not None:
+            limesurvey_cache().set(cache_key, questionnaire_header)
 
-    return questionnaire_list
+    # line 0 - header information
+    return [question for question in questionnaire_header or [] if question[1] in fields]
 
 
 def update_questionnaire_list(questionnaire_list, heading_type, experiment_questionnaire, current_language='pt-BR'):
@@ -847,44 +858,63 @@ def update_questionnaire_list(questionnaire_list, heading_type, experiment_quest
 def get_questionnaire_header(
         questionnaire_lime_survey, questionnaire_id, fields, heading_type='code', current_language='pt-BR'):
 
-    questionnaire_list = []
+    cache_key = questionnaire_header_cache_keys([questionnaire_id], current_language, 'header_' + heading_type)[
+        questionnaire_id]
+    questionnaire_header = limesurvey_cache().get(cache_key)
 
-    language_new = get_questionnaire_language(questionnaire_lime_survey, questionnaire_id, current_language)
+    if questionnaire_header is None:
+        language_new = get_questionnaire_language(questionnaire_lime_survey, questionnaire_id, current_language)
 
-    # Get a valid token (anyone)
-    survey = Survey.objects.filter(lime_survey_id=questionnaire_id).first()
-    questionnaire_response_list = QuestionnaireResponse.objects.filter(survey=survey)
-    if questionnaire_response_list:
-        token_id = questionnaire_response_list.first().token_id
-        token = questionnaire_lime_survey.get_participant_properties(questionnaire_id, token_id, 'token')
+        # Get a valid token (anyone)
+        survey = Survey.objects.filter(lime_survey_id=questionnaire_id).first()
+        questionnaire_response_list = QuestionnaireResponse.objects.filter(survey=survey)
+        if questionnaire_response_list:
+            token_id = questionnaire_response_list.first().token_id
+            token = questionnaire_lime_survey.get_participant_properties(questionnaire_id, token_id, 'token')
+            questionnaire_header = read_questionnaire_header(
+                questionnaire_lime_survey, questionnaire_id, language_new, token, heading_type)
+            if questionnaire_header is not None:
+                limesurvey_cache().set(cache_key, questionnaire_header)
 
-        responses_string = questionnaire_lime_survey.get_header_response(questionnaire_id, language_new, token)
+    # line 0 - header information
+    return [question for question in questionnaire_header or [] if question[1] in fields]
 
-        if not isinstance(responses_string, dict):
 
-            questionnaire_questions = QuestionnaireUtils.responses_to_csv(responses_string)
-            responses_heading_type = questionnaire_lime_survey.get_header_response(
-                questionnaire_id, language_new, token, heading_type=heading_type)
-            questionnaire_questions_heading_type = QuestionnaireUtils.responses_to_csv(responses_heading_type)
-            if heading_type == 'abbreviated':
-                # Remove trailling spaces that are brought by get_header_response
-                questionnaire_questions_heading_type[0] = [
-                    str.rstrip(item) for item in questionnaire_questions_heading_type[0]
-                ]
+def read_questionnaire_header(questionnaire_lime_survey, questionnaire_id, language, token, heading_type):
+    """Reads the questionnaire header from LimeSurvey
+    :return: list of (header in heading_type, field code) pairs, or None if
+    LimeSurvey did not export the responses of token
+    """
+    responses_string = questionnaire_lime_survey.get_header_response(questionnaire_id, language, token)
 
-            questionnaire_header = list(zip(questionnaire_questions_heading_type[0], questionnaire_questions[0]))
+    if isinstance(responses_string, dict):
+        return None
 
-            # line 0 - header information
-            for question in questionnaire_header:
-                if question[1] in fields:
-                    questionnaire_list.append(question)
+    questionnaire_questions = QuestionnaireUtils.responses_to_csv(responses_string)
+    responses_heading_type = questionnaire_lime_survey.get_header_response(
+        questionnaire_id, language, token, heading_type=heading_type)
+    questionnaire_questions_heading_type = QuestionnaireUtils.responses_to_csv(responses_heading_type)
+    if heading_type == 'abbreviated':
+        # Remove trailling spaces that are brought by get_header_response
+        questionnaire_questions_heading_type[0] = [
+            str.rstrip(item) for item in questionnaire_questions_heading_type[0]
+        ]
 
-    return questionnaire_list
+    return list(zip(questionnaire_questions_heading_type[0], questionnaire_questions[0]))
 
 
 def get_questionnaire_experiment_fields(questionnaire_code_list, language_current='pt-BR'):
+    """The fields of each questionnaire are cached per survey and language
+    until the survey changes (see survey.limesurvey_cache), so LimeSurvey is
+    only queried for questionnaires not exported before.
+    """
     questionnaires_included = []
-    questionnaire_lime_survey = Questionnaires()
+    questionnaire_lime_survey = None
+
+    cache_keys = questionnaire_header_cache_keys(
+        [questionnaire['questionnaire'].survey.lime_survey_id for questionnaire in questionnaire_code_list],
+        language_current, 'fields')
+    cached_fields = limesurvey_cache().get_many(cache_keys.values())
 
     for questionnaire in questionnaire_code_list:
         questionnaire_id = questionnaire['questionnaire'].survey.lime_survey_id
@@ -892,16 +922,20 @@ def get_questionnaire_experiment_fields(questionnaire_code_list, language_curren
         group_id = questionnaire['group_id']
         group_title = questionnaire['group_title']
 
-        language_new = get_questionnaire_language(questionnaire_lime_survey, questionnaire_id, language_current)
-        responses_string = questionnaire_lime_survey.get_header_response(questionnaire_id, language_new, token)
-        questionnaire_title = questionnaire_lime_survey.get_survey_title(questionnaire_id, language_new)
+        record_question = cached_fields.get(cache_keys[questionnaire_id])
 
-        if not isinstance(responses_string, dict):
+        if record_question is None:
+            if questionnaire_lime_survey is None:
+                questionnaire_lime_survey = Questionnaires()
 
-            record_question = {
-                'group_id': group_id, 'group_title': group_title, 'sid': questionnaire_id,
-                'title': questionnaire_title, 'output_list': []
-            }
+            language_new = get_questionnaire_language(questionnaire_lime_survey, questionnaire_id, language_current)
+            responses_string = questionnaire_lime_survey.get_header_response(questionnaire_id, language_new, token)
+            questionnaire_title = questionnaire_lime_survey.get_survey_title(questionnaire_id, language_new)
+
+            if isinstance(responses_string, dict):
+                continue
+
+            record_question = {'sid': questionnaire_id, 'title': questionnaire_title, 'output_list': []}
 
             questionnaire_questions = QuestionnaireUtils.responses_to_csv(responses_string)
             responses_full = questionnaire_lime_survey.get_header_response(
@@ -916,9 +950,15 @@ def get_questionnaire_experiment_fields(questionnaire_code_list, language_curren
                         'field': question, 'header': question, 'description': description
                     })
                 index += 1
-            questionnaires_included.append(record_question)
+            limesurvey_cache().set(cache_keys[questionnaire_id], record_question)
+            cached_fields[cache_keys[questionnaire_id]] = record_question
 
-    questionnaire_lime_survey.release_session_key()
+        questionnaires_included.append(dict(
+            record_question, group_id=group_id, group_title=group_title,
+            output_list=[dict(output) for output in record_question['output_list']]))
+
+    if questionnaire_lime_survey is not None:
+        questionnaire_lime_survey.release_session_key()
 
     return questionnaires_included
 
@@ -934,11 +974,23 @@ def get_questionnaire_fields(questionnaire_code_list, current_language='pt-BR'):
     """
 
     questionnaires_included = []
+    questionnaire_lime_survey = None
+
+    # the fields are shared with get_questionnaire_experiment_fields
+    cache_keys = questionnaire_header_cache_keys(questionnaire_code_list, current_language, 'fields')
+    cached_fields = limesurvey_cache().get_many(cache_keys.values())
 
-    questionnaire_lime_survey = Questionnaires()
-    if questionnaire_lime_survey.session_key is None:
-        return Questionnaires.ERROR_CODE, []
     for questionnaire_id in questionnaire_code_list:
+        record_question = cached_fields.get(cache_keys[questionnaire_id])
+        if record_question is not None:
+            questionnaires_included.append(dict(
+                record_question, output_list=[dict(output) for output in record_question['output_list']]))
+            continue
+
+        if questionnaire_lime_survey is None:
+            questionnaire_lime_survey = Questionnaires()
+            if questionnaire_lime_survey.session_key is None:
+                return Questionnaires.ERROR_CODE, []
         result = get_questionnaire_language(
             questionnaire_lime_survey, questionnaire_id, current_language)
         if result == Questionnaires.ERROR_CODE:
@@ -974,9 +1026,11 @@ def get_questionnaire_fields(questionnaire_code_list, current_language='pt-BR'):
                         'field': question, 'header': question, 'description': description
                     })
                 index += 1
+            limesurvey_cache().set(cache_keys[questionnaire_id], record_question)
             questionnaires_included.append(record_question)
 
-    questionnaire_lime_survey.release_session_key()
+    if questionnaire_lime_survey is not None:
+        questionnaire_lime_survey.release_session_key()
 
     return 0, questionnaires_included
 
@@ -996,6 +1050,48 @@ def get_some_token(questionnaire_lime_survey, questionnaire_id):
     return token
 
 
+def save_participant_selection(request, participants_list):
+    """Store the participants of participants_list as the selection of the
+    user, keeping only the id of the selection in the session.
+    :return: number of participants selected
+    """
+    ParticipantSelection.objects.filter(user=request.user).delete()
+    selection = ParticipantSelection.objects.create(user=request.user)
+    through = ParticipantSelection.patients.through
+    selected = [
+        through(participantselection_id=selection.id, patient_id=patient_id)
+        for patient_id in participants_list.order_by().values_list('id', flat=True).distinct()
+    ]
+    through.objects.bulk_create(selected)
+
+    request.session['participant_selection'] = selection.id
+    if 'filtered_participant_data' in request.session:
+        del request.session['filtered_participant_data']
+
+    return len(selected)
+
+
+def get_participant_selection(request):
+    """Ids of the participants selected by the user, or None if there is no
+    selection in the session
+    """
+    if 'participant_selection' in request.session:
+        return Patient.objects.filter(
+            participantselection=request.session['participant_selection'],
+            participantselection__user=request.user
+        ).values_list('id', flat=True)
+    # selection stored by previous versions
+    if 'filtered_participant_data' in request.session:
+        return request.session['filtered_participant_data']
+    return None
+
+
+def clear_participant_selection(request):
+    for key in ['participant_selection', 'filtered_participant_data']:
+        if key in request.session:
+            del request.session[key]
+
+
 @login_required
 def filter_participants(request):
     participant_selection_form = ParticipantsSelectionForm(None)
@@ -1008,22 +1104,12 @@ def filter_participants(request):
             participants_list = Patient.objects.filter(removed=False)
             # selecting participants according the study/experiment/group
             if 'study_selected_list' in request.session:
-                subject_list = []
-                study_selected_list = request.session['study_selected_list'][0]
-                for study in study_selected_list:
-                    group_id = study.split('-')[2]
-                    subject_of_group = SubjectOfGroup.objects.filter(group_id=group_id)
-
-                    for subject in subject_of_group:
-                        patient = subject.subject.patient
-                        if patient.id not in subject_list:
-                            subject_list.append(patient.id)
-
-                participants_list = participants_list.filter(pk__in=subject_list)
+                group_ids = [study.split('-')[2] for study in request.session['study_selected_list'][0]]
+                participants_list = participants_list.filter(subject__subjectofgroup__group_id__in=group_ids)
 
             if request.POST['type_of_selection_radio'] == 'selected':
 
-                total_of_participants = len(participants_list)
+                total_of_participants = participants_list.distinct().count()
 
                 # selecting participants according the filters
                 if 'gender_checkbox' in request.POST and 'gender' in request.POST:
@@ -1048,19 +1134,23 @@ def filter_participants(request):
                     classification_of_diseases_list = request.POST.getlist('selected_diagnoses')
 
                     participants_list = participants_list.filter(
-                        medicalrecorddata__diagnosis__classification_of_diseases__in=classification_of_diseases_list).\
-                        distinct()
+                        medicalrecorddata__diagnosis__classification_of_diseases__in=classification_of_diseases_list)
 
-                # putting the list of participants in the user session
-                request.session['filtered_participant_data'] = [item.id for item in participants_list]
+                # putting the selection of participants in the database, and
+                # its id in the user session
+                total_of_selected_participants = save_participant_selection(request, participants_list)
 
                 context = {
-                    'total_of_participants': total_of_participants, 'participants_list': participants_list
+                    'total_of_participants': total_of_participants,
+                    'total_of_selected_participants': total_of_selected_participants,
+                    'participants_list': Patient.objects.filter(
+                        participantselection=request.session['participant_selection']
+                    ).select_related('gender', 'marital_status')
                 }
                 return render(request, 'export/show_selected_participants.html', context)
 
             else:
-                request.session['filtered_participant_data'] = [item.id for item in participants_list]
+                save_participant_selection(request, participants_list)
 
                 redirect_url = reverse('export_view', args=())
                 return HttpResponseRedirect(redirect_url)
@@ -1111,11 +1201,28 @@ def export_menu(request, template_name='export/export_menu.html'):
     if 'group_selected_list' in request.session.keys():
         del request.session['group_selected_list']
 
+    # an export starts: the questions may have been edited in LimeSurvey since the last one
+    invalidate_questionnaire_headers()
+
     context = {'export_type_list': export_type_list}
 
     return render(request, template_name, context)
 
 
+@login_required
+def export_profile(request, export_id):
+    """Time, database queries, LimeSurvey calls and bytes written by each stage of an export, as JSON. With the
+    download parameter the JSON is sent as a file.
+    """
+    export_instance = get_object_or_404(Export, pk=export_id, user=request.user)
+
+    response = HttpResponse(export_instance.profile or json.dumps({'stages': []}), content_type='application/json')
+    if 'download' in request.GET:
+        response['Content-Disposition'] = 'attachment; filename="export_%s_profile.json"' % export_instance.id
+
+    return response
+
+
 @login_required
 def experiment_selection(request, template_name='export/experiment_selection.html'):
     research_projects = ResearchProject.objects.order_by('start_date')
@@ -1127,20 +1234,11 @@ def experiment_selection(request, template_name='export/experiment_selection.htm
     if request.method == 'POST':
         participants_list = Patient.objects.filter(removed=False)
         if request.POST['action'] == 'next-step-participants':
-            subject_list = []
             groups_selected = request.POST.getlist('group_selected')
             request.session['group_selected_list'] = groups_selected
             if groups_selected:
-                for group_selected_id in groups_selected:
-                    group_selected = Group.objects.filter(pk=group_selected_id)
-                    subject_of_groups = SubjectOfGroup.objects.filter(group=group_selected)
-                    for subject_of_group in subject_of_groups:
-                        patient = subject_of_group.subject.patient
-                        if patient.id not in subject_list:
-                            subject_list.append(patient.id)
-
-                participants_list = participants_list.filter(pk__in=subject_list)
-                request.session['filtered_participant_data'] = [item.id for item in participants_list]
+                participants_list = participants_list.filter(subject__subjectofgroup__group_id__in=groups_selected)
+                save_participant_selection(request, participants_list)
                 request.session['license'] = request.POST.get('license')
                 redirect_url = reverse('export_view', args=())
                 return HttpResponseRedirect(redirect_url)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-19 21:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0009_questionnaireresponse_completion_synced_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionnaireresponse',
+            name='acquisitiondate_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -644,6 +644,11 @@ class QuestionnaireResponse(models.Model):
     questionnaire_responsible = models.ForeignKey(
         User, null=False, related_name='+')
     is_completed = models.CharField(null=False, max_length=50, default='')
+    # when is_completed was last read from LimeSurvey (see survey.completion)
+    completion_synced_at = models.DateTimeField(null=True, blank=True)
+    # when date was last read from the acquisition date of the completed
+    # response in LimeSurvey
+    acquisitiondate_synced_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         permissions = (
@@ -75,14 +75,20 @@ class QuestionnaireFillTest(TestCase):
 
             self.assertIn('09-01-2014', response.context['URL'])
 
+    @staticmethod
+    def _set_acquisitiondate_mocks(mockServer):
+        mockServer.return_value.list_participants.return_value = [
+            {'tid': '1', 'token': 'abc', 'completed': '2018-05-15 15:51'}
+        ]
+        # "token","acquisitiondate"
+        # "abc","2019-01-03 00:00:00"
+        mockServer.return_value.export_responses.return_value = \
+            'InRva2VuIiwiYWNxdWlzaXRpb25kYXRlIgoiYWJjIiwiMjAxOS0wMS0wMyAwMDowMDowMCI='
+
     @patch('survey.abc_search_engine.Server')
     def test_view_questionnaires_updates_response_date_for_completed_fills(
             self, mockServer):
-        mockServer.return_value.get_participant_properties.return_value = \
-            {'token': 'abc', 'completed': '2018-05-15 15:51'}
-        # 2019-01-03 00:00:00
-        mockServer.return_value.export_responses_by_token.return_value = \
-            'ImFjcXVpc2l0aW9uZGF0ZSIKIjIwMTktMDEtMDMgMDA6MDA6MDAi'
+        self._set_acquisitiondate_mocks(mockServer)
 
         patient = UtilTests.create_patient(self.user)
         survey = UtilTests.create_survey(212121, True)
@@ -100,11 +106,7 @@ class QuestionnaireFillTest(TestCase):
     @patch('survey.abc_search_engine.Server')
     def test_view_questionnaires_updates_response_date_add_updated_key_to_context(
             self, mockServer):
-        mockServer.return_value.get_participant_properties.return_value = \
-            {'token': 'abc', 'completed': '2018-05-15 15:51'}
-        # 2019-01-03 00:00:00
-        mockServer.return_value.export_responses_by_token.return_value = \
-            'ImFjcXVpc2l0aW9uZGF0ZSIKIjIwMTktMDEtMDMgMDA6MDA6MDAi'
+        self._set_acquisitiondate_mocks(mockServer)
 
         patient = UtilTests.create_patient(self.user)
         survey = UtilTests.create_survey(212121, True)
@@ -123,11 +125,7 @@ class QuestionnaireFillTest(TestCase):
     @patch('survey.abc_search_engine.Server')
     def test_view_questionnaires_updates_response_date_display_tag_updated_in_template(
             self, mockServer):
-        mockServer.return_value.get_participant_properties.return_value = \
-            {'token': 'abc', 'completed': '2018-05-15 15:51'}
-        # 2019-01-03 00:00:00
-        mockServer.return_value.export_responses_by_token.return_value = \
-            'ImFjcXVpc2l0aW9uZGF0ZSIKIjIwMTktMDEtMDMgMDA6MDA6MDAi'
+        self._set_acquisitiondate_mocks(mockServer)
 
         patient = UtilTests.create_patient(self.user)
         survey = UtilTests.create_survey(212121, True)
@@ -139,3 +137,31 @@ class QuestionnaireFillTest(TestCase):
 
         self.assertContains(response, 'Atualizado', 1)
         self.assertRegex(str(response.content), 'class=.+blink')
+
+    @patch('survey.abc_search_engine.Server')
+    def test_view_questionnaires_reads_acquisition_dates_once(self, mockServer):
+        self._set_acquisitiondate_mocks(mockServer)
+
+        patient = UtilTests.create_patient(self.user)
+        survey = UtilTests.create_survey(212121, True)
+        # titles already in NES, so find_questionnaire_name doesn't read them
+        survey.en_title = survey.pt_title = 'Questionnaire'
+        survey.save()
+        UtilTests.create_response_survey(self.user, patient, survey, 1)
+        UtilTests.create_response_survey(self.user, patient, survey, 2)
+
+        url = reverse('patient_edit', args=(patient.pk,))
+        self.client.get(url, data={'currentTab': 4})
+        self.assertEqual(mockServer.return_value.list_participants.call_count, 1)
+        self.assertEqual(mockServer.return_value.export_responses.call_count, 1)
+
+        mockServer.reset_mock()
+        response = self.client.get(url, data={'currentTab': 4})
+
+        self.assertEqual(mockServer.return_value.mock_calls, [])
+        self.assertTrue(response.context['limesurvey_available'])
+        self.assertFalse(response.context[
+                             'patient_questionnaires_data_list'
+                         ][0]['questionnaire_responses'][0][
+                             'acquisitiondate_updated'
+                         ])
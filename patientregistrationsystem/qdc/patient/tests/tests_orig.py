@@ -14,7 +14,6 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.messages.api import MessageFailure
 from django.contrib.messages.storage.fallback import FallbackStorage
-from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
@@ -45,6 +44,7 @@ from patient.views import medical_record_view, medical_record_update, \
     patient_update, patient_view, restore_patient, reverse, \
     check_limesurvey_access
 from survey.abc_search_engine import Questionnaires
+from survey.limesurvey_cache import QUESTION_GROUPS, SURVEY_TITLE, limesurvey_cache, limesurvey_cache_key
 from survey.models import Survey
 from update_english_data import translate_fixtures_into_english, \
     update_translated_data
@@ -1659,8 +1659,10 @@ class QuestionnaireFormValidation(TestCase):
 
     @patch('survey.abc_search_engine.Server')
     @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-                                           'LOCATION': 'limesurveycache',
-                                           'TIMEOUT': 0}})
+                                           'LOCATION': 'limesurveycache'},
+                               'limesurvey': {'BACKEND': 'qdc.tiered_cache.TieredCache',
+                                              'LOCATION': 'default',
+                                              'TIMEOUT': 0}})
     def test_entrance_ev_response_complete_without_cache(self, mockServer):
         """Test view of questionnaire response when questionnaire is complete
         of the type: entrance evaluation questionnaire and no information
@@ -1677,20 +1679,20 @@ class QuestionnaireFormValidation(TestCase):
         url2 = url1.replace('experiment', 'patient')
         response = self.client.get(url2 + "?origin=subject&status=edit")
         self.assertEqual(response.status_code, 200)
-        self.assertIsNone(cache.get(
-            "pt-br" + "-" + str(survey_mock.lime_survey_id) + "-"
-            + str(response_survey_mock.token_id) + "_survey_title_participant")
+        self.assertIsNone(limesurvey_cache().get(
+            limesurvey_cache_key(SURVEY_TITLE, survey_mock.lime_survey_id, 'pt-br'))
         )
-        self.assertIsNone(cache.get(
-            "pt-br" + "-" + str(survey_mock.lime_survey_id) + "-"
-            + str(response_survey_mock.token_id) + "_group_of_questions_participant")
+        self.assertIsNone(limesurvey_cache().get(
+            limesurvey_cache_key(QUESTION_GROUPS, survey_mock.lime_survey_id, 'pt-br', response_survey_mock.token_id))
         )
         self.assertEqual(response_survey_mock.token_id, response.context["questionnaire_response"].token_id)
 
     @patch('survey.abc_search_engine.Server')
     @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-                                           'LOCATION': 'limesurveycache',
-                                           'TIMEOUT': 60}})
+                                           'LOCATION': 'limesurveycache'},
+                               'limesurvey': {'BACKEND': 'qdc.tiered_cache.TieredCache',
+                                              'LOCATION': 'default',
+                                              'TIMEOUT': 60}})
     def test_entrance_ev_response_complete_with_cache(self, mockServer):
         """Test view of questionnaire response when questionnaire is complete
         of the type: entrance evaluation questionnaire getting information
@@ -1707,13 +1709,11 @@ class QuestionnaireFormValidation(TestCase):
         url2 = url1.replace('experiment', 'patient')
         response = self.client.get(url2 + "?origin=subject&status=edit")
         self.assertEqual(response.status_code, 200)
-        self.assertIsNotNone(cache.get(
-            "pt-br" + "-" + str(survey_mock.lime_survey_id) + "-"
-            + str(response_survey_mock.token_id) + "_survey_title_participant")
+        self.assertIsNotNone(limesurvey_cache().get(
+            limesurvey_cache_key(SURVEY_TITLE, survey_mock.lime_survey_id, 'pt-br'))
         )
-        self.assertIsNotNone(cache.get(
-            "pt-br" + "-" + str(survey_mock.lime_survey_id) + "-"
-            + str(response_survey_mock.token_id) + "_group_of_questions_participant")
+        self.assertIsNotNone(limesurvey_cache().get(
+            limesurvey_cache_key(QUESTION_GROUPS, survey_mock.lime_survey_id, 'pt-br', response_survey_mock.token_id))
         )
         self.assertEqual(response_survey_mock.token_id, response.context["questionnaire_response"].token_id)
 
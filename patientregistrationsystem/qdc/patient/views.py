@@ -14,8 +14,8 @@ from django.forms.models import inlineformset_factory
 from django.http import HttpResponseRedirect
 from django.shortcuts import render, render_to_response, get_object_or_404
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import ugettext as _
-from django.core.cache import cache
 
 from experiment.models import Subject, SubjectOfGroup, \
     QuestionnaireResponse as ExperimentQuestionnaireResponse, Questionnaire
@@ -28,11 +28,13 @@ from patient.models import Patient, Telephone, SocialDemographicData,\
     SocialHistoryData, MedicalRecordData, ClassificationOfDiseases, Diagnosis,\
     ExamFile, ComplementaryExam, QuestionnaireResponse
 
-from survey.abc_search_engine import Questionnaires
+from survey.abc_search_engine import LazyQuestionnaires, Questionnaires
+from survey.completion import experiment_responses_by_survey, is_response_completed, refresh_stale_completion
+from survey.limesurvey_cache import invalidate_question_groups
 from survey.models import Survey
 from survey.survey_utils import find_questionnaire_name
-from survey.views import get_questionnaire_responses, check_limesurvey_access, \
-    get_questionnaire_language, csv_to_list
+from survey.views import get_cached_questionnaire_responses, \
+    check_cached_limesurvey_access, get_questionnaire_language, csv_to_list, update_acquisitiondate
 
 # pylint: disable=E1101
 # pylint: disable=E1103
@@ -459,8 +461,8 @@ def patient_view_questionnaires(request, patient, context, is_update):
     if is_update and request.method == 'POST':
         return finish_handling_post(request, patient.id, 4)
 
-    surveys = Questionnaires()
-    limesurvey_available = check_limesurvey_access(request, surveys)
+    # Logs in to LimeSurvey only if some completion or acquisition date must be read
+    surveys = LazyQuestionnaires()
     patient_questionnaires_data_dictionary = {}
     initial_evaluation_list = Survey.objects.filter(is_initial_evaluation=True)
     language_code = request.LANGUAGE_CODE
@@ -479,7 +481,14 @@ def patient_view_questionnaires(request, patient, context, is_update):
 
     # ...after, add questionnaire responses
     questionnaire_responses = \
-        QuestionnaireResponse.objects.filter(patient=patient).order_by('date')
+        QuestionnaireResponse.objects.filter(patient=patient).order_by('date').select_related('survey')
+
+    # Completion of the responses not completed yet is read from LimeSurvey once per survey
+    responses_by_survey = {}
+    for questionnaire_response in questionnaire_responses:
+        responses_by_survey.setdefault(questionnaire_response.survey.lime_survey_id, []).append(questionnaire_response)
+    refresh_stale_completion(responses_by_survey, surveys)
+    acquisitiondate_updated = sync_acquisition_dates(responses_by_survey, surveys, language_code)
 
     for questionnaire_response in questionnaire_responses:
         limesurvey_id = questionnaire_response.survey.lime_survey_id
@@ -494,29 +503,14 @@ def patient_view_questionnaires(request, patient, context, is_update):
                     'questionnaire_responses': []
                 }
 
-        properties = surveys.get_participant_properties(
-            limesurvey_id, questionnaire_response.token_id)
-        if properties:
-            update_completed_status(
-                limesurvey_id, properties['completed'],
-                questionnaire_response)
-            language = get_questionnaire_language(
-                surveys, limesurvey_id, language_code)
-            acquisitiondate_updated = update_acquisition_date(
-                limesurvey_id, properties['token'],
-                questionnaire_response, language)
-
-            response_result = questionnaire_response.is_completed
-
-            patient_questionnaires_data_dictionary[
-                limesurvey_id
-            ]['questionnaire_responses'].append({
-                'questionnaire_response': questionnaire_response,
-                'token_id': questionnaire_response.token_id,
-                'completed': None if response_result is None
-                else response_result != 'N' and response_result != '',
-                'acquisitiondate_updated': acquisitiondate_updated
-            })
+        patient_questionnaires_data_dictionary[
+            limesurvey_id
+        ]['questionnaire_responses'].append({
+            'questionnaire_response': questionnaire_response,
+            'token_id': questionnaire_response.token_id,
+            'completed': is_response_completed(questionnaire_response),
+            'acquisitiondate_updated': questionnaire_response.pk in acquisitiondate_updated
+        })
 
     patient_questionnaires_data_list = []
     # Transforming the dictionary to a list in order to sort
@@ -549,6 +543,10 @@ def patient_view_questionnaires(request, patient, context, is_update):
     questionnaires_data = []
     subject = Subject.objects.filter(patient=patient)
     subject_of_group_list = SubjectOfGroup.objects.filter(subject=subject)
+    refresh_stale_completion(
+        experiment_responses_by_survey(
+            ExperimentQuestionnaireResponse.objects.filter(subject_of_group__in=subject_of_group_list)),
+        surveys)
     for subject_of_group in subject_of_group_list:
         experiment_questionnaire_responses = \
             ExperimentQuestionnaireResponse.objects.filter(
@@ -556,18 +554,6 @@ def patient_view_questionnaires(request, patient, context, is_update):
         for questionnaire_response in experiment_questionnaire_responses:
             component_configuration = \
                 questionnaire_response.data_configuration_tree.component_configuration
-            limesurvey_id = \
-                component_configuration.component.questionnaire.survey.lime_survey_id
-
-            if questionnaire_response.is_completed == 'N' \
-                    or questionnaire_response.is_completed == '':
-                is_completed = surveys.get_participant_properties(
-                    limesurvey_id, questionnaire_response.token_id,
-                    'completed') or ''
-                questionnaire_response.is_completed = is_completed
-                questionnaire_response.save()
-
-            response_result = questionnaire_response.is_completed
 
             questionnaires_data.append({
                     'research_project_title':
@@ -580,9 +566,9 @@ def patient_view_questionnaires(request, patient, context, is_update):
                         language_code)["name"],
                     'questionnaire_response': questionnaire_response,
                     'token_id': questionnaire_response.token_id,
-                    'completed': None if response_result is None
-                    else response_result != 'N' and response_result != ''
+                    'completed': is_response_completed(questionnaire_response)
                 })
+    limesurvey_available = check_cached_limesurvey_access(request, surveys)
     surveys.release_session_key()
     context.update({
         'patient_questionnaires_data_list': patient_questionnaires_data_list,
@@ -595,6 +581,47 @@ def patient_view_questionnaires(request, patient, context, is_update):
     return render(request, "patient/register_questionnaires.html", context)
 
 
+def sync_acquisition_dates(responses_by_survey, surveys, language_code):
+    """Update the date of the completed responses whose acquisition date was
+    not read from LimeSurvey yet, with one export of the responses of each
+    survey, and mark them synced so the next views don't read it again
+    :param responses_by_survey: dict with a list of questionnaire responses by
+    LimeSurvey id of their survey
+    :param surveys: Questionnaires instance
+    :param language_code: language of the user
+    :return: set with the ids of the responses whose date was updated
+    """
+    responses_updated = set()
+    for limesurvey_id, responses in responses_by_survey.items():
+        responses_not_synced = [
+            questionnaire_response for questionnaire_response in responses
+            if is_response_completed(questionnaire_response) and
+            questionnaire_response.acquisitiondate_synced_at is None
+        ]
+        if not responses_not_synced:
+            continue
+
+        tokens = surveys.find_tokens_by_questionnaire(limesurvey_id)
+        if tokens is None:
+            continue
+        language = get_questionnaire_language(surveys, limesurvey_id, language_code)
+        ls_responses = surveys.get_responses(limesurvey_id, language)
+        if ls_responses is None:
+            continue
+
+        for questionnaire_response in update_acquisitiondate(tokens, ls_responses, responses_not_synced):
+            responses_updated.add(questionnaire_response.pk)
+
+        now = timezone.now()
+        QuestionnaireResponse.objects.filter(
+            pk__in=[questionnaire_response.pk for questionnaire_response in responses_not_synced]
+        ).update(acquisitiondate_synced_at=now)
+        for questionnaire_response in responses_not_synced:
+            questionnaire_response.acquisitiondate_synced_at = now
+
+    return responses_updated
+
+
 def update_completed_status(
         limesurvey_id, is_completed, questionnaire_response):
     if questionnaire_response.is_completed == 'N' \
@@ -1240,23 +1267,9 @@ def questionnaire_response_view(
                 token_id=questionnaire_response.token_id,
                 data_configuration_tree__component_configuration__component__in=questionnaire_component_list).exists()
 
-    survey_title_key = \
-        request.LANGUAGE_CODE + "-" + str(questionnaire_response.survey.lime_survey_id) + \
-        "-" + str(questionnaire_response.token_id) + "_survey_title_participant"
-    groups_of_questions_key = \
-        request.LANGUAGE_CODE + "-" + str(questionnaire_response.survey.lime_survey_id) + \
-        "-" + str(questionnaire_response.token_id) + "_group_of_questions_participant"
-
-    survey_title = cache.get(survey_title_key)
-    groups_of_questions = cache.get(groups_of_questions_key)
-
-    if not survey_title or not groups_of_questions:
-        survey_title, groups_of_questions = get_questionnaire_responses(
-            request.LANGUAGE_CODE, questionnaire_response.survey.lime_survey_id,
-            questionnaire_response.token_id, request)
-
-        cache.set(survey_title_key, survey_title)
-        cache.set(groups_of_questions_key, groups_of_questions)
+    survey_title, groups_of_questions = get_cached_questionnaire_responses(
+        request.LANGUAGE_CODE, questionnaire_response.survey.lime_survey_id,
+        questionnaire_response.token_id, request)
 
     context = {
         "questionnaire_response_form": questionnaire_response_form,
@@ -1530,6 +1543,9 @@ def check_required_fields(surveys, lime_survey_id):
 
 
 def get_limesurvey_response_url(questionnaire_response):
+    # the responses shown by questionnaire_response_view change once filled
+    invalidate_question_groups(questionnaire_response.survey.lime_survey_id, questionnaire_response.token_id)
+
     questionnaire_lime_survey = Questionnaires()
     token = questionnaire_lime_survey.get_participant_properties(
         questionnaire_response.survey.lime_survey_id,
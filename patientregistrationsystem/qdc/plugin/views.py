@@ -17,7 +17,7 @@ from experiment.views import get_block_tree
 from export.forms import ExportForm
 from export.input_export import build_complete_export_structure
 from export.models import Export
-from export.views import PATIENT_FIELDS, get_questionnaire_fields, export_create
+from export.views import PATIENT_FIELDS, get_questionnaire_fields, export_create, clear_participant_selection
 from patient.models import QuestionnaireResponse as IndependentResponse
 from plugin.models import RandomForests
 from survey.abc_search_engine import Questionnaires
@@ -215,8 +215,7 @@ def send_to_plugin(request, template_name='plugin/send_to_plugin.html'):
             request.session['group_selected_list'] = [str(group_id) for group_id in list(group_ids)]
             request.session['license'] = 0
             # Need to delete before call export_create method
-            if 'filtered_participant_data' in request.session:
-                del request.session['filtered_participant_data']
+            clear_participant_selection(request)
             participants_headers = update_patient_attributes(request.POST.getlist('patient_selected'))
             # TODO (NES-995): build always in English, but possibly not hard coded
             limesurvey_error, questionnaires = build_questionnaires_list('en', group_ids)
@@ -1,33 +1,166 @@
 # check if exist a NES new version
 
+import logging
+import os
+import platform
+import threading
+from distutils.version import StrictVersion
+
 from django.conf import settings
-from git import Repo
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from git import GitCommandError, Repo
+
+logger = logging.getLogger(__name__)
+
+# Latest version known, as stored by check_upgrade: a dict with 'git' (False
+# without a NES git installation), 'current_tag', 'latest_tag', 'new_version'
+# and 'checked_at'
+UPGRADE_CHECK_CACHE_KEY = 'upgrade_check'
+
+# Set while a process refreshes the latest version known
+UPGRADE_CHECK_LOCK_CACHE_KEY = 'upgrade_check_lock'
+
+# State of the last upgrade_nes job: a dict with 'status' ('running',
+# 'finished' or 'failed'), 'log' (file with its output), 'pid' (process of the
+# command, None until it starts), 'started_at', 'finished_at' and 'tag'
+UPGRADE_JOB_CACHE_KEY = 'upgrade_nes_job'
+
+# Set while a request starts an upgrade_nes job
+UPGRADE_START_LOCK_CACHE_KEY = 'upgrade_nes_start_lock'
+
+# Seconds the upgrade_nes command may take to record its process, and to
+# upgrade NES. A job running longer is taken as failed.
+UPGRADE_START_TIMEOUT = 60
+UPGRADE_TIMEOUT = 60 * 60
+
+# Seconds git may take to fetch the tags of the NES repository
+FETCH_TIMEOUT = 60
+
+
+def get_nes_directory_path():
+    path_repo = '/'
+    if 'Windows' in platform.system():
+        path_repo = ''
+    base_dir = settings.BASE_DIR.split('/')
+    if 'nes' in base_dir:
+        path_git_repo = []
+        for item in base_dir:
+            if item != 'nes' and item != '':
+                path_git_repo.append(item)
+            if item == 'nes':
+                path_git_repo.append(item)
+                break
+
+        for item in path_git_repo:
+            path_repo = path_repo + item + '/'
+
+    return path_repo
+
+
+def latest_version_tag(git):
+    return sorted(git.tag().split('\n'), key=lambda s: list(map(int, s.replace('-', '.').split('.')[1:])))[-1]
 
 
 def check_upgrade():
-    repo = Repo("/Users/mruizo/PycharmProjects/nes/.git")
-    for remote in repo.remotes:
-        remote.fetch()
-
-    tags = sorted(repo.tags, key=lambda t: t.commit.committed_datetime)
-
-    remote_version = str(tags[-1]).split('-')[-1]
-    remote_version = remote_version.split('.')
-    current_version = settings.VERSION.split('.')
-    print(remote_version)
-    print(current_version)
-    if int(remote_version[0]) == int(current_version[0]):
-        if int(remote_version[1]) > int(current_version[1]):
-            return True
-        else:
-            if int(remote_version[1]) == int(current_version[1]):
-                if int(remote_version[2]) > int(current_version[2]):
-                    return True
-                else:
-                    if int(remote_version[2]) == int(current_version[2]):
-                        return False
-    else:
-        if int(remote_version[0]) > int(current_version[0]):
-            return True
+    """Fetch the tags of the NES repository and store the latest version known
+    in the cache. Run periodically by the check_nes_upgrade command, and in
+    the background when the version stored is older than
+    settings.UPGRADE_CHECK_INTERVAL.
+    :return: the latest version known, see UPGRADE_CHECK_CACHE_KEY
+    """
+    path_git_repo_local = get_nes_directory_path()
+    upgrade_check = {'git': False, 'current_tag': None, 'latest_tag': None, 'new_version': False}
+
+    if '.git' in os.listdir(path_git_repo_local):
+        upgrade_check['git'] = True
+        repo = Repo(path_git_repo_local)
+        git = repo.git
+        current_tag = git.describe()
+        upgrade_check['current_tag'] = current_tag
+        if current_tag in repo.tags:
+            try:
+                git.fetch('origin', '--tags', kill_after_timeout=FETCH_TIMEOUT)
+            except GitCommandError:
+                # keep the latest version known until the remote answers
+                logger.warning('Fetching the tags of the NES repository', exc_info=True)
+                return cache.get(UPGRADE_CHECK_CACHE_KEY)
+            latest_tag = latest_version_tag(git)
+            upgrade_check['latest_tag'] = latest_tag
+            upgrade_check['new_version'] = \
+                StrictVersion(current_tag.split('-')[-1]) < StrictVersion(latest_tag.split('-')[-1])
+
+    upgrade_check['checked_at'] = timezone.now()
+    cache.set(UPGRADE_CHECK_CACHE_KEY, upgrade_check, None)
+
+    return upgrade_check
+
+
+def _check_upgrade_in_background():
+    try:
+        check_upgrade()
+    except Exception:
+        logger.exception('Checking NES upgrade')
+    finally:
+        cache.delete(UPGRADE_CHECK_LOCK_CACHE_KEY)
+        connection.close()
+
+
+def process_is_running(pid):
+    if os.name != 'posix':
+        # only the timeouts tell a dead job
+        return True
+    try:
+        # the upgrade_nes processes started by this process are reaped here
+        return os.waitpid(pid, os.WNOHANG)[0] != pid
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def get_upgrade_job():
+    """State of the last upgrade_nes job, with status 'failed' for a running
+    job whose process died, that didn't start in UPGRADE_START_TIMEOUT
+    seconds or that runs for more than UPGRADE_TIMEOUT seconds
+    :return: the state of the job, see UPGRADE_JOB_CACHE_KEY | None if NES was
+    never upgraded
+    """
+    job = cache.get(UPGRADE_JOB_CACHE_KEY)
+
+    if job is not None and job['status'] == 'running':
+        seconds_running = (timezone.now() - job['started_at']).total_seconds()
+        if job.get('pid') is None:
+            dead = seconds_running > UPGRADE_START_TIMEOUT
         else:
-            return False
+            dead = seconds_running > UPGRADE_TIMEOUT or not process_is_running(job['pid'])
+        if dead:
+            job['status'] = 'failed'
+
+    return job
+
+
+def get_upgrade_check():
+    """Latest version known, without waiting for the NES repository. When it
+    is missing or older than settings.UPGRADE_CHECK_INTERVAL a thread checks
+    it again, for the next requests.
+    :return: the latest version known, see UPGRADE_CHECK_CACHE_KEY | None if
+    it was never checked
+    """
+    upgrade_check = cache.get(UPGRADE_CHECK_CACHE_KEY)
+
+    interval = settings.UPGRADE_CHECK_INTERVAL
+    if interval is not None and (
+            upgrade_check is None or
+            (timezone.now() - upgrade_check['checked_at']).total_seconds() > interval):
+        # only one process checks at a time; the lock expires if it dies
+        if cache.add(UPGRADE_CHECK_LOCK_CACHE_KEY, True, FETCH_TIMEOUT * 2):
+            threading.Thread(target=_check_upgrade_in_background, daemon=True).start()
+
+    return upgrade_check
@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class QueryCountingCursor:
+    """Cursor counting the queries executed through it in each counter"""
+
+    def __init__(self, cursor, counters):
+        self.cursor = cursor
+        self.counters = counters
+
+    def _count(self):
+        for counter in self.counters:
+            counter['queries'] += 1
+
+    def execute(self, *args, **kwargs):
+        self._count()
+        return self.cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._count()
+        return self.cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.cursor.__exit__(exc_type, exc_value, traceback)
+
+
+@contextmanager
+def count_queries(counter, using=DEFAULT_DB_ALIAS):
+    """Add to counter['queries'] the queries run in the context through the
+    connection using, of the current thread. Django 1.11 has no
+    connection.execute_wrapper, so the cursors of the connection are wrapped.
+    Contexts may be nested, each counter counts the queries once.
+    """
+    connection = connections[using]
+    counters = connection.__dict__.get('query_counters')
+    if counters is not None and any(other is counter for other in counters):
+        # already counting
+        yield
+        return
+
+    outermost = counters is None
+    if outermost:
+        counters = connection.query_counters = []
+        cursor, chunked_cursor = connection.cursor, connection.chunked_cursor
+        connection.cursor = lambda: QueryCountingCursor(cursor(), counters)
+        connection.chunked_cursor = lambda: QueryCountingCursor(chunked_cursor(), counters)
+
+    counters.append(counter)
+    try:
+        yield
+    finally:
+        counters.pop()
+        if outermost:
+            del connection.cursor
+            del connection.chunked_cursor
+            del connection.query_counters
@@ -113,9 +113,33 @@ CACHES = {
         'LOCATION': 'limesurveycache',
         'TIMEOUT': 24*60*60,
 
+    },
+    # Cache shared by the NES processes for the data read from LimeSurvey:
+    # its own table, apart from the default cache, or memcached when
+    # LIMESURVEY_CACHE_SERVERS is set (see below)
+    'limesurvey_shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'limesurveysharedcache',
+        'TIMEOUT': 24*60*60,
+    },
+    # Data read from LimeSurvey (see survey.limesurvey_cache), kept in the
+    # memory of each process in front of the shared cache
+    'limesurvey': {
+        'BACKEND': 'qdc.tiered_cache.TieredCache',
+        'LOCATION': 'limesurvey_shared',
+        'KEY_PREFIX': 'limesurvey',
+        'TIMEOUT': 24*60*60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+        }
     }
 }
 
+# memcached servers (e.g. ['127.0.0.1:11211']) of the cache shared by the NES
+# processes for the data read from LimeSurvey. Empty to keep it in the database.
+LIMESURVEY_CACHE_SERVERS = []
+
 ROOT_URLCONF = 'qdc.urls'
 
 WSGI_APPLICATION = 'qdc.wsgi.application'
@@ -128,6 +152,21 @@ LIMESURVEY = {
     'PASSWORD': '',
 }
 
+# Seconds after which the completion of questionnaire responses not completed
+# yet is read again from LimeSurvey when they are shown or exported. With None
+# it is only read by the sync_questionnaire_completion command.
+QUESTIONNAIRE_COMPLETION_MAX_AGE = 300
+
+# Seconds the LimeSurvey availability seen by a login is used by the views
+# that otherwise render without logging in to LimeSurvey
+LIMESURVEY_AVAILABLE_TTL = 60
+
+# Seconds the list of active questionnaires offered to be added to NES is kept
+# before it is read again from LimeSurvey, and number of LimeSurvey calls made
+# at the same time to read it
+ACTIVE_QUESTIONNAIRES_TTL = 60
+LIMESURVEY_MAX_CONCURRENT_CALLS = 8
+
 # Portal API configuration
 PORTAL_API = {
     'URL': '',
@@ -139,6 +178,29 @@ PORTAL_API = {
 # Show button to send experiments to Portal
 SHOW_SEND_TO_PORTAL_BUTTON = False
 
+# Seconds the Portal availability shown in the pages is kept before it is
+# checked again in the background. While the Portal is unavailable the
+# interval doubles after each failed check, up to PORTAL_STATUS_MAX_BACKOFF.
+PORTAL_STATUS_TTL = 60
+PORTAL_STATUS_MAX_BACKOFF = 30 * 60
+
+# Number of processes used to export the data collected in the groups of an
+# experiment. With 1 the groups are exported one after another.
+EXPORT_WORKERS = 1
+
+# Size in bytes of the cache of the files exported for the groups of an
+# experiment, reused by the next exports of a group while its data and the
+# export options don't change. With 0 nothing is cached.
+EXPORT_CACHE_SIZE = 0
+
+# Number of processes preparing the NWB files and images of the sensors
+# positions of the EEG data while the rest of an export goes on, and the memory
+# in bytes the preparations running at the same time may use (each NWB
+# conversion holds a whole recording). With 1 they are prepared one after
+# another.
+EXPORT_FILE_WORKERS = 1
+EXPORT_FILE_MEMORY_BUDGET = 2 * 2 ** 30
+
 # AUTH_USER_MODEL = 'quiz.UserProfile'
 # AUTH_PROFILE_MODULE = 'quiz.UserProfile'
 
@@ -206,9 +268,21 @@ ADMIN_MEDIA_PREFIX = STATIC_URL + 'admin/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Seconds after which the latest NES version known is checked again, in the
+# background, when a page needs it. With None only the check_nes_upgrade
+# command (run periodically, e.g. by cron) checks it.
+UPGRADE_CHECK_INTERVAL = 24 * 60 * 60
+
 try:
     from .settings_local import *
 except ImportError:
     pass
 
+if LIMESURVEY_CACHE_SERVERS:
+    CACHES['limesurvey_shared'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': LIMESURVEY_CACHE_SERVERS,
+        'TIMEOUT': 24*60*60,
+    }
+
 VERSION = '1.72.7'
@@ -34,6 +34,11 @@ LIMESURVEY = {
     'PASSWORD': 'limesurvey_password'
 }
 
+# memcached servers shared by the NES processes for the data read from
+# LimeSurvey. Empty to keep that data in the database.
+LIMESURVEY_CACHE_SERVERS = []
+# LIMESURVEY_CACHE_SERVERS = ['127.0.0.1:11211']
+
 # Settings to send emails
 EMAIL_USE_TLS = True
 EMAIL_HOST = 'smtp.example.com'
@@ -0,0 +1,163 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Seconds an entry is kept in the memory of a process by default
+DEFAULT_LOCAL_TIMEOUT = 60
+
+# The local tier, its lock and its counters are shared by the threads of a
+# process (Django creates a cache backend instance per thread)
+_local_tiers = {}
+_locks = {}
+_counters = {}
+
+_missing = object()
+
+
+class TieredCache(BaseCache):
+    """Cache with a tier in the memory of each process, least recently used
+    entries discarded first, in front of a cache shared by the processes.
+
+    LOCATION is the alias, in settings.CACHES, of the shared cache. Each
+    process keeps up to OPTIONS['MAX_ENTRIES'] entries for at most
+    OPTIONS['LOCAL_TIMEOUT'] seconds, so it sees the writes of the other
+    processes after that time at most. add always goes to the shared cache, so
+    it can still be used as a lock. The local tier is off with
+    settings.IS_TESTING: the tests roll the shared cache (a database) back
+    after each test, but not the memory of the process.
+    """
+
+    def __init__(self, location, params):
+        super(TieredCache, self).__init__(params)
+        self._shared_alias = location
+        options = params.get('OPTIONS', {})
+        self._local_timeout = 0 if settings.IS_TESTING else options.get('LOCAL_TIMEOUT', DEFAULT_LOCAL_TIMEOUT)
+
+        name = (location, self.key_prefix)
+        self._local = _local_tiers.setdefault(name, OrderedDict())
+        self._lock = _locks.setdefault(name, threading.Lock())
+        self._counters = _counters.setdefault(name, {'local_hits': 0, 'shared_hits': 0, 'misses': 0})
+
+    @property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _count(self, counter, n=1):
+        with self._lock:
+            self._counters[counter] += n
+
+    def _local_get(self, key):
+        """Pickled value of key in the local tier | None"""
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expiry, pickled = entry
+            if expiry <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            self._counters['local_hits'] += 1
+            return pickled
+
+    def _local_set(self, key, value, timeout):
+        local_timeout = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        if local_timeout <= 0:
+            self._local_delete(key)
+            return
+        # values are copied, as the shared tier does, so callers changing
+        # them don't change the cache
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (time.time() + local_timeout, pickled)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = self._local_get(key)
+        if pickled is not None:
+            return pickle.loads(pickled)
+
+        value = self._shared.get(key, _missing)
+        if value is _missing:
+            self._count('misses')
+            return default
+        self._count('shared_hits')
+        self._local_set(key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys_by_cache_key = {self.make_key(key, version=version): key for key in keys}
+        values = {}
+        for cache_key, key in keys_by_cache_key.items():
+            self.validate_key(cache_key)
+            pickled = self._local_get(cache_key)
+            if pickled is not None:
+                values[key] = pickle.loads(pickled)
+
+        shared_keys = [cache_key for cache_key, key in keys_by_cache_key.items() if key not in values]
+        if shared_keys:
+            shared_values = self._shared.get_many(shared_keys)
+            self._count('shared_hits', len(shared_values))
+            self._count('misses', len(shared_keys) - len(shared_values))
+            for cache_key, value in shared_values.items():
+                self._local_set(cache_key, value, None)
+                values[keys_by_cache_key[cache_key]] = value
+
+        return values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        timeout = self._timeout(timeout)
+        self._shared.set(key, value, timeout)
+        self._local_set(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        timeout = self._timeout(timeout)
+        added = self._shared.add(key, value, timeout)
+        if added:
+            self._local_set(key, value, timeout)
+        return added
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._shared.delete(key)
+        self._local_delete(key)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version=version) is not _missing
+
+    def clear(self):
+        """Clear the local tier of the process. The shared cache may keep
+        other data, so it is left as it is.
+        """
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        """Hits of each tier and misses of the process since it started,
+        and entries in its local tier
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['local_entries'] = len(self._local)
+        return stats
@@ -46,6 +46,8 @@ urlpatterns = [
     url(r'^i18n/', include('django.conf.urls.i18n')),
     url(r'^home/check_upgrade/$', qdcviews.check_upgrade, name='check_upgrade'),
     url(r'^home/upgrade_nes/$', qdcviews.upgrade_nes, name='check_upgrade'),
+    url(r'^home/upgrade_nes/log/$', qdcviews.upgrade_nes_log, name='upgrade_nes_log'),
+    url(r'^home/limesurvey_cache/stats/$', qdcviews.limesurvey_cache_stats, name='limesurvey_cache_stats'),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
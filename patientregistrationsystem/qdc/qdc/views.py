@@ -1,22 +1,29 @@
-import os
+import logging
+import subprocess
 import sys
-import platform
+import time
+from os import path
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from django.utils.translation import activate, LANGUAGE_SESSION_KEY, ugettext as _
 from django.utils.safestring import mark_safe
-from git import Repo
-import pip
-from django.core.management import call_command
-from django.db import DEFAULT_DB_ALIAS, connections
-from django.db.migrations.executor import MigrationExecutor
 from functools import partial
-from distutils.version import StrictVersion
+
+from qdc.check_upgrade import UPGRADE_JOB_CACHE_KEY, UPGRADE_START_LOCK_CACHE_KEY, UPGRADE_START_TIMEOUT, \
+    get_upgrade_check, get_upgrade_job
+from survey.limesurvey_cache import limesurvey_cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reads of the log of an upgrade while it runs
+UPGRADE_LOG_POLL_INTERVAL = 1
 
 permission_required = partial(permission_required, raise_exception=True)
 
@@ -72,100 +79,90 @@ def password_changed(request):
 
 @login_required
 def check_upgrade(request):
-    path_git_repo_local = get_nes_directory_path()
-    list_dir = os.listdir(path_git_repo_local)
-    new_version = False
-    if '.git' in list_dir:
-        repo = Repo(path_git_repo_local)
-        git = repo.git
-        current_tag = git.describe()
-        if current_tag in repo.tags:
-            repo.remotes.origin.fetch()
-            new_version_tag = \
-                sorted(git.tag().split('\n'), key=lambda s: list(map(int, s.replace('-', '.').split('.')[1:])))[-1]
-            new_version = StrictVersion(current_tag.split('-')[-1]) < StrictVersion(new_version_tag.split('-')[-1])
-
-    else:
+    # the latest version is checked in the background (see qdc.check_upgrade)
+    upgrade_check = get_upgrade_check()
+    if upgrade_check is None:
+        return False
+
+    if not upgrade_check['git']:
         messages.success(request, _("You dont have NES Git installation. Automatic upgrade can be done with git "
                                     "installation. "
                                     "Please contact your system administrator to upgrade NES to a new version."))
 
-    return new_version
-
+    return upgrade_check['new_version']
 
-def get_nes_directory_path():
-    path_repo = '/'
-    if 'Windows' in platform.system():
-        path_repo = ''
-    base_dir = settings.BASE_DIR.split('/')
-    if 'nes' in base_dir:
-        path_git_repo = []
-        for item in base_dir:
-            if item != 'nes' and item != '':
-                path_git_repo.append(item)
-            if item == 'nes':
-                path_git_repo.append(item)
-                break
 
-        for item in path_git_repo:
-            path_repo = path_repo + item + '/'
+def start_upgrade_job():
+    log_file = path.join(settings.BASE_DIR, 'upgrade.log')
+    job = {'status': 'running', 'log': log_file, 'pid': None, 'started_at': timezone.now(), 'finished_at': None,
+           'tag': None}
+    cache.set(UPGRADE_JOB_CACHE_KEY, job, None)
 
-    return path_repo
-
-
-def get_pending_migrations():
-    connection = connections[DEFAULT_DB_ALIAS]
-    connection.prepare_database()
-    executor = MigrationExecutor(connection)
-    targets = executor.loader.graph.leaf_nodes()
-    return executor.migration_plan(targets)
+    try:
+        with open(log_file, 'w') as log:
+            subprocess.Popen(
+                [sys.executable, path.join(settings.BASE_DIR, 'manage.py'), 'upgrade_nes'],
+                stdout=log, stderr=subprocess.STDOUT, cwd=settings.BASE_DIR or None, start_new_session=True)
+    except OSError:
+        logger.exception('Starting upgrade_nes')
+        job.update(status='failed', finished_at=timezone.now())
+        cache.set(UPGRADE_JOB_CACHE_KEY, job, None)
 
 
 @login_required
 @permission_required('configuration.upgrade_rights')
 def upgrade_nes(request):
+    """Start the upgrade_nes command in a new process, with its output in
+    upgrade.log, and show its log
+    """
+    # one request at a time checks the job and starts a new one
+    if cache.add(UPGRADE_START_LOCK_CACHE_KEY, True, UPGRADE_START_TIMEOUT):
+        try:
+            job = get_upgrade_job()
+            if job is None or job['status'] != 'running':
+                start_upgrade_job()
+        finally:
+            cache.delete(UPGRADE_START_LOCK_CACHE_KEY)
 
-    path_git_repo_local = get_nes_directory_path()
-    list_dir = os.listdir(path_git_repo_local)
-
-    # criate a log file in path_git_repo_local + 'patientregistrationsystem'
-    log_file = settings.BASE_DIR + '/upgrade.log'
-    log = open(log_file, "w")
-    sys.stdout = log
-
-    if '.git' in list_dir:
+    redirect_url = reverse("upgrade_nes_log", args=())
+    return HttpResponseRedirect(redirect_url)
 
-        repo = Repo(path_git_repo_local)
-        git = repo.git
 
-        new_version_tag = \
-            sorted(git.tag().split('\n'), key=lambda s: list(map(int, s.replace('-', '.').split('.')[1:])))[-1]
+def stream_upgrade_log(log_file):
+    with open(log_file) as log:
+        while True:
+            line = log.readline()
+            if line:
+                yield line
+                continue
 
-        repo.remotes.origin.fetch()
+            # get_upgrade_job tells when the process of the job died
+            job = get_upgrade_job()
+            if job is None or job['status'] != 'running':
+                yield log.read()
+                return
 
-        git.checkout(new_version_tag)
+            time.sleep(UPGRADE_LOG_POLL_INTERVAL)
 
-        try:
-            pip.main(['install', '-r', 'requirements.txt'])
-        except SystemExit as e:
-            pass
 
-        call_command('collectstatic', interactive=False, verbosity=0)
+@login_required
+@permission_required('configuration.upgrade_rights')
+def upgrade_nes_log(request):
+    """Output of the last upgrade, streamed while the upgrade runs"""
+    job = get_upgrade_job()
 
-        if get_pending_migrations():
-            call_command('migrate')
-        else:
-            print("There are not migrations")
+    if job is None or not path.exists(job['log']):
+        messages.info(request, _("NES was not upgraded yet."))
+        redirect_url = reverse("contact", args=())
+        return HttpResponseRedirect(redirect_url)
 
-        os.system('touch %spatientregistrationsystem/qdc/qdc/wsgi.py' % path_git_repo_local)
+    return StreamingHttpResponse(stream_upgrade_log(job['log']), content_type='text/plain; charset=utf-8')
 
-        # check if the current TAG is the latest tag
-        if git.describe() == new_version_tag:
-            messages.success(request, _("Updated!!! Enjoy the new version of NES  :-)"))
-            print("NES updated to " + new_version_tag)
-        else:
-            messages.info(request, _("An unknown error ocurred ! Please contact your administrator system."))
-            print("NES was not updated " + new_version_tag)
 
-    redirect_url = reverse("contact", args=())
-    return HttpResponseRedirect(redirect_url)
+@login_required
+@permission_required('configuration.upgrade_rights')
+def limesurvey_cache_stats(request):
+    """Hits and misses of the cache of LimeSurvey data in the process serving
+    the request, for monitoring
+    """
+    return JsonResponse(limesurvey_cache().stats())
@@ -1,10 +1,43 @@
 # coding=utf-8
 import re
+import threading
 from abc import abstractmethod, ABC
 from base64 import b64decode, b64encode
+from concurrent.futures import ThreadPoolExecutor
 from jsonrpc_requests import Server, TransportError
 from django.conf import settings
 
+from survey.limesurvey_cache import limesurvey_cache
+
+_calls = threading.local()
+
+# Active surveys with token table, as listed by find_all_active_questionnaires.
+# Deleted when a survey or its token table is activated through NES.
+ACTIVE_QUESTIONNAIRES_CACHE_KEY = 'limesurvey_active_questionnaires'
+
+
+def limesurvey_calls():
+    """Number of calls made to the LimeSurvey API by the current thread"""
+    return getattr(_calls, 'count', 0)
+
+
+class CountingServer:
+    """LimeSurvey API server counting the calls made to it (see
+    limesurvey_calls)
+    """
+
+    def __init__(self, server):
+        self.server = server
+
+    def __getattr__(self, name):
+        method = getattr(self.server, name)
+
+        def counted_method(*args, **kwargs):
+            _calls.count = limesurvey_calls() + 1
+            return method(*args, **kwargs)
+
+        return counted_method
+
 
 class ABCSearchEngine(ABC):
     QUESTION_PROPERTIES = [
@@ -20,7 +53,7 @@ class ABCSearchEngine(ABC):
         self.get_session_key()
 
     def get_session_key(self):
-        self.server = Server(self.limesurvey_rpc)
+        self.server = CountingServer(Server(self.limesurvey_rpc))
         try:
             self.session_key = self.server.get_session_key(
                 settings.LIMESURVEY['USER'], settings.LIMESURVEY['PASSWORD'])
@@ -46,22 +79,48 @@ class ABCSearchEngine(ABC):
     @abstractmethod
     def find_all_active_questionnaires(self):
         """
-        :return: all active surveys
+        :return: all active surveys with token table, kept in the cache for
+        settings.ACTIVE_QUESTIONNAIRES_TTL seconds | None if LimeSurvey
+        didn't list the surveys
         """
 
+        list_active_survey = limesurvey_cache().get(ACTIVE_QUESTIONNAIRES_CACHE_KEY)
+        if list_active_survey is not None:
+            return list_active_survey
+
         list_survey = self.server.list_surveys(self.session_key, None)
 
-        list_active_survey = []
+        if not isinstance(list_survey, list):
+            return None
 
-        if isinstance(list_survey, list):
-            for survey in list_survey:
-                if survey['active'] == "Y" and self.survey_has_token_table(survey['sid']):
-                    list_active_survey.append(survey)
-        else:
-            list_active_survey = None
+        # The token tables of the active surveys are checked concurrently, by
+        # at most settings.LIMESURVEY_MAX_CONCURRENT_CALLS threads
+        active_surveys = [survey for survey in list_survey if survey['active'] == "Y"]
+        with ThreadPoolExecutor(max_workers=settings.LIMESURVEY_MAX_CONCURRENT_CALLS) as executor:
+            results = list(executor.map(
+                self._survey_has_token_table_in_thread, [survey['sid'] for survey in active_surveys]))
+        # the calls made by the threads are counted in this thread
+        _calls.count = limesurvey_calls() + sum(calls for token_table, calls in results)
+        list_active_survey = [
+            survey for survey, (token_table, calls) in zip(active_surveys, results) if token_table
+        ]
+
+        limesurvey_cache().set(
+            ACTIVE_QUESTIONNAIRES_CACHE_KEY, list_active_survey, settings.ACTIVE_QUESTIONNAIRES_TTL)
 
         return list_active_survey
 
+    def _survey_has_token_table_in_thread(self, sid):
+        """survey_has_token_table run in a thread of
+        find_all_active_questionnaires
+        :return: (True if the survey has token table, number of calls made to
+        LimeSurvey by the thread)
+        """
+        calls = limesurvey_calls()
+        # each thread has its own connection, the session is shared
+        token_table = self._survey_has_token_table(CountingServer(Server(self.limesurvey_rpc)), sid)
+        return token_table, limesurvey_calls() - calls
+
     @abstractmethod
     def find_questionnaire_by_id(self, sid):
         """
@@ -161,6 +220,7 @@ class ABCSearchEngine(ABC):
         """
 
         result = self.server.activate_survey(self.session_key, sid)
+        limesurvey_cache().delete(ACTIVE_QUESTIONNAIRES_CACHE_KEY)
 
         return result['status']
 
@@ -172,6 +232,7 @@ class ABCSearchEngine(ABC):
         """
 
         result = self.server.activate_tokens(self.session_key, sid)
+        limesurvey_cache().delete(ACTIVE_QUESTIONNAIRES_CACHE_KEY)
 
         return result['status']
 
@@ -206,8 +267,10 @@ class ABCSearchEngine(ABC):
         :return: True if the survey has token table; False, if not.
         """
 
-        result = self.server.get_summary(
-            self.session_key, sid, "token_completed")
+        return self._survey_has_token_table(self.server, sid)
+
+    def _survey_has_token_table(self, server, sid):
+        result = server.get_summary(self.session_key, sid, "token_completed")
         return isinstance(result, int)
 
     @abstractmethod
@@ -466,6 +529,20 @@ class ABCSearchEngine(ABC):
         # If some error occurs RPC returns a dict, so return None
         return tokens if isinstance(tokens, list) else None
 
+    def get_participants_completed(self, sid):
+        """
+        :param sid: survey ID
+        :return: dict with the completed property of each participant by token
+        id | None if some error occurs
+        """
+        participants = self.server.list_participants(
+            self.session_key, sid, 0, 99999999, False, ['completed'])
+
+        if not isinstance(participants, list):
+            return None
+
+        return {int(participant['tid']): participant.get('completed') or '' for participant in participants}
+
     def add_group(self, sid, title, description):
         result = self.server.add_group(self.session_key, sid, title)
 
@@ -632,3 +709,25 @@ class Questionnaires(ABCSearchEngine):
 
     def update_response(self, sid, response_data):
         return super(Questionnaires, self).update_response(sid, response_data)
+
+
+class LazyQuestionnaires:
+    """Questionnaires that logs in to LimeSurvey on its first use, for views
+    that usually render with the data already in NES
+    """
+
+    def __init__(self):
+        self.questionnaires = None
+
+    @property
+    def logged_in(self):
+        return self.questionnaires is not None
+
+    def __getattr__(self, name):
+        if self.questionnaires is None:
+            self.questionnaires = Questionnaires()
+        return getattr(self.questionnaires, name)
+
+    def release_session_key(self):
+        if self.questionnaires is not None:
+            self.questionnaires.release_session_key()
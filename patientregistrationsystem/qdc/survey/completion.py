@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from experiment.models import QuestionnaireResponse as ExperimentQuestionnaireResponse
+from patient.models import QuestionnaireResponse as PatientQuestionnaireResponse
+from survey.abc_search_engine import Questionnaires
+from survey.models import Survey
+
+# Number of responses updated by each UPDATE statement
+UPDATE_CHUNK_SIZE = 500
+
+
+def is_response_completed(questionnaire_response):
+    return questionnaire_response.is_completed not in ['N', '']
+
+
+# Lookup of the LimeSurvey id of the survey of an experiment questionnaire response
+EXPERIMENT_RESPONSE_LIME_SURVEY_ID = \
+    'data_configuration_tree__component_configuration__component__questionnaire__survey__lime_survey_id'
+
+
+def survey_responses(lime_survey_id):
+    """Questionnaire responses, of participants and of experiments, of the survey"""
+    return [
+        PatientQuestionnaireResponse.objects.filter(survey__lime_survey_id=lime_survey_id),
+        ExperimentQuestionnaireResponse.objects.filter(**{EXPERIMENT_RESPONSE_LIME_SURVEY_ID: lime_survey_id})
+    ]
+
+
+def experiment_responses_by_survey(experiment_responses):
+    """Experiment questionnaire responses of the queryset experiment_responses
+    by LimeSurvey id of their survey, as refresh_stale_completion takes them
+    """
+    responses_by_survey = {}
+    for questionnaire_response in experiment_responses.annotate(
+            lime_survey_id=F(EXPERIMENT_RESPONSE_LIME_SURVEY_ID)):
+        responses_by_survey.setdefault(questionnaire_response.lime_survey_id, []).append(questionnaire_response)
+    return responses_by_survey
+
+
+def sync_completion(lime_survey_ids=None, surveys=None):
+    """Refresh is_completed of the questionnaire responses of the surveys with
+    one LimeSurvey call per survey. The responses are updated with UPDATE
+    statements, so their history and the experiments are not changed.
+    :param lime_survey_ids: LimeSurvey ids of the surveys, all surveys if None
+    :param surveys: Questionnaires instance to use, a new one if None
+    :return: dict with the completed property by token id of each survey
+    synced; surveys LimeSurvey couldn't list are left out
+    """
+    if lime_survey_ids is None:
+        lime_survey_ids = Survey.objects.values_list('lime_survey_id', flat=True)
+
+    questionnaire_lime_survey = surveys or Questionnaires()
+    completions = {}
+    for lime_survey_id in lime_survey_ids:
+        completed_by_token = questionnaire_lime_survey.get_participants_completed(lime_survey_id)
+        if completed_by_token is None:
+            continue
+        completions[lime_survey_id] = completed_by_token
+
+        now = timezone.now()
+        for responses in survey_responses(lime_survey_id):
+            changed = {
+                token_id: completed_by_token[token_id]
+                for token_id, completed in responses.values_list('token_id', 'is_completed')
+                if token_id in completed_by_token and completed_by_token[token_id] != completed
+            }
+            responses.update(completion_synced_at=now)
+
+            token_ids = list(changed)
+            for start in range(0, len(token_ids), UPDATE_CHUNK_SIZE):
+                chunk = token_ids[start:start + UPDATE_CHUNK_SIZE]
+                responses.filter(token_id__in=chunk).update(is_completed=Case(
+                    *[When(token_id=token_id, then=Value(changed[token_id])) for token_id in chunk],
+                    default=F('is_completed')
+                ))
+
+    if surveys is None:
+        questionnaire_lime_survey.release_session_key()
+
+    return completions
+
+
+def is_stale(questionnaire_response, now):
+    """Whether the completion of a response not completed yet was synced longer
+    ago than settings.QUESTIONNAIRE_COMPLETION_MAX_AGE. Completed responses
+    don't change anymore.
+    """
+    max_age = settings.QUESTIONNAIRE_COMPLETION_MAX_AGE
+    if max_age is None or is_response_completed(questionnaire_response):
+        return False
+    synced_at = questionnaire_response.completion_synced_at
+    return synced_at is None or synced_at < now - timedelta(seconds=max_age)
+
+
+def refresh_stale_completion(responses_by_survey, surveys=None):
+    """Sync the surveys with responses whose completion is stale, and update
+    is_completed of the responses given
+    :param responses_by_survey: dict with a list of questionnaire responses by
+    LimeSurvey id of their survey
+    :param surveys: Questionnaires instance to use, a new one if None
+    """
+    now = timezone.now()
+    stale_lime_survey_ids = [
+        lime_survey_id for lime_survey_id, responses in responses_by_survey.items()
+        if any(is_stale(questionnaire_response, now) for questionnaire_response in responses)
+    ]
+    if not stale_lime_survey_ids:
+        return
+
+    completions = sync_completion(stale_lime_survey_ids, surveys)
+    for lime_survey_id, completed_by_token in completions.items():
+        for questionnaire_response in responses_by_survey[lime_survey_id]:
+            questionnaire_response.is_completed = completed_by_token.get(
+                questionnaire_response.token_id, questionnaire_response.is_completed)
+            questionnaire_response.completion_synced_at = now
@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Namespaces of the data read from LimeSurvey
+SURVEY_TITLE = 'survey_title'
+QUESTION_GROUPS = 'question_groups'
+QUESTIONNAIRE_HEADER = 'questionnaire_header'
+
+# Version of the data cached of a survey, see invalidate_survey_cache
+SURVEY_VERSION_KEY = 'survey_version:{}'
+
+# Version of the questionnaire headers cached, see invalidate_questionnaire_headers
+QUESTIONNAIRE_HEADER_VERSION_KEY = 'questionnaire_header_version'
+LIMESURVEY_DATA_KEY = '{}:{}:{}:{}'
+
+
+def limesurvey_cache():
+    return caches['limesurvey']
+
+
+def limesurvey_cache_keys(namespace, lime_survey_ids, *parts):
+    """Returns a dict mapping each LimeSurvey id to the cache key of the data
+    of the survey in namespace identified by parts (language, token id...).
+    Keys of a survey change when invalidate_survey_cache is called for it.
+    """
+    version_keys = {sid: SURVEY_VERSION_KEY.format(sid) for sid in lime_survey_ids}
+    versions = limesurvey_cache().get_many(version_keys.values())
+    parts = '-'.join(str(part) for part in parts)
+
+    return {
+        sid: LIMESURVEY_DATA_KEY.format(namespace, sid, versions.get(version_keys[sid], 0), parts)
+        for sid in lime_survey_ids
+    }
+
+
+def limesurvey_cache_key(namespace, lime_survey_id, *parts):
+    return limesurvey_cache_keys(namespace, [lime_survey_id], *parts)[lime_survey_id]
+
+
+def invalidate_survey_cache(lime_survey_id):
+    """Discards the data of a survey cached, forcing it to be read from
+    LimeSurvey again. Other processes may use the data they keep in memory
+    for up to the LOCAL_TIMEOUT of the limesurvey cache.
+    """
+    limesurvey_cache().set(SURVEY_VERSION_KEY.format(lime_survey_id), time.time(), None)
+
+
+def invalidate_question_groups(lime_survey_id, token_id):
+    """Discards the responses of a participant cached, in every language"""
+    limesurvey_cache().delete_many([
+        limesurvey_cache_key(QUESTION_GROUPS, lime_survey_id, language_code, token_id)
+        for language_code, language_name in settings.LANGUAGES
+    ])
+
+
+def questionnaire_header_version():
+    return limesurvey_cache().get(QUESTIONNAIRE_HEADER_VERSION_KEY, 0)
+
+
+def invalidate_questionnaire_headers():
+    """Discards the headers and fields of the questionnaires cached, of every
+    survey. Called when an export starts: the questions may be edited in
+    LimeSurvey without NES knowing, so each export reads them once, and the
+    requests of the same export share them. Other processes may use the
+    headers they keep in memory for up to the LOCAL_TIMEOUT of the limesurvey
+    cache.
+    """
+    limesurvey_cache().set(QUESTIONNAIRE_HEADER_VERSION_KEY, time.time(), None)
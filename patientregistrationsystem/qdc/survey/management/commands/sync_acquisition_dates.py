@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from survey.abc_search_engine import Questionnaires
+from survey.models import Survey
+from survey.views import sync_survey_acquisitiondate
+
+
+class Command(BaseCommand):
+    help = 'Update the date of the completed questionnaire responses with their acquisition date in LimeSurvey'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--survey', nargs='*', type=int, dest='lime_survey_ids',
+            help='LimeSurvey ids of the surveys (default: all surveys)'
+        )
+
+    def handle(self, *args, **options):
+        surveys = Survey.objects.order_by('lime_survey_id')
+        if options['lime_survey_ids']:
+            surveys = surveys.filter(lime_survey_id__in=options['lime_survey_ids'])
+
+        ls = Questionnaires()
+        skipped = []
+        try:
+            for survey in surveys:
+                responses_updated = sync_survey_acquisitiondate(survey, ls)
+                if responses_updated is None:
+                    skipped.append(survey.lime_survey_id)
+                    self.stderr.write(
+                        'Survey %s: skipped, its languages or participants could not be read from LimeSurvey.'
+                        % survey.lime_survey_id)
+                    continue
+                self.stdout.write('Survey %s: %d responses updated.' % (survey.lime_survey_id, len(responses_updated)))
+        finally:
+            ls.release_session_key()
+
+        if skipped:
+            self.stderr.write('%d surveys skipped: %s' % (len(skipped), ', '.join(map(str, skipped))))
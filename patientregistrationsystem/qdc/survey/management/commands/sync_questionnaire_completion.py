@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from survey.completion import sync_completion
+
+
+class Command(BaseCommand):
+    help = 'Refresh the completion status of the questionnaire responses from LimeSurvey'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--survey', nargs='*', type=int, dest='lime_survey_ids',
+            help='LimeSurvey ids of the surveys (default: all surveys)'
+        )
+
+    def handle(self, *args, **options):
+        completions = sync_completion(options['lime_survey_ids'] or None)
+        for lime_survey_id, completed_by_token in sorted(completions.items()):
+            self.stdout.write('Survey %s: %d participants synced.' % (lime_survey_id, len(completed_by_token)))
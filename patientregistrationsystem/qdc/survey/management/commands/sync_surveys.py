@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.survey_sync import sync_surveys
+
+
+class Command(BaseCommand):
+    help = 'Refresh whether the questionnaires are active, and their titles, from the list of surveys of LimeSurvey'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true', dest='force',
+            help='read again the titles of all questionnaires, not only of those changed in LimeSurvey'
+        )
+
+    def handle(self, *args, **options):
+        surveys_updated = sync_surveys(options['force'])
+        if surveys_updated is None:
+            raise CommandError('LimeSurvey did not list the surveys.')
+        self.stdout.write('%d questionnaires updated.' % surveys_updated)
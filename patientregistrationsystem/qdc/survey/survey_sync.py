@@ -0,0 +1,114 @@
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, F, NullBooleanField, Value, When
+
+from survey.abc_search_engine import Questionnaires
+from survey.completion import UPDATE_CHUNK_SIZE
+from survey.limesurvey_cache import limesurvey_cache
+from survey.models import Survey
+
+logger = logging.getLogger(__name__)
+
+# Title of each survey in its base language by LimeSurvey id, as listed by
+# the last sync_surveys. Shown for the surveys without title in pt-BR or en.
+SURVEY_TITLES_CACHE_KEY = 'limesurvey_survey_titles'
+
+# Set while a process syncs the surveys
+SURVEY_SYNC_LOCK_CACHE_KEY = 'survey_sync_lock'
+
+# Seconds after which the lock of a sync that died expires
+SURVEY_SYNC_LOCK_TIMEOUT = 10 * 60
+
+SURVEY_TITLE_FIELDS = {'pt_title': 'pt-br', 'en_title': 'en'}
+
+
+def read_survey_titles(questionnaire_lime_survey, survey):
+    """Read the titles of the survey in pt-BR and en from LimeSurvey
+    :return: list with the title fields changed
+    """
+    fields_changed = []
+    for field, language in SURVEY_TITLE_FIELDS.items():
+        title = questionnaire_lime_survey.get_survey_title(survey.lime_survey_id, language)
+        # get_survey_title returns the id for surveys without the language
+        if title and title != str(survey.lime_survey_id) and title != getattr(survey, field):
+            setattr(survey, field, title)
+            fields_changed.append(field)
+    if fields_changed:
+        survey.save(update_fields=fields_changed)
+
+    return fields_changed
+
+
+def sync_surveys(force=False, surveys=None):
+    """Update is_active of the surveys from one list of the surveys of
+    LimeSurvey, with an UPDATE statement by chunk of surveys changed. Their
+    titles in pt-BR and en are read again, two calls per survey, only for the
+    surveys whose title in the list changed since the last sync.
+    :param force: read the titles of all surveys
+    :param surveys: Questionnaires instance to use, a new one if None
+    :return: number of surveys updated | None if LimeSurvey didn't list the
+    surveys
+    """
+    questionnaire_lime_survey = surveys or Questionnaires()
+    lime_surveys = questionnaire_lime_survey.find_all_questionnaires()
+
+    surveys_updated = None
+    if isinstance(lime_surveys, list):
+        lime_survey_by_id = {int(lime_survey['sid']): lime_survey for lime_survey in lime_surveys}
+        last_titles = {} if force else limesurvey_cache().get(SURVEY_TITLES_CACHE_KEY, {})
+        titles = {}
+        is_active_changed = {}
+        titles_changed = set()
+        for survey in Survey.objects.all():
+            lime_survey = lime_survey_by_id.get(survey.lime_survey_id)
+            if lime_survey is None:
+                continue
+            is_active = lime_survey['active'] == 'Y'
+            if survey.is_active != is_active:
+                is_active_changed[survey.pk] = is_active
+            titles[survey.lime_survey_id] = lime_survey['surveyls_title']
+            if last_titles.get(survey.lime_survey_id) != titles[survey.lime_survey_id] \
+                    and read_survey_titles(questionnaire_lime_survey, survey):
+                titles_changed.add(survey.pk)
+
+        # there is no bulk_update in this Django version
+        survey_ids = list(is_active_changed)
+        for start in range(0, len(survey_ids), UPDATE_CHUNK_SIZE):
+            chunk = survey_ids[start:start + UPDATE_CHUNK_SIZE]
+            Survey.objects.filter(pk__in=chunk).update(is_active=Case(
+                *[When(pk=survey_id, then=Value(is_active_changed[survey_id])) for survey_id in chunk],
+                default=F('is_active'), output_field=NullBooleanField()
+            ))
+
+        limesurvey_cache().set(SURVEY_TITLES_CACHE_KEY, titles, None)
+        surveys_updated = len(titles_changed.union(is_active_changed))
+
+    if surveys is None:
+        questionnaire_lime_survey.release_session_key()
+
+    return surveys_updated
+
+
+def _sync_surveys_in_background(force):
+    try:
+        sync_surveys(force)
+    except Exception:
+        logger.exception('Syncing surveys with LimeSurvey')
+    finally:
+        cache.delete(SURVEY_SYNC_LOCK_CACHE_KEY)
+        connection.close()
+
+
+def schedule_survey_sync(force=False):
+    """Run sync_surveys in a background thread, unless a sync is running
+    :return: whether the sync was started
+    """
+    # the lock expires if the process syncing dies
+    if not cache.add(SURVEY_SYNC_LOCK_CACHE_KEY, True, SURVEY_SYNC_LOCK_TIMEOUT):
+        return False
+    threading.Thread(target=_sync_surveys_in_background, args=(force,), daemon=True).start()
+
+    return True
@@ -10,6 +10,7 @@ from django.utils.encoding import smart_str
 from django.utils.translation import ugettext as _
 
 from survey.abc_search_engine import Questionnaires
+from survey.limesurvey_cache import QUESTIONNAIRE_HEADER, limesurvey_cache_keys, questionnaire_header_version
 from survey.models import Survey
 
 HEADER_EXPLANATION_FIELDS = [
@@ -450,3 +451,13 @@ def find_questionnaire_name(survey, language_code):
         surveys.release_session_key()
 
     return {'sid': survey.lime_survey_id, 'name': title}
+
+
+def questionnaire_header_cache_keys(lime_survey_ids, language_code, name):
+    """Returns a dict mapping each LimeSurvey id to the cache key of data
+    named name built from the survey header in language_code (see
+    survey.limesurvey_cache). The keys change when the survey changes and
+    when an export starts (see invalidate_questionnaire_headers).
+    """
+    return limesurvey_cache_keys(
+        QUESTIONNAIRE_HEADER, lime_survey_ids, language_code.lower(), name, questionnaire_header_version())
@@ -0,0 +1,108 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from custom_user.tests_helper import create_user
+from patient.models import QuestionnaireResponse
+from patient.tests.tests_orig import UtilTests
+from survey.abc_search_engine import Questionnaires
+from survey.completion import refresh_stale_completion, sync_completion
+
+LIME_SURVEY_ID = 212121
+
+
+class SyncCompletionTest(TestCase):
+
+    def setUp(self):
+        self.user, _ = create_user()
+        self.patient = UtilTests.create_patient(self.user)
+        self.survey = UtilTests.create_survey(LIME_SURVEY_ID, True)
+
+    @patch('survey.abc_search_engine.Server')
+    def test_get_participants_completed_returns_completed_by_token_id(self, mockServer):
+        mockServer.return_value.list_participants.return_value = [
+            {'tid': '1', 'token': 'abc', 'completed': '2018-05-15 15:51'},
+            {'tid': '2', 'token': 'def', 'completed': 'N'}
+        ]
+
+        surveys = Questionnaires()
+        completed_by_token = surveys.get_participants_completed(LIME_SURVEY_ID)
+        surveys.release_session_key()
+
+        self.assertEqual(completed_by_token, {1: '2018-05-15 15:51', 2: 'N'})
+        self.assertEqual(
+            mockServer.return_value.list_participants.call_args[0][1:],
+            (LIME_SURVEY_ID, 0, 99999999, False, ['completed']))
+
+    @patch('survey.abc_search_engine.Server')
+    def test_get_participants_completed_returns_none_if_limesurvey_gives_error(self, mockServer):
+        mockServer.return_value.list_participants.return_value = {'status': 'No survey participants found.'}
+
+        surveys = Questionnaires()
+        completed_by_token = surveys.get_participants_completed(LIME_SURVEY_ID)
+        surveys.release_session_key()
+
+        self.assertIsNone(completed_by_token)
+
+    @patch('survey.abc_search_engine.Server')
+    def test_sync_completion_updates_responses_with_one_call_per_survey(self, mockServer):
+        mockServer.return_value.list_participants.return_value = [
+            {'tid': '1', 'token': 'abc', 'completed': '2018-05-15 15:51'},
+            {'tid': '2', 'token': 'def', 'completed': 'N'}
+        ]
+        UtilTests.create_response_survey(self.user, self.patient, self.survey, 1, is_completed='N')
+        UtilTests.create_response_survey(self.user, self.patient, self.survey, 2, is_completed='N')
+
+        sync_completion([LIME_SURVEY_ID])
+
+        self.assertEqual(mockServer.return_value.list_participants.call_count, 1)
+        self.assertEqual(QuestionnaireResponse.objects.get(token_id=1).is_completed, '2018-05-15 15:51')
+        self.assertEqual(QuestionnaireResponse.objects.get(token_id=2).is_completed, 'N')
+        self.assertFalse(QuestionnaireResponse.objects.filter(completion_synced_at=None).exists())
+
+    @patch('survey.abc_search_engine.Server')
+    def test_sync_completion_keeps_responses_if_limesurvey_gives_error(self, mockServer):
+        mockServer.return_value.list_participants.return_value = {'status': 'Error: Invalid survey ID'}
+        UtilTests.create_response_survey(self.user, self.patient, self.survey, 1, is_completed='N')
+
+        self.assertEqual(sync_completion([LIME_SURVEY_ID]), {})
+
+        questionnaire_response = QuestionnaireResponse.objects.get(token_id=1)
+        self.assertEqual(questionnaire_response.is_completed, 'N')
+        self.assertIsNone(questionnaire_response.completion_synced_at)
+
+    @patch('survey.abc_search_engine.Server')
+    def test_refresh_stale_completion_syncs_survey_of_stale_response(self, mockServer):
+        mockServer.return_value.list_participants.return_value = [
+            {'tid': '1', 'token': 'abc', 'completed': '2018-05-15 15:51'}
+        ]
+        questionnaire_response = UtilTests.create_response_survey(
+            self.user, self.patient, self.survey, 1, is_completed='N')
+
+        refresh_stale_completion({LIME_SURVEY_ID: [questionnaire_response]})
+
+        self.assertEqual(mockServer.return_value.list_participants.call_count, 1)
+        self.assertEqual(questionnaire_response.is_completed, '2018-05-15 15:51')
+        self.assertIsNotNone(questionnaire_response.completion_synced_at)
+
+    @patch('survey.abc_search_engine.Server')
+    def test_refresh_stale_completion_does_not_call_limesurvey_for_completed_responses(self, mockServer):
+        questionnaire_response = UtilTests.create_response_survey(
+            self.user, self.patient, self.survey, 1, is_completed='2018-05-15 15:51')
+
+        refresh_stale_completion({LIME_SURVEY_ID: [questionnaire_response]})
+
+        mockServer.return_value.list_participants.assert_not_called()
+
+    @patch('survey.abc_search_engine.Server')
+    def test_refresh_stale_completion_does_not_call_limesurvey_for_recently_synced_responses(self, mockServer):
+        questionnaire_response = UtilTests.create_response_survey(
+            self.user, self.patient, self.survey, 1, is_completed='N')
+        questionnaire_response.completion_synced_at = timezone.now() - timedelta(seconds=10)
+
+        with override_settings(QUESTIONNAIRE_COMPLETION_MAX_AGE=60):
+            refresh_stale_completion({LIME_SURVEY_ID: [questionnaire_response]})
+
+        mockServer.return_value.list_participants.assert_not_called()
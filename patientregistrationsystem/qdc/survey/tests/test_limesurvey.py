@@ -2,7 +2,7 @@ from unittest.mock import patch
 
 from django.test import TestCase
 
-from survey.abc_search_engine import Questionnaires, ABCSearchEngine
+from survey.abc_search_engine import Questionnaires, ABCSearchEngine, limesurvey_calls
 from survey.survey_utils import QuestionnaireUtils
 
 
@@ -26,6 +26,46 @@ class LimeSurveyAPITest(TestCase):
             str(set(properties))
         )
 
+    @patch('survey.abc_search_engine.Server')
+    def test_find_all_active_questionnaires_lists_active_surveys_with_token_table(self, mockServer):
+        mockServer.return_value.list_surveys.return_value = [
+            {'sid': 1, 'active': 'Y'}, {'sid': 2, 'active': 'N'}, {'sid': 3, 'active': 'Y'}
+        ]
+        mockServer.return_value.get_summary.side_effect = \
+            lambda session_key, sid, stat_name: 0 if sid == 1 else {'status': 'No Tokens found'}
+
+        lime_survey = Questionnaires()
+
+        self.assertEqual(lime_survey.find_all_active_questionnaires(), [{'sid': 1, 'active': 'Y'}])
+        self.assertEqual(mockServer.return_value.get_summary.call_count, 2)
+
+    @patch('survey.abc_search_engine.Server')
+    def test_find_all_active_questionnaires_counts_calls_made_by_threads(self, mockServer):
+        mockServer.return_value.list_surveys.return_value = [{'sid': 1, 'active': 'Y'}, {'sid': 3, 'active': 'Y'}]
+        mockServer.return_value.get_summary.return_value = 0
+
+        lime_survey = Questionnaires()
+        calls = limesurvey_calls()
+        lime_survey.find_all_active_questionnaires()
+
+        # list_surveys and get_summary of each survey
+        self.assertEqual(limesurvey_calls() - calls, 3)
+
+    @patch('survey.abc_search_engine.Server')
+    def test_find_all_active_questionnaires_is_cached_until_a_survey_is_activated(self, mockServer):
+        mockServer.return_value.list_surveys.return_value = [{'sid': 1, 'active': 'Y'}]
+        mockServer.return_value.get_summary.return_value = 0
+        mockServer.return_value.activate_tokens.return_value = {'status': 'OK'}
+
+        lime_survey = Questionnaires()
+        lime_survey.find_all_active_questionnaires()
+        lime_survey.find_all_active_questionnaires()
+        self.assertEqual(mockServer.return_value.list_surveys.call_count, 1)
+
+        lime_survey.activate_tokens(2)
+        lime_survey.find_all_active_questionnaires()
+        self.assertEqual(mockServer.return_value.list_surveys.call_count, 2)
+
 
 class SurveyUtilsTest(TestCase):
 
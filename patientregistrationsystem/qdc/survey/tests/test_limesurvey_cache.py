@@ -0,0 +1,88 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from qdc.tiered_cache import TieredCache
+from survey.limesurvey_cache import QUESTION_GROUPS, SURVEY_TITLE, invalidate_survey_cache, limesurvey_cache, \
+    limesurvey_cache_key
+
+LIME_SURVEY_ID = 212121
+
+
+@override_settings(IS_TESTING=False)
+class TieredCacheTest(TestCase):
+
+    def setUp(self):
+        # the local tier and the counters are kept by process, so each test
+        # uses its own
+        self.cache = TieredCache('default', {
+            'KEY_PREFIX': self._testMethodName, 'OPTIONS': {'MAX_ENTRIES': 2, 'LOCAL_TIMEOUT': 60}
+        })
+        self.shared = caches['default']
+
+    def test_value_is_read_from_local_tier_after_first_read(self):
+        self.cache.set('key', 'value')
+        self.shared.delete(self.cache.make_key('key'))
+
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.stats()['local_hits'], 1)
+
+    def test_value_is_read_from_shared_tier_when_not_in_local_tier(self):
+        self.shared.set(self.cache.make_key('key'), 'value')
+
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.stats()['shared_hits'], 1)
+        self.assertEqual(self.cache.stats()['local_hits'], 1)
+
+    def test_least_recently_used_entries_are_discarded_from_local_tier(self):
+        self.cache.set('key1', 1)
+        self.cache.set('key2', 2)
+        self.cache.get('key1')
+        self.cache.set('key3', 3)
+
+        self.assertEqual(self.cache.stats()['local_entries'], 2)
+        self.assertEqual(self.cache.get('key2'), 2)
+        self.assertEqual(self.cache.stats()['shared_hits'], 1)
+
+    def test_misses_are_counted(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get_many(['key1', 'key2']), {})
+
+        self.assertEqual(self.cache.stats()['misses'], 3)
+
+    def test_add_is_decided_by_shared_tier(self):
+        self.shared.add(self.cache.make_key('lock'), 'other process')
+
+        self.assertFalse(self.cache.add('lock', 'this process'))
+        self.assertEqual(self.cache.get('lock'), 'other process')
+
+    def test_delete_removes_value_from_both_tiers(self):
+        self.cache.set('key', 'value')
+        self.cache.delete('key')
+
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.shared.get(self.cache.make_key('key')))
+
+
+class LimeSurveyCacheTest(TestCase):
+
+    def test_invalidate_survey_cache_changes_the_keys_of_the_survey(self):
+        title_key = limesurvey_cache_key(SURVEY_TITLE, LIME_SURVEY_ID, 'en')
+        other_survey_key = limesurvey_cache_key(SURVEY_TITLE, LIME_SURVEY_ID + 1, 'en')
+
+        invalidate_survey_cache(LIME_SURVEY_ID)
+
+        self.assertNotEqual(limesurvey_cache_key(SURVEY_TITLE, LIME_SURVEY_ID, 'en'), title_key)
+        self.assertEqual(limesurvey_cache_key(SURVEY_TITLE, LIME_SURVEY_ID + 1, 'en'), other_survey_key)
+
+    def test_keys_are_namespaced(self):
+        self.assertNotEqual(
+            limesurvey_cache_key(SURVEY_TITLE, LIME_SURVEY_ID, 'en', 1),
+            limesurvey_cache_key(QUESTION_GROUPS, LIME_SURVEY_ID, 'en', 1))
+
+    def test_shared_tier_is_not_the_default_cache(self):
+        cache = limesurvey_cache()
+        cache.set('key', 'value')
+
+        self.assertEqual(caches['limesurvey_shared'].get(cache.make_key('key')), 'value')
+        self.assertIsNone(caches['default'].get(cache.make_key('key')))
@@ -1,7 +1,9 @@
 from base64 import b64decode
-from unittest.mock import patch
+from io import StringIO
+from unittest.mock import ANY, patch
 
 from django.contrib.auth.models import Group
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
 from django.test import TestCase, override_settings
 from django.test.client import RequestFactory
@@ -12,9 +14,9 @@ from patient.tests.tests_orig import UtilTests
 from patient.models import QuestionnaireResponse as \
     PatientQuestionnaireResponse
 from survey.models import Survey
+from survey.survey_sync import sync_surveys
 from survey.tests.tests_helper import create_survey
 from survey.views import survey_update, update_acquisitiondate
-from survey.abc_search_engine import Questionnaires
 
 from experiment.models import QuestionnaireResponse, Questionnaire, \
     Experiment, ComponentConfiguration, Block, Subject, \
@@ -438,6 +440,26 @@ class SurveyTest(TestCase):
         # dates created in questionnaire responses, so the dates were updated
         self.assertEqual(len(responses), 0)
 
+    @patch('survey.abc_search_engine.Server')
+    def test_update_acquisitiondate_from_limesurvey_writes_dates_of_responses_updated(
+            self, mockServer):
+        self._set_mocks(mockServer)
+
+        patient2 = UtilTests.create_patient(self.user)
+        UtilTests.create_response_survey(
+            self.user, patient2, self.survey, token_id=2)
+
+        tokens = mockServer.return_value.list_participants.return_value
+        ls_responses = b64decode(
+            mockServer.return_value.export_responses.return_value).decode()
+
+        update_acquisitiondate(tokens, ls_responses, list(PatientQuestionnaireResponse.objects.all()))
+
+        self.assertEqual(
+            PatientQuestionnaireResponse.objects.get(token_id=1).date.strftime('%Y-%m-%d'), '2021-03-09')
+        self.assertEqual(
+            PatientQuestionnaireResponse.objects.get(token_id=2).date.strftime('%Y-%m-%d'), '2021-04-09')
+
     @patch('survey.abc_search_engine.Server')
     def test_GET_update_survey_acquisitiondate_view_redirects_to_survey_view_with_right_message1(
             self, mockServer):
@@ -485,40 +507,49 @@ class SurveyTest(TestCase):
         self.assertContains(response, '2 respostas foram atualizadas!')
 
     @patch('survey.abc_search_engine.Server')
-    def test_survey_without_pt_title_gets_pt_title_filled_with_limesurvey_code_when_there_is_not_en_title(
+    def test_GET_update_survey_acquisitiondate_view_of_survey_removed_from_limesurvey_shows_error(
             self, mockServer):
-        mockServer.return_value.get_session_key.return_value = \
-            'vz224sb7jzkvh8i4kpx8fxbcxd67meht'
-        mockServer.return_value.get_language_properties.return_value = \
-            {'status': 'Error: Invalid survey ID'}
+        self._set_mocks(mockServer)
+        mockServer.return_value.get_survey_properties.return_value = {'status': 'Error: Invalid survey ID'}
 
-        # Create a survey with a dummy lime survey id and without any code
-        survey = Survey.objects.create(lime_survey_id=-1)
-        self.assertIsNone(survey.pt_title)
+        response = self.client.get(reverse(
+            'update_survey_acquisitiondate', args=(self.survey.pk,)),
+            follow=True)
 
-        response = self.client.get(reverse('survey_list'))
-        self.assertIsNotNone(Survey.objects.last().pt_title)
-        self.assertEqual(Survey.objects.last().pt_title, str(
-            survey.lime_survey_id))
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.context['questionnaires_list']), 2)
+        self.assertRedirects(response, reverse('survey_view', args=(self.survey.pk,)))
+        self.assertContains(response, 'It was not possible to read the languages or the participants')
+        mockServer.return_value.release_session_key.assert_called_once_with('abc')
 
-    @override_settings(LANGUAGE_CODE='en')
     @patch('survey.abc_search_engine.Server')
-    def test_survey_without_en_title_gets_en_title_filled_with_limesurvey_code_when_there_is_not_pt_title(
-            self, mockServer):
-        mockServer.return_value.get_session_key.return_value = 'vz224sb7jzkvh8i4kpx8fxbcxd67meht'
-        mockServer.return_value.get_language_properties.return_value = {'status': 'Error: Invalid survey ID'}
+    def test_sync_acquisition_dates_command_skips_surveys_that_can_not_be_read(self, mockServer):
+        self._set_mocks(mockServer)
+        mockServer.return_value.list_participants.return_value = {'status': 'No survey participants table'}
+        stdout, stderr = StringIO(), StringIO()
+
+        call_command('sync_acquisition_dates', stdout=stdout, stderr=stderr)
+
+        self.assertIn('Survey %s: skipped' % self.survey.lime_survey_id, stderr.getvalue())
+        self.assertNotIn('responses updated', stdout.getvalue())
+        mockServer.return_value.release_session_key.assert_called_once_with('abc')
+
+    @patch('survey.abc_search_engine.Server')
+    def test_survey_without_titles_is_listed_with_limesurvey_code_without_reading_limesurvey(self, mockServer):
+        mockServer.return_value.get_session_key.return_value = \
+            'vz224sb7jzkvh8i4kpx8fxbcxd67meht'
 
         # Create a survey with a dummy lime survey id and without any code
         survey = Survey.objects.create(lime_survey_id=-1)
-        self.assertIsNone(survey.en_title)
+        self.assertIsNone(survey.pt_title)
 
         response = self.client.get(reverse('survey_list'))
-        self.assertIsNotNone(Survey.objects.last().en_title)
-        self.assertEqual(Survey.objects.last().en_title, str(survey.lime_survey_id))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context['questionnaires_list']), 2)
+        self.assertIn(str(survey.lime_survey_id), [
+            questionnaire['title'] for questionnaire in response.context['questionnaires_list']
+        ])
+        self.assertIsNone(Survey.objects.last().pt_title)
+        mockServer.return_value.get_language_properties.assert_not_called()
+        mockServer.return_value.get_survey_properties.assert_not_called()
 
     @patch('survey.abc_search_engine.Server')
     def test_survey_without_pt_title_gets_listed_with_en_title_instead_but_remains_without_pt_title(self, mockServer):
@@ -562,21 +593,16 @@ class SurveyTest(TestCase):
             self, mockServer):
         mockServer.return_value.get_session_key.return_value = \
             'vz224sb7jzkvh8i4kpx8fxbcxd67meht'
-        mockServer.return_value.add_survey.return_value = 21212150
-        mockServer.return_value.get_language_properties.side_effect = [
-            {'surveyls_title': None},
-            {'surveyls_title': None},
-            {'surveyls_title': 'Test Questionnaire in French'}
-        ]
-        mockServer.return_value.get_survey_properties.return_value = {'active': 'N'}
+        mockServer.return_value.get_language_properties.return_value = {'surveyls_title': None}
 
-        lime_survey = Questionnaires()
-
-        # Create a new survey at LimeSurvey withou titles in pt or en languages
+        # A survey at LimeSurvey without titles in pt or en languages
         fr_title_survey = 'Test Questionnaire in French'
-        sid = lime_survey.add_survey(9999, fr_title_survey, 'fr', 'G')
+        mockServer.return_value.list_surveys.return_value = [
+            {'sid': '9999', 'surveyls_title': fr_title_survey, 'active': 'N'}
+        ]
 
-        Survey.objects.create(lime_survey_id=sid)
+        Survey.objects.create(lime_survey_id=9999)
+        sync_surveys()
         response = self.client.get(reverse('survey_list'))
 
         # Check if the page renders the fr title of the survey
@@ -590,15 +616,13 @@ class SurveyTest(TestCase):
     def test_surveys_list_get_updated(self, mockServer):
         mockServer.return_value.get_session_key.return_value = \
             'vz224sb7jzkvh8i4kpx8fxbcxd67meht'
-        mockServer.return_value.add_survey.return_value = 212121
+        mockServer.return_value.list_surveys.return_value = [
+            {'sid': str(self.survey.lime_survey_id), 'surveyls_title': 'Questionário Teste', 'active': 'N'}
+        ]
         mockServer.return_value.get_language_properties.side_effect = [
-            {'surveyls_title': 'Questionário Teste'},
-            {'surveyls_title': None},
             {'surveyls_title': 'Questionário Teste'},
             {'surveyls_title': None}
         ]
-        mockServer.return_value.get_survey_properties.return_value = \
-            {'active': 'N'}
 
         # Simulate a discrepancy between the survey informations at
         # limesurvey and NES
@@ -607,13 +631,41 @@ class SurveyTest(TestCase):
 
         self.assertNotEqual(Survey.objects.last().pt_title, 'Questionário Teste')
 
-        # Simulate clicking to update the list with new limesurvey information
-        self.client.post(
-            reverse('survey_list'), {'action': 'update'}, follow=True)
+        # Simulate the update of the list with new limesurvey information
+        sync_surveys(force=True)
 
         # Check if the pt_title was updated properly
         self.assertEqual(Survey.objects.last().pt_title, 'Questionário Teste')
 
+    @patch('survey.abc_search_engine.Server')
+    def test_sync_surveys_updates_is_active_with_one_limesurvey_list(self, mockServer):
+        mockServer.return_value.get_language_properties.return_value = {'surveyls_title': None}
+        other_survey = create_survey(313131)
+        Survey.objects.update(is_active=False)
+        mockServer.return_value.list_surveys.return_value = [
+            {'sid': str(self.survey.lime_survey_id), 'surveyls_title': 'Survey', 'active': 'Y'},
+            {'sid': str(other_survey.lime_survey_id), 'surveyls_title': 'Other survey', 'active': 'N'}
+        ]
+
+        self.assertEqual(sync_surveys(), 1)
+        self.assertTrue(Survey.objects.get(pk=self.survey.pk).is_active)
+        self.assertFalse(Survey.objects.get(pk=other_survey.pk).is_active)
+
+        # titles are read again only for the surveys whose title changed
+        mockServer.return_value.get_language_properties.reset_mock()
+        sync_surveys()
+        mockServer.return_value.list_surveys.assert_called()
+        mockServer.return_value.get_language_properties.assert_not_called()
+        mockServer.return_value.get_survey_properties.assert_not_called()
+
+    @patch('survey.survey_sync.threading.Thread')
+    def test_update_action_syncs_surveys_in_background(self, mock_thread):
+        response = self.client.post(reverse('survey_list'), {'action': 'update'})
+
+        self.assertRedirects(response, reverse('survey_list'), fetch_redirect_response=False)
+        mock_thread.assert_called_once_with(target=ANY, args=(True,), daemon=True)
+        mock_thread.return_value.start.assert_called_once_with()
+
     @staticmethod
     def _set_mocks(mockServer):
         mockServer.return_value.get_session_key.return_value = 'abc'
@@ -13,7 +13,10 @@ from operator import itemgetter
 from django.contrib import messages
 from django.contrib.admin.utils import flatten
 from django.contrib.auth.decorators import login_required, permission_required
+from django.conf import settings
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.db.models import Case, DateField, F, Value, When
 from django.db.models.deletion import ProtectedError
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
@@ -21,12 +24,19 @@ from django.utils.translation import ugettext as _
 
 from .models import Survey, SensitiveQuestion
 from .forms import SurveyForm
-from survey.abc_search_engine import Questionnaires
+from survey.abc_search_engine import LazyQuestionnaires, Questionnaires
+from survey.survey_sync import SURVEY_TITLES_CACHE_KEY, schedule_survey_sync
+from survey.limesurvey_cache import QUESTION_GROUPS, SURVEY_TITLE, invalidate_survey_cache, limesurvey_cache, \
+    limesurvey_cache_key
+from survey.completion import UPDATE_CHUNK_SIZE, experiment_responses_by_survey, is_response_completed, \
+    refresh_stale_completion
 
 from experiment.models import ComponentConfiguration, QuestionnaireResponse, Questionnaire, Group, Block
 
 from patient.models import Patient, QuestionnaireResponse as PatientQuestionnaireResponse
 
+# Whether LimeSurvey accepted the last login, see check_cached_limesurvey_access
+LIMESURVEY_AVAILABLE_CACHE_KEY = 'limesurvey_available'
 
 questionnaire_evaluation_fields_excluded = [
     "subjectid",
@@ -49,93 +59,55 @@ class GroupOfQuestions:
     questionnaire_responses = []
 
 
-def get_survey_title_based_on_the_user_language(survey, language_code, update=False):
+def get_survey_title_based_on_the_user_language(survey, language_code, base_titles):
+    """Title of the survey from the data in NES: the title in the user's
+    language, else in the other language, else in the base language of the
+    survey as listed by the last sync_surveys, else its LimeSurvey id
+    :param base_titles: dict with the title in the base language by
+    LimeSurvey id (see SURVEY_TITLES_CACHE_KEY)
+    """
+    titles = {'pt-br': survey.pt_title, 'en': survey.en_title}
+    fallback_language = 'en' if language_code == 'pt-br' else 'pt-br'
 
-    if not update:
-        # Get the titles in both languages and return the one compatible with the user's language,
-        # If the title is blank in that language, return it in the other language, and
-        # if that one is also blank, try to update the titles in each language
-        # if any of them updates isn't blank, recursively calls this function
-        # otherwise, try to get the title for this survey at LimeSurvey and return it
-        titles = {'pt-br': survey.pt_title, 'en': survey.en_title}
-        fallback_language = 'en' if language_code == 'pt-br' else 'pt-br'
+    if titles[language_code]:
+        return titles[language_code]
+    elif titles[fallback_language]:
+        return titles[fallback_language]
 
-        if titles[language_code]:
-            return titles[language_code]
-        elif titles[fallback_language]:
-            return titles[fallback_language]
-
-    surveys = Questionnaires()
-    pt_title = surveys.get_survey_title(survey.lime_survey_id, 'pt-br')
-    en_title = surveys.get_survey_title(survey.lime_survey_id, 'en')
-
-    if language_code == 'pt-br' and pt_title:
-        surveys.release_session_key()
-        survey.pt_title = pt_title
-        survey.save()
-        return get_survey_title_based_on_the_user_language(survey, language_code)
-    elif language_code == 'en' and en_title:
-        surveys.release_session_key()
-        survey.en_title = en_title
-        survey.save()
-        return get_survey_title_based_on_the_user_language(survey, language_code)
-    else:
-        title = surveys.get_survey_title(survey.lime_survey_id)
-        surveys.release_session_key()
-
-        if title:
-            return title
-        else:
-            return survey.lime_survey_id
+    return base_titles.get(survey.lime_survey_id) or str(survey.lime_survey_id)
 
 
 @login_required
 @permission_required('survey.view_survey')
 def survey_list(request, template_name='survey/survey_list.html'):
-    surveys = Questionnaires()
-    limesurvey_available_ = check_limesurvey_access(request, surveys)
+    if request.method == "POST" and request.POST['action'] == "update":
+        # is_active and the titles are synced in the background
+        if schedule_survey_sync(force=True):
+            messages.success(request, _('The questionnaires are being updated from LimeSurvey.'))
+        else:
+            messages.info(request, _('The questionnaires are already being updated from LimeSurvey.'))
 
-    questionnaires_list = []
+        return HttpResponseRedirect(reverse('survey_list'))
 
-    language_code = request.LANGUAGE_CODE
+    surveys = LazyQuestionnaires()
+    limesurvey_available_ = check_cached_limesurvey_access(request, surveys)
+    surveys.release_session_key()
 
-    update = False
-    if request.method == "POST":
-        if request.POST['action'] == "update":
-            update = True
+    language_code = request.LANGUAGE_CODE
+    base_titles = limesurvey_cache().get(SURVEY_TITLES_CACHE_KEY, {})
 
+    questionnaires_list = []
     for survey in Survey.objects.all():
-        survey_title = get_survey_title_based_on_the_user_language(
-            survey, language_code, update)
-
-        # Get the status of the survey
-        # If there's any inactive survey, search LimeSurvey to see if
-        # there's any change in that matter and update the fields in the
-        # database
-        is_active = survey.is_active
-
-        if not is_active or update:
-            status = surveys.get_survey_properties(
-                survey.lime_survey_id, 'active')
-            if status == 'Y':
-                survey.is_active = True
-            else:
-                survey.is_active = False
-
-            survey.save()
-
         questionnaires_list.append(
             {
                 'id': survey.id,
                 'lime_survey_id': survey.lime_survey_id,
-                'title': survey_title,
+                'title': get_survey_title_based_on_the_user_language(survey, language_code, base_titles),
                 'is_initial_evaluation': survey.is_initial_evaluation,
                 'is_active': survey.is_active,
             }
         )
 
-    surveys.release_session_key()
-
     questionnaires_list = sorted(questionnaires_list, key=itemgetter('title'))
 
     context = {
@@ -405,7 +377,11 @@ def create_experiments_questionnaire_data_list(survey, surveys):
     # filtering out duplicate component configurations from the list.
     experiments_questionnaire_data_dictionary = {}
 
-    for qr in QuestionnaireResponse.objects.all():
+    questionnaire_responses = QuestionnaireResponse.objects.filter(
+        data_configuration_tree__component_configuration__component__questionnaire__survey=survey)
+    refresh_stale_completion(experiment_responses_by_survey(questionnaire_responses), surveys)
+
+    for qr in questionnaire_responses:
         q = Questionnaire.objects.get(
             id=qr.data_configuration_tree.component_configuration.component_id
         )
@@ -435,13 +411,10 @@ def create_experiments_questionnaire_data_list(survey, surveys):
                     'questionnaire_responses': []
                 }
 
-            response_result = surveys.get_participant_properties(
-                q.survey.lime_survey_id, qr.token_id, "completed")
-
             experiments_questionnaire_data_dictionary[use.id]['patients'][patient.id]['questionnaire_responses'].append(
                 {
                     'questionnaire_response': qr,
-                    'completed': None if response_result is None else response_result != "N" and response_result != ""
+                    'completed': is_response_completed(qr)
                 })
 
     surveys.release_session_key()
@@ -596,8 +569,36 @@ def create_patients_questionnaire_data_list(survey, surveys):
 def update_survey_acquisitiondate_view(request, survey_id):
     survey = get_object_or_404(Survey, pk=survey_id)
     ls = Questionnaires()
+    try:
+        responses_updated = sync_survey_acquisitiondate(survey, ls)
+    finally:
+        ls.release_session_key()
+
+    if responses_updated is None:
+        messages.error(
+            request, _('It was not possible to read the languages or the participants of the questionnaire '
+                       'from LimeSurvey.'))
+    else:
+        make_messages(request, responses_updated)
+
+    return HttpResponseRedirect(
+        reverse('survey_view', args=(survey.pk,)))
+
+
+def sync_survey_acquisitiondate(survey, ls):
+    """Update the date of the completed responses of the survey with their
+    acquisition date in LimeSurvey, in each language of the survey
+    :param ls: Questionnaires instance
+    :return: list of responses with acquisitiondate updated | None if the
+    languages or the tokens of the survey can't be read from LimeSurvey (the
+    survey was removed from it, for instance)
+    """
     languages = ls.get_survey_languages(survey.lime_survey_id)
+    if languages is None:
+        return None
     tokens = ls.find_tokens_by_questionnaire(survey.lime_survey_id)
+    if tokens is None:
+        return None
     default_language = languages['language']
     additional_language = languages['additional_languages']
     nes_responses = get_responses(survey)
@@ -608,12 +609,7 @@ def update_survey_acquisitiondate_view(request, survey_id):
             update_acquisitiondate(tokens, ls_responses, nes_responses))
         responses_updated = flatten(responses_updated)
 
-    ls.release_session_key()
-
-    make_messages(request, responses_updated)
-
-    return HttpResponseRedirect(
-        reverse('survey_view', args=(survey.pk,)))
+    return responses_updated
 
 
 def get_responses(survey):
@@ -634,32 +630,48 @@ def update_acquisitiondate(tokens, ls_responses, nes_responses):
     entrance questionnaire responses
     :return: list of responses with acquisitiondate updated
     """
-    ls_responses = csv_to_list(ls_responses)
+    token_by_tid = {int(item['tid']): item['token'] for item in tokens}
+    ls_response_by_token = {}
+    for ls_response in csv_to_list(ls_responses or ''):
+        ls_response_by_token.setdefault(ls_response['token'], ls_response)
+
     responses_updated = []
     for response in nes_responses:
-        token = next((
-            item['token'] for item in tokens
-            if item['tid'] == response.token_id), None)
-        if token is not None:
-            ls_response = next((
-                ls_response for ls_response in ls_responses
-                if ls_response['token'] == token), None)
-            if ls_response is not None:
-                try:
-                    new_date = datetime.datetime.strptime(
-                            ls_response['acquisitiondate'],
-                            '%Y-%m-%d %H:%M:%S')
-                except ValueError:
-                    continue
-                new_date = new_date.date()
-                if response.date != new_date:
-                    response.date = new_date
-                    responses_updated.append(response)
-                response.save()
+        ls_response = ls_response_by_token.get(token_by_tid.get(response.token_id))
+        if ls_response is not None:
+            try:
+                new_date = datetime.datetime.strptime(
+                        ls_response['acquisitiondate'],
+                        '%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                continue
+            new_date = new_date.date()
+            if response.date != new_date:
+                response.date = new_date
+                responses_updated.append(response)
+
+    save_dates(responses_updated)
 
     return responses_updated
 
 
+def save_dates(questionnaire_responses):
+    """Write the date of the questionnaire responses with one UPDATE by model
+    and chunk of responses (there is no bulk_update in this Django version)
+    """
+    responses_by_model = {}
+    for questionnaire_response in questionnaire_responses:
+        responses_by_model.setdefault(type(questionnaire_response), []).append(questionnaire_response)
+
+    for model, responses in responses_by_model.items():
+        for start in range(0, len(responses), UPDATE_CHUNK_SIZE):
+            chunk = responses[start:start + UPDATE_CHUNK_SIZE]
+            model.objects.filter(pk__in=[response.pk for response in chunk]).update(date=Case(
+                *[When(pk=response.pk, then=Value(response.date)) for response in chunk],
+                default=F('date'), output_field=DateField()
+            ))
+
+
 def csv_to_list(responses):
     responses_csv = StringIO(responses)
     responses_list = []
@@ -695,6 +707,9 @@ def survey_view(request, survey_id, template_name="survey/survey_register.html")
     language = get_questionnaire_language(
         surveys, survey.lime_survey_id, request.LANGUAGE_CODE)
     survey_title = surveys.get_survey_title(survey.lime_survey_id, language)
+    # Viewing the questionnaire is the way to make NES aware of changes made
+    # to it in LimeSurvey: the data cached of the survey is read again.
+    invalidate_survey_cache(survey.lime_survey_id)
 
     # There is no need to use "request.POST or None" because the data will
     # never be changed here. In fact we have to use "None" only, because
@@ -743,6 +758,30 @@ def survey_view(request, survey_id, template_name="survey/survey_register.html")
     return render(request, template_name, context)
 
 
+def get_cached_questionnaire_responses(language_code, lime_survey_id, token_id, request):
+    """get_questionnaire_responses, with the survey title and the groups of
+    questions answered kept in the limesurvey cache until the survey changes
+    or the participant fills the questionnaire again (see
+    survey.limesurvey_cache)
+    """
+    language_code = language_code.lower()
+    survey_title_key = limesurvey_cache_key(SURVEY_TITLE, lime_survey_id, language_code)
+    groups_of_questions_key = limesurvey_cache_key(QUESTION_GROUPS, lime_survey_id, language_code, token_id)
+
+    cached = limesurvey_cache().get_many([survey_title_key, groups_of_questions_key])
+    if cached.get(survey_title_key) and cached.get(groups_of_questions_key):
+        return cached[survey_title_key], cached[groups_of_questions_key]
+
+    survey_title, groups_of_questions = get_questionnaire_responses(
+        language_code, lime_survey_id, token_id, request)
+    if survey_title and groups_of_questions:
+        limesurvey_cache().set_many({
+            survey_title_key: survey_title, groups_of_questions_key: groups_of_questions
+        })
+
+    return survey_title, groups_of_questions
+
+
 def get_questionnaire_responses(language_code, lime_survey_id, token_id, request):
 
     groups_of_questions = []
@@ -1065,6 +1104,22 @@ def check_limesurvey_access(request, surveys):
     return available
 
 
+def check_cached_limesurvey_access(request, surveys):
+    """check_limesurvey_access for a LazyQuestionnaires: while it didn't log
+    in, the availability seen by the last login is used instead of logging in
+    :return: Boolean
+    """
+    available = None if surveys.logged_in else cache.get(LIMESURVEY_AVAILABLE_CACHE_KEY)
+    if available is None:
+        available = bool(limesurvey_available(surveys))
+        cache.set(LIMESURVEY_AVAILABLE_CACHE_KEY, available, settings.LIMESURVEY_AVAILABLE_TTL)
+    if not available:
+        messages.warning(
+            request, _("LimeSurvey unavailable. System running partially."))
+
+    return available
+
+
 def limesurvey_available(surveys):
     return surveys.session_key
 